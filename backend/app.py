@@ -1,26 +1,32 @@
-from flask import Flask, render_template, request, jsonify
+from flask import (Flask, render_template, request, jsonify, Response, send_file, stream_with_context,
+                   redirect, url_for, g)
 import os
 import json
 import logging
+import time
 from pathlib import Path
 import glob
 import re
 from typing import List, Dict
 import threading
+from functools import lru_cache
+from contextlib import ExitStack
 
-from config import LANGUAGES, DEFAULT_VERSION, PROJECT_ROOT, FLASK_CONFIG
-from utils import setup_logging, format_run_id, validate_language_pair, detect_language
-from services import TranslationService, EvaluationService
-from batch import run_batch_translation, run_batch_evaluation, run_live_translation_and_evaluation
-from examples import EXAMPLES
-from tts_service import TTSService
+from config import LANGUAGES, DEFAULT_VERSION, PROJECT_ROOT, DATA_ROOT, FLASK_CONFIG, HISTORY_CACHE_TTL
+from utils import setup_logging, format_run_id, validate_language_pair, detect_language, load_run_usage
+from usage import merge_usage
+from refstore import get_reference_store
+from limits import get_budget
+from tts_segments import MAX_TEXT_CHARS
+from shared_store import get_shared_store
+import metrics
 
-# 简化日志配置
+# 简化日志配置（日志文件在第一条日志写入时才打开）
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('logs/app.log', encoding='utf-8'),
+        logging.FileHandler('logs/app.log', encoding='utf-8', delay=True),
         logging.StreamHandler()
     ]
 )
@@ -28,10 +34,52 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 
-# Initialize services
-translation_service = TranslationService()
-evaluation_service = EvaluationService()
-tts_service = TTSService()
+# Services (and the requests/batch modules behind them) are created on first use
+# so that importing the app stays fast; see scripts/profile_startup.py
+@lru_cache(maxsize=None)
+def get_translation_service():
+    from services import TranslationService
+    return TranslationService()
+
+@lru_cache(maxsize=None)
+def get_evaluation_service():
+    from services import EvaluationService
+    return EvaluationService()
+
+@lru_cache(maxsize=None)
+def get_tts_service():
+    from tts_service import TTSService
+    return TTSService()
+
+# ========= Metrics =========
+
+@app.before_request
+def _metrics_start():
+    g.metrics_started = time.perf_counter()
+    metrics.HTTP_IN_FLIGHT.inc()
+    metrics.start_publisher()
+
+@app.after_request
+def _metrics_record(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, method=request.method, route=route)
+    return response
+
+@app.teardown_request
+def _metrics_finish(exc):
+    # Runs after a streamed response has been fully sent
+    metrics.HTTP_IN_FLIGHT.dec()
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition of request, upstream, cache and job metrics for all workers"""
+    from config import get_metrics_config
+    if not get_metrics_config()['enabled']:
+        return jsonify({"success": False, "error": "Metrics are disabled"}), 404
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/')
 def index():
@@ -39,6 +87,12 @@ def index():
     logger.info("Serving main page")
     return render_template('index.html', languages=LANGUAGES)
 
+def _use_memory(data: dict) -> bool:
+    """请求中的 memory 参数，未指定时使用 TM_ENABLED"""
+    from config import get_memory_config
+    memory = data.get('memory')
+    return get_memory_config()['enabled'] if memory is None else bool(memory)
+
 @app.route('/api/translate', methods=['POST'])
 def api_translate():
     """API endpoint for translation with enhanced parameter support"""
@@ -52,19 +106,25 @@ def api_translate():
     temperature = data.get('temperature')  # None means use config default
     max_length = data.get('max_length')  # None means use config default
     top_p = data.get('top_p')  # None means use config default
+    # Reuse the translations of unchanged sentences from earlier requests
+    incremental = bool(data.get('incremental'))
+    use_memory = _use_memory(data)
     
-    logger.info(f"Translation API called: {source_lang} -> {target_lang}, stream={stream}, temp={temperature}")
-    
-    # Auto detect language if needed
-    if source_lang in ['auto', '', None]:
-        source_lang = detect_language(text)
-        logger.info(f"Auto-detected source language: {source_lang}")
+    logger.info(f"Translation API called: {source_lang} -> {target_lang}, stream={stream}, temp={temperature}, "
+                f"incremental={incremental}")
     
     # Validate required parameters
     if not text:
         logger.warning("Missing text in translation request")
         return jsonify({"success": False, "error": "Text is required"})
     
+    # Auto detect language if needed
+    if source_lang in ['auto', '', None]:
+        source_lang = detect_language(text)
+        logger.info(f"Auto-detected source language: {source_lang}")
+        if not source_lang:
+            return jsonify({"success": False, "error": "Could not detect the source language, please specify source_lang"})
+    
     # Validate language pair
     is_valid, error_msg = validate_language_pair(source_lang, target_lang)
     if not is_valid:
@@ -72,19 +132,91 @@ def api_translate():
         return jsonify({"success": False, "error": error_msg})
     
     # Call translation service with parameters
-    result = translation_service.translate_text(
-        source_lang=source_lang,
-        target_lang=target_lang,
-        text=text,
-        stream=stream,
-        temperature=temperature,
-        max_length=max_length,
-        top_p=top_p
-    )
+    if incremental:
+        # Each changed sentence takes its own slot
+        result = get_translation_service().translate_incremental(
+            source_lang, target_lang, text,
+            slot=get_budget('translation').slot,
+            stream=stream,
+            temperature=temperature,
+            max_length=max_length,
+            top_p=top_p,
+            use_memory=use_memory
+        )
+        logger.info(f"Translation API result: success={result['success']}, "
+                    f"reused {result.get('reused_segments')}/{result.get('segments')} segments")
+        return jsonify(result)
+    with get_budget('translation').slot():
+        result = get_translation_service().translate_text(
+            source_lang=source_lang,
+            target_lang=target_lang,
+            text=text,
+            stream=stream,
+            temperature=temperature,
+            max_length=max_length,
+            top_p=top_p,
+            use_memory=use_memory
+        )
     
     logger.info(f"Translation API result: success={result['success']}")
     return jsonify(result)
 
+@app.route('/api/translate/multi', methods=['POST'])
+def api_translate_multi():
+    """API endpoint translating one text into several target languages in a single call"""
+    data = request.get_json()
+    source_lang = data.get('source_lang') or 'auto'
+    target_langs = data.get('target_langs')
+    text = data.get('text', '').strip()
+    mode = data.get('mode')  # None means use config default
+
+    logger.info(f"Multi-target translation API called: {source_lang} -> {target_langs}, mode={mode}")
+
+    if not text:
+        logger.warning("Missing text in multi-target translation request")
+        return jsonify({"success": False, "error": "Text is required"})
+    if target_langs is not None and (not isinstance(target_langs, list) or not target_langs):
+        return jsonify({"success": False, "error": "target_langs must be a non-empty list"})
+
+    # Detect the source language once for all targets
+    if source_lang in ['auto', '', None]:
+        source_lang = detect_language(text)
+        logger.info(f"Auto-detected source language: {source_lang}")
+        if not source_lang:
+            return jsonify({"success": False, "error": "Could not detect the source language, please specify source_lang"})
+
+    # Without target_langs, translate into every other supported language
+    if target_langs is None:
+        target_langs = [lang for lang in LANGUAGES if lang != source_lang]
+    target_langs = list(dict.fromkeys(target_langs))
+    for target_lang in target_langs:
+        is_valid, error_msg = validate_language_pair(source_lang, target_lang)
+        if not is_valid:
+            logger.warning(f"Invalid language pair: {error_msg}")
+            return jsonify({"success": False, "error": error_msg})
+
+    # Each upstream call takes its own interactive slot
+    result = get_translation_service().translate_multi(
+        source_lang, target_langs, text,
+        mode=mode,
+        slot=get_budget('translation').slot,
+        stream=data.get('stream'),
+        temperature=data.get('temperature'),
+        max_length=data.get('max_length'),
+        top_p=data.get('top_p'),
+        use_memory=_use_memory(data)
+    )
+    result['source_lang'] = source_lang
+
+    logger.info(f"Multi-target translation API result: success={result['success']}")
+    return jsonify(result)
+
+@app.route('/api/memory')
+def api_memory():
+    """Translation memory size and match rates per language pair (this worker)"""
+    from tm import memory_stats
+    return jsonify({"success": True, "pairs": memory_stats()})
+
 @app.route('/api/evaluate', methods=['POST'])
 def api_evaluate():
     """API endpoint for translation evaluation"""
@@ -108,7 +240,8 @@ def api_evaluate():
         return jsonify({"success": False, "error": error_msg})
     
     # Call evaluation service
-    result = evaluation_service.evaluate_translation(source_lang, target_lang, source_text, translation)
+    with get_budget('evaluation').slot():
+        result = get_evaluation_service().evaluate_translation(source_lang, target_lang, source_text, translation)
     logger.info(f"Evaluation API result: success={result['success']}")
     return jsonify(result)
 
@@ -120,13 +253,34 @@ def batch_index():
 @app.route('/api/examples')
 def api_examples():
     """Return a dictionary of example sentences for the playground."""
+    from examples import EXAMPLES
     return jsonify(EXAMPLES)
 
+@app.route('/api/references/<suite>/<int:line>')
+def api_reference(suite, line):
+    """Get the human reference translation of a suite line (one language via ?lang=, or all)"""
+    store = get_reference_store()
+    language = request.args.get('lang')
+    languages = [language] if language else store.languages(suite)
+
+    references = {lang: store.get(suite, line, lang) for lang in languages}
+    references = {lang: text for lang, text in references.items() if text is not None}
+    if not references:
+        return jsonify({"success": False, "error": f"No reference found for {suite} line {line}"}), 404
+    return jsonify({"success": True, "suite": suite, "line": line, "references": references})
+
 @app.route('/api/history')
 def api_history():
     """Get translation and evaluation history"""
+    # Scanning every run is the slowest read endpoint; workers share the result briefly
+    store = get_shared_store()
+    cached = store.get('cache:history') if store and HISTORY_CACHE_TTL > 0 else None
+    if store and HISTORY_CACHE_TTL > 0:
+        metrics.cache_lookup('history', cached is not None)
+    if cached is not None:
+        return jsonify({"success": True, "history": cached})
     try:
-        data_dir = Path('data')
+        data_dir = DATA_ROOT
         translations_dir = data_dir / 'translations'
         evaluations_dir = data_dir / 'evaluations'
         
@@ -146,17 +300,20 @@ def api_history():
                     
                     # Count language pairs and items
                     total_items = 0
+                    run_usage = load_run_usage(run_dir)
                     for lang_pair_dir in run_dir.iterdir():
                         if lang_pair_dir.is_dir():
                             lang_pair = lang_pair_dir.name
                             item_count = len(list(lang_pair_dir.glob('*.json')))
                             run_info['language_pairs'].append({
                                 'pair': lang_pair,
-                                'items': item_count
+                                'items': item_count,
+                                'usage': run_usage.get(lang_pair)
                             })
                             total_items += item_count
                     
                     run_info['total_items'] = total_items
+                    run_info['usage'] = merge_usage(list(run_usage.values()))
                     if total_items > 0:
                         history.append(run_info)
         
@@ -176,6 +333,7 @@ def api_history():
                     total_items = 0
                     total_score = 0
                     score_count = 0
+                    run_usage = load_run_usage(run_dir)
                     
                     for lang_pair_dir in run_dir.iterdir():
                         if lang_pair_dir.is_dir():
@@ -196,7 +354,8 @@ def api_history():
                                 run_info['language_pairs'].append({
                                     'pair': lang_pair,
                                     'items': len(pair_scores),
-                                    'avg_score': round(avg_score, 2)
+                                    'avg_score': round(avg_score, 2),
+                                    'usage': run_usage.get(lang_pair)
                                 })
                                 total_items += len(pair_scores)
                                 total_score += sum(pair_scores)
@@ -204,24 +363,33 @@ def api_history():
                     
                     run_info['total_items'] = total_items
                     run_info['avg_score'] = round(total_score / score_count, 2) if score_count > 0 else None
+                    run_info['usage'] = merge_usage(list(run_usage.values()))
                     if total_items > 0:
                         history.append(run_info)
         
         # Sort by timestamp (newest first)
         history.sort(key=lambda x: x['timestamp'], reverse=True)
         
-        return jsonify({"success": True, "history": history[:20]})  # Limit to 20 most recent
+        history = history[:20]  # Limit to 20 most recent
+        if store and HISTORY_CACHE_TTL > 0:
+            store.set('cache:history', history, ttl=HISTORY_CACHE_TTL)
+        return jsonify({"success": True, "history": history})
         
     except Exception as e:
         logger.error(f"Error getting history: {e}")
         return jsonify({"success": False, "error": str(e)})
 
+TTS_LANGUAGES = ['en', 'zh', 'ja', 'pt', 'es', 'ko']
+TTS_BATCH_MAX_ITEMS = 200
+
 @app.route('/api/tts', methods=['POST'])
 def api_text_to_speech():
     """Text-to-Speech API endpoint using MiniMax"""
     data = request.get_json()
     text = data.get('text', '').strip()
     language = data.get('language', 'zh')
+    # audio_url=true returns a link to the cached MP3 instead of inline base64
+    want_url = bool(data.get('audio_url'))
     
     logger.info(f"TTS API called: language={language}, text_length={len(text)}")
     
@@ -231,30 +399,143 @@ def api_text_to_speech():
         return jsonify({"success": False, "error": "Text is required"})
     
     # Validate language
-    if language not in ['en', 'zh', 'ja', 'pt', 'es', 'ko']:
+    if language not in TTS_LANGUAGES:
         logger.warning(f"Unsupported language for TTS: {language}")
         return jsonify({"success": False, "error": f"Unsupported language: {language}"})
     
-    # Call TTS service
-    result = tts_service.text_to_speech(text, language)
+    # Call TTS service; long text is synthesized in segments, each holding its own budget slot
+    result = get_tts_service().long_text_to_speech(text, language, budget=get_budget('tts'))
     logger.info(f"TTS API result: success={result['success']}")
     
     if result['success']:
-        # Return audio data as base64
-        return jsonify({
+        response = {
             "success": True,
-            "audio_data": result['audio_data'],
             "format": result['format'],
-            "voice_id": result['voice_id']
-        })
+            "voice_id": result['voice_id'],
+            "cached": result.get('cached', False),
+            "segments": result.get('segments', 1)
+        }
+        if result.get('cache_key'):
+            response["audio_url"] = f"/api/tts/audio/{result['cache_key']}"
+        if not (want_url and result.get('cache_key')):
+            # Return audio data as base64
+            response["audio_data"] = result['audio_data']
+        return jsonify(response)
     else:
         return jsonify({"success": False, "error": result['error']})
 
+@app.route('/api/tts/stream', methods=['GET', 'POST'])
+def api_tts_stream():
+    """
+    Streaming TTS: relays MP3 chunks as MiniMax produces them, so playback starts right away.
+    GET (?text=&language=) can be used directly as an <audio> src; POST takes the /api/tts JSON body.
+    """
+    data = (request.get_json(silent=True) if request.method == 'POST' else request.args) or {}
+    text = (data.get('text') or '').strip()
+    language = data.get('language') or 'zh'
+
+    if not text:
+        return jsonify({"success": False, "error": "Text is required"}), 400
+    if language not in TTS_LANGUAGES:
+        return jsonify({"success": False, "error": f"Unsupported language: {language}"}), 400
+
+    service = get_tts_service()
+    if request.method == 'GET':
+        # Already synthesized: the cached file supports ETag and Range, which a stream cannot
+        key = service.cached_key(text, language)
+        if key:
+            return redirect(url_for('api_tts_audio', key=key))
+    if len(text) > MAX_TEXT_CHARS:
+        return jsonify({"success": False, "error": f"Text too long for streaming ({len(text)} > {MAX_TEXT_CHARS} "
+                                                   f"characters); use /api/tts"}), 400
+
+    # The budget slot is held until the last chunk has been relayed
+    budget = ExitStack()
+    budget.enter_context(get_budget('tts').slot())
+    try:
+        result = service.stream_text_to_speech(text, language)
+    except Exception:
+        budget.close()
+        raise
+    if not result['success']:
+        budget.close()
+        return jsonify({"success": False, "error": result['error']}), 502
+
+    def generate():
+        with budget:
+            try:
+                yield from result['chunks']
+            except Exception as e:
+                # Headers are already sent; the client sees a truncated clip
+                logger.error(f"TTS stream interrupted: {e}")
+                return
+        logger.info(f"TTS stream done: time to first audio {result['stats']['ttfa']}s, "
+                    f"{result['stats']['bytes']} bytes")
+
+    return Response(stream_with_context(generate()), mimetype='audio/mpeg',
+                    headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no',
+                             'X-TTS-Cache': 'hit' if result['cached'] else 'miss',
+                             'X-TTS-TTFA': str(result['stats']['ttfa'])})
+
+@app.route('/api/tts/batch', methods=['POST'])
+def api_tts_batch():
+    """
+    Batch TTS: synthesizes many (text, language) items concurrently, deduplicated and cached,
+    streaming one NDJSON event per item as it completes so players can prefetch ahead.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"success": False, "error": "items must be a non-empty list"}), 400
+    if len(items) > TTS_BATCH_MAX_ITEMS:
+        return jsonify({"success": False, "error": f"Please provide {TTS_BATCH_MAX_ITEMS} items or fewer."}), 400
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or item.get('language', 'zh') not in TTS_LANGUAGES:
+            return jsonify({"success": False, "error": f"Item {index}: unsupported language"}), 400
+
+    logger.info(f"Batch TTS called: {len(items)} items")
+    events = get_tts_service().synthesize_many(items, budget=get_budget('tts'))
+
+    def generate():
+        try:
+            for event in events:
+                if event.get('cache_key'):
+                    event["audio_url"] = url_for('api_tts_audio', key=event['cache_key'])
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error(f"Batch TTS failed: {e}", exc_info=True)
+            yield json.dumps({"type": "error", "error": f"An unexpected error occurred: {str(e)}"}) + "\n"
+        finally:
+            events.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/tts/audio/<key>')
+def api_tts_audio(key):
+    """Serve a cached TTS clip as raw audio with ETag, Range and long-lived caching"""
+    from audio_cache import get_audio_cache, AUDIO_MIMETYPES
+    from config import get_audio_cache_config
+    cache = get_audio_cache()
+    path = cache.get(key) if cache else None
+    if path is None:
+        return jsonify({"success": False, "error": "Audio not found"}), 404
+    try:
+        # The key is a hash of the audio's inputs, so it is a strong ETag and the content never changes
+        response = send_file(path, mimetype=AUDIO_MIMETYPES['mp3'], conditional=True, etag=key,
+                             max_age=get_audio_cache_config()['max_age'])
+    except FileNotFoundError:
+        return jsonify({"success": False, "error": "Audio not found"}), 404
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/api/tts/voices', methods=['GET'])
 def api_get_tts_voices():
     """Get available TTS voices"""
     language = request.args.get('language')
-    result = tts_service.get_supported_voices(language)
+    result = get_tts_service().get_supported_voices(language)
     return jsonify(result)
 
 @app.route('/api/playground-run', methods=['POST'])
@@ -272,13 +553,107 @@ def api_playground_run():
          return jsonify({"success": False, "error": "Please provide 20 lines or fewer to process at once."}), 400
 
     try:
+        from batch import run_live_translation_and_evaluation, summarize_live_results
         results = run_live_translation_and_evaluation(source_lang, target_lang, texts)
-        avg_score = round(sum(r['evaluation_score'] for r in results if isinstance(r.get('evaluation_score'), int)) / len(results), 2)
-        return jsonify({"success": True, "results": results, "avg_score": avg_score, "avg_bleu": None})
+        return jsonify({"success": True, "results": results, **summarize_live_results(results)})
     except Exception as e:
         logger.error(f"Playground run failed: {e}", exc_info=True)
         return jsonify({"success": False, "error": f"An unexpected error occurred: {str(e)}"}), 500
 
+@app.route('/api/playground-run/stream', methods=['POST'])
+def api_playground_run_stream():
+    """Same as /api/playground-run, but streams NDJSON events as each line is translated and evaluated."""
+    data = request.get_json(silent=True) or {}
+    source_lang = data.get('source_lang')
+    target_lang = data.get('target_lang')
+    texts = data.get('texts', [])
+
+    if not all([source_lang, target_lang, texts]):
+        return jsonify({"success": False, "error": "source_lang, target_lang, and a list of texts are required."}), 400
+
+    if len(texts) > 20:
+         return jsonify({"success": False, "error": "Please provide 20 lines or fewer to process at once."}), 400
+
+    from batch import stream_live_translation_and_evaluation
+
+    def generate():
+        try:
+            for event in stream_live_translation_and_evaluation(source_lang, target_lang, texts):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error(f"Streaming playground run failed: {e}", exc_info=True)
+            yield json.dumps({"type": "error", "error": f"An unexpected error occurred: {str(e)}"}) + "\n"
+
+    # No buffering by proxies, so each line reaches the browser as soon as it is written
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ========= Background batch jobs =========
+
+def _submit_job(kind: str, params: dict):
+    """提交后台任务，返回 (响应体, 状态码)"""
+    from jobs import get_job_manager, JobError, JobQueueFull
+    try:
+        job = get_job_manager().submit(kind, params)
+    except JobQueueFull as e:
+        return {"success": False, "error": str(e)}, 429
+    except JobError as e:
+        return {"success": False, "error": str(e)}, 400
+    return {"success": True, "job": job}, 202
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """Queue a batch translation/evaluation job; poll /api/jobs/<id> for progress."""
+    data = request.get_json(silent=True) or {}
+    body, status = _submit_job(data.get('kind'), data)
+    return jsonify(body), status
+
+@app.route('/api/jobs', methods=['GET'])
+def api_list_jobs():
+    """List recent jobs from every worker, newest first."""
+    from jobs import get_job_manager
+    return jsonify({"success": True, "jobs": get_job_manager().list()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_get_job(job_id):
+    from jobs import get_job_manager
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": f"Job not found: {job_id}"}), 404
+    return jsonify({"success": True, "job": job})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    """Cancel a job: queued jobs never start, running jobs make no new upstream calls."""
+    from jobs import get_job_manager
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": f"Job not found: {job_id}"}), 404
+    return jsonify({"success": True, "job": job})
+
+@app.route('/api/batch-translate', methods=['POST'])
+def api_batch_translate():
+    """Start a batch translation run as a background job."""
+    data = request.get_json(silent=True) or {}
+    body, status = _submit_job('translation', data)
+    if body["success"]:
+        job = body["job"]
+        body.update(job_id=job["id"], run_id=job["params"]["run_id"],
+                    message=f"Batch translation queued for {job['params']['source_lang']}-{job['params']['target_lang']}")
+    return jsonify(body), status
+
+@app.route('/api/batch-evaluate', methods=['POST'])
+def api_batch_evaluate():
+    """Start a batch evaluation run as a background job."""
+    data = request.get_json(silent=True) or {}
+    body, status = _submit_job('evaluation', data)
+    if body["success"]:
+        job = body["job"]
+        body.update(job_id=job["id"], translation_run_id=job["params"]["translation_run_id"],
+                    eval_run_id=job["params"]["eval_run_id"],
+                    message=f"Batch evaluation queued for {job['params']['source_lang']}-{job['params']['target_lang']}")
+    return jsonify(body), status
+
 if __name__ == '__main__':
     # 生产环境配置
     host = os.environ.get('FLASK_HOST', '0.0.0.0')
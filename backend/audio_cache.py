@@ -0,0 +1,139 @@
+"""
+TTS Audio Cache
+
+Synthesized clips are stored on disk as one file per content hash of
+(text, voice, speed, volume, pitch, format, model). The same translation played
+again is served from disk instead of calling MiniMax. When the directory grows
+past its size limit, the least recently used files are evicted (a hit refreshes
+the file's mtime). Writes are atomic, so several worker processes can share it.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+from config import get_audio_cache_config
+
+logger = logging.getLogger(__name__)
+
+KEY_RE = re.compile(r'^[0-9a-f]{64}$')
+AUDIO_MIMETYPES = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'flac': 'audio/flac',
+    'pcm': 'audio/L16',
+}
+
+
+def cache_key(text: str, voice_id: str, speed: float, vol: float, pitch: float, fmt: str = 'mp3',
+              model: str = '') -> str:
+    """音频内容的缓存键（SHA-256，同时用作ETag）"""
+    payload = json.dumps([text, voice_id, float(speed), float(vol), float(pitch), fmt, model],
+                         ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    """按大小上限做LRU淘汰的磁盘音频缓存"""
+
+    def __init__(self, directory, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path(self, key: str, fmt: str = 'mp3') -> Path:
+        return self.directory / f"{key}.{fmt}"
+
+    def get(self, key: str, fmt: str = 'mp3') -> Optional[Path]:
+        """
+        查找缓存文件，命中时刷新其最近使用时间
+
+        Returns:
+            Path: 缓存文件路径；未命中或键无效时返回None
+        """
+        if not KEY_RE.match(key or ''):
+            return None
+        path = self.path(key, fmt)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def read(self, key: str, fmt: str = 'mp3') -> Optional[bytes]:
+        path = self.get(key, fmt)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            # Evicted by another process between utime and read
+            return None
+
+    def put(self, key: str, data: bytes, fmt: str = 'mp3') -> Path:
+        """原子地写入缓存文件，超出容量时淘汰最久未使用的文件"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self.path(key, fmt))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self.evict()
+        return self.path(key, fmt)
+
+    def evict(self) -> int:
+        """按mtime从旧到新删除文件直到不超过容量，返回删除数量"""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        if removed:
+            logger.info(f"Audio cache evicted {removed} file(s), {total} bytes remain")
+        return removed
+
+    def stats(self) -> dict:
+        files = [entry for entry in os.scandir(self.directory)
+                 if not entry.name.startswith('.') and entry.is_file()] if self.directory.exists() else []
+        return {"files": len(files), "bytes": sum(entry.stat().st_size for entry in files),
+                "max_bytes": self.max_bytes}
+
+
+_cache: Optional[AudioCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_audio_cache() -> Optional[AudioCache]:
+    """获取进程内共享的音频缓存；AUDIO_CACHE_DIR 为空或 AUDIO_CACHE_MAX_MB 为0时返回None"""
+    global _cache
+    if _cache is None:
+        config = get_audio_cache_config()
+        if not config['dir'] or config['max_bytes'] <= 0:
+            return None
+        with _cache_lock:
+            if _cache is None:
+                _cache = AudioCache(config['dir'], config['max_bytes'])
+    return _cache
@@ -2,36 +2,96 @@
 Batch Translation and Evaluation Processing
 """
 import logging
+import queue
+import threading
 import time
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 from backend.services import TranslationService, EvaluationService
 from backend.utils import (load_test_cases, save_translation_result,
-                           load_translation_results, save_evaluation_result)
+                           load_translation_results, save_evaluation_result,
+                           save_evaluation_run_stats, save_translation_run_stats, find_reference)
+from scoring import sentence_scores, corpus_scores
+from prescreen import prescreen_translation, prescreen_justification, JUDGE
+from config import get_prescreen_config, get_evaluation_config, get_translation_config
+from tracing import traced, span, current_span
+from usage import UsageLedger
+from scheduling import resolve_order, schedule, translation_costs, evaluation_costs
+from limits import get_budget, BATCH, PLAYGROUND
 
 logger = logging.getLogger(__name__)
 
 MAX_CONCURRENCY = 10
+EVALUATION_MODES = ('single', 'batched')
+# Returned for lines skipped because the run was cancelled
+CANCELLED = 'cancelled'
 
 
-def run_batch_translation(source_lang: str, target_lang: str, run_id: str, lines: int):
+class _RunCounters:
+    """Thread-safe counters for one evaluation run."""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, key: str, n: int = 1):
+        with self._lock:
+            self._counts[key] += n
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+def _cancelled(cancel_event) -> bool:
+    return cancel_event is not None and cancel_event.is_set()
+
+
+def _record(progress, outcome):
+    """Count one line's outcome towards a job's progress (cancelled lines are not counted)."""
+    if progress is not None and outcome != CANCELLED:
+        progress.record(bool(outcome))
+
+
+def run_batch_translation(source_lang: str, target_lang: str, run_id: str, lines: int,
+                          progress=None, cancel_event=None, order: str = None):
     """
     Performs batch translation using concurrent API calls.
+
+    Lines start in the given order (default: BATCH_ORDER): 'longest' submits the lines
+    with the highest estimated cost first, so long lines do not finish the run alone.
+
+    progress (optional) receives add_total()/record() calls as lines finish. Once
+    cancel_event is set, lines that have not started yet are skipped without an API call.
+    The summary, including the run's token usage ledger, is saved next to the
+    translations. Returns the summary dict, or None when there is nothing to translate.
     """
+    order = resolve_order(order)
     logger.info(
-        f"Starting batch translation run '{run_id}' for {source_lang}->{target_lang}, {lines} lines."
+        f"Starting batch translation run '{run_id}' for {source_lang}->{target_lang}, {lines} lines, order={order}."
     )
     translation_service = TranslationService()
     test_cases = load_test_cases(source_lang)
 
     if not test_cases:
         logger.warning(f"No test cases found for source language '{source_lang}'.")
-        return
+        return None
 
+    selected = test_cases[:lines]
+    if progress is not None:
+        progress.add_total(len(selected))
+    outcomes = Counter()
+    ledger = UsageLedger.from_config(get_translation_config())
+    if order == 'fifo':
+        line_order = range(len(selected))
+    else:
+        line_order = schedule(translation_costs(source_lang, target_lang, selected), order)
     tasks = []
     with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
-        for i, source_text in enumerate(test_cases[:lines]):
+        for i in line_order:
+            source_text = selected[i]
             line_num = i + 1
             task = executor.submit(
                 _translate_and_save,
@@ -41,31 +101,67 @@ def run_batch_translation(source_lang: str, target_lang: str, run_id: str, lines
                 source_text,
                 line_num,
                 run_id,
+                cancel_event,
+                ledger,
             )
             tasks.append(task)
 
         for future in as_completed(tasks):
             try:
-                future.result()
+                outcome = future.result()
             except Exception as e:
                 logger.error(f"A translation task in run '{run_id}' failed: {e}", exc_info=True)
+                outcome = False
+            outcomes[CANCELLED if outcome == CANCELLED else ('saved' if outcome else 'failed')] += 1
+            _record(progress, outcome)
 
-    logger.info(f"Batch translation run '{run_id}' completed.")
+    summary = {
+        "run_id": run_id,
+        "lines": len(selected),
+        "saved": outcomes['saved'],
+        "failed": outcomes['failed'],
+        "cancelled": outcomes[CANCELLED],
+        "order": order,
+        "usage": ledger.as_dict(),
+    }
+    save_translation_run_stats(source_lang, target_lang, run_id, summary)
+    if summary["cancelled"]:
+        logger.info(f"Batch translation run '{run_id}' cancelled: {summary}")
+    else:
+        logger.info(f"Batch translation run '{run_id}' completed.")
+    return summary
 
 
-def _translate_and_save(service, source_lang, target_lang, text, line_num, run_id):
-    """Helper function to translate a single text and save the result."""
+@traced('translate_line', 'run_id', 'line_num')
+def _translate_and_save(service, source_lang, target_lang, text, line_num, run_id, cancel_event=None,
+                        ledger=None):
+    """
+    Helper function to translate a single text and save the result.
+    The call's token usage is added to ledger when given.
+    Returns True when saved, False on failure, CANCELLED when skipped.
+    """
+    if _cancelled(cancel_event):
+        return CANCELLED
     try:
         logger.info(f"Translating line {line_num} for run '{run_id}': {text[:50]}...")
-        result = service.translate_text(source_lang, target_lang, text)
+        # Batch calls queue behind interactive and playground calls for the shared upstream
+        with get_budget('translation').slot(BATCH):
+            # The wait for a batch slot can be long; a job cancelled meanwhile issues no call
+            if _cancelled(cancel_event):
+                return CANCELLED
+            result = service.translate_text(source_lang, target_lang, text)
+        if ledger is not None:
+            ledger.add(result.get("usage"))
 
         if result.get("success"):
             translation = result.get("translation", "").strip()
             if translation:
-                save_translation_result(
-                    source_lang, target_lang, line_num, text, translation, run_id
-                )
+                with span('save'):
+                    save_translation_result(
+                        source_lang, target_lang, line_num, text, translation, run_id
+                    )
                 logger.info(f"Successfully saved translation for line {line_num} in run '{run_id}'.")
+                return True
             else:
                 logger.error(f"Translation failed for line {line_num} in run '{run_id}': Empty response.")
         else:
@@ -76,65 +172,314 @@ def _translate_and_save(service, source_lang, target_lang, text, line_num, run_i
             f"Exception during translation of line {line_num} in run '{run_id}': {e}",
             exc_info=True
         )
+    return False
 
 
-def run_batch_evaluation(source_lang: str, target_lang: str, translation_run_id: str, eval_run_id: str):
+def run_batch_evaluation(source_lang: str, target_lang: str, translation_run_id: str, eval_run_id: str,
+                         prescreen: bool = None, mode: str = None, batch_size: int = None,
+                         progress=None, cancel_event=None, order: str = None):
     """
     Performs batch evaluation using concurrent API calls.
+
+    When prescreen is enabled (default: PRESCREEN_ENABLED), obvious cases are scored
+    locally and only uncertain lines are sent to the LLM judge.
+
+    mode 'single' (default: EVALUATION_MODE) sends one judge request per line; mode
+    'batched' sends batch_size lines per request and asks for structured JSON scores.
+    Lines missing or invalid in a batched response are re-evaluated one by one.
+    Judge requests start in the given order (default: BATCH_ORDER) of their estimated
+    cost; batches keep their lines in file order and are ordered by their total cost.
+    Judge request statistics and the run's token usage ledger are saved per run.
+
+    progress and cancel_event work as in run_batch_translation. Returns the saved
+    run statistics, or None when there is nothing to evaluate.
     """
+    evaluation_config = get_evaluation_config()
+    if prescreen is None:
+        prescreen = get_prescreen_config()['enabled']
+    mode = mode or evaluation_config['mode']
+    if mode not in EVALUATION_MODES:
+        raise ValueError(f"Unsupported evaluation mode: {mode}")
+    batch_size = max(1, batch_size or evaluation_config['batch_size'])
+    order = resolve_order(order)
+
     logger.info(
-        f"Starting batch evaluation run '{eval_run_id}' for translation run '{translation_run_id}' ({source_lang}->{target_lang})."
+        f"Starting batch evaluation run '{eval_run_id}' for translation run '{translation_run_id}' "
+        f"({source_lang}->{target_lang}, mode={mode}, order={order})."
     )
+    started = time.time()
     evaluation_service = EvaluationService()
     translations_to_eval = load_translation_results(source_lang, target_lang, translation_run_id)
 
     if not translations_to_eval:
         logger.warning(f"No translation results found for run '{translation_run_id}'.")
-        return
+        return None
 
+    if progress is not None:
+        progress.add_total(len(translations_to_eval))
+    counters = _RunCounters()
+    ledger = UsageLedger.from_config(evaluation_config)
+    # Reference, sentence metrics and pre-screen verdict per line number, computed once per line
+    assessments = {}
+    decisions = Counter()
     tasks = []
     with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
-        for item in translations_to_eval:
-            task = executor.submit(
-                _evaluate_and_save,
-                evaluation_service,
-                source_lang,
-                target_lang,
-                item,
-                eval_run_id,
-            )
-            tasks.append(task)
+        if mode == 'batched':
+            to_judge = []
+            for item in translations_to_eval:
+                assessment = _assess_item(source_lang, target_lang, item, prescreen, assessments)
+                screen = assessment and assessment["screen"]
+                if screen and screen["decision"] != JUDGE:
+                    # Resolved locally: saving needs no judge request
+                    decision = _evaluate_and_save(evaluation_service, source_lang, target_lang, item,
+                                                  eval_run_id, prescreen, counters, cancel_event, ledger,
+                                                  assessments)
+                    if decision:
+                        decisions[decision] += 1
+                    _record(progress, decision)
+                else:
+                    to_judge.append(item)
+            batches = [to_judge[i:i + batch_size] for i in range(0, len(to_judge), batch_size)]
+            batch_costs = [sum(evaluation_costs(items)) for items in batches]
+            for i in schedule(batch_costs, order):
+                tasks.append(executor.submit(
+                    _evaluate_batch_and_save,
+                    evaluation_service,
+                    source_lang,
+                    target_lang,
+                    batches[i],
+                    eval_run_id,
+                    prescreen,
+                    counters,
+                    cancel_event,
+                    ledger,
+                    assessments,
+                ))
+        else:
+            for i in schedule(evaluation_costs(translations_to_eval), order):
+                tasks.append(executor.submit(
+                    _evaluate_and_save,
+                    evaluation_service,
+                    source_lang,
+                    target_lang,
+                    translations_to_eval[i],
+                    eval_run_id,
+                    prescreen,
+                    counters,
+                    cancel_event,
+                    ledger,
+                    assessments,
+                ))
 
         for future in as_completed(tasks):
             try:
-                future.result()
+                result = future.result()
             except Exception as e:
                 logger.error(f"An evaluation task in run '{eval_run_id}' failed: {e}", exc_info=True)
+                result = None
+            for decision in (result if isinstance(result, list) else [result]):
+                if decision:
+                    decisions[decision] += 1
+                _record(progress, decision)
+
+    cancelled = decisions.pop(CANCELLED, 0)
+
+    if prescreen:
+        resolved = sum(count for decision, count in decisions.items() if decision != JUDGE)
+        logger.info(
+            f"Pre-screen for run '{eval_run_id}' resolved {resolved}/{sum(decisions.values())} lines "
+            f"without the judge: {dict(decisions)}"
+        )
+
+    counts = counters.as_dict()
+    judged_items = counts.get('batched_items', 0) + counts.get('single_requests', 0)
+    requests_made = counts.get('batched_requests', 0) + counts.get('single_requests', 0)
+    stats = {
+        "mode": mode,
+        "batch_size": batch_size if mode == 'batched' else 1,
+        "order": order,
+        "lines": len(translations_to_eval),
+        "saved": sum(decisions.values()),
+        "prescreen_decisions": dict(decisions),
+        "judge_requests": requests_made,
+        "batched_requests": counts.get('batched_requests', 0),
+        "single_requests": counts.get('single_requests', 0),
+        "requeued_items": counts.get('requeued_items', 0),
+        "failed_requests": counts.get('failed_requests', 0),
+        "items_per_request": round(judged_items / requests_made, 2) if requests_made else None,
+        "duration_seconds": round(time.time() - started, 2),
+        "usage": ledger.as_dict(),
+    }
+    if cancelled:
+        stats["cancelled"] = cancelled
+    save_evaluation_run_stats(source_lang, target_lang, eval_run_id, stats)
+    logger.info(f"Judge requests for run '{eval_run_id}': {stats}")
+
+    _log_corpus_metrics(source_lang, target_lang, translations_to_eval, eval_run_id, assessments)
+    logger.info(f"Batch evaluation run '{eval_run_id}' {'cancelled' if cancelled else 'completed'}.")
+    return stats
+
+
+def _log_corpus_metrics(source_lang, target_lang, items, eval_run_id, assessments=None):
+    """Compute corpus-level BLEU/chrF over the items that have a reference translation."""
+    hyps, refs = [], []
+    for item in items:
+        assessment = (assessments or {}).get(item.get("line_number"))
+        if assessment is not None:
+            reference = assessment["reference"]
+        else:
+            # Not assessed, e.g. skipped after a cancellation
+            reference = find_reference(source_lang, target_lang, item.get("source_text"), item.get("line_number"))
+        if reference and item.get("translation"):
+            hyps.append(item["translation"])
+            refs.append(reference)
+    if hyps:
+        corpus = corpus_scores(hyps, refs)
+        logger.info(
+            f"Corpus metrics for run '{eval_run_id}' ({source_lang}->{target_lang}, {corpus['count']} lines): "
+            f"BLEU={corpus['corpus_bleu']}, chrF={corpus['corpus_chrf']}"
+        )
+
+
+def _assess_item(source_lang, target_lang, item, prescreen, assessments=None):
+    """
+    Local checks of a saved translation item: its reference translation, sentence BLEU/chrF
+    and, when prescreen is on, the pre-screen verdict. Each line is assessed once per run:
+    results are kept in assessments (line number -> assessment) and reused from there.
+    Returns None for invalid items.
+    """
+    line_num = item.get("line_number")
+    source_text = item.get("source_text")
+    translation = item.get("translation")
+    if not all([line_num, source_text, translation]):
+        return None
+    if assessments is not None and line_num in assessments:
+        return assessments[line_num]
+    with span('reference', line_number=line_num):
+        reference = find_reference(source_lang, target_lang, source_text, line_num)
+        metrics = sentence_scores(translation, reference)
+    screen = None
+    if prescreen:
+        with span('prescreen', line_number=line_num):
+            screen = prescreen_translation(source_lang, target_lang, source_text, translation, reference)
+    assessment = {"reference": reference, "metrics": metrics, "screen": screen}
+    if assessments is not None:
+        assessments[line_num] = assessment
+    return assessment
+
+
+@traced('evaluate_batch', 'eval_run_id')
+def _evaluate_batch_and_save(service, source_lang, target_lang, items, eval_run_id, prescreen=False,
+                             counters=None, cancel_event=None, ledger=None, assessments=None):
+    """
+    Evaluate several translations with one judge request and save each result.
+    Items the judge skipped or answered invalidly are re-evaluated individually.
+    Local checks already in assessments (see _assess_item) are reused.
+    Returns one decision per item (None when nothing was saved).
+    """
+    if _cancelled(cancel_event):
+        return [CANCELLED] * len(items)
+    counters = counters or _RunCounters()
+    valid = [item for item in items if all([item.get("line_number"), item.get("source_text"), item.get("translation")])]
+    for item in items:
+        if item not in valid:
+            logger.warning(f"Skipping evaluation for invalid item in run '{eval_run_id}': {item}")
+
+    batch_items = [
+        {"id": i + 1, "source_text": item["source_text"], "translation": item["translation"]}
+        for i, item in enumerate(valid)
+    ]
+    line_nums = [item["line_number"] for item in valid]
+    current_span().set(line_numbers=line_nums)
+    logger.info(f"Evaluating lines {line_nums} in one request for run '{eval_run_id}'.")
+
+    with get_budget('evaluation').slot(BATCH):
+        if _cancelled(cancel_event):
+            return [CANCELLED] * len(items)
+        counters.add('batched_requests')
+        result = service.evaluate_batch(source_lang, target_lang, batch_items)
+    if ledger is not None:
+        ledger.add(result.get("usage"))
+    if result.get("success"):
+        scored = result.get("results", {})
+        counters.add('batched_items', len(scored))
+    else:
+        logger.error(f"Batched judge request failed for lines {line_nums} in run '{eval_run_id}': {result.get('error')}")
+        counters.add('failed_requests')
+        scored = {}
 
-    logger.info(f"Batch evaluation run '{eval_run_id}' completed.")
+    decisions = [None] * (len(items) - len(valid))
+    for batch_item, item in zip(batch_items, valid):
+        verdict = scored.get(batch_item["id"])
+        if verdict is None:
+            counters.add('requeued_items')
+            decisions.append(_evaluate_and_save(service, source_lang, target_lang, item, eval_run_id,
+                                                prescreen, counters, cancel_event, ledger, assessments))
+            continue
+
+        line_num = item["line_number"]
+        assessment = _assess_item(source_lang, target_lang, item, prescreen, assessments)
+        with span('save', line_number=line_num):
+            save_evaluation_result(
+                source_lang, target_lang, line_num, item["source_text"], item["translation"],
+                verdict["score"], verdict["justification"], eval_run_id,
+                bleu_score=assessment["metrics"]["bleu_score"], chrf_score=assessment["metrics"]["chrf_score"],
+                prescreen=assessment["screen"]
+            )
+        decisions.append(JUDGE)
+    return decisions
 
 
-def _evaluate_and_save(service, source_lang, target_lang, item, eval_run_id):
-    """Helper function to evaluate a single translation and save the result."""
+@traced('evaluate_line', 'eval_run_id')
+def _evaluate_and_save(service, source_lang, target_lang, item, eval_run_id, prescreen=False, counters=None,
+                       cancel_event=None, ledger=None, assessments=None):
+    """
+    Helper function to evaluate a single translation and save the result.
+    The judge call's token usage is added to ledger when given. Local checks already
+    in assessments (see _assess_item) are reused.
+    Returns the pre-screen decision, None when nothing was saved, or CANCELLED.
+    """
+    if _cancelled(cancel_event):
+        return CANCELLED
     line_num = item.get("line_number")
     source_text = item.get("source_text")
     translation = item.get("translation")
+    current_span().set(line_number=line_num)
 
     if not all([line_num, source_text, translation]):
         logger.warning(f"Skipping evaluation for invalid item in run '{eval_run_id}': {item}")
-        return
+        return None
 
     try:
-        logger.info(f"Evaluating line {line_num} for run '{eval_run_id}': {translation[:50]}...")
-        result = service.evaluate_translation(source_lang, target_lang, source_text, translation)
+        assessment = _assess_item(source_lang, target_lang, item, prescreen, assessments)
+        metrics, screen = assessment["metrics"], assessment["screen"]
+
+        if screen and screen["decision"] != JUDGE:
+            logger.info(f"Pre-screen {screen['decision']}ed line {line_num} in run '{eval_run_id}': {screen['reason']}")
+            result = {"success": True, "score": screen["score"], "justification": prescreen_justification(screen)}
+        else:
+            logger.info(f"Evaluating line {line_num} for run '{eval_run_id}': {translation[:50]}...")
+            with get_budget('evaluation').slot(BATCH):
+                if _cancelled(cancel_event):
+                    return CANCELLED
+                if counters:
+                    counters.add('single_requests')
+                result = service.evaluate_translation(source_lang, target_lang, source_text, translation)
+            if ledger is not None:
+                ledger.add(result.get("usage"))
+            if counters and not result.get("success"):
+                counters.add('failed_requests')
 
         if result.get("success"):
             score = result.get("score", "N/A")
             justification = result.get("justification", "N/A")
-            save_evaluation_result(
-                source_lang, target_lang, line_num, source_text, translation, score, justification, eval_run_id
-            )
+            with span('save'):
+                save_evaluation_result(
+                    source_lang, target_lang, line_num, source_text, translation, score, justification, eval_run_id,
+                    bleu_score=metrics["bleu_score"], chrf_score=metrics["chrf_score"], prescreen=screen
+                )
             logger.info(f"Successfully saved evaluation for line {line_num} in run '{eval_run_id}'.")
+            return screen["decision"] if screen else JUDGE
         else:
             error_msg = result.get("error", "Unknown API error")
             logger.error(f"API error for line {line_num} in run '{eval_run_id}': {error_msg}")
@@ -143,6 +488,7 @@ def _evaluate_and_save(service, source_lang, target_lang, item, eval_run_id):
             f"Exception during evaluation of line {line_num} in run '{eval_run_id}': {e}",
             exc_info=True
         )
+    return None
 
 # ========= Live Playground Processing =========
 
@@ -150,58 +496,126 @@ def run_live_translation_and_evaluation(source_lang: str, target_lang: str, text
     """
     Translates and then evaluates a list of texts, returning results directly.
     """
+    results = [event for event in stream_live_translation_and_evaluation(source_lang, target_lang, texts)
+               if event["type"] == "result"]
+    for result in results:
+        del result["type"]
+    results.sort(key=lambda x: x.get("line_number", 0))
+    return results
+
+
+def stream_live_translation_and_evaluation(source_lang: str, target_lang: str, texts: list[str]):
+    """
+    Translates and evaluates texts concurrently, yielding events as soon as they happen:
+
+    - {"type": "translation", "line_number", "source_text", "translation"} once a line is translated
+    - {"type": "result", ...} with the line's evaluation (the same fields as the non-streaming results)
+    - {"type": "summary", "count", "avg_score", "avg_bleu", "avg_chrf"} after the last line
+
+    Lines arrive in completion order. Closing the generator early (client went away)
+    cancels the lines that have not started yet.
+    """
     logger.info(f"Starting live run for {source_lang}->{target_lang} with {len(texts)} texts.")
-    
-    results = []
-    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
-        future_to_line = {
-            executor.submit(_translate_then_evaluate, source_lang, target_lang, text, i + 1): i + 1
-            for i, text in enumerate(texts) if text.strip()
-        }
-        
-        for future in as_completed(future_to_line):
-            try:
-                result_data = future.result()
-                results.append(result_data)
-            except Exception as exc:
-                line_num = future_to_line[future]
-                logger.error(f"Line {line_num} generated an exception: {exc}", exc_info=True)
-                results.append({
-                    "line_number": line_num,
-                    "source_text": texts[line_num - 1],
-                    "translation": "Error",
-                    "evaluation_score": "N/A",
-                    "justification": f"Processing failed: {exc}",
-                    "error": True
-                })
+    lines = [(i + 1, text) for i, text in enumerate(texts) if text.strip()]
+    events = queue.Queue()
+    executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY)
+    try:
+        for line_num, text in lines:
+            executor.submit(_live_line, source_lang, target_lang, text, line_num, events.put)
+
+        results = []
+        while len(results) < len(lines):
+            event = events.get()
+            if event["type"] == "result":
+                results.append(event)
+            yield event
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
-    results.sort(key=lambda x: x.get("line_number", 0))
     logger.info(f"Live run completed for {source_lang}->{target_lang}.")
-    return results
+    yield {"type": "summary", "count": len(results), **summarize_live_results(results)}
+
+
+def summarize_live_results(results: list[dict]) -> dict:
+    """Average judge score, BLEU and chrF over live results (None when nothing to average)."""
+    scores = [r['evaluation_score'] for r in results if isinstance(r.get('evaluation_score'), int)]
+    bleu_scores = [r['bleu_score'] for r in results if isinstance(r.get('bleu_score'), (int, float))]
+    chrf_scores = [r['chrf_score'] for r in results if isinstance(r.get('chrf_score'), (int, float))]
+    return {
+        # Failed lines count as zero, as in the playground's original average
+        "avg_score": round(sum(scores) / len(results), 2) if results else None,
+        "avg_bleu": round(sum(bleu_scores) / len(bleu_scores), 4) if bleu_scores else None,
+        "avg_chrf": round(sum(chrf_scores) / len(chrf_scores), 4) if chrf_scores else None,
+    }
+
 
-def _translate_then_evaluate(source_lang: str, target_lang: str, source_text: str, line_number: int) -> dict:
-    """Worker function: translates, then evaluates a single text."""
+def _live_line(source_lang: str, target_lang: str, source_text: str, line_number: int, emit):
+    """Worker for one live line: emits its translation event, then exactly one result event."""
+    def on_translation(translation):
+        emit({"type": "translation", "line_number": line_number, "source_text": source_text,
+              "translation": translation})
+
+    try:
+        result = _translate_then_evaluate(source_lang, target_lang, source_text, line_number, on_translation)
+    except Exception as exc:
+        logger.error(f"Line {line_number} generated an exception: {exc}", exc_info=True)
+        result = {
+            "line_number": line_number,
+            "source_text": source_text,
+            "translation": "Error",
+            "evaluation_score": "N/A",
+            "justification": f"Processing failed: {exc}",
+            "error": True
+        }
+    emit({"type": "result", **result})
+
+@traced('playground_line', 'line_number')
+def _translate_then_evaluate(source_lang: str, target_lang: str, source_text: str, line_number: int,
+                             on_translation=None) -> dict:
+    """
+    Worker function: translates, then evaluates a single text.
+    on_translation, if given, is called with the translation before evaluation starts.
+    """
     translation_service = TranslationService()
     evaluation_service = EvaluationService()
 
     # Step 1: Translate
-    trans_result = translation_service.translate_text(source_lang, target_lang, source_text)
+    with get_budget('translation').slot(PLAYGROUND):
+        trans_result = translation_service.translate_text(source_lang, target_lang, source_text)
     if not trans_result.get("success"):
         raise Exception(f"Translation failed: {trans_result.get('error', 'Unknown error')}")
     
     translation = trans_result.get("translation", "").strip()
     if not translation:
         raise Exception("Translation resulted in an empty string.")
+    if on_translation:
+        on_translation(translation)
+
+    # Reference metrics are only available when the text is a test-suite sentence
+    with span('reference'):
+        reference = find_reference(source_lang, target_lang, source_text)
+        metrics = sentence_scores(translation, reference)
+
+    # Step 2: Pre-screen, then evaluate only the uncertain lines
+    screen = None
+    if get_prescreen_config()['enabled']:
+        with span('prescreen'):
+            screen = prescreen_translation(source_lang, target_lang, source_text, translation, reference)
+        metrics["prescreen"] = screen
 
-    # Step 2: Evaluate
-    eval_result = evaluation_service.evaluate_translation(source_lang, target_lang, source_text, translation)
+    if screen and screen["decision"] != JUDGE:
+        eval_result = {"success": True, "score": screen["score"], "justification": prescreen_justification(screen)}
+    else:
+        with get_budget('evaluation').slot(PLAYGROUND):
+            eval_result = evaluation_service.evaluate_translation(source_lang, target_lang, source_text, translation)
     if not eval_result.get("success"):
         return {
             "line_number": line_number,
             "source_text": source_text,
             "translation": translation,
             "evaluation_score": "N/A",
-            "justification": f"Evaluation failed: {eval_result.get('error', 'Unknown error')}"
+            "justification": f"Evaluation failed: {eval_result.get('error', 'Unknown error')}",
+            **metrics
         }
 
     return {
@@ -210,5 +624,5 @@ def _translate_then_evaluate(source_lang: str, target_lang: str, source_text: st
         "translation": translation,
         "evaluation_score": eval_result.get("score"),
         "justification": eval_result.get("justification"),
-        "bleu_score": None  # Placeholder for consistency
+        **metrics
     } 
\ No newline at end of file
@@ -7,6 +7,10 @@ load_dotenv()
 
 # Get the project root directory
 PROJECT_ROOT = Path(__file__).parent.parent
+# Test suites, references and run results (translations/, evaluations/, results/)
+DATA_ROOT = Path(os.environ.get('DATA_ROOT') or 'data')
+if not DATA_ROOT.is_absolute():
+    DATA_ROOT = PROJECT_ROOT / DATA_ROOT
 
 # Language mapping
 LANGUAGES = {
@@ -33,7 +37,19 @@ def get_translation_config():
         'max_length': int(os.environ.get('TRANSLATION_MAX_LENGTH', '16384')),
         'top_p': float(os.environ.get('TRANSLATION_TOP_P', '1.0')),
         'num_beams': int(os.environ.get('TRANSLATION_NUM_BEAMS', '1')),
-        'do_sample': os.environ.get('TRANSLATION_DO_SAMPLE', 'false').lower() == 'true'
+        'do_sample': os.environ.get('TRANSLATION_DO_SAMPLE', 'false').lower() == 'true',
+        # /api/translate/multi: 'concurrent' sends one request per target language, 'structured' one JSON
+        # request for all targets (for models that follow JSON instructions reliably)
+        'multi_mode': os.environ.get('TRANSLATION_MULTI_MODE', 'concurrent'),
+        # Ask for response_format=json_object in structured mode (disable for endpoints that reject it)
+        'json_mode': os.environ.get('TRANSLATION_JSON_MODE', 'true').lower() == 'true',
+        # Incremental translation: seconds sentence translations are kept (0 disables reuse), and the
+        # most sentences kept (in the shared store, or in the in-process fallback when it is unavailable)
+        'segment_cache_ttl': float(os.environ.get('TRANSLATION_SEGMENT_CACHE_TTL', '604800')),
+        'segment_cache_size': int(os.environ.get('TRANSLATION_SEGMENT_CACHE_SIZE', '20000')),
+        # Prices per million prompt / completion tokens for the run ledger (0: no cost reported)
+        'price_prompt': float(os.environ.get('TRANSLATION_PRICE_PROMPT', '0')),
+        'price_completion': float(os.environ.get('TRANSLATION_PRICE_COMPLETION', '0'))
     }
 
 # Evaluation API configuration
@@ -42,7 +58,14 @@ def get_evaluation_config():
     return {
         'api_key': os.environ.get('EVALUATION_API_KEY'),
         'api_url': os.environ.get('EVALUATION_API_URL'),
-        'model': os.environ.get('EVALUATION_MODEL')
+        'model': os.environ.get('EVALUATION_MODEL'),
+        # 'single': one judge request per line; 'batched': batch_size lines per request with JSON output
+        'mode': os.environ.get('EVALUATION_MODE', 'single'),
+        'batch_size': int(os.environ.get('EVALUATION_BATCH_SIZE', '8')),
+        # Ask for response_format=json_object in batched mode (disable for endpoints that reject it)
+        'json_mode': os.environ.get('EVALUATION_JSON_MODE', 'true').lower() == 'true',
+        'price_prompt': float(os.environ.get('EVALUATION_PRICE_PROMPT', '0')),
+        'price_completion': float(os.environ.get('EVALUATION_PRICE_COMPLETION', '0'))
     }
 
 # MiniMax TTS configuration
@@ -51,8 +74,10 @@ def get_tts_config():
     return {
         'api_key': os.environ.get('MINIMAX_API_KEY'),
         'group_id': os.environ.get('MINIMAX_GROUP_ID'),
-        'api_url': 'https://api.minimax.chat/v1/t2a_v2',
+        'api_url': os.environ.get('MINIMAX_API_URL', 'https://api.minimax.chat/v1/t2a_v2'),
         'model': 'speech-01-turbo',
+        # 长文本按句切分后每段的字数上限（不超过MiniMax单次请求的2000字）
+        'segment_chars': int(os.environ.get('TTS_SEGMENT_CHARS', 300)),
         'voice_setting': {
             'voice_id': 'male-qn-qingse',  # 默认声音
             'speed': 1.0,
@@ -85,4 +110,175 @@ LOGGING_CONFIG = {
     'format': os.environ.get('LOG_FORMAT', 
         '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d in %(funcName)s] - %(message)s'
     )
-} 
\ No newline at end of file
+} 
+
+# Upstream concurrency and rate budgets
+def get_upstream_budgets():
+    """获取各上游接口的并发与速率预算（rate 单位为每秒请求数，0 表示不限速）"""
+    budgets = {}
+    for name, default_concurrency, default_reserved in (('translation', 10, 2), ('evaluation', 10, 2),
+                                                        ('tts', 4, 0)):
+        prefix = name.upper()
+        budgets[name] = {
+            'max_concurrency': int(os.environ.get(f'{prefix}_MAX_CONCURRENCY', default_concurrency)),
+            'rate': float(os.environ.get(f'{prefix}_RATE_LIMIT', '0')),
+            'burst': int(os.environ.get(f'{prefix}_RATE_BURST', '1')),
+            # Slots only interactive API calls may take, so a batch job never fills the budget
+            'reserved': int(os.environ.get(f'{prefix}_RESERVED_INTERACTIVE', default_reserved)),
+            # Seconds after which a queued playground or batch call ranks with interactive calls
+            'aging': float(os.environ.get('UPSTREAM_PRIORITY_AGING', '10'))
+        }
+    return budgets
+
+# Order in which batch runs start their lines (see backend/scheduling.py)
+def get_batch_config():
+    """获取批处理调度配置"""
+    return {
+        # 'longest' starts the most expensive lines first, 'shortest' the cheapest, 'fifo' keeps file order
+        'order': os.environ.get('BATCH_ORDER', 'longest'),
+        # Recent translation runs of the same language pair used to predict output lengths
+        'history_runs': int(os.environ.get('BATCH_COST_HISTORY_RUNS', '5'))
+    }
+
+# Fuzzy translation memory for interactive translation (see backend/tm.py)
+def get_memory_config():
+    """获取翻译记忆配置"""
+    return {
+        # Default for /api/translate requests that do not pass "memory"; batch runs never use it
+        'enabled': os.environ.get('TM_ENABLED', 'true').lower() == 'true',
+        # Character 3-gram Jaccard similarity from which stored translations are given to the model as
+        # references. Only exact repeats are returned as is
+        'hint_threshold': float(os.environ.get('TM_HINT_THRESHOLD', '0.5')),
+        'max_hints': int(os.environ.get('TM_MAX_HINTS', '3')),
+        # Entries kept per language pair and worker; the oldest are dropped first
+        'max_entries': int(os.environ.get('TM_MAX_ENTRIES', '50000')),
+        # Seconds between scans of data/translations for new results
+        'refresh_seconds': float(os.environ.get('TM_REFRESH_SECONDS', '60'))
+    }
+
+# Terminology glossaries injected into translation prompts (see backend/glossary.py)
+def get_glossary_config():
+    """获取术语表配置"""
+    directory = Path(os.environ.get('GLOSSARY_DIR') or DATA_ROOT / 'glossaries')
+    return {
+        'enabled': os.environ.get('GLOSSARY_ENABLED', 'true').lower() == 'true',
+        # Holds one {src}-{tgt}.tsv file per language pair
+        'dir': directory if directory.is_absolute() else PROJECT_ROOT / directory,
+        # Seconds between checks of a glossary file for changes
+        'reload_seconds': float(os.environ.get('GLOSSARY_RELOAD_SECONDS', '5')),
+        # Most terms added to one prompt
+        'max_terms': int(os.environ.get('GLOSSARY_MAX_TERMS', '50'))
+    }
+
+# Local quality pre-screen (skips the LLM judge on obvious cases)
+def get_prescreen_config():
+    """获取本地预筛选配置"""
+    return {
+        'enabled': os.environ.get('PRESCREEN_ENABLED', 'true').lower() == 'true',
+        # chrF against the reference at or above which a line is auto-accepted
+        'accept_chrf': float(os.environ.get('PRESCREEN_ACCEPT_CHRF', '0.9')),
+        'accept_score': int(os.environ.get('PRESCREEN_ACCEPT_SCORE', '9')),
+        # chrF against the source at or above which a line counts as an untranslated copy
+        'copy_chrf': float(os.environ.get('PRESCREEN_COPY_CHRF', '0.9')),
+        # Share of letters in the target language's script below which the output is rejected
+        'min_script_share': float(os.environ.get('PRESCREEN_MIN_SCRIPT_SHARE', '0.5')),
+        # Length ratio (relative to the expected ratio) outside [1/flag, flag] is flagged for the judge,
+        # outside [1/reject, reject] it is rejected
+        'length_flag_factor': float(os.environ.get('PRESCREEN_LENGTH_FLAG_FACTOR', '2.0')),
+        'length_reject_factor': float(os.environ.get('PRESCREEN_LENGTH_REJECT_FACTOR', '5.0')),
+        'reject_score': int(os.environ.get('PRESCREEN_REJECT_SCORE', '1'))
+    }
+
+# Language detection for source_lang=auto
+def get_language_detection_config():
+    """获取语言检测配置"""
+    return {
+        # Seed langdetect so the fallback returns the same answer for the same text
+        'deterministic': os.environ.get('LANGID_DETERMINISTIC', 'true').lower() == 'true',
+        'seed': int(os.environ.get('LANGID_SEED', '0')),
+        'cache_size': int(os.environ.get('LANGID_CACHE_SIZE', '4096')),
+        # Trigram model answers are used only above this posterior and with enough evidence
+        'min_confidence': float(os.environ.get('LANGID_MIN_CONFIDENCE', '0.9')),
+        'min_trigrams': int(os.environ.get('LANGID_MIN_TRIGRAMS', '4')),
+        # Share of the text's trigrams the chosen language's profile must know; text in other Latin-script
+        # languages (French, German) scores lower and is left to langdetect
+        'min_coverage': float(os.environ.get('LANGID_MIN_COVERAGE', '0.75'))
+    }
+
+# Production serving (gunicorn, see gunicorn.conf.py)
+def get_serving_config():
+    """获取生产环境多进程服务配置"""
+    cpus = os.cpu_count() or 1
+    return {
+        'workers': int(os.environ.get('WEB_WORKERS', cpus * 2 + 1)),
+        # Upstream calls are I/O-bound, so each worker serves several requests on threads
+        'threads': int(os.environ.get('WEB_THREADS', '16')),
+        # Streams can last up to 60s; leave headroom before a worker is considered hung
+        'timeout': int(os.environ.get('WEB_TIMEOUT', '120')),
+        'graceful_timeout': int(os.environ.get('WEB_GRACEFUL_TIMEOUT', '60')),
+        'keepalive': int(os.environ.get('WEB_KEEPALIVE', '5')),
+        # Recycle each worker after this many requests (0 disables), with jitter to avoid restarting together.
+        # Off by default: background jobs run in the worker's threads and a recycled worker fails them
+        'max_requests': int(os.environ.get('WEB_MAX_REQUESTS', '0')),
+        'max_requests_jitter': int(os.environ.get('WEB_MAX_REQUESTS_JITTER', '100')),
+        'preload': os.environ.get('WEB_PRELOAD', 'true').lower() == 'true'
+    }
+
+# Cross-process store for rate limits and caches shared by all workers ('' disables)
+SHARED_STORE_PATH = os.environ.get('SHARED_STORE_PATH', 'data/.shared_store.sqlite')
+if SHARED_STORE_PATH and not Path(SHARED_STORE_PATH).is_absolute():
+    SHARED_STORE_PATH = str(PROJECT_ROOT / SHARED_STORE_PATH)
+# Seconds /api/history responses are cached in the shared store (0 disables)
+HISTORY_CACHE_TTL = float(os.environ.get('HISTORY_CACHE_TTL', '5'))
+
+# Background batch jobs (/api/jobs)
+def get_jobs_config():
+    """获取后台批处理任务配置"""
+    return {
+        # Jobs executing at once per process; further jobs wait in the queue
+        'max_workers': int(os.environ.get('JOB_MAX_WORKERS', '2')),
+        'max_queued': int(os.environ.get('JOB_MAX_QUEUED', '20')),
+        # How long finished jobs stay listed
+        'retention_seconds': int(os.environ.get('JOB_RETENTION_SECONDS', str(24 * 3600))),
+        # Seconds between re-publishing the unfinished jobs of a worker
+        'heartbeat_seconds': float(os.environ.get('JOB_HEARTBEAT_SECONDS', '5')),
+        # An unfinished job not re-published for this long belongs to a dead worker and is marked failed
+        'stale_seconds': float(os.environ.get('JOB_STALE_SECONDS', '30'))
+    }
+
+# Disk cache for synthesized TTS audio, served by /api/tts/audio/<key>
+def get_audio_cache_config():
+    """获取TTS音频缓存配置"""
+    directory = os.environ.get('AUDIO_CACHE_DIR', 'data/audio_cache')
+    if directory and not Path(directory).is_absolute():
+        directory = str(PROJECT_ROOT / directory)
+    return {
+        # '' or a size of 0 disables the cache
+        'dir': directory,
+        'max_bytes': int(float(os.environ.get('AUDIO_CACHE_MAX_MB', '200')) * 1024 * 1024),
+        # Browser cache lifetime for audio responses; keys are content hashes, so entries never change
+        'max_age': int(os.environ.get('AUDIO_CACHE_MAX_AGE', str(365 * 24 * 3600)))
+    }
+
+# Prometheus metrics at /metrics
+def get_metrics_config():
+    """获取监控指标配置"""
+    return {
+        'enabled': os.environ.get('METRICS_ENABLED', 'true').lower() == 'true',
+        # Each worker publishes its metrics to the shared store this often, so a scrape of any
+        # worker reports totals for all of them
+        'publish_interval': float(os.environ.get('METRICS_PUBLISH_INTERVAL', '15'))
+    }
+
+# Per-line tracing of translate → evaluate → save (see scripts/analyze_traces.py)
+def get_tracing_config():
+    """获取链路追踪配置"""
+    path = os.environ.get('TRACE_FILE', 'logs/traces.jsonl')
+    if path and not Path(path).is_absolute():
+        path = str(PROJECT_ROOT / path)
+    return {
+        # '' disables export
+        'file': path if os.environ.get('TRACING_ENABLED', 'true').lower() == 'true' else '',
+        # Fraction of lines traced (1 traces every line)
+        'sample_rate': float(os.environ.get('TRACE_SAMPLE_RATE', '1'))
+    }
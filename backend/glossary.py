@@ -0,0 +1,206 @@
+"""
+Terminology Glossaries
+
+Each language pair can have a glossary file, data/glossaries/{src}-{tgt}.tsv,
+with one "term<TAB>translation" pair per line ('#' starts a comment). A pair's
+terms are compiled into one Aho-Corasick automaton, so a source text is
+scanned once for all terms, however many there are. Only the terms that occur
+in the text are added to the translation prompt.
+
+Matching ignores case, except for terms written entirely in capitals
+(acronyms such as "IT"). A term starting or ending with a letter or digit of a
+spaced script must not continue into a neighbouring word, so "app" does not
+match inside "apple"; CJK text has no such boundary. Overlapping matches keep
+the leftmost, then longest, term.
+
+Files are checked for changes at most every GLOSSARY_RELOAD_SECONDS and
+recompiled when their modification time changes, without a restart.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import List, Optional
+
+from config import get_glossary_config
+
+logger = logging.getLogger(__name__)
+
+
+def _lower(text: str) -> str:
+    """逐字符转小写，保持长度不变（位置可与原文对应）"""
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _is_word_char(c: str) -> bool:
+    """空格分词文字中的字母或数字（CJK、假名、谚文之间没有词边界）"""
+    return c.isalnum() and ord(c) < 0x2E80
+
+
+class Glossary:
+    """一个语言对的术语表：Aho-Corasick 自动机"""
+
+    def __init__(self, entries: dict):
+        self.terms = list(entries)
+        self.translations = [entries[term] for term in self.terms]
+        self._exact = [term.isupper() and len(term) > 1 for term in self.terms]
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, term in enumerate(self.terms):
+            self._insert(_lower(term), index)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _insert(self, pattern: str, index: int):
+        node = 0
+        for c in pattern:
+            next_node = self._goto[node].get(c)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][c] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(index)
+
+    def _link(self):
+        """按层构建失配指针，并把后缀节点的输出并入当前节点"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for c, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(c, 0)
+                # Children of the root fail back to the root, not to themselves
+                self._fail[child] = fail if fail != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _all(self, text: str):
+        """一次扫描产生所有（可能重叠的）出现位置 (起始, 结束, 术语下标)"""
+        node = 0
+        for end, c in enumerate(_lower(text), 1):
+            while node and c not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(c, 0)
+            for index in self._output[node]:
+                start = end - len(self.terms[index])
+                if not self._exact[index] or text[start:end] == self.terms[index]:
+                    yield start, end, index
+
+    def matches(self, text: str) -> List[tuple]:
+        """
+        找出文本中的术语
+
+        Returns:
+            list: [(起始位置, 结束位置, 术语下标)]，按位置排列且互不重叠（同一起点取最长）
+        """
+        found = [match for match in self._all(text) if self._at_boundary(text, match[0], match[1])]
+        selected, covered = [], 0
+        for start, end, index in sorted(found, key=lambda m: (m[0], m[0] - m[1])):
+            if start >= covered:
+                selected.append((start, end, index))
+                covered = end
+        return selected
+
+    @staticmethod
+    def _at_boundary(text: str, start: int, end: int) -> bool:
+        if start > 0 and _is_word_char(text[start]) and _is_word_char(text[start - 1]):
+            return False
+        if end < len(text) and _is_word_char(text[end - 1]) and _is_word_char(text[end]):
+            return False
+        return True
+
+    def find(self, text: str, limit: int = None) -> List[dict]:
+        """文本中出现的术语及译法，按首次出现的顺序去重"""
+        terms, seen = [], set()
+        for _, _, index in self.matches(text):
+            if index not in seen:
+                seen.add(index)
+                terms.append({"term": self.terms[index], "translation": self.translations[index]})
+        return terms[:limit] if limit else terms
+
+
+def load_glossary_file(path: Path) -> dict:
+    """读取TSV术语表：每行 术语<TAB>译法，'#' 开头为注释，格式不对的行跳过"""
+    entries = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) < 2 or not fields[0].strip() or not fields[1].strip():
+                logger.warning(f"Skipping malformed glossary line {path.name}:{line_num}")
+                continue
+            entries[fields[0].strip()] = fields[1].strip()
+    return entries
+
+
+class _Entry:
+    def __init__(self, glossary: Optional[Glossary], mtime: Optional[float], checked: float):
+        self.glossary = glossary
+        self.mtime = mtime
+        self.checked = checked
+
+
+_glossaries = {}
+_glossaries_lock = threading.Lock()
+
+
+def get_glossary(source_lang: str, target_lang: str) -> Optional[Glossary]:
+    """获取语言对的术语表（没有术语表文件时为None），文件修改后自动重新编译"""
+    config = get_glossary_config()
+    pair = f"{source_lang}-{target_lang}"
+    now = time.monotonic()
+    entry = _glossaries.get(pair)
+    if entry is not None and now - entry.checked < config['reload_seconds']:
+        return entry.glossary
+
+    path = Path(config['dir']) / f"{pair}.tsv"
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    with _glossaries_lock:
+        entry = _glossaries.get(pair)
+        if entry is not None and entry.mtime == mtime:
+            entry.checked = now
+            return entry.glossary
+        glossary = None
+        if mtime is not None:
+            started = time.perf_counter()
+            try:
+                glossary = Glossary(load_glossary_file(path))
+                logger.info(f"Glossary {pair}: compiled {len(glossary)} terms in "
+                            f"{(time.perf_counter() - started) * 1000:.1f} ms")
+            except (OSError, UnicodeDecodeError) as e:
+                logger.error(f"Could not load glossary {path}: {e}")
+                # Keep serving the previous version until the file can be read
+                glossary = entry.glossary if entry is not None else None
+        _glossaries[pair] = _Entry(glossary, mtime, now)
+        return glossary
+
+
+def find_terms(source_lang: str, target_lang: str, text: str) -> List[dict]:
+    """原文中出现的术语（最多 GLOSSARY_MAX_TERMS 条），未启用或没有术语表时为空列表"""
+    config = get_glossary_config()
+    if not config['enabled']:
+        return []
+    glossary = get_glossary(source_lang, target_lang)
+    return glossary.find(text, config['max_terms']) if glossary else []
+
+
+def missing_terms(terms: List[dict], translation: str) -> List[dict]:
+    """译文中没有使用规定译法的术语（不区分大小写）"""
+    lowered = translation.casefold()
+    return [term for term in terms if term["translation"].casefold() not in lowered]
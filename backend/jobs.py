@@ -0,0 +1,569 @@
+"""
+Background Batch Jobs
+
+Batch translation/evaluation runs submitted over HTTP are queued here and run by a
+bounded pool of worker threads. Each job reports progress (done, failed, throughput,
+ETA) and can be cancelled: lines that have not started are skipped without any
+upstream call. Job snapshots are mirrored to the shared store so that every
+gunicorn worker can list, inspect and cancel jobs started by another one. A job
+claims the run directories it writes with one shared-store transaction, so two
+workers cannot both accept jobs for the same run; the claim is released when the
+job ends.
+
+A job runs in the worker that accepted it, which re-publishes its unfinished
+jobs every JOB_HEARTBEAT_SECONDS. When a worker is killed or recycled, its jobs
+stop with it; any worker that then reads a snapshot whose heartbeat is older
+than JOB_STALE_SECONDS marks the job as failed.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import LANGUAGES, get_jobs_config
+from metrics import JOBS
+from scheduling import ORDERS
+from shared_store import get_shared_store
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ('translation', 'evaluation', 'translate_evaluate')
+ACTIVE_STATUSES = ('queued', 'running')
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+
+_RUN_ID_RE = re.compile(r'^[\w.-]{1,64}$')
+# Minimum seconds between two snapshot writes to the shared store while running
+_PUBLISH_INTERVAL = 0.5
+
+
+class JobError(ValueError):
+    """任务参数无效"""
+
+
+class JobQueueFull(JobError):
+    """排队任务过多"""
+
+
+def new_run_id() -> str:
+    """
+    新的运行ID（YYYYMMDD_HHMMSS_xxxxxxxx）
+
+    同一秒内提交的任务也不会写到同一个运行目录：末尾是随机的十六进制后缀。
+    """
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def _outputs(kind: str, params: dict) -> set:
+    """任务写入的运行目录 (数据目录, 运行ID, 语言对)"""
+    pair = f"{params['source_lang']}-{params['target_lang']}"
+    outputs = set()
+    if kind in ('translation', 'translate_evaluate') and params.get('run_id'):
+        outputs.add(('translations', params['run_id'], pair))
+    if kind in ('evaluation', 'translate_evaluate') and params.get('eval_run_id'):
+        outputs.add(('evaluations', params['eval_run_id'], pair))
+    return outputs
+
+
+def _run_claims(snapshot: dict) -> tuple:
+    """任务在共享存储中占用的键（每个写入的运行目录一个）及占用值"""
+    keys = sorted(f"run:{directory}:{run_id}:{pair}"
+                  for directory, run_id, pair in _outputs(snapshot['kind'], snapshot['params']))
+    return keys, {"job": snapshot['id'], "since": snapshot['created_at']}
+
+
+class JobProgress:
+    """线程安全的进度计数：完成/失败数、吞吐与预计剩余时间"""
+
+    def __init__(self):
+        self.total = 0
+        self.done = 0
+        self.failed = 0
+        self.phase = None
+        self.started = None
+        self._lock = threading.Lock()
+
+    def add_total(self, n: int):
+        with self._lock:
+            if self.started is None:
+                self.started = time.time()
+            self.total += n
+
+    def record(self, success: bool, n: int = 1):
+        """记录 n 行已处理（成功或失败）"""
+        with self._lock:
+            if success:
+                self.done += n
+            else:
+                self.failed += n
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            processed = self.done + self.failed
+            elapsed = time.time() - self.started if self.started else 0.0
+            throughput = processed / elapsed if elapsed > 0 else 0.0
+            remaining = max(0, self.total - processed)
+            eta = round(remaining / throughput, 1) if throughput > 0 else None
+            return {
+                "phase": self.phase,
+                "total": self.total,
+                "done": self.done,
+                "failed": self.failed,
+                "percent": round(100.0 * processed / self.total, 1) if self.total else 0.0,
+                "throughput": round(throughput, 3),
+                "eta_seconds": eta if remaining else 0.0,
+                "elapsed_seconds": round(elapsed, 1),
+            }
+
+
+class _CancelFlag:
+    """取消标志：本进程的Event，外加其他worker写入共享存储的取消请求"""
+
+    def __init__(self, job_id: str, store=None):
+        self._event = threading.Event()
+        self._key = f'job-cancel:{job_id}'
+        self._store = store
+        self._checked = 0.0
+
+    def set(self):
+        self._event.set()
+
+    def is_set(self) -> bool:
+        if self._event.is_set():
+            return True
+        now = time.monotonic()
+        if self._store is not None and now - self._checked >= _PUBLISH_INTERVAL:
+            self._checked = now
+            try:
+                if self._store.get(self._key):
+                    self._event.set()
+            except Exception as e:
+                logger.debug(f"Could not read cancel flag {self._key}: {e}")
+        return self._event.is_set()
+
+
+class Job:
+    """一个后台批处理任务"""
+
+    def __init__(self, kind: str, params: dict, store=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.result = {}
+        self.progress = JobProgress()
+        self.cancel_event = _CancelFlag(self.id, store)
+        self.future = None
+        # Process running the job, and when it last published the job
+        self.owner = os.getpid()
+        self.heartbeat = self.created_at
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress.snapshot(),
+            "result": self.result,
+            "error": self.error,
+            "owner": self.owner,
+            "heartbeat": self.heartbeat,
+        }
+
+
+def validate_job_params(kind: str, params: dict) -> dict:
+    """
+    校验并补全任务参数
+
+    Returns:
+        dict: 规范化后的参数
+
+    Raises:
+        JobError: 参数无效
+    """
+    if kind not in JOB_KINDS:
+        raise JobError(f"Unsupported job kind: {kind}. Expected one of: {', '.join(JOB_KINDS)}")
+    source_lang = params.get('source_lang')
+    target_lang = params.get('target_lang')
+    if source_lang not in LANGUAGES or target_lang not in LANGUAGES or source_lang == target_lang:
+        raise JobError("source_lang and target_lang must be two different supported languages")
+
+    clean = {"source_lang": source_lang, "target_lang": target_lang}
+    if kind in ('translation', 'translate_evaluate'):
+        try:
+            clean["lines"] = int(params.get('lines') or 15)
+        except (TypeError, ValueError):
+            raise JobError("lines must be an integer")
+        if clean["lines"] < 1:
+            raise JobError("lines must be at least 1")
+    if kind == 'evaluation' and not params.get('translation_run_id'):
+        raise JobError("translation_run_id is required for evaluation jobs")
+    if kind in ('evaluation', 'translate_evaluate'):
+        if params.get('mode') is not None:
+            # Same values as batch.EVALUATION_MODES (not imported: batch loads the API clients)
+            if params['mode'] not in ('single', 'batched'):
+                raise JobError(f"Unsupported evaluation mode: {params['mode']}")
+            clean["mode"] = params['mode']
+        if params.get('batch_size') is not None:
+            try:
+                clean["batch_size"] = int(params['batch_size'])
+            except (TypeError, ValueError):
+                raise JobError("batch_size must be an integer")
+        if params.get('prescreen') is not None:
+            clean["prescreen"] = bool(params['prescreen'])
+    if params.get('order') is not None:
+        if params['order'] not in ORDERS:
+            raise JobError(f"Unsupported order: {params['order']}. Expected one of: {', '.join(ORDERS)}")
+        clean["order"] = params['order']
+
+    run_keys = {'translation': ('run_id',), 'evaluation': ('translation_run_id', 'eval_run_id'),
+                'translate_evaluate': ('run_id', 'eval_run_id')}[kind]
+    for key in run_keys:
+        value = params.get(key)
+        if value:
+            if not _RUN_ID_RE.match(str(value)):
+                raise JobError(f"Invalid {key}: {value}")
+            clean[key] = str(value)
+    return clean
+
+
+class JobManager:
+    """有界线程池执行的后台任务队列"""
+
+    def __init__(self, max_workers: int = None, max_queued: int = None, retention_seconds: int = None,
+                 store=None):
+        config = get_jobs_config()
+        self.max_workers = max(1, max_workers or config['max_workers'])
+        self.max_queued = max_queued if max_queued is not None else config['max_queued']
+        self.retention_seconds = retention_seconds or config['retention_seconds']
+        self.heartbeat_seconds = config['heartbeat_seconds']
+        self.stale_seconds = config['stale_seconds']
+        self.store = store
+        self._heartbeat_pid = None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._published = {}
+
+    # ---------- public API ----------
+
+    def submit(self, kind: str, params: dict) -> dict:
+        """
+        提交任务
+
+        Raises:
+            JobError: 参数无效，或指定的运行ID正被另一个未结束的任务写入
+            JobQueueFull: 排队任务过多
+        """
+        params = validate_job_params(kind, params or {})
+        # Run ids are fixed at submission so callers can find the output right away
+        if kind in ('translation', 'translate_evaluate'):
+            params.setdefault('run_id', new_run_id())
+        if kind in ('evaluation', 'translate_evaluate'):
+            params.setdefault('eval_run_id', new_run_id())
+        outputs = _outputs(kind, params)
+        job = Job(kind, params, self.store)
+        with self._lock:
+            self._prune()
+            # The lock only covers this process; jobs of other workers are excluded by the claim below
+            for other in self._jobs.values():
+                if other.status in ACTIVE_STATUSES and outputs & _outputs(other.kind, other.params):
+                    raise JobError(f"Job {other.id} is already writing to this run; choose another run id")
+            queued = sum(1 for other in self._jobs.values() if other.status == 'queued')
+            if queued >= self.max_queued:
+                raise JobQueueFull(f"Too many queued jobs ({queued}); try again later")
+            self._claim(job)
+            self._jobs[job.id] = job
+        self._publish(job, force=True)
+        self._start_heartbeat()
+        job.future = self._executor.submit(self._run, job)
+        logger.info(f"Queued {kind} job {job.id}: {params}")
+        return job.to_dict()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """查询任务（包括其他worker上的任务）"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self._check_owner(self._store_call('get', f'job:{job_id}'))
+
+    def list(self) -> List[dict]:
+        """按提交时间倒序列出任务"""
+        jobs = {}
+        shared = self._store_call('items', 'job:') or {}
+        for value in shared.values():
+            jobs[value['id']] = self._check_owner(value)
+        with self._lock:
+            self._prune()
+            for job in self._jobs.values():
+                jobs[job.id] = job.to_dict()
+        return sorted(jobs.values(), key=lambda job: job['created_at'], reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """
+        取消任务：排队中的任务直接取消，运行中的任务不再发起新的上游请求
+
+        Returns:
+            dict: 任务快照；任务不存在时返回None
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            snapshot = self._check_owner(self._store_call('get', f'job:{job_id}'))
+            if snapshot is None:
+                return None
+            if snapshot['status'] in ACTIVE_STATUSES:
+                # Owned by another worker: it polls this flag through its cancel event
+                self._store_call('set', f'job-cancel:{job_id}', True, ttl=self.retention_seconds)
+                snapshot['cancel_requested'] = True
+            return snapshot
+
+        if job.status in FINAL_STATUSES:
+            return job.to_dict()
+        job.cancel_event.set()
+        with self._lock:
+            if job.status == 'queued' and job.future is not None and job.future.cancel():
+                job.status = 'cancelled'
+                job.finished_at = time.time()
+        logger.info(f"Cancellation requested for job {job.id}")
+        self._publish(job, force=True)
+        if job.status in FINAL_STATUSES:
+            self._release(job.to_dict())
+        snapshot = job.to_dict()
+        snapshot['cancel_requested'] = True
+        return snapshot
+
+    def status_counts(self) -> dict:
+        """本进程内排队中与运行中的任务数，供 /metrics 采集"""
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {(status,): statuses.count(status) for status in ('queued', 'running')}
+
+    def shutdown(self, wait: bool = False):
+        """取消所有未完成的任务并关闭线程池"""
+        for job in list(self._jobs.values()):
+            if job.status in ACTIVE_STATUSES:
+                self.cancel(job.id)
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def abandon(self, reason: str):
+        """进程即将退出：未结束的任务不会再运行，立即标记为失败并停止发起新的上游请求"""
+        for job in list(self._jobs.values()):
+            if job.status in ACTIVE_STATUSES:
+                job.cancel_event.set()
+                job.error = reason
+                job.status = 'failed'
+                job.finished_at = time.time()
+                logger.warning(f"Job {job.id} failed: {reason}")
+                self._publish(job, force=True)
+                self._release(job.to_dict())
+
+    # ---------- execution ----------
+
+    def _run(self, job: Job):
+        if job.cancel_event.is_set():
+            self._finish(job, 'cancelled')
+            return
+        job.status = 'running'
+        job.started_at = time.time()
+        self._publish(job, force=True)
+        progress = _PublishingProgress(job, self)
+        try:
+            cancelled = self._execute(job, progress)
+            self._finish(job, 'cancelled' if cancelled else 'completed')
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            job.error = str(e)
+            self._finish(job, 'failed')
+
+    def _execute(self, job: Job, progress) -> bool:
+        """执行任务，返回是否被取消"""
+        from batch import run_batch_translation, run_batch_evaluation
+
+        params = job.params
+        src, tgt = params['source_lang'], params['target_lang']
+        if job.kind in ('translation', 'translate_evaluate'):
+            job.progress.phase = 'translation'
+            run_id = params['run_id']
+            job.result['translation_run_id'] = run_id
+            summary = run_batch_translation(src, tgt, run_id, params['lines'],
+                                            progress=progress, cancel_event=job.cancel_event,
+                                            order=params.get('order'))
+            if summary is None:
+                raise RuntimeError(f"No test cases found for source language '{src}'")
+            job.result['translation'] = summary
+            if job.cancel_event.is_set():
+                return True
+            if job.kind == 'translate_evaluate' and not summary['saved']:
+                raise RuntimeError("No translations were saved; evaluation skipped")
+
+        if job.kind in ('evaluation', 'translate_evaluate'):
+            job.progress.phase = 'evaluation'
+            translation_run_id = job.result.get('translation_run_id') or params['translation_run_id']
+            eval_run_id = params['eval_run_id']
+            job.result.update(translation_run_id=translation_run_id, eval_run_id=eval_run_id)
+            stats = run_batch_evaluation(src, tgt, translation_run_id, eval_run_id,
+                                         prescreen=params.get('prescreen'), mode=params.get('mode'),
+                                         batch_size=params.get('batch_size'), order=params.get('order'),
+                                         progress=progress, cancel_event=job.cancel_event)
+            if stats is None:
+                raise RuntimeError(f"No translation results found for run '{translation_run_id}'")
+            job.result['evaluation'] = stats
+        return job.cancel_event.is_set()
+
+    def _finish(self, job: Job, status: str):
+        if job.status in FINAL_STATUSES:
+            # Already failed by abandon()
+            return
+        job.status = status
+        job.finished_at = time.time()
+        job.progress.phase = None
+        logger.info(f"Job {job.id} {status}: {job.result or job.error}")
+        self._publish(job, force=True)
+        self._release(job.to_dict())
+        # History lists new runs on the next request instead of after the cache TTL
+        self._store_call('delete', 'cache:history')
+
+    # ---------- bookkeeping ----------
+
+    def _publish(self, job: Job, force: bool = False):
+        """把任务快照写入共享存储（运行中按时间节流）"""
+        if self.store is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._published.get(job.id, 0.0) < _PUBLISH_INTERVAL:
+            return
+        self._published[job.id] = now
+        job.heartbeat = time.time()
+        self._store_call('set', f'job:{job.id}', job.to_dict(), ttl=self.retention_seconds)
+
+    def _start_heartbeat(self):
+        """每个进程启动一次心跳线程：定期重新发布本进程未结束的任务"""
+        if self.store is None or self._heartbeat_pid == os.getpid():
+            return
+        with self._lock:
+            if self._heartbeat_pid == os.getpid():
+                return
+            self._heartbeat_pid = os.getpid()
+
+        def loop():
+            while True:
+                time.sleep(self.heartbeat_seconds)
+                for job in list(self._jobs.values()):
+                    if job.status in ACTIVE_STATUSES:
+                        self._publish(job, force=True)
+
+        threading.Thread(target=loop, name='job-heartbeat', daemon=True).start()
+
+    def _check_owner(self, snapshot: Optional[dict]) -> Optional[dict]:
+        """其他worker的未结束任务：心跳超过 JOB_STALE_SECONDS 说明该worker已退出，标记为失败"""
+        if snapshot is None or snapshot['status'] not in ACTIVE_STATUSES or snapshot['id'] in self._jobs:
+            return snapshot
+        heartbeat = snapshot.get('heartbeat') or snapshot['created_at']
+        if time.time() - heartbeat <= self.stale_seconds:
+            return snapshot
+        snapshot = dict(snapshot, status='failed', finished_at=time.time(),
+                        error=f"Worker {snapshot.get('owner')} stopped while the job was {snapshot['status']}")
+        logger.warning(f"Job {snapshot['id']} failed: {snapshot['error']}")
+        self._store_call('set', f"job:{snapshot['id']}", snapshot, ttl=self.retention_seconds)
+        self._release(snapshot)
+        return snapshot
+
+    def _claim(self, job: Job):
+        """
+        在共享存储中占用任务写入的运行目录（检查与写入在同一事务中，跨worker原子）
+
+        占用者已结束、其worker已退出，或占用超过 JOB_STALE_SECONDS 仍没有任务快照时，
+        视为遗留占用，释放后重试一次。共享存储不可用时只做本进程内的检查。
+
+        Raises:
+            JobError: 运行目录正被另一个未结束的任务写入
+        """
+        keys, value = _run_claims(job.to_dict())
+        if self.store is None or not keys:
+            return
+        for _ in range(2):
+            held = self._store_call('claim', keys, value)
+            if not held:
+                return
+            for key, holder in held.items():
+                other = self.get(holder['job'])
+                if other is not None and other['status'] in ACTIVE_STATUSES:
+                    raise JobError(f"Job {holder['job']} is already writing to this run; choose another run id")
+                if other is None and time.time() - holder['since'] <= self.stale_seconds:
+                    # Claimed by a submit in another worker that has not published its job yet
+                    raise JobError(f"Job {holder['job']} is already writing to this run; choose another run id")
+                self._store_call('unclaim', [key], holder)
+        raise JobError("Another job is claiming this run; try again")
+
+    def _release(self, snapshot: dict):
+        """释放已结束任务对运行目录的占用"""
+        keys, value = _run_claims(snapshot)
+        if keys:
+            self._store_call('unclaim', keys, value)
+
+    def _prune(self):
+        """移除超过保留期限的已结束任务（需持有锁）"""
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.status in FINAL_STATUSES and job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+            self._published.pop(job_id, None)
+
+    def _store_call(self, method: str, *args, **kwargs):
+        if self.store is None:
+            return None
+        try:
+            return getattr(self.store, method)(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Shared store {method} failed for jobs: {e}")
+            return None
+
+
+class _PublishingProgress:
+    """转发给任务的 JobProgress，并在进度变化时发布快照"""
+
+    def __init__(self, job: Job, manager: JobManager):
+        self._job = job
+        self._manager = manager
+
+    def add_total(self, n: int):
+        self._job.progress.add_total(n)
+        self._manager._publish(self._job, force=True)
+
+    def record(self, success: bool, n: int = 1):
+        self._job.progress.record(success, n)
+        self._manager._publish(self._job)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def abandon_jobs(reason: str):
+    """进程退出前调用（gunicorn worker_exit）：本进程的未结束任务标记为失败"""
+    if _manager is not None:
+        _manager.abandon(reason)
+
+
+def get_job_manager() -> JobManager:
+    """获取进程内共享的任务管理器"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = JobManager(store=get_shared_store())
+                JOBS.set_function(_manager.status_counts)
+    return _manager
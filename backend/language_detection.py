@@ -0,0 +1,269 @@
+"""
+Tiered Language Detection
+
+1. Unicode script: Hangul -> ko, Kana -> ja, Han -> zh
+2. Latin script: compact character-trigram model for en/es/pt
+3. Anything still uncertain: langdetect (seeded, so results are reproducible)
+
+Text whose language is not supported (French, German, ...) is reported as
+undetectable rather than as the nearest supported language.
+
+Results are cached per text, and detect_batch/detect_majority handle whole suites.
+"""
+
+import json
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from config import PROJECT_ROOT, get_language_detection_config
+
+logger = logging.getLogger(__name__)
+
+# Unicode script ranges used for script detection
+SCRIPT_RANGES = {
+    'han': [(0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF)],
+    'kana': [(0x3040, 0x309F), (0x30A0, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9D)],
+    'hangul': [(0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF)],
+    'latin': [(0x0041, 0x005A), (0x0061, 0x007A), (0x00C0, 0x024F)]
+}
+
+_SCRIPT_RES = {
+    name: re.compile('[' + ''.join(f'\\u{start:04x}-\\u{end:04x}' for start, end in ranges) + ']')
+    for name, ranges in SCRIPT_RANGES.items()
+}
+
+# langdetect codes that map onto the languages this tool supports
+LANG_MAP = {
+    'zh-cn': 'zh',
+    'zh-tw': 'zh',
+    'zh': 'zh',
+    'en': 'en',
+    'ja': 'ja',
+    'es': 'es',
+    'pt': 'pt',
+    'ko': 'ko'
+}
+
+PROFILE_FILE = PROJECT_ROOT / 'data/langid/latin_trigrams.json'
+LATIN_LANGUAGES = ('en', 'es', 'pt')
+# Characters considered when detecting; longer texts are truncated
+MAX_DETECT_CHARS = 512
+
+_NON_LETTER_RE = re.compile(r"[^\w']+|[\d_]+")
+
+
+def script_counts(text: str) -> dict:
+    """统计文本中各文字系统的字母数量"""
+    return {name: len(pattern.findall(text)) for name, pattern in _SCRIPT_RES.items()}
+
+
+def _trigrams(text: str) -> List[str]:
+    """小写、按词补空格后的字符三元组（与langdetect档案的切分方式一致）"""
+    grams = []
+    for word in _NON_LETTER_RE.sub(' ', text.lower()).split():
+        padded = f' {word} '
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramModel:
+    """拉丁文字语言的字符三元组朴素贝叶斯模型"""
+
+    def __init__(self, profiles: Dict[str, dict]):
+        self.languages = sorted(profiles)
+        self._log_probs = {}
+        self._unknown = {}
+        for lang, profile in profiles.items():
+            total = profile['total']
+            self._log_probs[lang] = {gram: math.log(count / total) for gram, count in profile['trigrams'].items()}
+            # Trigrams outside the kept top-N: half the rarest kept frequency
+            self._unknown[lang] = math.log(min(profile['trigrams'].values()) / (2 * total))
+
+    @classmethod
+    def load(cls, path=PROFILE_FILE) -> 'TrigramModel':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f)['languages'])
+
+    def score(self, text: str) -> dict:
+        """
+        Returns:
+            dict: language、probability（各候选语言的后验概率中的最大值）、trigrams（参与计算的三元组数）、
+                  coverage（三元组中出现在该语言档案里的比例；其他语言的文本明显偏低）
+        """
+        grams = _trigrams(text)
+        if not grams:
+            return {"language": None, "probability": 0.0, "trigrams": 0, "coverage": 0.0}
+        totals = {
+            lang: sum(self._log_probs[lang].get(gram, self._unknown[lang]) for gram in grams)
+            for lang in self.languages
+        }
+        best = max(totals, key=totals.get)
+        # Posterior of the best language under a uniform prior
+        probability = 1 / sum(math.exp(score - totals[best]) for score in totals.values())
+        coverage = sum(1 for gram in grams if gram in self._log_probs[best]) / len(grams)
+        return {"language": best, "probability": round(probability, 4), "trigrams": len(grams),
+                "coverage": round(coverage, 4)}
+
+
+class LanguageDetector:
+    """分层语言检测：文字系统 -> 三元组模型 -> langdetect"""
+
+    def __init__(self, config: dict = None, model: TrigramModel = None):
+        self.config = config or get_language_detection_config()
+        self._model = model
+        self._lock = threading.Lock()
+        self._langdetect_seeded = False
+        # Cached as tuples so a caller changing a returned dict cannot alter later results
+        self._cached = lru_cache(maxsize=self.config['cache_size'])(lambda text: tuple(self._detect(text).items()))
+
+    def detect(self, text: str) -> dict:
+        """检测单条文本的语言（结果按文本缓存，每次返回新的dict），字段见 _detect"""
+        return dict(self._cached(text))
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+    @property
+    def model(self) -> Optional[TrigramModel]:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    try:
+                        self._model = TrigramModel.load()
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Trigram profiles unavailable ({e}); Latin text falls back to langdetect")
+                        self._model = TrigramModel({})
+        return self._model
+
+    def _detect(self, text: str) -> dict:
+        """
+        检测单条文本的语言
+
+        Returns:
+            dict: language（支持的语言代码，无法判断时为None）、confidence、method（script/trigram/langdetect/none）
+        """
+        sample = (text or '')[:MAX_DETECT_CHARS]
+        counts = script_counts(sample)
+        letters = sum(counts.values())
+        if not letters:
+            return self._fallback(sample)
+
+        cjk = counts['han'] + counts['kana'] + counts['hangul']
+        if cjk / letters >= 0.5:
+            # Kana is unique to Japanese, Hangul to Korean; text with Han only is Chinese
+            if counts['hangul'] >= counts['kana'] and counts['hangul'] > 0:
+                return {"language": 'ko', "confidence": round(counts['hangul'] / cjk, 4), "method": 'script'}
+            if counts['kana'] > 0:
+                return {"language": 'ja', "confidence": round((counts['kana'] + counts['han']) / cjk, 4),
+                        "method": 'script'}
+            return {"language": 'zh', "confidence": 1.0, "method": 'script'}
+
+        if counts['latin'] / letters >= 0.5 and self.model.languages:
+            result = self.model.score(sample)
+            # The posterior only compares en/es/pt, so an unsupported language needs the coverage check
+            if result['trigrams'] < self.config['min_trigrams']:
+                # Too little text for either tier: langdetect labels "OK" as Portuguese
+                return {"language": None, "confidence": 0.0, "method": 'none'}
+            if (result['probability'] >= self.config['min_confidence']
+                    and result['coverage'] >= self.config['min_coverage']):
+                return {"language": result['language'], "confidence": result['probability'], "method": 'trigram'}
+            return self._fallback(sample)
+
+        return self._fallback(sample)
+
+    def _fallback(self, text: str) -> dict:
+        """交给langdetect判断（确定性模式下固定随机种子）"""
+        try:
+            from langdetect import DetectorFactory, detect_langs
+            if self.config['deterministic'] and not self._langdetect_seeded:
+                DetectorFactory.seed = self.config['seed']
+                self._langdetect_seeded = True
+            candidates = detect_langs(text)
+        except Exception as e:
+            logger.debug(f"langdetect could not classify text: {e}")
+            return {"language": None, "confidence": 0.0, "method": 'none'}
+
+        # Only the most likely language counts: a supported runner-up to French is still French
+        if candidates and candidates[0].lang in LANG_MAP:
+            return {"language": LANG_MAP[candidates[0].lang], "confidence": round(candidates[0].prob, 4),
+                    "method": 'langdetect'}
+        return {"language": None, "confidence": 0.0, "method": 'langdetect'}
+
+    def detect_batch(self, texts: Iterable[str]) -> List[dict]:
+        """批量检测，返回与输入一一对应的结果"""
+        return [self.detect(text) for text in texts]
+
+    def detect_majority(self, texts: Iterable[str]) -> dict:
+        """
+        检测整套文本（如一个测试套件）的语言，按多数票决定
+
+        Returns:
+            dict: language、share（得票比例）、counts（各语言行数）
+        """
+        counts = Counter(result['language'] for result in self.detect_batch(texts) if result['language'])
+        if not counts:
+            return {"language": None, "share": 0.0, "counts": {}}
+        language, votes = counts.most_common(1)[0]
+        return {"language": language, "share": round(votes / sum(counts.values()), 4), "counts": dict(counts)}
+
+
+_detector: Optional[LanguageDetector] = None
+_detector_lock = threading.Lock()
+
+
+def get_language_detector() -> LanguageDetector:
+    """获取进程内共享的语言检测器"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = LanguageDetector()
+    return _detector
+
+
+def build_profiles(top: int = 3000) -> dict:
+    """从langdetect自带的语言档案提取en/es/pt最常见的三元组，生成紧凑模型"""
+    import os
+    import langdetect
+
+    profile_dir = os.path.join(os.path.dirname(langdetect.__file__), 'profiles')
+    languages = {}
+    for lang in LATIN_LANGUAGES:
+        with open(os.path.join(profile_dir, lang), 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+        trigrams = Counter()
+        for gram, count in profile['freq'].items():
+            if len(gram) == 3:
+                trigrams[gram.lower()] += count
+        top_grams = dict(trigrams.most_common(top))
+        languages[lang] = {"total": sum(trigrams.values()), "trigrams": top_grams}
+    return {"source": "langdetect profiles", "top": top, "languages": languages}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Tiered language detection')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build-profiles', help='Regenerate the Latin trigram profiles')
+    build_parser.add_argument('--top', type=int, default=3000, help='Trigrams kept per language')
+    detect_parser = subparsers.add_parser('detect', help='Detect the language of each file (one sentence per line)')
+    detect_parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'build-profiles':
+        PROFILE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(PROFILE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(build_profiles(args.top), f, ensure_ascii=False, separators=(',', ':'))
+        print(f"Wrote {PROFILE_FILE}")
+    else:
+        detector = get_language_detector()
+        for path in args.files:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f if line.strip()]
+            print(f"{path}: {json.dumps(detector.detect_majority(lines), ensure_ascii=False)}")
@@ -0,0 +1,230 @@
+"""
+Upstream concurrency and rate budgets
+
+Interactive API calls, playground runs and batch jobs share each upstream's
+concurrency budget. A freed slot goes to the highest priority class waiting
+(interactive > playground > batch, first come first served within a class),
+and `reserved` slots are held back for interactive calls only. A call that has
+waited longer than `aging` seconds ranks with interactive calls, so batch work
+keeps moving while the playground is busy.
+
+Under gunicorn the budgets returned by get_budget() queue in the shared store,
+so a budget's slots and its priority order hold across all workers: a batch
+job in one worker yields to interactive calls arriving at another, and
+`*_MAX_CONCURRENCY` caps the whole deployment. Without the shared store each
+process keeps its own queue and slots.
+"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from config import get_upstream_budgets
+from metrics import UPSTREAM_WAITING, UPSTREAM_QUEUE_WAIT
+from tracing import start_span
+
+INTERACTIVE = 'interactive'
+PLAYGROUND = 'playground'
+BATCH = 'batch'
+# Highest priority first
+PRIORITIES = (INTERACTIVE, PLAYGROUND, BATCH)
+# How often a call queued in the shared store checks for slots freed by other workers: the interval
+# starts at SHARED_POLL_SECONDS and doubles while the call keeps waiting, up to SHARED_POLL_MAX_SECONDS
+SHARED_POLL_SECONDS = 0.05
+SHARED_POLL_MAX_SECONDS = 0.5
+# Most polls are read-only; this often a waiting call also releases slots of exited workers
+SHARED_REAP_SECONDS = 1.0
+# A shared slot whose lease was not renewed for this long is assumed leaked (e.g. by a worker whose pid
+# was reused); leases of held and queued slots are renewed in the background
+SHARED_SLOT_LEASE_SECONDS = 600
+
+
+class RateLimiter:
+    """令牌桶限速器，rate <= 0 时不限速"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """获取一个令牌，返回等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+class _Waiter:
+    __slots__ = ('rank', 'since', 'seq')
+
+    def __init__(self, rank: int, seq: int, since: float = None):
+        self.rank = rank
+        self.since = time.monotonic() if since is None else since
+        self.seq = seq
+
+
+class UpstreamBudget:
+    """
+    单个上游接口的并发与速率预算，按优先级分配并发槽位
+
+    slots 为 shared_store.SharedSlots 时在共享存储中排队，槽位与优先级顺序在所有worker之间生效。
+    """
+
+    def __init__(self, name: str, max_concurrency: int, rate: float = 0.0, burst: int = 1, limiter=None,
+                 reserved: int = 0, aging: float = 10.0, slots=None):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        # At least one slot stays open to playground and batch calls
+        self.reserved = min(max(0, reserved), self.max_concurrency - 1)
+        self.aging = aging
+        self.limiter = limiter or RateLimiter(rate, burst)
+        self.slots = slots
+        self._active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _choose(self, waiters: list, active: int, now: float):
+        """已占用 active 个槽位时，下一个可以占用槽位的等待者"""
+        def order(waiter):
+            aged = self.aging > 0 and now - waiter.since >= self.aging
+            return (0 if aged else waiter.rank, waiter.seq)
+
+        for waiter in sorted(waiters, key=order):
+            limit = self.max_concurrency if waiter.rank == 0 else self.max_concurrency - self.reserved
+            if active < limit:
+                return waiter
+        return None
+
+    def _next(self):
+        """下一个可以占用本进程槽位的等待者（调用方持有锁）"""
+        return self._choose(self._waiters, self._active, time.monotonic())
+
+    def _choose_shared(self, waiting: list, active: int):
+        """在共享存储的队列 [(票号, 优先级, 排队时间)] 中选出下一个占用者的票号"""
+        chosen = self._choose([_Waiter(rank, ticket, since) for ticket, rank, since in waiting], active, time.time())
+        return chosen.seq if chosen else None
+
+    def _queue_shared(self, rank: int) -> int:
+        """在共享存储中排队直到占用槽位，返回票号"""
+        ticket = self.slots.queue(rank)
+        try:
+            interval = SHARED_POLL_SECONDS
+            reap_at = time.monotonic() + SHARED_REAP_SECONDS
+            while True:
+                # The write lock is taken only when this ticket is next in line, or to reap now and then
+                reap = time.monotonic() >= reap_at
+                if reap:
+                    reap_at = time.monotonic() + SHARED_REAP_SECONDS
+                if self.slots.claim(ticket, self._choose_shared, reap=reap):
+                    break
+                with self._cond:
+                    # A release in this worker wakes the queue at once; other workers' releases are polled
+                    self._cond.wait(interval)
+                interval = min(interval * 2, SHARED_POLL_MAX_SECONDS)
+        except BaseException:
+            self.slots.release(ticket)
+            raise
+        with self._cond:
+            self._active += 1
+        return ticket
+
+    @contextmanager
+    def slot(self, priority: str = INTERACTIVE):
+        """按优先级排队占用一个并发槽位，并消耗一个速率令牌"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown upstream priority: {priority}")
+        waiter = _Waiter(PRIORITIES.index(priority), next(self._seq))
+        queue_span = start_span(f"{self.name}.queue", priority=priority)
+        UPSTREAM_WAITING.inc(service=self.name, priority=priority)
+        acquired = False
+        ticket = None
+        try:
+            if self.slots is not None:
+                ticket = self._queue_shared(waiter.rank)
+                acquired = True
+            else:
+                with self._cond:
+                    self._waiters.append(waiter)
+                    try:
+                        while self._next() is not waiter:
+                            self._cond.wait()
+                    finally:
+                        self._waiters.remove(waiter)
+                    self._active += 1
+                    acquired = True
+                    # More than one slot may be free; let the next waiter check
+                    self._cond.notify_all()
+            self.limiter.acquire()
+            queue_span.finish()
+            UPSTREAM_WAITING.dec(service=self.name, priority=priority)
+            UPSTREAM_QUEUE_WAIT.observe(time.monotonic() - waiter.since, service=self.name, priority=priority)
+            waiter = None
+            yield
+        finally:
+            if waiter is not None:
+                UPSTREAM_WAITING.dec(service=self.name, priority=priority)
+            if acquired:
+                if ticket is not None:
+                    self.slots.release(ticket)
+                with self._cond:
+                    self._active -= 1
+                    self._cond.notify_all()
+
+    @property
+    def active(self) -> int:
+        """本进程正在占用的槽位数"""
+        with self._cond:
+            return self._active
+
+    @classmethod
+    def from_config(cls, name: str, **overrides) -> 'UpstreamBudget':
+        """根据环境配置创建预算，overrides 中非 None 的值优先"""
+        settings = dict(get_upstream_budgets()[name])
+        settings.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(name, settings['max_concurrency'], settings['rate'], settings['burst'],
+                   reserved=settings['reserved'], aging=settings['aging'])
+
+
+_budgets: Dict[str, UpstreamBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def get_budget(name: str) -> UpstreamBudget:
+    """
+    获取进程内共享的上游预算
+
+    共享存储可用时，并发槽位在共享存储中排队，并发上限与优先级顺序对所有worker进程整体生效；
+    配置了速率限制时令牌桶也由所有worker共用，多进程部署下总请求速率仍不超过配置值。
+    共享存储不可用时并发上限与优先级只在本进程内生效。
+    """
+    with _budgets_lock:
+        if name not in _budgets:
+            settings = get_upstream_budgets()[name]
+            limiter = slots = None
+            from shared_store import get_shared_store, SharedRateLimiter, SharedSlots
+            store = get_shared_store()
+            if store is not None:
+                slots = SharedSlots(store, f"upstream:{name}", SHARED_SLOT_LEASE_SECONDS)
+                if settings['rate'] > 0:
+                    limiter = SharedRateLimiter(store, f"upstream:{name}", settings['rate'], settings['burst'])
+            _budgets[name] = UpstreamBudget(name, settings['max_concurrency'], settings['rate'],
+                                            settings['burst'], limiter=limiter, reserved=settings['reserved'],
+                                            aging=settings['aging'], slots=slots)
+        return _budgets[name]
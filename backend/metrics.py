@@ -0,0 +1,492 @@
+"""
+Prometheus Metrics
+
+Counters, gauges and histograms rendered in the Prometheus text format at
+/metrics, without third-party dependencies. Updates on the hot path are
+lock-free: each thread writes only its own shard (a plain dict), and a scrape
+sums the shards. Shards of exited threads are folded into a retired total.
+
+Under gunicorn each worker publishes a snapshot to the shared store every
+METRICS_PUBLISH_INTERVAL seconds, and a scrape merges the snapshots of all
+workers, so any worker can answer for the whole server. Counters and histograms
+of exited workers are folded into a retired snapshot, so totals never drop when
+gunicorn recycles a worker.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from config import get_metrics_config
+from tracing import start_span
+from usage import usage_record
+
+logger = logging.getLogger(__name__)
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+
+def _add(totals: dict, key, value):
+    """累加一个样本；直方图样本为各桶计数加总和的列表"""
+    current = totals.get(key)
+    if current is None:
+        totals[key] = list(value) if isinstance(value, list) else value
+    elif isinstance(current, list):
+        for i, v in enumerate(value):
+            current[i] += v
+    else:
+        totals[key] = current + value
+
+
+def _read(values: dict) -> list:
+    """复制另一个线程正在写入的分片"""
+    while True:
+        try:
+            return [(key, list(value) if isinstance(value, list) else value) for key, value in values.items()]
+        except RuntimeError:
+            # The owner added a key while we were iterating; try again
+            continue
+
+
+class Metric:
+    """指标基类：按线程分片存储各标签组合的值"""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry: 'Registry' = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._compact_at = 64
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), values))
+                if len(self._shards) >= self._compact_at:
+                    self._compact()
+                    self._compact_at = max(64, 2 * len(self._shards))
+            return values
+
+    def _compact(self):
+        """把已退出线程的分片并入 retired（调用方持有锁）"""
+        alive = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                alive.append((thread, values))
+            else:
+                # The thread has exited, so its shard can no longer change
+                for key, value in values.items():
+                    _add(self._retired, key, value)
+        self._shards = alive
+
+    def collect(self) -> Dict[tuple, object]:
+        """各标签组合的当前值（所有线程之和）"""
+        with self._lock:
+            self._compact()
+            totals = {}
+            for key, value in self._retired.items():
+                _add(totals, key, value)
+            shards = [values for _, values in self._shards]
+        for values in shards:
+            for key, value in _read(values):
+                _add(totals, key, value)
+        return totals
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """可增可减的数值；也可以用 set_function 在采集时计算"""
+
+    type = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function: Optional[Callable[[], dict]] = None
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], dict]):
+        """function 返回 {标签值元组: 数值}，采集时调用"""
+        self._function = function
+
+    def collect(self) -> Dict[tuple, object]:
+        totals = super().collect()
+        if self._function is not None:
+            try:
+                for key, value in self._function().items():
+                    _add(totals, tuple(str(v) for v in key), value)
+            except Exception as e:
+                logger.warning(f"Collecting {self.name} failed: {e}")
+        return totals
+
+
+class Histogram(Metric):
+    """分桶统计的直方图（桶上界包含在内）"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=HTTP_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        counts = shard.get(key)
+        if counts is None:
+            # One count per bucket plus +Inf, then the running sum
+            counts = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric):
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def snapshot(self) -> dict:
+        """可JSON序列化的当前值，用于跨进程合并"""
+        return {
+            metric.name: {
+                "type": metric.type,
+                "help": metric.documentation,
+                "labels": list(metric.labelnames),
+                "buckets": list(getattr(metric, 'buckets', ())),
+                "samples": [[list(key), value] for key, value in metric.collect().items()],
+            }
+            for metric in self._metrics
+        }
+
+
+REGISTRY = Registry()
+
+
+def merge_snapshots(snapshots: List[dict]) -> dict:
+    """合并多个进程的快照，同名同标签的样本相加"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            target = merged.setdefault(name, {**family, "samples": {}})
+            for key, value in family["samples"]:
+                _add(target["samples"], tuple(key), value)
+    for family in merged.values():
+        family["samples"] = [[list(key), value] for key, value in family["samples"].items()]
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render(snapshot: dict) -> str:
+    """按Prometheus文本格式输出快照"""
+    lines = []
+    for name, family in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        names = family["labels"]
+        for key, value in sorted(family["samples"]):
+            if family["type"] == 'histogram':
+                cumulative = 0
+                for bound, count in zip(family["buckets"] + [float('inf')], value[:-1]):
+                    cumulative += count
+                    le = 'le="%s"' % _number(bound)
+                    lines.append(f"{name}_bucket{_labels(names, key, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(names, key)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(names, key)} {_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def add_hit_ratios(snapshot: dict) -> dict:
+    """由 cache_requests_total 计算各缓存的命中率"""
+    family = snapshot.get('cache_requests_total')
+    if not family:
+        return snapshot
+    totals, hits = {}, {}
+    for (cache, result), value in family["samples"]:
+        totals[cache] = totals.get(cache, 0) + value
+        if result == 'hit':
+            hits[cache] = hits.get(cache, 0) + value
+    snapshot = dict(snapshot)
+    snapshot['cache_hit_ratio'] = {
+        "type": 'gauge', "help": 'Cache hits divided by lookups since start', "labels": ['cache'], "buckets": [],
+        "samples": [[[cache], round(hits.get(cache, 0) / total, 4)] for cache, total in totals.items() if total],
+    }
+    return snapshot
+
+
+# ---------- cross-worker publishing ----------
+
+_publisher_pid = None
+_publisher_lock = threading.Lock()
+_worker_key = None
+
+RETIRED_KEY = 'metrics:retired'
+
+
+def _store_key() -> str:
+    """本进程快照的键：metrics:<pid>:<随机后缀>，pid 被新进程复用时不会覆盖旧快照"""
+    global _worker_key
+    if _worker_key is None or _worker_key[0] != os.getpid():
+        _worker_key = (os.getpid(), f"metrics:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+    return _worker_key[1]
+
+
+def _worker_pid(key: str) -> Optional[int]:
+    parts = key.split(':')
+    return int(parts[1]) if len(parts) == 3 and parts[1].isdigit() else None
+
+
+def _retire(retired: Optional[dict], snapshots: List[dict]) -> dict:
+    """把退出worker的计数器与直方图并入 retired 快照；gauge 随进程一起消失"""
+    kept = [{name: family for name, family in snapshot.items() if family["type"] != 'gauge'}
+            for snapshot in snapshots]
+    return merge_snapshots(([retired] if retired else []) + kept)
+
+
+def publish(store):
+    """把本进程的快照写入共享存储"""
+    store.set(_store_key(), REGISTRY.snapshot())
+
+
+def retire_worker(store):
+    """worker 退出时写入最终快照并立即并入 retired"""
+    publish(store)
+    store.fold([_store_key()], RETIRED_KEY, _retire)
+
+
+def retire_dead_workers(store):
+    """把已退出（包括被强杀）的worker的快照并入 retired"""
+    from shared_store import pid_alive
+    dead = [key for key in store.items('metrics:')
+            if _worker_pid(key) is not None and not pid_alive(_worker_pid(key))]
+    if dead:
+        store.fold(dead, RETIRED_KEY, _retire)
+
+
+def start_publisher():
+    """每个进程启动一次后台发布线程（没有共享存储时不启动）"""
+    global _publisher_pid
+    if _publisher_pid == os.getpid():
+        return
+    with _publisher_lock:
+        if _publisher_pid == os.getpid():
+            return
+        _publisher_pid = os.getpid()
+        from shared_store import get_shared_store
+        store = get_shared_store()
+        if store is None:
+            return
+        interval = get_metrics_config()['publish_interval']
+
+        def loop():
+            while True:
+                try:
+                    publish(store)
+                except Exception as e:
+                    logger.warning(f"Publishing metrics failed: {e}")
+                time.sleep(interval)
+
+        threading.Thread(target=loop, name='metrics-publisher', daemon=True).start()
+
+
+def exposition() -> str:
+    """/metrics 的响应内容：有共享存储时合并所有worker，否则只含本进程"""
+    from shared_store import get_shared_store
+    store = get_shared_store()
+    snapshots = None
+    if store is not None:
+        try:
+            publish(store)
+            retire_dead_workers(store)
+            snapshots = list(store.items('metrics:').values())
+        except Exception as e:
+            logger.warning(f"Reading worker metrics failed, reporting this worker only: {e}")
+    merged = merge_snapshots(snapshots or [REGISTRY.snapshot()])
+    return render(add_hit_ratios(merged))
+
+
+# ---------- metrics ----------
+
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by route and status', ['method', 'route', 'status'])
+HTTP_LATENCY = Histogram('http_request_duration_seconds',
+                         'Time until the response headers are ready (streams keep running afterwards)',
+                         ['method', 'route'], buckets=HTTP_BUCKETS)
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being served, including open streams')
+
+UPSTREAM_REQUESTS = Counter('upstream_requests_total',
+                            'Upstream API calls by outcome (ok, rate_limited, http_error, timeout, '
+                            'connection, api_error, error)', ['service', 'endpoint', 'outcome'])
+UPSTREAM_LATENCY = Histogram('upstream_request_duration_seconds', 'Upstream API call duration',
+                             ['service', 'endpoint'], buckets=UPSTREAM_BUCKETS)
+UPSTREAM_TTFT = Histogram('upstream_time_to_first_token_seconds',
+                          'Time until a streaming upstream call returns its first token or audio chunk',
+                          ['service', 'endpoint'], buckets=UPSTREAM_BUCKETS)
+UPSTREAM_IN_FLIGHT = Gauge('upstream_requests_in_flight', 'Upstream API calls in progress', ['service'])
+UPSTREAM_WAITING = Gauge('upstream_budget_waiting', 'Calls queued for an upstream concurrency slot',
+                         ['service', 'priority'])
+UPSTREAM_QUEUE_WAIT = Histogram('upstream_budget_wait_seconds',
+                                'Time a call waited for an upstream concurrency slot and rate-limit token',
+                                ['service', 'priority'], buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                                                                  10, 30, 60))
+LLM_TOKENS = Counter('llm_tokens_total', 'Tokens reported by the LLM APIs', ['service', 'model', 'type'])
+
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by result (hit or miss)', ['cache', 'result'])
+TM_LOOKUPS = Counter('translation_memory_lookups_total',
+                     'Translation memory lookups by result (served, hinted or miss)', ['result'])
+JOBS = Gauge('background_jobs', 'Background jobs in this process by status', ['status'])
+
+
+def cache_lookup(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+def _outcome(error: BaseException) -> str:
+    """把上游调用的异常归类"""
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status == 429:
+        return 'rate_limited'
+    if status:
+        return 'http_error'
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if 'Timeout' in names:
+        return 'timeout'
+    if 'ConnectionError' in names:
+        return 'connection'
+    return 'error'
+
+
+class UpstreamCall:
+    """
+    一次上游调用的计时与结果记录
+
+    作为上下文管理器使用，异常会按类型记录为结果；流式调用可在流结束时手动 finish()。
+    在trace中时同时记录一个 service.endpoint 的span。
+    """
+
+    def __init__(self, service: str, endpoint: str):
+        self.service = service
+        self.endpoint = endpoint
+        self.outcome = 'ok'
+        self.started = time.perf_counter()
+        self._first_token = None
+        self._finished = False
+        self._usage = None
+        self.duration = None
+        self.span = start_span(f"{service}.{endpoint}")
+        UPSTREAM_IN_FLIGHT.inc(service=service)
+
+    def __enter__(self) -> 'UpstreamCall':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        return False
+
+    def first_token(self):
+        """记录首个token（或首段音频）到达的时间，只记第一次"""
+        if self._first_token is None:
+            self._first_token = time.perf_counter() - self.started
+            UPSTREAM_TTFT.observe(self._first_token, service=self.service, endpoint=self.endpoint)
+            self.span.event('first_token')
+
+    def received(self, response):
+        """记录响应头到达的耗时（含建立连接），即 requests 的 response.elapsed"""
+        elapsed = getattr(response, 'elapsed', None)
+        if isinstance(elapsed, timedelta):
+            self.span.set(headers_ms=round(elapsed.total_seconds() * 1000, 3))
+
+    def fail(self, outcome: str = 'api_error'):
+        """HTTP成功但响应内容表示失败"""
+        self.outcome = outcome
+
+    def usage(self, usage: Optional[dict], model: str):
+        """记录OpenAI格式响应中的 usage"""
+        if not isinstance(usage, dict):
+            return
+        self._usage = usage
+        for kind in ('prompt_tokens', 'completion_tokens'):
+            if isinstance(usage.get(kind), int):
+                LLM_TOKENS.inc(usage[kind], service=self.service, model=model or 'unknown',
+                               type=kind.split('_')[0])
+
+    def tokens(self, messages: list, completion: str) -> dict:
+        """本次调用的用量记录（接口未返回usage时按提示词与输出估计），在 finish() 之后调用"""
+        prompt = '\n'.join(str(m.get('content', '')) for m in messages or [])
+        latency = self.duration if self.duration is not None else time.perf_counter() - self.started
+        record = usage_record(self._usage, prompt, completion, latency)
+        self.span.set(prompt_tokens=record['prompt_tokens'], completion_tokens=record['completion_tokens'])
+        return record
+
+    def finish(self, error: BaseException = None):
+        if self._finished:
+            return
+        self._finished = True
+        self.duration = time.perf_counter() - self.started
+        if error is not None and self.outcome == 'ok':
+            self.outcome = _outcome(error)
+        UPSTREAM_IN_FLIGHT.dec(service=self.service)
+        UPSTREAM_REQUESTS.inc(service=self.service, endpoint=self.endpoint, outcome=self.outcome)
+        UPSTREAM_LATENCY.observe(self.duration, service=self.service, endpoint=self.endpoint)
+        self.span.set(outcome=self.outcome)
+        self.span.finish()
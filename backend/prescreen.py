@@ -0,0 +1,139 @@
+"""
+Local Translation Quality Pre-screen
+
+Cheap checks that decide obvious cases before the LLM judge is called:
+empty output, untranslated copies of the source, output in the wrong script,
+implausible length ratios and exact/near matches with the human reference.
+"""
+
+import re
+import logging
+from typing import Optional
+
+from config import get_prescreen_config
+from scoring import sentence_scores
+from language_detection import script_counts
+
+logger = logging.getLogger(__name__)
+
+ACCEPT = 'accept'
+REJECT = 'reject'
+JUDGE = 'judge'
+
+# Scripts a translation into each language is expected to be written in
+EXPECTED_SCRIPTS = {
+    'zh': {'han'},
+    'ja': {'han', 'kana'},
+    'ko': {'hangul', 'han'},
+    'en': {'latin'},
+    'es': {'latin'},
+    'pt': {'latin'}
+}
+
+# Typical character length relative to English, measured on the aligned test suites
+# (ko is an estimate; it has no suite yet)
+LENGTH_FACTORS = {
+    'en': 1.0,
+    'zh': 0.25,
+    'ja': 0.42,
+    'ko': 0.45,
+    'es': 1.18,
+    'pt': 1.11
+}
+
+# Sources shorter than this ("Hotel", "OK", names, product codes) may rightly be kept as they are, and
+# have no stable length ratio: copy, script and length checks flag them for the judge instead of rejecting
+MIN_REJECT_CHARS = 20
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE_RE.sub(' ', (text or '').strip()).casefold()
+
+
+def prescreen_translation(source_lang: str, target_lang: str, source_text: str,
+                          translation: str, reference: Optional[str] = None,
+                          config: dict = None) -> dict:
+    """
+    对单条翻译做本地预筛选
+
+    Returns:
+        dict: decision (accept/reject/judge)、reason、score（自动评分时）、
+              flags（送评时的可疑项）以及各项检查的数值 checks
+    """
+    config = config or get_prescreen_config()
+    checks = {}
+    flags = []
+
+    def decide(decision, reason=None, score=None):
+        return {"decision": decision, "reason": reason, "score": score, "flags": flags, "checks": checks}
+
+    normalized = _normalize(translation)
+    if not normalized or not any(ch.isalnum() for ch in normalized):
+        return decide(REJECT, 'empty_output', config['reject_score'])
+
+    if reference is not None and normalized == _normalize(reference):
+        return decide(ACCEPT, 'reference_match', 10)
+
+    short = len(source_text.strip()) < MIN_REJECT_CHARS
+
+    # Untranslated copy of the source
+    if normalized == _normalize(source_text):
+        checks['copy_chrf'] = 1.0
+    else:
+        checks['copy_chrf'] = sentence_scores(translation, source_text)['chrf_score']
+    if checks['copy_chrf'] >= config['copy_chrf']:
+        if not short:
+            return decide(REJECT, 'untranslated_copy', config['reject_score'])
+        flags.append('untranslated_copy')
+
+    # Output written in the wrong script (e.g. Latin text for a zh target)
+    expected = EXPECTED_SCRIPTS.get(target_lang)
+    counts = script_counts(translation)
+    letters = sum(counts.values())
+    if expected and letters:
+        checks['script_share'] = round(sum(counts[s] for s in expected) / letters, 4)
+        if checks['script_share'] < config['min_script_share']:
+            if not short:
+                return decide(REJECT, 'wrong_script', config['reject_score'])
+            flags.append('wrong_script')
+        if target_lang == 'zh' and counts['kana']:
+            flags.append('kana_in_zh')
+
+    # Length ratio against the ratio expected for this language pair
+    if source_lang in LENGTH_FACTORS and target_lang in LENGTH_FACTORS and source_text.strip():
+        expected_ratio = LENGTH_FACTORS[target_lang] / LENGTH_FACTORS[source_lang]
+        ratio = len(translation.strip()) / len(source_text.strip())
+        deviation = ratio / expected_ratio
+        checks['length_ratio'] = round(ratio, 4)
+        checks['expected_length_ratio'] = round(expected_ratio, 4)
+        # Very short inputs ("Hi." -> "你好。") have no stable ratio
+        if not short:
+            reject_factor = config['length_reject_factor']
+            if deviation > reject_factor or deviation < 1 / reject_factor:
+                return decide(REJECT, 'length_ratio', config['reject_score'])
+            flag_factor = config['length_flag_factor']
+            if deviation > flag_factor or deviation < 1 / flag_factor:
+                flags.append('length_ratio')
+
+    # Similarity with the human reference
+    if reference is not None:
+        checks['reference_chrf'] = sentence_scores(translation, reference)['chrf_score']
+        if checks['reference_chrf'] >= config['accept_chrf'] and not flags:
+            return decide(ACCEPT, 'near_reference', config['accept_score'])
+
+    return decide(JUDGE)
+
+
+def prescreen_justification(result: dict) -> str:
+    """生成自动评分时的评价理由"""
+    reasons = {
+        'empty_output': 'Translation is empty.',
+        'untranslated_copy': 'Translation is an untranslated copy of the source text.',
+        'wrong_script': 'Translation is not written in the target language script.',
+        'length_ratio': 'Translation length is implausible for this language pair (truncated or padded output).',
+        'reference_match': 'Translation matches the human reference exactly.',
+        'near_reference': 'Translation is nearly identical to the human reference.'
+    }
+    return f"[Pre-screen] {reasons.get(result['reason'], result['reason'])}"
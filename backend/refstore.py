@@ -0,0 +1,251 @@
+"""
+Reference Translation Store
+
+Human reference translations keyed by (suite, line, language), persisted as one
+JSON file per suite under data/references plus a small manifest. Nothing is read
+until the first lookup, and each suite file is loaded on first use only. Lookups
+re-import suites whose test files changed, so references stay aligned with the
+lines load_test_cases() reads.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import DATA_ROOT
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+
+class ReferenceStore:
+    """参考译文库：按 (suite, line, language) O(1) 查找，惰性加载"""
+
+    def __init__(self, root: Path = None, testcases_dir: Path = None, refresh_seconds: float = 2.0):
+        self.root = Path(root) if root else DATA_ROOT / 'references'
+        self.testcases_dir = Path(testcases_dir) if testcases_dir else DATA_ROOT / 'testcases'
+        # Test files are stat'ed at most this often; suites whose files changed are re-imported
+        self.refresh_seconds = refresh_seconds
+        self._stamps: Optional[dict] = None
+        self._checked = 0.0
+        self._manifest: Optional[dict] = None
+        self._suites: Dict[str, Dict[str, List[str]]] = {}
+        self._text_index: Dict[tuple, Dict[str, int]] = {}
+        self._lock = threading.RLock()
+
+    # ---------- lookup ----------
+
+    def get(self, suite: str, line: int, language: str) -> Optional[str]:
+        """获取指定套件第 line 行（从1开始）在 language 下的参考译文"""
+        lines = self._load_suite(suite).get(language)
+        if lines and 0 < line <= len(lines):
+            return lines[line - 1]
+        return None
+
+    def find_line(self, suite: str, language: str, text: str) -> Optional[int]:
+        """根据原文查找其在套件中的行号"""
+        self._refresh()
+        key = (suite, language)
+        index = self._text_index.get(key)
+        if index is None:
+            with self._lock:
+                index = self._text_index.get(key)
+                if index is None:
+                    lines = self._load_suite(suite).get(language, [])
+                    index = {t: i + 1 for i, t in enumerate(lines)}
+                    self._text_index[key] = index
+        return index.get((text or '').strip())
+
+    def lookup(self, source_lang: str, target_lang: str, source_text: str,
+               line_number: int = None, suite: str = None) -> Optional[str]:
+        """
+        查找源文本在目标语言下的参考译文
+
+        套件中各语言按行对齐，源语言第N行的参考即目标语言第N行。
+        若给出的行号与源文本不符，则按文本匹配；不属于任何套件时返回None。
+        """
+        source_text = (source_text or '').strip()
+        for name in ([suite] if suite else self.suites()):
+            if line_number and self.get(name, line_number, source_lang) == source_text:
+                matched = line_number
+            else:
+                matched = self.find_line(name, source_lang, source_text)
+            if matched:
+                return self.get(name, matched, target_lang)
+        return None
+
+    def suites(self) -> List[str]:
+        """已导入的套件名列表"""
+        return sorted(self._load_manifest()['suites'])
+
+    def languages(self, suite: str) -> List[str]:
+        return sorted(self._load_suite(suite))
+
+    # ---------- import ----------
+
+    def import_suite(self, suite: str, translations: Dict[str, List[str]], sources: dict = None):
+        """
+        导入或更新一个套件
+
+        Args:
+            suite: 套件名
+            translations: {语言: 按行对齐的句子列表}
+            sources: 可选的来源文件签名，用于增量导入时判断是否需要重新导入
+        """
+        lengths = {len(lines) for lines in translations.values()}
+        if len(lengths) > 1:
+            logger.warning(f"Suite '{suite}' languages are not line-aligned: "
+                           f"{ {lang: len(lines) for lang, lines in translations.items()} }")
+
+        with self._lock:
+            manifest = self._load_manifest(build=False)
+            self.root.mkdir(parents=True, exist_ok=True)
+            suite_data = {"suite": suite, "languages": translations}
+            self._write_json(self.root / f"{suite}.json", suite_data)
+
+            manifest['suites'][suite] = {
+                "languages": sorted(translations),
+                "lines": max(lengths) if lengths else 0,
+                "sources": sources or {},
+                "updated": datetime.now().isoformat()
+            }
+            self._write_json(self.root / MANIFEST_NAME, manifest)
+
+            self._suites[suite] = translations
+            for key in [k for k in self._text_index if k[0] == suite]:
+                del self._text_index[key]
+
+        logger.info(f"Imported reference suite '{suite}' with {len(translations)} languages")
+
+    def import_testcases(self, force: bool = False) -> List[str]:
+        """
+        从 data/testcases/<lang>/<suite>.txt 增量导入：只重新导入来源文件有变化的套件
+
+        Returns:
+            list: 本次导入的套件名
+        """
+        found: Dict[str, Dict[str, Path]] = {}
+        for suite_file in self._testcase_files():
+            found.setdefault(suite_file.stem, {})[suite_file.parent.name] = suite_file
+
+        imported = []
+        manifest = self._load_manifest(build=False)
+        for suite, files in found.items():
+            sources = {lang: self._signature(path) for lang, path in files.items()}
+            if not force and manifest['suites'].get(suite, {}).get('sources') == sources:
+                continue
+            translations = {}
+            for lang, path in files.items():
+                with open(path, 'r', encoding='utf-8') as f:
+                    translations[lang] = [line.strip() for line in f if line.strip()]
+            self.import_suite(suite, translations, sources)
+            imported.append(suite)
+        return imported
+
+    # ---------- internals ----------
+
+    def _testcase_files(self) -> List[Path]:
+        if not self.testcases_dir.exists():
+            return []
+        return sorted(self.testcases_dir.glob('*/*.txt'))
+
+    def _refresh(self):
+        """测试文件的 mtime 或大小有变化时增量重新导入"""
+        now = time.monotonic()
+        if self._stamps is not None and now - self._checked < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._stamps is not None and now - self._checked < self.refresh_seconds:
+                return
+            self._checked = now
+            stamps = {}
+            for path in self._testcase_files():
+                stat = path.stat()
+                stamps[str(path)] = (stat.st_mtime_ns, stat.st_size)
+            if stamps != self._stamps:
+                # import_testcases compares content hashes, so a touched but unchanged file costs one read
+                self.import_testcases()
+                self._stamps = stamps
+
+    @staticmethod
+    def _signature(path: Path) -> str:
+        return hashlib.sha1(path.read_bytes()).hexdigest()
+
+    @staticmethod
+    def _write_json(path: Path, data: dict):
+        tmp_path = path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(path)
+
+    def _load_manifest(self, build: bool = True) -> dict:
+        if self._manifest is None:
+            with self._lock:
+                if self._manifest is None:
+                    manifest_file = self.root / MANIFEST_NAME
+                    if manifest_file.exists():
+                        with open(manifest_file, 'r', encoding='utf-8') as f:
+                            self._manifest = json.load(f)
+                    else:
+                        self._manifest = {"suites": {}}
+        # Lookups build the store on a fresh checkout and pick up edits to the test suites
+        if build:
+            self._refresh()
+        return self._manifest
+
+    def _load_suite(self, suite: str) -> Dict[str, List[str]]:
+        self._refresh()
+        translations = self._suites.get(suite)
+        if translations is not None:
+            return translations
+        with self._lock:
+            if suite not in self._suites:
+                suite_file = self.root / f"{suite}.json"
+                if suite in self._load_manifest()['suites'] and suite_file.exists():
+                    with open(suite_file, 'r', encoding='utf-8') as f:
+                        self._suites[suite] = json.load(f)['languages']
+                    logger.debug(f"Loaded reference suite '{suite}' from {suite_file}")
+                else:
+                    self._suites[suite] = {}
+            return self._suites[suite]
+
+
+_store: Optional[ReferenceStore] = None
+_store_lock = threading.Lock()
+
+
+def get_reference_store() -> ReferenceStore:
+    """获取进程内共享的参考译文库"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ReferenceStore()
+    return _store
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Reference translation store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help='Import changed suites from data/testcases')
+    import_parser.add_argument('--force', action='store_true', help='Re-import every suite')
+    get_parser = subparsers.add_parser('get', help='Print one reference')
+    get_parser.add_argument('suite')
+    get_parser.add_argument('line', type=int)
+    get_parser.add_argument('language')
+    args = parser.parse_args()
+
+    store = get_reference_store()
+    if args.command == 'import':
+        imported = store.import_testcases(force=args.force)
+        print(f"Imported suites: {', '.join(imported) if imported else 'none (up to date)'}")
+    else:
+        print(store.get(args.suite, args.line, args.language))
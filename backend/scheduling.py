@@ -0,0 +1,103 @@
+"""
+Batch Line Scheduling
+
+Batch runs hand their lines to a fixed-size thread pool, which starts them in
+submission order. In file order, a few long lines near the end of a suite start
+last and decide the run's makespan while the other workers sit idle. Lines are
+therefore submitted by estimated cost: the source's tokens plus the output
+tokens predicted from recent translation runs of the same language pair (the
+same source text's last output, otherwise the pair's output/input ratio).
+
+'longest' starts the most expensive lines first (longest-processing-time
+scheduling), 'shortest' the cheapest ones, and 'fifo' keeps file order.
+"""
+
+import json
+import logging
+import threading
+import time
+
+from config import DATA_ROOT, get_batch_config
+from usage import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+ORDERS = ('fifo', 'longest', 'shortest')
+# Seconds the output history of a language pair is reused before the run files are read again
+HISTORY_TTL = 60
+
+_history_cache = {}
+_history_lock = threading.Lock()
+
+
+def resolve_order(order: str = None) -> str:
+    """校验调度顺序，未指定时使用 BATCH_ORDER"""
+    order = order or get_batch_config()['order']
+    if order not in ORDERS:
+        raise ValueError(f"Unsupported batch order: {order}")
+    return order
+
+
+def load_output_history(source_lang: str, target_lang: str, runs: int = None) -> tuple:
+    """
+    最近几次翻译运行的输出长度，按进程缓存 HISTORY_TTL 秒
+
+    Returns:
+        tuple: ({原文: 译文token数}, 译文与原文的token比，没有历史时为1.0)
+    """
+    runs = runs if runs is not None else get_batch_config()['history_runs']
+    key = (source_lang, target_lang, runs)
+    with _history_lock:
+        cached = _history_cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < HISTORY_TTL:
+        return cached[1]
+
+    pair_dirs = sorted((d for d in (DATA_ROOT / 'translations').glob(f"*/{source_lang}-{target_lang}") if d.is_dir()),
+                       key=lambda d: d.stat().st_mtime, reverse=True)[:max(runs, 0)]
+    outputs, source_total, output_total = {}, 0, 0
+    # Oldest first, so a newer run's output for the same source text wins
+    for pair_dir in reversed(pair_dirs):
+        for result_file in pair_dir.glob("line_*_translation.json"):
+            try:
+                with open(result_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.debug(f"Skipping unreadable translation result {result_file}: {e}")
+                continue
+            source_text, translation = data.get('source_text'), data.get('translation')
+            if not source_text or not translation:
+                continue
+            outputs[source_text] = estimate_tokens(translation)
+            source_total += estimate_tokens(source_text)
+            output_total += outputs[source_text]
+
+    history = (outputs, output_total / source_total if source_total else 1.0)
+    with _history_lock:
+        _history_cache[key] = (time.monotonic(), history)
+    return history
+
+
+def translation_costs(source_lang: str, target_lang: str, texts: list, history: tuple = None) -> list:
+    """翻译各行的估计代价：原文token数加预测的译文token数"""
+    outputs, ratio = history if history is not None else load_output_history(source_lang, target_lang)
+    costs = []
+    for text in texts:
+        source_tokens = estimate_tokens(text)
+        costs.append(source_tokens + outputs.get(text, source_tokens * ratio))
+    return costs
+
+
+def evaluation_costs(items: list) -> list:
+    """评估各行的估计代价：原文与译文的token数（评语长度与行长基本无关）"""
+    return [estimate_tokens(item.get('source_text') or '') + estimate_tokens(item.get('translation') or '')
+            for item in items]
+
+
+def schedule(costs: list, order: str) -> list:
+    """按调度顺序返回下标，代价相同的行保持原顺序"""
+    indices = list(range(len(costs)))
+    if order == 'longest':
+        return sorted(indices, key=lambda i: -costs[i])
+    if order == 'shortest':
+        return sorted(indices, key=lambda i: costs[i])
+    return indices
@@ -0,0 +1,251 @@
+"""
+Reference-based Metrics: BLEU and chrF
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+BLEU_MAX_ORDER = 4
+CHRF_CHAR_ORDER = 6
+CHRF_BETA = 2
+# Above this many lines corpus_scores() counts n-grams in one process per CPU by default
+PARALLEL_MIN_LINES = 10000
+
+# Han, Kana and Hangul syllables are scored one character per token; runs of other
+# letters/digits form words and every punctuation mark is its own token. This keeps
+# BLEU meaningful for zh/ja without a segmenter while matching 13a-style tokenization
+# for space-delimited languages.
+_CJK_CHARS = '぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+_WORD = rf'[^\W_{_CJK_CHARS}]+'
+_TOKEN_RE = re.compile(rf'[{_CJK_CHARS}]|\d+(?:[.,]\d+)+|{_WORD}(?:[-\'’]{_WORD})*|[^\w\s]|_')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def tokenize(text: str) -> List[str]:
+    """BLEU分词：CJK按字切分，其他语言按词与标点切分"""
+    return _TOKEN_RE.findall(text)
+
+
+def _word_ngrams(tokens: Sequence[str], order: int) -> list:
+    return list(zip(*[tokens[i:] for i in range(order)]))
+
+
+@lru_cache(maxsize=4096)
+def _slice_plan(length: int, order: int) -> tuple:
+    return tuple(slice(i, i + order) for i in range(length - order + 1))
+
+
+def _char_ngrams(chars: str, order: int) -> list:
+    return list(map(chars.__getitem__, _slice_plan(len(chars), order)))
+
+
+def _ngram_table(grams: list) -> tuple:
+    counts = Counter(grams)
+    repeated = frozenset(gram for gram, count in counts.items() if count > 1)
+    return counts, frozenset(counts), len(grams), repeated
+
+
+@lru_cache(maxsize=65536)
+def reference_table(reference: str) -> tuple:
+    """
+    预计算参考译文的n-gram表（按参考文本缓存，同一参考只计算一次）
+
+    Returns:
+        tuple: (参考词数, 各阶词n-gram计数, 各阶字符n-gram计数)
+    """
+    tokens = tokenize(reference)
+    chars = _WHITESPACE_RE.sub('', reference)
+    word_tables = tuple(_ngram_table(_word_ngrams(tokens, n)) for n in range(1, BLEU_MAX_ORDER + 1))
+    char_tables = tuple(_ngram_table(_char_ngrams(chars, n)) for n in range(1, CHRF_CHAR_ORDER + 1))
+    return len(tokens), word_tables, char_tables
+
+
+def _clipped_matches(grams: list, ref_table: tuple) -> int:
+    """
+    裁剪匹配数 sum(min(hyp_count, ref_count))
+
+    共有n-gram各计1次由集合求交完成；只有在译文和参考中都重复出现的n-gram
+    才需要逐个补足计数，通常只有极少数。
+    """
+    ref_counts, ref_keys, _, ref_repeated = ref_table
+    hyp_keys = set(grams)
+    common = hyp_keys.intersection(ref_keys)
+    matches = len(common)
+    if len(hyp_keys) != len(grams):
+        repeated = common.intersection(ref_repeated)
+        if repeated:
+            hyp_counts = Counter(grams)
+            matches += sum(min(hyp_counts[gram], ref_counts[gram]) - 1 for gram in repeated)
+    return matches
+
+
+def sentence_stats(hypothesis: str, reference: str) -> list:
+    """
+    计算单句的可累加统计量
+
+    布局: [hyp_len, ref_len, (matches, total) * 4, (matches, hyp_count, ref_count) * 6]
+    """
+    ref_len, ref_words, ref_chars = reference_table(reference)
+    tokens = tokenize(hypothesis)
+    chars = _WHITESPACE_RE.sub('', hypothesis)
+
+    stats = [len(tokens), ref_len]
+    for n in range(1, BLEU_MAX_ORDER + 1):
+        grams = _word_ngrams(tokens, n)
+        stats.append(_clipped_matches(grams, ref_words[n - 1]))
+        stats.append(len(grams))
+    for n in range(1, CHRF_CHAR_ORDER + 1):
+        grams = _char_ngrams(chars, n)
+        ref_table = ref_chars[n - 1]
+        stats.append(_clipped_matches(grams, ref_table))
+        stats.append(len(grams))
+        stats.append(ref_table[2])
+    return stats
+
+
+def bleu_from_stats(stats: Sequence[int], smooth: bool = True) -> float:
+    """由统计量计算BLEU (0-1)；句子级使用exp平滑与有效阶数"""
+    hyp_len, ref_len = stats[0], stats[1]
+    if hyp_len == 0 or stats[2] == 0:
+        return 0.0
+
+    log_precision = 0.0
+    effective_order = 0
+    smooth_factor = 1.0
+    for n in range(BLEU_MAX_ORDER):
+        matches, total = stats[2 + 2 * n], stats[3 + 2 * n]
+        if total == 0:
+            break
+        effective_order += 1
+        if matches == 0:
+            if not smooth:
+                return 0.0
+            smooth_factor *= 2
+            log_precision += math.log(1.0 / (smooth_factor * total))
+        else:
+            log_precision += math.log(matches / total)
+
+    if effective_order == 0:
+        return 0.0
+    # Unsmoothed (corpus) BLEU has no effective order: missing higher-order n-grams score 0, as in sacrebleu
+    if not smooth and effective_order < BLEU_MAX_ORDER:
+        return 0.0
+    order = effective_order if smooth else BLEU_MAX_ORDER
+    brevity_penalty = 1.0 if hyp_len > ref_len else math.exp(1 - ref_len / hyp_len)
+    return brevity_penalty * math.exp(log_precision / order)
+
+
+def chrf_from_stats(stats: Sequence[int], beta: int = CHRF_BETA) -> float:
+    """由统计量计算chrF (0-1)：各阶平均精确率/召回率后取F-beta"""
+    offset = 2 + 2 * BLEU_MAX_ORDER
+    precision_sum = recall_sum = 0.0
+    effective_order = 0
+    for n in range(CHRF_CHAR_ORDER):
+        matches, hyp_count, ref_count = stats[offset + 3 * n: offset + 3 * n + 3]
+        if hyp_count == 0 or ref_count == 0:
+            continue
+        effective_order += 1
+        precision_sum += matches / hyp_count
+        recall_sum += matches / ref_count
+
+    if effective_order == 0:
+        return 0.0
+    precision = precision_sum / effective_order
+    recall = recall_sum / effective_order
+    if precision + recall == 0:
+        return 0.0
+    beta2 = beta ** 2
+    return (1 + beta2) * precision * recall / (beta2 * precision + recall)
+
+
+def sentence_scores(hypothesis: str, reference: Optional[str]) -> dict:
+    """计算单句BLEU与chrF，无参考译文时返回None"""
+    if not reference or hypothesis is None:
+        return {"bleu_score": None, "chrf_score": None}
+    stats = sentence_stats(hypothesis, reference)
+    return {
+        "bleu_score": round(bleu_from_stats(stats), 4),
+        "chrf_score": round(chrf_from_stats(stats), 4)
+    }
+
+
+def _stats_chunk(pairs: list) -> list:
+    return [sentence_stats(hyp, ref) for hyp, ref in pairs]
+
+
+def corpus_scores(hypotheses: Sequence[str], references: Sequence[str],
+                  processes: int = None, chunk_size: int = 2000) -> dict:
+    """
+    批量计算句子级与语料级BLEU/chrF
+
+    Args:
+        hypotheses: 译文列表
+        references: 与译文一一对应的参考译文列表
+        processes: 大于1时使用多进程分块计算统计量；默认超过 PARALLEL_MIN_LINES 行时使用全部CPU
+        chunk_size: 每个进程任务的句子数
+
+    Returns:
+        dict: corpus_bleu, corpus_chrf 以及逐句 sentences
+    """
+    if len(hypotheses) != len(references):
+        raise ValueError("hypotheses and references must have the same length")
+
+    pairs = list(zip(hypotheses, references))
+    if processes is None:
+        processes = (os.cpu_count() or 1) if len(pairs) > PARALLEL_MIN_LINES else 1
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+    if processes > 1 and len(chunks) > 1:
+        import multiprocessing
+        # spawn: callers such as batch jobs run in threads of a server process, which must not be forked
+        with multiprocessing.get_context('spawn').Pool(processes=min(processes, len(chunks))) as pool:
+            chunk_stats = pool.map(_stats_chunk, chunks)
+    else:
+        chunk_stats = [_stats_chunk(chunk) for chunk in chunks]
+
+    totals = None
+    sentences = []
+    for stats in (s for chunk in chunk_stats for s in chunk):
+        totals = list(stats) if totals is None else [a + b for a, b in zip(totals, stats)]
+        sentences.append({
+            "bleu_score": round(bleu_from_stats(stats), 4),
+            "chrf_score": round(chrf_from_stats(stats), 4)
+        })
+
+    return {
+        "corpus_bleu": round(bleu_from_stats(totals, smooth=False), 4) if totals else None,
+        "corpus_chrf": round(chrf_from_stats(totals), 4) if totals else None,
+        "count": len(sentences),
+        "sentences": sentences
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    import time
+
+    parser = argparse.ArgumentParser(description='Score a hypothesis file against a reference file (one sentence per line)')
+    parser.add_argument('hypotheses', help='Hypothesis file')
+    parser.add_argument('references', help='Reference file')
+    parser.add_argument('--processes', type=int, default=None,
+                        help=f'Worker processes for n-gram counting (default: all CPUs above {PARALLEL_MIN_LINES} lines)')
+    args = parser.parse_args()
+
+    with open(args.hypotheses, encoding='utf-8') as f:
+        hyps = [line.rstrip('\n') for line in f]
+    with open(args.references, encoding='utf-8') as f:
+        refs = [line.rstrip('\n') for line in f]
+
+    started = time.perf_counter()
+    result = corpus_scores(hyps, refs, processes=args.processes)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "corpus_bleu": result["corpus_bleu"],
+        "corpus_chrf": result["corpus_chrf"],
+        "count": result["count"],
+        "seconds": round(elapsed, 3)
+    }, ensure_ascii=False))
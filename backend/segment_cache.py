@@ -0,0 +1,201 @@
+"""
+Incremental Translation Segments
+
+The playground re-translates its whole text after every edit. In incremental
+mode the text is split into sentences, and each sentence's translation is
+cached under a hash of the sentence, the language pair, the model, the
+sampling settings and the glossary terms found in the sentence. After an edit
+only sentences that changed are sent upstream; the others are reused and the
+translation is reassembled with the original whitespace between them.
+
+Sentences never span a line break. A period ends a sentence only when it is
+followed by whitespace and the next word does not start in lower case, and not
+after a known abbreviation ("Dr.", "e.g.") or an initial ("J."), so a sentence
+is not cut into fragments that would be translated without their context.
+
+The cache lives in the shared store so every worker sees it, and falls back to
+a small in-process LRU when the store is unavailable. Both hold at most
+TRANSLATION_SEGMENT_CACHE_SIZE sentences; the shared store drops expired and
+the oldest sentences every few hundred writes.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from shared_store import get_shared_store
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Target languages written without spaces between sentences
+_NO_SPACE_LANGS = ('zh', 'ja')
+_KEY_PREFIX = 'tseg:'
+# Writes between clean-ups of the shared store
+_PURGE_EVERY = 256
+
+# Full-width terminators always end a sentence; the others only before whitespace or the end of the line
+_SENTENCE_END = re.compile(r'(?:([。！？]+)|([.!?…]+))[”’"\'」』）)\]]*')
+_OPENING_QUOTES = '「『（(“"‘\'['
+_LAST_WORD = re.compile(r"[\w.'-]*$")
+# Lower-cased, without the final period (English, Spanish, Portuguese)
+_ABBREVIATIONS = frozenset("""
+    mr mrs ms dr prof sr sra srta dra jr st mt rev gen col lt capt sgt hon
+    vs etc e.g i.e cf al approx ca viz inc ltd co corp dept univ assn bros
+    no nos fig figs vol vols p pp ed eds est min max tel ext
+    jan feb mar apr jun jul aug sep sept oct nov dec a.m p.m u.s u.k
+    av avda pág págs núm art cap ej aprox ud uds sto sta
+""".split())
+
+
+def _sentence_spans(line: str) -> List[Tuple[int, int]]:
+    """一行文本中各句的起止位置（不含句间空白）"""
+    spans, start = [], 0
+    for match in _SENTENCE_END.finditer(line):
+        if match.group(2) and not _ends_sentence(line, match.start(), match.group(2), match.end()):
+            continue
+        # 「……。」と言った: a quotation closed inside the sentence
+        if match.group(1) and match.end() > match.end(1) and match.end() < len(line) \
+                and not line[match.end()].isspace() and line[match.end()] not in _OPENING_QUOTES:
+            continue
+        spans.append((start, match.end()))
+        start = match.end()
+    spans.append((start, len(line)))
+    result = []
+    for start, end in spans:
+        piece = line[start:end]
+        if piece.strip():
+            start += len(piece) - len(piece.lstrip())
+            result.append((start, start + len(piece.strip())))
+    return result
+
+
+def _ends_sentence(line: str, start: int, terminator: str, end: int) -> bool:
+    """半角句末标点是否真的结束句子"""
+    rest = line[end:]
+    if rest and not rest[0].isspace():
+        # "3.50", "e.g" inside a word, or text right after the punctuation
+        return False
+    following = rest.lstrip()
+    if following and following[0].islower():
+        return False
+    if terminator == '.':
+        word = _LAST_WORD.search(line, 0, start).group().lstrip("'-")
+        if word.lower() in _ABBREVIATIONS or (len(word) == 1 and word.isupper()):
+            return False
+    return True
+
+
+def segment_text(text: str) -> Tuple[List[str], List[str]]:
+    """
+    按句子切分
+
+    Returns:
+        tuple: (句子列表, 分隔列表)；分隔比句子多一个，依次为首句之前、各句之间与末句之后的原文空白，
+               text == 分隔[0] + 句子[0] + 分隔[1] + ... + 句子[-1] + 分隔[-1]
+    """
+    sentences, separators, position = [], [], 0
+    for line in re.finditer(r'[^\n]+', text):
+        for start, end in _sentence_spans(line.group()):
+            start, end = start + line.start(), end + line.start()
+            separators.append(text[position:start])
+            sentences.append(text[start:end])
+            position = end
+    separators.append(text[position:])
+    return sentences, separators
+
+
+def join_segments(translations: List[str], separators: List[str], target_lang: str) -> str:
+    """
+    用原文的分隔拼接各句译文
+
+    换行、缩进、制表符与首尾空白原样保留；同一行内只由空格分隔的两句之间，中文、日文译文不加空格，
+    其他语言保留原来的空格（原文没有空格时加一个）。
+    """
+    parts = [separators[0]]
+    for index, translation in enumerate(translations):
+        parts.append(translation)
+        separator = separators[index + 1]
+        if index + 1 < len(translations) and not separator.strip(' '):
+            separator = '' if target_lang in _NO_SPACE_LANGS else separator or ' '
+        parts.append(separator)
+    return ''.join(parts)
+
+
+def segment_key(model: str, source_lang: str, target_lang: str, settings: dict, segment: str,
+                terms: list = None) -> str:
+    """句子译文的缓存键：模型、语言对、采样参数、原文及其中术语的规定译法的哈希"""
+    glossary = sorted((term["term"], term["translation"]) for term in terms or [])
+    payload = json.dumps([model, source_lang, target_lang, sorted(settings.items()), segment, glossary],
+                         ensure_ascii=False)
+    return _KEY_PREFIX + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SegmentCache:
+    """句子译文缓存：优先使用共享存储，不可用时退回进程内LRU"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = OrderedDict()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        store = get_shared_store()
+        if store is not None:
+            value = store.get(key)
+        else:
+            with self._lock:
+                value = self._local.get(key)
+                if value is not None:
+                    self._local.move_to_end(key)
+        metrics.cache_lookup('segments', value is not None)
+        return value
+
+    def set(self, key: str, translation: str):
+        store = get_shared_store()
+        if store is not None:
+            store.set(key, translation, ttl=self.ttl)
+            with self._lock:
+                self._writes += 1
+                purge = (self._writes - 1) % _PURGE_EVERY == 0
+            if purge:
+                self._purge(store)
+            return
+        with self._lock:
+            self._local[key] = translation
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+
+    def _purge(self, store):
+        """删除共享存储中过期的键，并把句子缓存限制在 max_entries 条以内"""
+        try:
+            expired = store.purge_expired()
+            trimmed = store.trim(_KEY_PREFIX, self.max_entries)
+        except Exception as e:
+            logger.warning(f"Cleaning up the segment cache failed: {e}")
+            return
+        if expired or trimmed:
+            logger.info(f"Segment cache clean-up removed {expired} expired keys and {trimmed} old sentences")
+
+
+_cache: Optional[SegmentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_segment_cache(config: dict) -> Optional[SegmentCache]:
+    """获取进程内共享的句子缓存；TRANSLATION_SEGMENT_CACHE_TTL 为0时返回None（每次都全部翻译）"""
+    global _cache
+    if config['segment_cache_ttl'] <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SegmentCache(config['segment_cache_ttl'], config['segment_cache_size'])
+    return _cache
@@ -3,14 +3,35 @@ Translation and Evaluation Services
 """
 
 import json
+import time
 import requests
 import logging
-from typing import Dict, Generator, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, Dict, Generator, Optional
 from config import get_translation_config, get_evaluation_config
-from prompts import get_translation_prompt, get_evaluation_prompt
+from prompts import (get_translation_prompt, get_multi_translation_prompt, get_evaluation_prompt,
+                     get_batch_evaluation_prompt)
+from metrics import UpstreamCall
+from tracing import start_span
+from usage import UsageLedger, combine_records
+from segment_cache import get_segment_cache, join_segments, segment_key, segment_text
+from tm import consult, remember
+from glossary import find_terms, missing_terms
 
 logger = logging.getLogger(__name__)
 
+# Ways to translate one source into several target languages, see TranslationService.translate_multi
+MULTI_MODES = ('concurrent', 'structured')
+# Sentences of one incremental translation sent upstream at once (the upstream budget still applies)
+MAX_SEGMENT_WORKERS = 8
+
+
+def _failed_usage(call: Optional[UpstreamCall], request_data: dict, content: str = '') -> Optional[dict]:
+    """失败调用的用量记录（按已发送的提示词与已收到的输出），请求没有发出时为None"""
+    return call.tokens(request_data['messages'], content) if call is not None else None
+
+
 class TranslationService:
     """翻译服务"""
     
@@ -19,22 +40,45 @@ class TranslationService:
     
     def translate_text(self, source_lang: str, target_lang: str, text: str, 
                       stream: Optional[bool] = None, temperature: Optional[float] = None,
-                      max_length: Optional[int] = None, top_p: Optional[float] = None) -> dict:
-        """翻译文本，支持流式和非流式"""
+                      max_length: Optional[int] = None, top_p: Optional[float] = None,
+                      use_memory: bool = False) -> dict:
+        """
+        翻译文本，支持流式和非流式
+
+        use_memory 为True时先查询翻译记忆：原文完全相同、且使用了术语表规定译法的既有译文直接返回
+        （不调用上游），其他匹配作为参考译文放入prompt；结果中的 memory 字段说明使用情况。
+        """
         logger.info(f"Starting translation: {source_lang} -> {target_lang}, text length: {len(text)}")
         
         if not self.config['api_key']:
             logger.error("Translation API key not available")
             return {"success": False, "error": "Translation API key not found"}
         
+        terms = find_terms(source_lang, target_lang, text)
+        hints = None
+        if use_memory:
+            match = consult(source_lang, target_lang, text)
+            served = match["served"]
+            # A stored translation made before a glossary change may use an outdated term
+            if served and not missing_terms(terms, served["translation"]):
+                logger.info(f"Translation served from memory, similarity {served['similarity']}")
+                result = {"success": True, "translation": served["translation"],
+                          "memory": {"served": True, "similarity": served["similarity"],
+                                     "source_text": served["source_text"]}}
+                if terms:
+                    result["terms"] = [term["term"] for term in terms]
+                return result
+            hints = [served] if served else match["hints"]
+        
         # 使用传入的参数或配置默认值
         use_stream = stream if stream is not None else self.config['stream']
         use_temperature = temperature if temperature is not None else self.config['temperature']
         use_max_length = max_length if max_length is not None else self.config['max_length']
         use_top_p = top_p if top_p is not None else self.config['top_p']
         
+        prompt_span = start_span('translation.prompt')
         try:
-            system_prompt = get_translation_prompt(source_lang, target_lang)
+            system_prompt = get_translation_prompt(source_lang, target_lang, examples=hints, terms=terms)
             user_content = f"翻译为{target_lang}（仅输出译文内容）：\n\n{text}"
             logger.debug(f"Using translation prompt for {source_lang}-{target_lang}")
             
@@ -59,30 +103,207 @@ class TranslationService:
         except Exception as e:
             logger.error(f"Error preparing translation request: {e}")
             return {"success": False, "error": f"Error preparing request: {e}"}
+        finally:
+            prompt_span.finish()
         
         # 根据是否流式选择不同的处理方式
         if use_stream:
-            return self._translate_stream(request_data)
+            result = self._translate_stream(request_data)
         else:
-            return self._translate_non_stream(request_data)
+            result = self._translate_non_stream(request_data)
+        if terms and result.get("success"):
+            result["terms"] = [term["term"] for term in terms]
+        if use_memory and result.get("success"):
+            remember(source_lang, target_lang, text, result["translation"])
+            result["memory"] = {"served": False, "hints": len(hints)}
+        return result
     
-    def _translate_non_stream(self, request_data: dict) -> dict:
+    def translate_multi(self, source_lang: str, target_langs: list, text: str, mode: Optional[str] = None,
+                        slot: Optional[Callable] = None, **options) -> dict:
+        """
+        把同一原文翻译为多个目标语言
+
+        'concurrent' 为每个目标语言各发一次翻译请求并发执行；'structured' 一次请求要求模型以JSON
+        返回所有译文，缺失或为空的目标语言再单独并发翻译。
+
+        Args:
+            target_langs: 目标语言列表（调用方已校验，且不含源语言）
+            mode: 'concurrent' 或 'structured'，默认使用 TRANSLATION_MULTI_MODE
+            slot: 每次上游调用前进入的上下文工厂（如 get_budget('translation').slot），默认不限制
+            options: 传给 translate_text 的 stream / temperature / max_length / top_p
+
+        Returns:
+            dict: success（所有目标语言都成功）、mode、results（{目标语言: translate_text 的结果，
+                  另含 latency_ms}）、usage（本次所有上游调用的用量汇总）、latency_ms
+        """
+        use_mode = mode or self.config['multi_mode']
+        if use_mode not in MULTI_MODES:
+            return {"success": False, "error": f"Unsupported multi-target mode: {use_mode}"}
+        if not self.config['api_key']:
+            logger.error("Translation API key not available")
+            return {"success": False, "error": "Translation API key not found"}
+
+        logger.info(f"Starting multi-target translation ({use_mode}): {source_lang} -> {','.join(target_langs)}")
+        started = time.perf_counter()
+        slot = slot or nullcontext
+        ledger = UsageLedger.from_config(self.config)
+
+        results = {}
+        if use_mode == 'structured' and len(target_langs) > 1:
+            results = self._translate_structured(source_lang, target_langs, text, slot, ledger, options)
+        pending = [lang for lang in target_langs if lang not in results]
+        if pending:
+            if results:
+                logger.warning(f"Structured translation returned nothing for {pending}, translating them separately")
+
+            def translate_one(target_lang):
+                with slot():
+                    call_started = time.perf_counter()
+                    result = self.translate_text(source_lang, target_lang, text, **options)
+                    result["latency_ms"] = round((time.perf_counter() - call_started) * 1000, 1)
+                return result
+
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                for target_lang, result in zip(pending, executor.map(translate_one, pending)):
+                    ledger.add(result.get("usage"))
+                    results[target_lang] = result
+
+        failed = [lang for lang in target_langs if not results[lang].get("success")]
+        response = {"success": not failed, "mode": use_mode,
+                    "results": {lang: results[lang] for lang in target_langs},
+                    "usage": ledger.as_dict(),
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+        if failed:
+            response["error"] = f"Translation failed for: {', '.join(failed)}"
+        logger.info(f"Multi-target translation finished: {len(target_langs) - len(failed)}/{len(target_langs)} "
+                    f"targets in {response['latency_ms']} ms")
+        return response
+
+    def translate_incremental(self, source_lang: str, target_lang: str, text: str,
+                              slot: Optional[Callable] = None, **options) -> dict:
+        """
+        增量翻译：按句切分，未改动的句子复用缓存的译文，只把改动的句子发给上游
+
+        Args:
+            slot: 每次上游调用前进入的上下文工厂（如 get_budget('translation').slot），默认不限制
+            options: 传给 translate_text 的 stream / temperature / max_length / top_p
+
+        Returns:
+            dict: success、translation（保留原文的换行与缩进拼接）、segments（句子数）、reused_segments
+                  （复用缓存的句子数）、usage（本次上游调用的用量汇总）
+        """
+        if not self.config['api_key']:
+            logger.error("Translation API key not available")
+            return {"success": False, "error": "Translation API key not found"}
+
+        sentences, separators = segment_text(text)
+        segments = list(dict.fromkeys(sentences))
+        # Only settings that change the output belong in the cache key
+        settings = {name: options.get(name) if options.get(name) is not None else self.config[name]
+                    for name in ('temperature', 'top_p', 'max_length')}
+        # The glossary terms of a sentence are part of its key, so a glossary edit re-translates exactly
+        # the sentences whose terms changed
+        keys = {segment: segment_key(self.config['model'], source_lang, target_lang, settings, segment,
+                                     find_terms(source_lang, target_lang, segment))
+                for segment in segments}
+        cache = get_segment_cache(self.config)
+        slot = slot or nullcontext
+        ledger = UsageLedger.from_config(self.config)
+
+        translations = {}
+        for segment in segments:
+            cached = cache.get(keys[segment]) if cache else None
+            if cached is not None:
+                translations[segment] = cached
+        reused = len(translations)
+        pending = [segment for segment in segments if segment not in translations]
+        logger.info(f"Incremental translation {source_lang} -> {target_lang}: {len(segments)} segments, "
+                    f"{reused} reused, {len(pending)} to translate")
+
+        def translate_one(segment):
+            with slot():
+                return self.translate_text(source_lang, target_lang, segment, **options)
+
+        errors = []
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(len(pending), MAX_SEGMENT_WORKERS)) as executor:
+                for segment, result in zip(pending, executor.map(translate_one, pending)):
+                    ledger.add(result.get("usage"))
+                    if not result.get("success"):
+                        errors.append(result.get("error"))
+                        continue
+                    translations[segment] = result["translation"].strip()
+                    # Failed sentences are not cached, so a retry only sends those
+                    if cache:
+                        cache.set(keys[segment], translations[segment])
+
+        response = {"segments": len(segments), "reused_segments": reused, "usage": ledger.as_dict()}
+        if errors:
+            logger.error(f"Incremental translation failed for {len(errors)} of {len(pending)} segments")
+            return dict(response, success=False, error=f"{len(errors)} segments failed: {errors[0]}")
+        translation = join_segments([translations[s] for s in sentences], separators, target_lang)
+        return dict(response, success=True, translation=translation)
+
+    def _translate_structured(self, source_lang: str, target_langs: list, text: str, slot: Callable,
+                              ledger: UsageLedger, options: dict) -> dict:
+        """一次请求翻译所有目标语言，返回解析成功的 {目标语言: 结果}；请求失败时返回空字典"""
+        request_data = {
+            'model': self.config['model'],
+            'messages': [
+                {'role': 'system', 'content': get_multi_translation_prompt(
+                    source_lang, target_langs, {lang: find_terms(source_lang, lang, text) for lang in target_langs})},
+                {'role': 'user', 'content': text}
+            ],
+            'temperature': options.get('temperature') if options.get('temperature') is not None
+            else self.config['temperature'],
+            'max_length': options.get('max_length') or self.config['max_length'],
+            'top_p': options.get('top_p') if options.get('top_p') is not None else self.config['top_p'],
+            'num_beams': self.config['num_beams'],
+            'delete_prompt_from_output': 1,
+            'do_sample': self.config['do_sample']
+        }
+        if self.config.get('json_mode', True):
+            request_data['response_format'] = {'type': 'json_object'}
+
+        with slot():
+            call_started = time.perf_counter()
+            result = self._translate_non_stream(request_data, endpoint='chat_multi')
+            latency_ms = round((time.perf_counter() - call_started) * 1000, 1)
+        ledger.add(result.get("usage"))
+        if not result.get("success"):
+            logger.warning(f"Structured translation failed: {result.get('error')}")
+            return {}
+
+        translations, missing = parse_multi_translation(result["translation"], target_langs)
+        if missing:
+            logger.warning(f"Structured translation returned no valid translation for: {missing}")
+        # The targets share one request, so each reports that request's latency
+        return {lang: {"success": True, "translation": translation, "latency_ms": latency_ms}
+                for lang, translation in translations.items()}
+
+    def _translate_non_stream(self, request_data: dict, endpoint: str = 'chat') -> dict:
         """非流式翻译"""
         headers = {
             'Content-Type': 'application/json', 
             'Authorization': f'Bearer {self.config["api_key"]}'
         }
         
+        call = None
         try:
             logger.debug(f"Making non-stream translation API call to {self.config['api_url']}")
-            response = requests.post(
-                self.config['api_url'], 
-                headers=headers, 
-                data=json.dumps(request_data), 
-                timeout=60
-            )
-            response.raise_for_status()
-            response_data = response.json()
+            with UpstreamCall('translation', endpoint) as call:
+                response = requests.post(
+                    self.config['api_url'], 
+                    headers=headers, 
+                    data=json.dumps(request_data), 
+                    timeout=60
+                )
+                call.received(response)
+                response.raise_for_status()
+                response_data = response.json()
+                call.usage(response_data.get('usage'), request_data.get('model'))
+                if not response_data.get("choices"):
+                    call.fail()
             
             # 记录完整的响应内容
             logger.info(f"Translation response data: {json.dumps(response_data, ensure_ascii=False, indent=2)}")
@@ -90,17 +311,18 @@ class TranslationService:
             if "choices" in response_data and response_data["choices"]:
                 translation = response_data["choices"][0]["message"]["content"]
                 logger.info(f"Translation successful, result length: {len(translation)}")
-                return {"success": True, "translation": translation}
+                return {"success": True, "translation": translation,
+                        "usage": call.tokens(request_data['messages'], translation)}
             else:
                 logger.error(f"Invalid API response: {response_data}")
-                return {"success": False, "error": "Invalid API response"}
+                return {"success": False, "error": "Invalid API response", "usage": _failed_usage(call, request_data)}
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Translation API request failed: {e}")
-            return {"success": False, "error": str(e)}
+            return {"success": False, "error": str(e), "usage": _failed_usage(call, request_data)}
         except Exception as e:
             logger.error(f"Unexpected error during translation: {e}")
-            return {"success": False, "error": str(e)}
+            return {"success": False, "error": str(e), "usage": _failed_usage(call, request_data)}
     
     def _translate_stream(self, request_data: dict) -> dict:
         """流式翻译"""
@@ -109,6 +331,8 @@ class TranslationService:
             'Authorization': f'Bearer {self.config["api_key"]}'
         }
         
+        call = UpstreamCall('translation', 'chat_stream')
+        full_translation = ""
         try:
             logger.debug(f"Making stream translation API call to {self.config['api_url']}")
             response = requests.post(
@@ -118,10 +342,12 @@ class TranslationService:
                 timeout=60,
                 stream=True
             )
+            call.received(response)
             response.raise_for_status()
+            # SSE 规定使用UTF-8；未声明charset时 requests 会按 ISO-8859-1 解码 text/*
+            response.encoding = 'utf-8'
             
             # 处理SSE流式响应，兼容 OpenAI / DeepSeek / 自建代理多种格式
-            full_translation = ""
             for raw_line in response.iter_lines(decode_unicode=True):
                 if not raw_line:
                     continue  # 跳过 keep-alive 空行
@@ -143,6 +369,8 @@ class TranslationService:
                 except json.JSONDecodeError:
                     logger.debug(f"Skipping non-JSON stream chunk: {data_str[:80]}")
                     continue
+                # 部分接口在最后一个事件中返回 usage
+                call.usage(data_json.get("usage"), request_data.get('model'))
 
                 # OpenAI / DeepSeek 格式：choices -> delta -> content
                 choices = data_json.get("choices")
@@ -154,23 +382,36 @@ class TranslationService:
                     content_piece = data_json.get("text", "")
 
                 if content_piece:
+                    call.first_token()
                     full_translation += content_piece
                     logger.debug(f"Stream chunk: {content_piece}")
             
             logger.info(f"Stream translation completed. Full length: {len(full_translation)}")
+            if not full_translation.strip():
+                call.fail()
+            call.finish()
             
             if full_translation.strip():
-                return {"success": True, "translation": full_translation}
+                return {"success": True, "translation": full_translation,
+                        "usage": call.tokens(request_data['messages'], full_translation)}
             # 如果流模式失败尝试 fallback 到非流式
             logger.warning("No content received from stream, falling back to non-stream API call")
-            return self._translate_non_stream({k: v for k, v in request_data.items() if k != 'stream'})
+            return self._stream_fallback(call, request_data, full_translation)
         except requests.exceptions.RequestException as e:
+            call.finish(e)
             logger.error(f"Stream translation API request failed: {e}")
             # fallback 到非流式
-            return self._translate_non_stream({k: v for k, v in request_data.items() if k != 'stream'})
+            return self._stream_fallback(call, request_data, full_translation)
         except Exception as e:
+            call.finish(e)
             logger.error(f"Unexpected error during stream translation: {e}")
-            return {"success": False, "error": str(e)}
+            return {"success": False, "error": str(e), "usage": _failed_usage(call, request_data, full_translation)}
+
+    def _stream_fallback(self, call: UpstreamCall, request_data: dict, received: str) -> dict:
+        """流式失败后改用非流式重试，结果的用量包含失败的流式调用"""
+        result = self._translate_non_stream({k: v for k, v in request_data.items() if k != 'stream'})
+        result["usage"] = combine_records(_failed_usage(call, request_data, received), result.get("usage"))
+        return result
 
 
 class EvaluationService:
@@ -188,6 +429,7 @@ class EvaluationService:
             logger.error("Evaluation API key not available")
             return {"success": False, "error": "Evaluation API key not found"}
         
+        prompt_span = start_span('evaluation.prompt')
         try:
             eval_prompt = get_evaluation_prompt(source_lang, target_lang, source_text, translation)
             logger.debug(f"Using evaluation prompt for {source_lang}-{target_lang}")
@@ -203,22 +445,30 @@ class EvaluationService:
         except Exception as e:
             logger.error(f"Error preparing evaluation request: {e}")
             return {"success": False, "error": f"Error preparing evaluation request: {e}"}
+        finally:
+            prompt_span.finish()
         
         headers = {
             'Content-Type': 'application/json', 
             'Authorization': f'Bearer {self.config["api_key"]}'
         }
         
+        call = None
         try:
             logger.debug(f"Making evaluation API call to {self.config['api_url']}")
-            response = requests.post(
-                self.config['api_url'], 
-                headers=headers, 
-                data=json.dumps(request_data), 
-                timeout=60
-            )
-            response.raise_for_status()
-            eval_data = response.json()
+            with UpstreamCall('evaluation', 'chat') as call:
+                response = requests.post(
+                    self.config['api_url'], 
+                    headers=headers, 
+                    data=json.dumps(request_data), 
+                    timeout=60
+                )
+                call.received(response)
+                response.raise_for_status()
+                eval_data = response.json()
+                call.usage(eval_data.get('usage'), request_data.get('model'))
+                if not eval_data.get("choices"):
+                    call.fail()
             
             # 记录完整的响应内容
             logger.info(f"Evaluation response data: {json.dumps(eval_data, ensure_ascii=False, indent=2)}")
@@ -245,14 +495,160 @@ class EvaluationService:
                         logger.debug(f"Parsed justification length: {len(justification)}")
                 
                 logger.info(f"Evaluation successful, score: {score}")
-                return {"success": True, "score": score, "justification": justification}
+                return {"success": True, "score": score, "justification": justification,
+                        "usage": call.tokens(request_data['messages'], eval_result_str)}
             else:
                 logger.error(f"Invalid evaluation response: {eval_data}")
-                return {"success": False, "error": "Invalid evaluation response"}
+                return {"success": False, "error": "Invalid evaluation response",
+                        "usage": _failed_usage(call, request_data)}
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Evaluation API request failed: {e}")
-            return {"success": False, "error": str(e)}
+            return {"success": False, "error": str(e), "usage": _failed_usage(call, request_data)}
         except Exception as e:
             logger.error(f"Unexpected error during evaluation: {e}")
-            return {"success": False, "error": str(e)} 
\ No newline at end of file
+            return {"success": False, "error": str(e), "usage": _failed_usage(call, request_data)}
+
+    def evaluate_batch(self, source_lang: str, target_lang: str, items: list) -> dict:
+        """
+        批量评估：一次请求评估多条翻译，返回经过校验的逐条结果
+
+        Args:
+            items: [{"id": 整数, "source_text": 原文, "translation": 译文}, ...]
+
+        Returns:
+            dict: success、results（{id: {"score", "justification"}}，只含校验通过的条目）、
+                  missing（缺失或无效、需要单独重评的id列表）、usage（本次请求的token用量）
+        """
+        logger.info(f"Starting batch evaluation: {source_lang} -> {target_lang}, items: {len(items)}")
+
+        if not self.config['api_key']:
+            logger.error("Evaluation API key not available")
+            return {"success": False, "error": "Evaluation API key not found"}
+
+        prompt_span = start_span('evaluation.prompt', items=len(items))
+        request_data = {
+            'model': self.config['model'],
+            'messages': [{'role': 'user', 'content': get_batch_evaluation_prompt(source_lang, target_lang, items)}]
+        }
+        if self.config.get('json_mode', True):
+            request_data['response_format'] = {'type': 'json_object'}
+        logger.info(f"Batch evaluation request data: {json.dumps(request_data, ensure_ascii=False, indent=2)}")
+        prompt_span.finish()
+
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.config["api_key"]}'
+        }
+
+        call = None
+        try:
+            with UpstreamCall('evaluation', 'chat_batch') as call:
+                response = requests.post(
+                    self.config['api_url'],
+                    headers=headers,
+                    data=json.dumps(request_data),
+                    timeout=60 + 10 * len(items)
+                )
+                call.received(response)
+                response.raise_for_status()
+                eval_data = response.json()
+                call.usage(eval_data.get('usage'), request_data.get('model'))
+                if not eval_data.get("choices"):
+                    call.fail()
+            logger.info(f"Batch evaluation response data: {json.dumps(eval_data, ensure_ascii=False, indent=2)}")
+
+            if not ("choices" in eval_data and eval_data["choices"]):
+                logger.error(f"Invalid batch evaluation response: {eval_data}")
+                return {"success": False, "error": "Invalid evaluation response",
+                        "usage": _failed_usage(call, request_data)}
+
+            content = eval_data["choices"][0]["message"]["content"]
+            results, missing = parse_batch_evaluation(content, [item["id"] for item in items])
+            if missing:
+                logger.warning(f"Batch evaluation returned no valid result for ids: {missing}")
+            logger.info(f"Batch evaluation successful: {len(results)}/{len(items)} items scored")
+            return {"success": True, "results": results, "missing": missing,
+                    "usage": call.tokens(request_data['messages'], content)}
+
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Batch evaluation API request failed: {e}")
+            return {"success": False, "error": str(e), "usage": _failed_usage(call, request_data)}
+        except Exception as e:
+            logger.error(f"Unexpected error during batch evaluation: {e}")
+            return {"success": False, "error": str(e), "usage": _failed_usage(call, request_data)}
+
+
+def parse_multi_translation(content: str, target_langs: list) -> tuple:
+    """
+    解析多目标翻译的JSON结果
+
+    兼容代码块包裹、顶层直接为 {语言: 译文} 以及 translations 键包裹的输出；
+    译文必须是非空字符串，缺少或无效的目标语言视为缺失。
+
+    Returns:
+        tuple: ({目标语言: 译文}, 缺失的目标语言列表)
+    """
+    text = (content or '').strip()
+    start, end = text.find('{'), text.rfind('}')
+    try:
+        data = json.loads(text[start:end + 1]) if start >= 0 else None
+    except json.JSONDecodeError:
+        logger.warning(f"Structured translation output is not valid JSON: {text[:200]}")
+        data = None
+
+    if isinstance(data, dict) and isinstance(data.get('translations'), dict):
+        data = data['translations']
+    translations = {}
+    for lang in target_langs:
+        translation = data.get(lang) if isinstance(data, dict) else None
+        if isinstance(translation, str) and translation.strip():
+            translations[lang] = translation.strip()
+
+    missing = [lang for lang in target_langs if lang not in translations]
+    return translations, missing
+
+
+def parse_batch_evaluation(content: str, expected_ids: list) -> tuple:
+    """
+    解析并校验批量评估的JSON结果
+
+    兼容代码块包裹和顶层直接为列表的输出；分数必须是1-10的整数，
+    理由必须是非空字符串，重复、未知或无效的条目都视为缺失。
+
+    Returns:
+        tuple: ({id: {"score", "justification"}}, 缺失的id列表)
+    """
+    results = {}
+    text = (content or '').strip()
+    # Skip any ```json fence or preamble around the JSON payload
+    start = min((i for i in (text.find('{'), text.find('[')) if i >= 0), default=-1)
+    end = max(text.rfind('}'), text.rfind(']'))
+
+    try:
+        data = json.loads(text[start:end + 1]) if start >= 0 else None
+    except json.JSONDecodeError:
+        logger.warning(f"Batch evaluation output is not valid JSON: {text[:200]}")
+        data = None
+
+    entries = data.get('results', []) if isinstance(data, dict) else data
+    expected = set(expected_ids)
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        item_id = entry.get('id')
+        if isinstance(item_id, str) and item_id.strip().isdigit():
+            item_id = int(item_id)
+        score = entry.get('score')
+        if isinstance(score, float) and score.is_integer():
+            score = int(score)
+        justification = entry.get('justification')
+        if (not isinstance(item_id, int) or item_id not in expected or item_id in results
+                or isinstance(score, bool) or not isinstance(score, int) or not 1 <= score <= 10
+                or not isinstance(justification, str) or not justification.strip()):
+            logger.debug(f"Discarding invalid batch evaluation entry: {entry}")
+            continue
+        results[item_id] = {"score": score, "justification": justification.strip()}
+
+    missing = [item_id for item_id in expected_ids if item_id not in results]
+    return results, missing
@@ -0,0 +1,358 @@
+"""
+Cross-process Shared Store
+
+A small SQLite (WAL) database that every gunicorn worker opens, used for values
+that must be consistent across workers: token buckets for upstream rate limits,
+the slot queues of upstream concurrency budgets, counters and short-lived
+caches. Connections are per thread and per process, so
+the store is safe to create before the server forks its workers.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+from config import SHARED_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires REAL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS slots (
+    ticket INTEGER PRIMARY KEY AUTOINCREMENT,
+    budget TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    since REAL NOT NULL,
+    pid INTEGER NOT NULL,
+    active INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slots_budget ON slots (budget);
+"""
+
+
+def pid_alive(pid: int) -> bool:
+    """同一主机上的进程是否仍在运行"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedStore:
+    """跨进程共享的键值/计数/令牌桶存储（SQLite）"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # A forked worker must not reuse the parent's connection
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        # IMMEDIATE takes the write lock up front so read-modify-write is atomic across processes
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    # ---------- key/value ----------
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """读取值（过期视为不存在）"""
+        row = self._connection().execute('SELECT value, expires FROM kv WHERE key = ?', (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return default
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float = None):
+        """写入可JSON序列化的值，ttl 为秒数"""
+        expires = time.time() + ttl if ttl else None
+        self._connection().execute(
+            'INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)',
+            (key, json.dumps(value, ensure_ascii=False), expires)
+        )
+
+    def items(self, prefix: str) -> dict:
+        """读取某前缀下所有未过期的键值"""
+        rows = self._connection().execute(
+            'SELECT key, value FROM kv WHERE key >= ? AND key < ? AND (expires IS NULL OR expires > ?)',
+            (prefix, prefix + '\uffff', time.time())
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def delete(self, key: str):
+        self._connection().execute('DELETE FROM kv WHERE key = ?', (key,))
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        """原子地增加计数并返回新值"""
+        with self._transaction() as conn:
+            row = conn.execute('SELECT value FROM kv WHERE key = ?', (key,)).fetchone()
+            value = (json.loads(row[0]) if row else 0) + amount
+            conn.execute('INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, NULL)',
+                         (key, json.dumps(value)))
+        return value
+
+    def fold(self, keys: List[str], into: str, combine: Callable[[Any, list], Any]):
+        """
+        原子地把 keys 的值并入 into 并删除 keys
+
+        into 的新值为 combine(into 的当前值或None, [keys 中存在的值])，不过期。
+        并发调用时每个值只会被合并一次。
+        """
+        with self._transaction() as conn:
+            values = []
+            for key in keys:
+                row = conn.execute('SELECT value FROM kv WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    values.append(json.loads(row[0]))
+            if not values:
+                return
+            conn.executemany('DELETE FROM kv WHERE key = ?', [(key,) for key in keys])
+            row = conn.execute('SELECT value FROM kv WHERE key = ?', (into,)).fetchone()
+            value = combine(json.loads(row[0]) if row else None, values)
+            conn.execute('INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, NULL)',
+                         (into, json.dumps(value, ensure_ascii=False)))
+
+    def claim(self, keys: List[str], value: Any) -> dict:
+        """
+        原子地占用一组键（不过期）：任一键已被占用时一个也不写入
+
+        Returns:
+            dict: 已被占用的键及其当前值；为空表示占用成功
+        """
+        with self._transaction() as conn:
+            held = {}
+            for key in keys:
+                row = conn.execute('SELECT value, expires FROM kv WHERE key = ?', (key,)).fetchone()
+                if row is not None and (row[1] is None or row[1] > time.time()):
+                    held[key] = json.loads(row[0])
+            if not held:
+                encoded = json.dumps(value, ensure_ascii=False)
+                conn.executemany('INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, NULL)',
+                                 [(key, encoded) for key in keys])
+        return held
+
+    def unclaim(self, keys: List[str], value: Any):
+        """释放仍由 value 占用的键；已被重新占用的键保持不变"""
+        encoded = json.dumps(value, ensure_ascii=False)
+        self._connection().executemany('DELETE FROM kv WHERE key = ? AND value = ?',
+                                       [(key, encoded) for key in keys])
+
+    def purge_expired(self) -> int:
+        """删除已过期的键，返回删除数量"""
+        cursor = self._connection().execute('DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?',
+                                            (time.time(),))
+        return cursor.rowcount
+
+    def trim(self, prefix: str, max_entries: int) -> int:
+        """某前缀下只保留最晚过期（即最近写入）的 max_entries 个键，返回删除数量"""
+        cursor = self._connection().execute(
+            'DELETE FROM kv WHERE key IN (SELECT key FROM kv WHERE key >= ? AND key < ? '
+            'ORDER BY expires DESC LIMIT -1 OFFSET ?)',
+            (prefix, prefix + '\uffff', max(0, max_entries))
+        )
+        return cursor.rowcount
+
+    # ---------- token buckets ----------
+
+    def take_token(self, name: str, rate: float, capacity: int) -> float:
+        """
+        尝试从共享令牌桶取一个令牌
+
+        Returns:
+            float: 0 表示已取得令牌，否则为需要等待的秒数
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE name = ?', (name,)).fetchone()
+            tokens = float(capacity) if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            if tokens >= 1:
+                conn.execute('INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)',
+                             (name, tokens - 1, now))
+                return 0.0
+            conn.execute('INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)',
+                         (name, tokens, now))
+            return (1 - tokens) / rate
+
+    # ---------- concurrency slots ----------
+
+    def queue_slot(self, budget: str, rank: int) -> int:
+        """加入预算的槽位队列，返回票号（票号递增，即到达顺序）"""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute('INSERT INTO slots (budget, rank, since, pid, updated) VALUES (?, ?, ?, ?, ?)',
+                                  (budget, rank, now, os.getpid(), now))
+        return cursor.lastrowid
+
+    def claim_slot(self, budget: str, ticket: int, choose: Callable[[List[Tuple[int, int, float]], int], Optional[int]],
+                   lease: float, reap: bool = True) -> bool:
+        """
+        尝试为排队中的票号占用槽位
+
+        先清除所属进程已退出、或超过 lease 秒未续租的记录（被强杀的worker不会释放槽位），
+        再由 choose(排队中的 [(票号, 优先级, 排队时间)], 已占用数) 选出下一个可以占用槽位的票号。
+        reap 为 False 时先只读地检查：票号还轮不到时不获取写锁、也不检查其他进程，直接返回 False。
+
+        Returns:
+            bool: 是否已占用槽位；False 时票号继续排队
+        """
+        if not reap:
+            rows = self._connection().execute('SELECT ticket, rank, since, active FROM slots WHERE budget = ?',
+                                              (budget,)).fetchall()
+            waiting = [(row[0], row[1], row[2]) for row in rows if not row[3]]
+            if choose(waiting, sum(1 for row in rows if row[3])) != ticket:
+                return False
+        now = time.time()
+        own = os.getpid()
+        with self._transaction() as conn:
+            rows = conn.execute('SELECT ticket, rank, since, pid, active, updated FROM slots WHERE budget = ?',
+                                (budget,)).fetchall()
+            alive = {own: True}
+            stale = [row[0] for row in rows if row[0] != ticket and
+                     (now - row[5] > lease or not alive.setdefault(row[3], pid_alive(row[3])))]
+            if stale:
+                conn.executemany('DELETE FROM slots WHERE ticket = ?', [(t,) for t in stale])
+                logger.warning(f"Released {len(stale)} stale {budget} slots of exited workers")
+            rows = [row for row in rows if row[0] not in stale]
+            active = sum(1 for row in rows if row[4])
+            waiting = [(row[0], row[1], row[2]) for row in rows if not row[4]]
+            claimed = choose(waiting, active) == ticket
+            conn.execute('UPDATE slots SET active = ?, updated = ? WHERE ticket = ?', (int(claimed), now, ticket))
+        return claimed
+
+    def release_slot(self, ticket: int):
+        """释放槽位或退出队列"""
+        self._connection().execute('DELETE FROM slots WHERE ticket = ?', (ticket,))
+
+    def renew_slots(self, tickets: List[int]):
+        """为占用中或排队中的票号续租"""
+        if tickets:
+            now = time.time()
+            with self._transaction() as conn:
+                conn.executemany('UPDATE slots SET updated = ? WHERE ticket = ?', [(now, t) for t in tickets])
+
+
+class SharedSlots:
+    """
+    所有worker共用的并发槽位队列（由 limits.UpstreamBudget 按优先级选择下一个占用者）
+
+    后台线程每 lease/4 秒为本进程的票号续租，占用槽位超过 lease 秒的长调用（如TTS流）不会被当作泄漏清除。
+    """
+
+    def __init__(self, store: SharedStore, name: str, lease: float):
+        self.store = store
+        self.name = name
+        self.lease = lease
+        self._tickets = set()
+        self._lock = threading.Lock()
+        self._heartbeat_pid = None
+
+    def queue(self, rank: int) -> int:
+        ticket = self.store.queue_slot(self.name, rank)
+        with self._lock:
+            self._start_heartbeat()
+            self._tickets.add(ticket)
+        return ticket
+
+    def claim(self, ticket: int, choose: Callable, reap: bool = True) -> bool:
+        return self.store.claim_slot(self.name, ticket, choose, self.lease, reap)
+
+    def release(self, ticket: int):
+        with self._lock:
+            self._tickets.discard(ticket)
+        self.store.release_slot(ticket)
+
+    def _start_heartbeat(self):
+        """每个进程启动一次续租线程（调用方持有锁）"""
+        if self._heartbeat_pid == os.getpid():
+            return
+        # Tickets inherited from the parent process are not ours to renew
+        self._heartbeat_pid = os.getpid()
+        self._tickets = set()
+
+        def loop():
+            while True:
+                time.sleep(self.lease / 4)
+                with self._lock:
+                    tickets = list(self._tickets)
+                try:
+                    self.store.renew_slots(tickets)
+                except Exception as e:
+                    logger.warning(f"Renewing {self.name} slot leases failed: {e}")
+
+        threading.Thread(target=loop, name=f'{self.name}-leases', daemon=True).start()
+
+
+class SharedRateLimiter:
+    """所有worker共用一个令牌桶的限速器（接口同 limits.RateLimiter）"""
+
+    def __init__(self, store: SharedStore, name: str, rate: float, burst: int = 1):
+        self.store = store
+        self.name = name
+        self.rate = rate
+        self.capacity = max(1, burst)
+
+    def acquire(self) -> float:
+        """获取一个令牌，返回等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            wait = self.store.take_token(self.name, self.rate, self.capacity)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+
+_store: Optional[SharedStore] = None
+_store_lock = threading.Lock()
+_store_failed = False
+
+
+def get_shared_store() -> Optional[SharedStore]:
+    """获取共享存储；未配置 SHARED_STORE_PATH 或无法打开时返回None（调用方退回进程内实现）"""
+    global _store, _store_failed
+    if _store is None and not _store_failed and SHARED_STORE_PATH:
+        with _store_lock:
+            if _store is None and not _store_failed:
+                try:
+                    _store = SharedStore(SHARED_STORE_PATH)
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"Shared store unavailable at {SHARED_STORE_PATH}: {e}")
+                    _store_failed = True
+    return _store
@@ -23,6 +23,7 @@ class TranslationApp {
         this.streamModeSelect = document.getElementById('stream-mode');
         this.temperatureInput = document.getElementById('temperature');
         this.topPInput = document.getElementById('top-p');
+        this.incrementalSelect = document.getElementById('incremental-mode');
 
         // Buttons
         this.translateBtn = document.getElementById('translate-btn');
@@ -173,6 +174,9 @@ class TranslationApp {
         if (this.topPInput.value) {
             requestBody.top_p = parseFloat(this.topPInput.value);
         }
+        if (this.incrementalSelect.value === 'true') {
+            requestBody.incremental = true;
+        }
 
         try {
             const response = await fetch('/api/translate', {
@@ -185,7 +189,13 @@ class TranslationApp {
             if (result.success) {
                 this.translationText.value = result.translation;
                 this.showEvaluationSection();
-                this.showAlert('Translation completed successfully!', 'success');
+                if (result.memory && result.memory.served) {
+                    this.showAlert(`Translation reused from memory (similarity ${result.memory.similarity})`, 'success');
+                } else if (result.segments !== undefined) {
+                    this.showAlert(`Translation completed: ${result.reused_segments} of ${result.segments} sentences reused`, 'success');
+                } else {
+                    this.showAlert('Translation completed successfully!', 'success');
+                }
                 this.playTranslationBtn.disabled = false;
             } else {
                 this.showAlert(`Translation failed: ${result.error}`, 'danger');
@@ -257,26 +267,29 @@ class TranslationApp {
             return;
         }
 
-        if (text.length > 500) {
-            text = text.substring(0, 500) + '...';
-            this.showAlert('Text truncated to 500 characters for speech synthesis', 'info');
-        }
-
         const originalHTML = button.innerHTML;
         button.disabled = true;
         button.innerHTML = '<i class="fas fa-spinner fa-spin me-1"></i>Loading...';
 
         try {
-            const response = await fetch('/api/tts', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ text: text, language: language })
-            });
-            const result = await response.json();
+            // Short clips play straight from the streaming endpoint, so audio starts with the
+            // first chunk; longer text would overflow the request line and goes through /api/tts
+            let result = { success: true };
+            let audioUrl = `/api/tts/stream?${new URLSearchParams({ text: text, language: language })}`;
+            if (audioUrl.length > 2000) {
+                const response = await fetch('/api/tts', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ text: text, language: language, audio_url: true })
+                });
+                result = await response.json();
+                // Cached clips are served as plain MP3 the browser can cache and range-request;
+                // revoking a non-blob URL below is a no-op
+                audioUrl = result.success && (result.audio_url ||
+                    URL.createObjectURL(this.base64ToBlob(result.audio_data, 'audio/mp3')));
+            }
 
             if (result.success) {
-                const audioBlob = this.base64ToBlob(result.audio_data, 'audio/mp3');
-                const audioUrl = URL.createObjectURL(audioBlob);
                 
                 this.audioPlayer.pause();
                 this.audioPlayer.currentTime = 0;
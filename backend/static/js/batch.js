@@ -53,6 +53,7 @@ class PlaygroundDashboard {
         // File upload, history, and audio playback functionality
         this.setupFileUpload();
         this.setupHistory();
+        this.setupJobs();
         this.bindAudioEvents();
     }
 
@@ -184,7 +185,7 @@ class PlaygroundDashboard {
                 if (data.history.length === 0) {
                     tableBody.innerHTML = `
                         <tr>
-                            <td colspan="6" class="text-center text-muted py-4">
+                            <td colspan="7" class="text-center text-muted py-4">
                                 <i class="fas fa-inbox fa-2x mb-2"></i><br>
                                 No history found. Start by running some translations!
                             </td>
@@ -212,6 +213,15 @@ class PlaygroundDashboard {
                         const avgScore = item.avg_score ? 
                             `<span class="badge bg-info">${item.avg_score}/10</span>` : 
                             '<span class="text-muted">-</span>';
+
+                        // Token usage from the run ledger (runs saved before the ledger have none)
+                        const usage = item.usage;
+                        const tokens = usage && usage.calls ?
+                            `<small title="${usage.prompt_tokens} prompt + ${usage.completion_tokens} completion, ` +
+                            `${usage.ms_per_completion_token ?? '-'} ms/token">${usage.total_tokens.toLocaleString()}` +
+                            `${usage.tokens_per_second ? `<br>${usage.tokens_per_second} tok/s` : ''}` +
+                            `${usage.cost !== undefined ? `<br>cost ${usage.cost}` : ''}</small>` :
+                            '<span class="text-muted">-</span>';
                         
                         row.innerHTML = `
                             <td><code>${item.run_id}</code></td>
@@ -219,6 +229,7 @@ class PlaygroundDashboard {
                             <td><small>${langPairs}</small></td>
                             <td class="text-center">${item.total_items}</td>
                             <td class="text-center">${avgScore}</td>
+                            <td class="text-center">${tokens}</td>
                             <td><small>${timestamp}</small></td>
                         `;
                         
@@ -239,20 +250,140 @@ class PlaygroundDashboard {
     }
     
     formatTimestamp(timestamp) {
-        // Convert YYYYMMDD_HHMM to readable format
-        if (timestamp.length === 13 && timestamp.includes('_')) {
+        // Convert YYYYMMDD_HHMM or YYYYMMDD_HHMMSS_xxxxxxxx (background jobs) to readable format
+        if (/^\d{8}_\d{4}(\d{2}_[0-9a-f]+)?$/.test(timestamp)) {
             const [date, time] = timestamp.split('_');
             const year = date.substring(0, 4);
             const month = date.substring(4, 6);
             const day = date.substring(6, 8);
             const hour = time.substring(0, 2);
             const minute = time.substring(2, 4);
+            const second = time.length > 4 ? `:${time.substring(4, 6)}` : '';
             
-            return `${year}-${month}-${day} ${hour}:${minute}`;
+            return `${year}-${month}-${day} ${hour}:${minute}${second}`;
         }
         return timestamp;
     }
 
+    setupJobs() {
+        this.jobKindSelect = document.getElementById('job-kind');
+        this.jobLinesGroup = document.getElementById('job-lines-group');
+        this.jobRunGroup = document.getElementById('job-run-group');
+        this.startJobBtn = document.getElementById('start-job');
+        this.jobErrorDiv = document.getElementById('job-error');
+        this.jobsTableBody = document.querySelector('#jobs-table tbody');
+        this.jobPollTimer = null;
+
+        this.jobKindSelect.addEventListener('change', () => {
+            const evaluateOnly = this.jobKindSelect.value === 'evaluation';
+            this.jobLinesGroup.style.display = evaluateOnly ? 'none' : '';
+            this.jobRunGroup.style.display = evaluateOnly ? '' : 'none';
+        });
+        this.startJobBtn.addEventListener('click', () => this.startJob());
+        this.jobsTableBody.addEventListener('click', (e) => {
+            const target = e.target.closest('.cancel-job-btn');
+            if (target) this.cancelJob(target.dataset.jobId, target);
+        });
+        this.loadJobs();
+    }
+
+    async startJob() {
+        const payload = {
+            kind: this.jobKindSelect.value,
+            source_lang: this.sourceSelect.value,
+            target_lang: this.targetSelect.value
+        };
+        if (payload.kind === 'evaluation') {
+            payload.translation_run_id = document.getElementById('job-translation-run').value.trim();
+        } else {
+            payload.lines = parseInt(document.getElementById('job-lines').value, 10) || 15;
+        }
+
+        this.jobErrorDiv.style.display = 'none';
+        this.startJobBtn.disabled = true;
+        try {
+            const response = await fetch('/api/jobs', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(payload)
+            });
+            const data = await response.json();
+            if (!data.success) throw new Error(data.error || 'Failed to start job');
+            await this.loadJobs();
+        } catch (error) {
+            this.jobErrorDiv.textContent = error.message;
+            this.jobErrorDiv.style.display = 'block';
+        } finally {
+            this.startJobBtn.disabled = false;
+        }
+    }
+
+    async cancelJob(jobId, btnElement) {
+        btnElement.disabled = true;
+        try {
+            await fetch(`/api/jobs/${encodeURIComponent(jobId)}/cancel`, { method: 'POST' });
+        } catch (error) {
+            console.error('Error cancelling job:', error);
+        }
+        await this.loadJobs();
+    }
+
+    async loadJobs() {
+        clearTimeout(this.jobPollTimer);
+        let jobs = [];
+        try {
+            const response = await fetch('/api/jobs');
+            const data = await response.json();
+            if (data.success) jobs = data.jobs;
+        } catch (error) {
+            console.error('Error loading jobs:', error);
+        }
+        this.renderJobs(jobs);
+        // Poll only while something is queued or running
+        if (jobs.some(job => job.status === 'queued' || job.status === 'running')) {
+            this.jobPollTimer = setTimeout(() => this.loadJobs(), 2000);
+        }
+    }
+
+    renderJobs(jobs) {
+        if (jobs.length === 0) {
+            this.jobsTableBody.innerHTML = '<tr><td colspan="8" class="text-center text-muted">No jobs yet.</td></tr>';
+            return;
+        }
+        const kindLabels = { translation: 'Translate', evaluation: 'Evaluate', translate_evaluate: 'Translate & Evaluate' };
+        const statusBadges = {
+            queued: 'bg-secondary', running: 'bg-primary', completed: 'bg-success',
+            failed: 'bg-danger', cancelled: 'bg-warning text-dark'
+        };
+        this.jobsTableBody.innerHTML = jobs.map(job => {
+            const p = job.progress || {};
+            const active = job.status === 'queued' || job.status === 'running';
+            const phase = p.phase ? ` <small class="text-muted">(${this.escapeHtml(p.phase)})</small>` : '';
+            const failed = p.failed ? `, <span class="text-danger">${p.failed} failed</span>` : '';
+            const eta = active && p.eta_seconds != null ? `${Math.round(p.eta_seconds)}s` : '-';
+            const runs = [job.result.translation_run_id || job.params.translation_run_id || job.params.run_id,
+                          job.result.eval_run_id || job.params.eval_run_id]
+                .filter(Boolean).map(id => `<code>${this.escapeHtml(id)}</code>`).join(' → ');
+            const error = job.error ? `<div class="small text-danger">${this.escapeHtml(job.error)}</div>` : '';
+            return `
+                <tr>
+                    <td>${kindLabels[job.kind] || this.escapeHtml(job.kind)}<br><small class="text-muted">${this.escapeHtml(job.id)}</small></td>
+                    <td>${this.escapeHtml(job.params.source_lang)}-${this.escapeHtml(job.params.target_lang)}</td>
+                    <td><span class="badge ${statusBadges[job.status] || 'bg-secondary'}">${this.escapeHtml(job.status)}</span>${phase}</td>
+                    <td>
+                        <div class="progress" style="height: 8px;">
+                            <div class="progress-bar" role="progressbar" style="width: ${p.percent || 0}%"></div>
+                        </div>
+                        <small>${p.done || 0}/${p.total || 0} done${failed}</small>${error}
+                    </td>
+                    <td>${p.throughput ? `${p.throughput.toFixed(2)}/s` : '-'}</td>
+                    <td>${eta}</td>
+                    <td><small>${runs || '-'}</small></td>
+                    <td>${active ? `<button class="btn btn-sm btn-outline-danger cancel-job-btn" data-job-id="${this.escapeHtml(job.id)}" title="Cancel"><i class="fas fa-stop"></i></button>` : ''}</td>
+                </tr>`;
+        }).join('');
+    }
+
     async loadAndPopulateExamples() {
         try {
             const response = await fetch('/api/examples');
@@ -304,19 +435,38 @@ class PlaygroundDashboard {
         this.setLoading(true);
 
         try {
-            const resp = await fetch('/api/playground-run', {
+            // Lines are rendered as the server streams them: translation first, then its score
+            const resp = await fetch('/api/playground-run/stream', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({ source_lang: sourceLang, target_lang: targetLang, texts: texts })
             });
-            const data = await resp.json();
-            
-            if (data.success) {
-                this.displayResults(data.results, data.avg_score, data.avg_bleu);
-            } else {
+            if (!resp.ok) {
+                const data = await resp.json();
                 alert(`Error: ${data.error}` || 'An unknown error occurred.');
                 this.displayResults([], null, null);
+                return;
             }
+
+            const lines = new Map();
+            const render = (summary) => {
+                const results = Array.from(lines.values()).sort((a, b) => a.line_number - b.line_number);
+                const avgScore = summary ? summary.avg_score : this.runningAverage(results);
+                this.displayResults(results, avgScore, summary ? summary.avg_bleu : null);
+            };
+            await this.readNdjson(resp, (event) => {
+                if (event.type === 'translation') {
+                    lines.set(event.line_number, { ...event, pending: true });
+                    render(null);
+                } else if (event.type === 'result') {
+                    lines.set(event.line_number, event);
+                    render(null);
+                } else if (event.type === 'summary') {
+                    render(event);
+                } else if (event.type === 'error') {
+                    alert(`Error: ${event.error}`);
+                }
+            });
         } catch (err) {
             console.error(err);
             alert('A network error occurred. Please check the console for details.');
@@ -326,6 +476,26 @@ class PlaygroundDashboard {
         }
     }
 
+    async readNdjson(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)));
+        }
+        if (buffer.trim()) onEvent(JSON.parse(buffer));
+    }
+
+    runningAverage(results) {
+        const scores = results.filter(r => typeof r.evaluation_score === 'number').map(r => r.evaluation_score);
+        return scores.length ? scores.reduce((a, b) => a + b, 0) / scores.length : null;
+    }
+
     displayResults(results, avgScore, avgBleu) {
         // clear
         this.resultsTableBody.innerHTML = '';
@@ -354,7 +524,9 @@ class PlaygroundDashboard {
             
             row.innerHTML = `
                 <td class="text-center"><strong>${res.line_number}</strong></td>
-                <td class="text-center"><span class="score-badge ${this.getScoreClass(res.evaluation_score)}">${res.evaluation_score}/10</span></td>
+                <td class="text-center">${res.pending
+                    ? '<span class="spinner-border spinner-border-sm text-secondary" role="status" title="Evaluating..."></span>'
+                    : `<span class="score-badge ${this.getScoreClass(res.evaluation_score)}">${res.evaluation_score}/10</span>`}</td>
                 <td class="text-center">${res.bleu_score ? res.bleu_score.toFixed(3) : '-'}</td>
                 <td><div class="text-truncate" style="max-width: 250px;" title="${this.escapeHtml(res.source_text)}">${this.escapeHtml(res.source_text)}</div></td>
                 <td><div class="text-truncate" style="max-width: 250px;" title="${this.escapeHtml(res.translation)}">${this.escapeHtml(res.translation)}</div></td>
@@ -480,35 +652,21 @@ class PlaygroundDashboard {
         btnElement.disabled = true;
 
         try {
-            const response = await fetch('/api/tts', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ text: text, language: lang })
-            });
-
-            const data = await response.json();
-
-            if (data.success && data.audio_data) {
-                const audioBlob = this.base64ToBlob(data.audio_data, 'audio/mp3');
-                const audioUrl = URL.createObjectURL(audioBlob);
-                const audio = new Audio(audioUrl);
-                
-                audio.onended = () => {
-                    btnElement.innerHTML = originalIcon;
-                    btnElement.disabled = false;
-                    URL.revokeObjectURL(audioUrl);
-                };
-                 audio.onerror = () => {
-                    alert('Error playing audio');
-                    btnElement.innerHTML = originalIcon;
-                    btnElement.disabled = false;
-                    URL.revokeObjectURL(audioUrl);
-                };
-                audio.play();
-
-            } else {
-                throw new Error(data.error || 'Failed to get audio data.');
-            }
+            const audioUrl = await this.audioUrlFor(text, lang);
+            const audio = new Audio(audioUrl);
+
+            audio.onended = () => {
+                btnElement.innerHTML = originalIcon;
+                btnElement.disabled = false;
+                URL.revokeObjectURL(audioUrl);
+            };
+            audio.onerror = () => {
+                alert('Error playing audio');
+                btnElement.innerHTML = originalIcon;
+                btnElement.disabled = false;
+                URL.revokeObjectURL(audioUrl);
+            };
+            audio.play();
         } catch (error) {
             console.error('TTS Error:', error);
             alert(`Could not play audio: ${error.message}`);
@@ -520,60 +678,85 @@ class PlaygroundDashboard {
     async playAllVisible(type) {
         if (!type) return;
 
-        const rows = this.resultsTableBody.querySelectorAll('tr');
+        const buttons = Array.from(this.resultsTableBody.querySelectorAll(`.play-${type}-btn`))
+            .filter(btn => btn.dataset.text && btn.dataset.lang);
+        if (buttons.length === 0) return;
         this.playAllDropdownBtn.disabled = true;
         this.playAllDropdownBtn.innerHTML = '<span class="spinner-border spinner-border-sm me-1" role="status" aria-hidden="true"></span> Playing...';
 
-        for (const row of rows) {
-            const btn = row.querySelector(`.play-${type}-btn`);
-            if (btn) {
-                const text = btn.dataset.text;
-                const lang = btn.dataset.lang;
-                
-                // Play audio and wait for it to finish
-                await new Promise(async (resolve) => {
-                    if (text && lang) {
-                        const originalIcon = btn.innerHTML;
-                        btn.innerHTML = '<i class="fas fa-pause"></i>';
-                        
-                        const response = await fetch('/api/tts', {
-                            method: 'POST',
-                            headers: { 'Content-Type': 'application/json' },
-                            body: JSON.stringify({ text: text, language: lang })
-                        });
-                        const data = await response.json();
-                        
-                        if(data.success) {
-                            const audioBlob = this.base64ToBlob(data.audio_data, 'audio/mp3');
-                            const audioUrl = URL.createObjectURL(audioBlob);
-                            const audio = new Audio(audioUrl);
-                            audio.onended = () => {
-                                btn.innerHTML = originalIcon;
-                                URL.revokeObjectURL(audioUrl);
-                                // Wait 1 second before playing the next
-                                setTimeout(resolve, 1000); 
-                            };
-                            audio.onerror = () => {
-                                btn.innerHTML = originalIcon;
-                                URL.revokeObjectURL(audioUrl);
-                                setTimeout(resolve, 1000);
-                            }
-                            audio.play();
-                        } else {
-                            // If TTS fails for one, just move on
-                           setTimeout(resolve, 100); 
-                        }
-                    } else {
-                        resolve();
-                    }
-                });
+        // One batch request synthesizes every row concurrently; rows resolve as their audio is
+        // ready, so the next row is usually warm by the time the current one finishes
+        const resolvers = [];
+        const ready = buttons.map(() => new Promise(resolve => resolvers.push(resolve)));
+        const items = buttons.map(btn => ({ text: btn.dataset.text, language: btn.dataset.lang }));
+        fetch('/api/tts/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ items: items })
+        }).then(response => this.readNdjson(response, (event) => {
+            if (event.type === 'audio') {
+                resolvers[event.index](event.success ? this.audioSource(event) : null);
             }
+        })).catch(error => console.error('Batch TTS Error:', error))
+            // Rows the stream never reached are skipped
+            .finally(() => resolvers.forEach(resolve => resolve(null)));
+
+        for (let i = 0; i < buttons.length; i++) {
+            const btn = buttons[i];
+            const originalIcon = btn.innerHTML;
+            btn.innerHTML = '<i class="fas fa-pause"></i>';
+            const audioUrl = await ready[i];
+
+            await new Promise((resolve) => {
+                if (!audioUrl) {
+                    // If TTS fails for one, just move on
+                    btn.innerHTML = originalIcon;
+                    setTimeout(resolve, 100);
+                    return;
+                }
+                const audio = new Audio(audioUrl);
+                const done = () => {
+                    btn.innerHTML = originalIcon;
+                    URL.revokeObjectURL(audioUrl);
+                    // Wait 1 second before playing the next
+                    setTimeout(resolve, 1000);
+                };
+                audio.onended = done;
+                audio.onerror = done;
+                audio.play().catch(done);
+            });
         }
-        
+
         this.playAllDropdownBtn.disabled = false;
         this.playAllDropdownBtn.innerHTML = '<i class="fas fa-play-circle me-1"></i> Play All';
     }
-    
+
+    async audioUrlFor(text, lang) {
+        // Short clips play straight from the streaming endpoint, so audio starts
+        // with the first chunk; longer text would overflow the request line
+        const streamUrl = `/api/tts/stream?${new URLSearchParams({ text: text, language: lang })}`;
+        if (streamUrl.length <= 2000) {
+            return streamUrl;
+        }
+
+        const response = await fetch('/api/tts', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ text: text, language: lang, audio_url: true })
+        });
+        const data = await response.json();
+        if (!data.success || !(data.audio_url || data.audio_data)) {
+            throw new Error(data.error || 'Failed to get audio data.');
+        }
+        return this.audioSource(data);
+    }
+
+    audioSource(data) {
+        // Cached clips are served as plain MP3 the browser can cache and range-request;
+        // revoking such a URL later is a no-op
+        return data.audio_url || URL.createObjectURL(this.base64ToBlob(data.audio_data, 'audio/mp3'));
+    }
+
     base64ToBlob(audioData, mimeType) {
         try {
             // Check if the data is hex string (from MiniMax API)
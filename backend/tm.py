@@ -0,0 +1,326 @@
+"""
+Fuzzy Translation Memory
+
+Indexes every stored translation under data/translations per language pair so
+that interactive requests can reuse earlier work on near-duplicate sentences
+(templated UI strings, small edits) that an exact-match cache misses.
+
+Sentences are compared as sets of character 3-grams, which works the same for
+spaced and unspaced scripts. Each set is reduced to a one-permutation MinHash
+signature and the signature is split into LSH bands; a query only looks at entries sharing at
+least one band, and compares the few that share the most bands by their exact
+Jaccard similarity. The cost of a lookup is therefore bounded however large the
+memory grows (see docs/BENCHMARKS.md for timings).
+
+Only an exact repeat (after normalization) is returned without an upstream
+call. A one-word edit can flip the meaning ("will review" / "will not review")
+while barely changing the similarity, so fuzzy matches down to
+TM_HINT_THRESHOLD are only passed to the model as reference translations.
+Batch runs never consult the memory, since they measure the model itself.
+
+Each pair keeps at most TM_MAX_ENTRIES entries; the oldest are dropped first.
+A background thread per worker picks up new result files every
+TM_REFRESH_SECONDS, so lookups never scan the data directory.
+"""
+
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import Counter, OrderedDict, defaultdict, deque
+from itertools import islice
+from typing import List, Optional
+
+from config import DATA_ROOT, get_memory_config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+NGRAM = 3
+SIGNATURE_SIZE = 32
+BANDS = 8
+_ROWS = SIGNATURE_SIZE // BANDS
+# Entries counted per LSH bucket, and entries compared exactly per lookup
+MAX_BUCKET = 256
+MAX_CANDIDATES = 32
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(text: str) -> str:
+    """NFKC 归一化并合并空白"""
+    return _SPACES.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+def shingles(text: str) -> frozenset:
+    """字符3-gram集合（短于3个字符的文本整体作为一个元素）"""
+    if len(text) <= NGRAM:
+        return frozenset((text,))
+    return frozenset(text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1))
+
+
+def minhash(grams: frozenset) -> tuple:
+    """
+    MinHash签名（单次哈希）
+
+    每个元素只哈希一次，按哈希值分到 SIGNATURE_SIZE 个箱中，各箱取最小值；空箱借用右侧
+    最近的非空箱并加上距离偏移。比每个位置各用一个排列快一个数量级，两个签名相同位置
+    相等的比例仍近似于Jaccard相似度。
+    """
+    bins = [None] * SIGNATURE_SIZE
+    for gram in grams:
+        h = zlib.crc32(gram.encode('utf-8'))
+        index, value = h % SIGNATURE_SIZE, h // SIGNATURE_SIZE
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    signature = []
+    for index in range(SIGNATURE_SIZE):
+        distance = 0
+        while bins[(index + distance) % SIGNATURE_SIZE] is None:
+            distance += 1
+        signature.append(bins[(index + distance) % SIGNATURE_SIZE] + (distance << 32))
+    return tuple(signature)
+
+
+def jaccard(first: frozenset, second: frozenset) -> float:
+    return len(first & second) / len(first | second) if first or second else 1.0
+
+
+class TranslationMemory:
+    """一个语言对的翻译记忆：MinHash LSH 索引（线程安全），最多 max_entries 条，先进先出"""
+
+    def __init__(self, max_entries: int = 0):
+        self.max_entries = max_entries
+        # id -> (原文, 译文, 3-gram集合, 各band的键)；id 单调递增，淘汰时总是最小的id
+        self._entries = OrderedDict()
+        self._by_text = {}
+        self._bands = [defaultdict(deque) for _ in range(BANDS)]
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.served = 0
+        self.hinted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, source_text: str, translation: str):
+        """加入一条译文；相同原文（归一化后）只保留最新的译文"""
+        key = normalize(source_text)
+        translation = translation.strip()
+        if not key or not translation:
+            return
+        with self._lock:
+            entry_id = self._by_text.get(key)
+            if entry_id is not None:
+                source, _, grams, band_keys = self._entries[entry_id]
+                self._entries[entry_id] = (source, translation, grams, band_keys)
+                return
+        grams = shingles(key)
+        signature = minhash(grams)
+        band_keys = tuple(signature[band * _ROWS:(band + 1) * _ROWS] for band in range(BANDS))
+        with self._lock:
+            if key in self._by_text:
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._by_text[key] = entry_id
+            self._entries[entry_id] = (source_text.strip(), translation, grams, band_keys)
+            for buckets, band_key in zip(self._bands, band_keys):
+                buckets[band_key].append(entry_id)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        # Buckets are filled in id order, so the oldest entry is at the front of each of its buckets
+        entry_id, (source, _, _, band_keys) = self._entries.popitem(last=False)
+        del self._by_text[normalize(source)]
+        for buckets, band_key in zip(self._bands, band_keys):
+            bucket = buckets[band_key]
+            bucket.popleft()
+            if not bucket:
+                del buckets[band_key]
+
+    def exact(self, text: str) -> Optional[dict]:
+        """归一化后与原文完全相同的条目"""
+        with self._lock:
+            entry_id = self._by_text.get(normalize(text))
+            if entry_id is None:
+                return None
+            source, translation, _, _ = self._entries[entry_id]
+            return {"source_text": source, "translation": translation, "similarity": 1.0}
+
+    def search(self, text: str, threshold: float = 0.0, limit: int = 3) -> List[dict]:
+        """相似度不低于 threshold 的条目，按相似度降序，最多 limit 条"""
+        exact = self.exact(text)
+        if exact is not None:
+            return [exact]
+        grams = shingles(normalize(text))
+        signature = minhash(grams)
+        with self._lock:
+            matched = [buckets[band_key] for band, buckets in enumerate(self._bands)
+                       if (band_key := signature[band * _ROWS:(band + 1) * _ROWS]) in buckets]
+            # Entries sharing more bands are likelier to be similar. Buckets of templated strings can hold
+            # thousands of entries, so only the newest MAX_BUCKET of each are counted and only the
+            # MAX_CANDIDATES most frequent entries get an exact comparison
+            hits = Counter()
+            for bucket in sorted(matched, key=len):
+                hits.update(islice(reversed(bucket), MAX_BUCKET))
+            candidates = heapq.nlargest(MAX_CANDIDATES, hits, key=hits.get)
+            scored = [(jaccard(grams, self._entries[i][2]), i) for i in candidates]
+            scored = sorted((item for item in scored if item[0] >= threshold), key=lambda item: -item[0])[:limit]
+            return [{"source_text": self._entries[i][0], "translation": self._entries[i][1],
+                     "similarity": round(similarity, 3)} for similarity, i in scored]
+
+    def stats(self) -> dict:
+        """条目数与命中率（本进程）"""
+        with self._lock:
+            lookups, served, hinted = self.lookups, self.served, self.hinted
+        return {"entries": len(self), "lookups": lookups, "served": served, "hinted": hinted,
+                "served_rate": round(served / lookups, 4) if lookups else None,
+                "hinted_rate": round(hinted / lookups, 4) if lookups else None}
+
+    def _count(self, result: str):
+        with self._lock:
+            self.lookups += 1
+            if result == 'served':
+                self.served += 1
+            elif result == 'hinted':
+                self.hinted += 1
+        metrics.TM_LOOKUPS.inc(result=result)
+
+
+class _PairMemory:
+    """语言对的翻译记忆及已读入的结果文件"""
+
+    def __init__(self, max_entries: int):
+        self.memory = TranslationMemory(max_entries)
+        self.loaded = set()
+        # 各运行的语言对目录的修改时间，没有变化的目录不再列出文件
+        self.dir_mtimes = {}
+        self.lock = threading.Lock()
+
+
+_pairs = {}
+_pairs_lock = threading.Lock()
+_refresher_pid = None
+_refresher_wake = threading.Event()
+
+
+def get_memory(source_lang: str, target_lang: str) -> TranslationMemory:
+    """
+    获取语言对的翻译记忆
+
+    首次使用时登记该语言对，由后台线程读入 data/translations 下的全部结果（读入完成前只有
+    本进程新增的译文）；之后每 TM_REFRESH_SECONDS 秒读入新增的结果文件。
+    """
+    key = (source_lang, target_lang)
+    pair = _pairs.get(key)
+    if pair is None:
+        with _pairs_lock:
+            pair = _pairs.get(key)
+            if pair is None:
+                pair = _pairs[key] = _PairMemory(get_memory_config()['max_entries'])
+        _start_refresher()
+        _refresher_wake.set()
+    return pair.memory
+
+
+def _start_refresher():
+    """每个进程启动一次后台刷新线程"""
+    global _refresher_pid
+    if _refresher_pid == os.getpid():
+        return
+    with _pairs_lock:
+        if _refresher_pid == os.getpid():
+            return
+        _refresher_pid = os.getpid()
+
+        def loop():
+            while True:
+                with _pairs_lock:
+                    keys = list(_pairs)
+                for source_lang, target_lang in keys:
+                    try:
+                        refresh(source_lang, target_lang)
+                    except Exception as e:
+                        logger.warning(f"Refreshing translation memory {source_lang}-{target_lang} failed: {e}")
+                _refresher_wake.wait(max(get_memory_config()['refresh_seconds'], 1))
+                _refresher_wake.clear()
+
+        threading.Thread(target=loop, name='tm-refresher', daemon=True).start()
+
+
+def refresh(source_lang: str, target_lang: str):
+    """读入语言对尚未加入记忆的结果文件（只列出修改时间变化了的运行目录）"""
+    with _pairs_lock:
+        pair = _pairs.setdefault((source_lang, target_lang), _PairMemory(get_memory_config()['max_entries']))
+    with pair.lock:
+        started = time.perf_counter()
+        files = []
+        for pair_dir in (DATA_ROOT / 'translations').glob(f"*/{source_lang}-{target_lang}"):
+            try:
+                mtime = pair_dir.stat().st_mtime
+            except OSError:
+                continue
+            if pair.dir_mtimes.get(pair_dir) == mtime:
+                continue
+            pair.dir_mtimes[pair_dir] = mtime
+            files.extend(f for f in pair_dir.glob("line_*_translation.json") if f not in pair.loaded)
+        added = 0
+        for result_file in sorted(files, key=_mtime):
+            pair.loaded.add(result_file)
+            try:
+                with open(result_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.debug(f"Skipping unreadable translation result {result_file}: {e}")
+                continue
+            if data.get('source_text') and data.get('translation'):
+                pair.memory.add(data['source_text'], data['translation'])
+                added += 1
+        if added:
+            logger.info(f"Translation memory {source_lang}-{target_lang}: added {added} results "
+                        f"in {time.perf_counter() - started:.2f}s, {len(pair.memory)} entries")
+
+
+def _mtime(path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def consult(source_lang: str, target_lang: str, text: str) -> dict:
+    """
+    查询翻译记忆
+
+    Returns:
+        dict: served（归一化后与原文完全相同的条目，可直接返回；否则为None）、
+              hints（相似度不低于 TM_HINT_THRESHOLD 的参考译文列表）
+    """
+    config = get_memory_config()
+    memory = get_memory(source_lang, target_lang)
+    served = memory.exact(text)
+    if served is not None:
+        memory._count('served')
+        return {"served": served, "hints": []}
+    matches = memory.search(text, config['hint_threshold'], config['max_hints'])
+    memory._count('hinted' if matches else 'miss')
+    return {"served": None, "hints": matches}
+
+
+def remember(source_lang: str, target_lang: str, source_text: str, translation: str):
+    """把新的交互译文加入本进程的翻译记忆（不写文件）"""
+    get_memory(source_lang, target_lang).add(source_text, translation)
+
+
+def memory_stats() -> dict:
+    """已加载的各语言对的条目数与命中率"""
+    with _pairs_lock:
+        pairs = dict(_pairs)
+    return {f"{source}-{target}": pair.memory.stats() for (source, target), pair in sorted(pairs.items())}
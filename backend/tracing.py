@@ -0,0 +1,224 @@
+"""
+Line Tracing
+
+Each batch or playground line runs inside a trace: a root span plus child
+spans for the stages it goes through (prompt building, upstream calls, reference
+lookup, pre-screen, file writes). The current span lives in a contextvar, so
+services called from a batch worker attach their spans to that line's trace
+without passing anything around. When the root span ends, the whole trace is
+appended to TRACE_FILE as one JSON line; scripts/analyze_traces.py reads it.
+
+Outside a trace, span() and start_span() are no-ops.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import get_tracing_config
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """一个计时区间；时间以毫秒记录，相对于所属trace的开始时间"""
+
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'attrs', 'events', 'start', 'end')
+
+    def __init__(self, trace: '_Trace', name: str, parent_id: str = None, attrs: dict = None):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.events = {}
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def event(self, name: str):
+        """记录区间内某个时刻（只记第一次），如首个token到达"""
+        self.events.setdefault(name, round((time.perf_counter() - self.start) * 1000, 3))
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+            self.trace.add(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - self.trace.origin) * 1000, 3),
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+            "attrs": self.attrs,
+            "events": self.events,
+        }
+
+
+class _NoopSpan:
+    """不在trace中（或未被采样）时使用的空span"""
+
+    def set(self, **attrs):
+        pass
+
+    def event(self, name: str):
+        pass
+
+    def finish(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Trace:
+    def __init__(self, file: str):
+        self.trace_id = uuid.uuid4().hex
+        self.file = file
+        self.origin = time.perf_counter()
+        self.wall_start = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+
+_current = contextvars.ContextVar('tracing_span', default=None)
+_write_lock = threading.Lock()
+
+
+def current_span():
+    """当前span；不在trace中时返回空span"""
+    return _current.get() or NOOP_SPAN
+
+
+def current_trace_id():
+    span = _current.get()
+    return span.trace.trace_id if isinstance(span, Span) else None
+
+
+@contextmanager
+def trace(name: str, **attrs):
+    """
+    开始一条trace（根span），结束时写入TRACE_FILE
+
+    已在trace中时只作为子span，因此重试或嵌套调用不会拆出新的trace。
+    """
+    if _current.get() is not None:
+        with span(name, **attrs) as child:
+            yield child
+        return
+
+    config = get_tracing_config()
+    if not config['file'] or random.random() >= config['sample_rate']:
+        # Mark the context so nested trace() calls stay untraced as well
+        token = _current.set(NOOP_SPAN)
+        try:
+            yield NOOP_SPAN
+        finally:
+            _current.reset(token)
+        return
+
+    root = Span(_Trace(config['file']), name, attrs=attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current.reset(token)
+        root.finish()
+        _export(root)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """在当前trace中开始一个子span，并在其中成为当前span"""
+    parent = _current.get()
+    if not isinstance(parent, Span):
+        yield NOOP_SPAN
+        return
+    child = Span(parent.trace, name, parent.span_id, attrs)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set(error=type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        child.finish()
+
+
+def start_span(name: str, **attrs):
+    """
+    开始一个叶子span，由调用方 finish()
+
+    不会成为当前span，所以可以在另一个线程或生成器中结束（例如流式上游调用）。
+    """
+    parent = _current.get()
+    if not isinstance(parent, Span):
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent.span_id, attrs)
+
+
+def traced(name: str, *arg_names: str):
+    """
+    装饰器：每次调用作为一条trace，arg_names 指定的参数记为根span属性
+
+    简单类型的返回值记为 result 属性。
+    """
+    def decorator(function):
+        import inspect
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            with trace(name, **{key: arguments.get(key) for key in arg_names}) as root:
+                result = function(*args, **kwargs)
+                if result is None or isinstance(result, (bool, int, float, str)):
+                    root.set(result=result)
+                return result
+        return wrapper
+    return decorator
+
+
+def _export(root: Span):
+    trace = root.trace
+    record = {
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "start": round(trace.wall_start, 3),
+        "duration_ms": round((root.end - root.start) * 1000, 3),
+        "pid": os.getpid(),
+        "attrs": root.attrs,
+        "spans": [span.to_dict() for span in sorted(trace.spans, key=lambda s: s.start) if span is not root],
+    }
+    line = (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+    try:
+        with _write_lock:
+            Path(trace.file).parent.mkdir(parents=True, exist_ok=True)
+            # One O_APPEND write per trace keeps lines whole when several workers share the file
+            fd = os.open(trace.file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+    except OSError as e:
+        logger.warning(f"Could not export trace {trace.trace_id}: {e}")
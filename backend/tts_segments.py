@@ -0,0 +1,135 @@
+"""
+Long-text TTS helpers
+
+Text longer than one segment is split into segments that are synthesized
+separately. Consecutive paragraphs that fit in one segment are merged into it;
+a longer paragraph is split at sentence boundaries into segments of its own, so
+editing it leaves the segments of other long paragraphs (and their cached
+audio) unchanged. Text that fits in one segment is never split. The segment MP3s are joined frame by frame after stripping the ID3
+tags and Xing/Info header frames that would otherwise play as glitches or make
+players misreport the duration.
+"""
+
+import re
+from typing import List
+
+# MiniMax t2a_v2 accepts at most this many characters per request
+MAX_TEXT_CHARS = 2000
+
+_SENTENCE_END = re.compile(r'(?:[。！？；!?;…]+|\.+(?=\s|$))[”’"\'」』）)\]]*\s*')
+_SOFT_BREAKS = '，,、：: '
+
+# Bitrates (kbps) by index for MPEG-1 and MPEG-2/2.5 Layer III
+_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    25: [11025, 12000, 8000],
+}
+
+
+def split_sentences(text: str) -> List[str]:
+    """按句末标点切分，标点和其后的引号、括号、空白归入前一句"""
+    sentences, start = [], 0
+    for match in _SENTENCE_END.finditer(text):
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    if start < len(text):
+        sentences.append(text[start:])
+    return [s for s in sentences if s.strip()]
+
+
+def _split_long_sentence(sentence: str, max_chars: int) -> List[str]:
+    """超长句子优先在逗号等停顿处切开，找不到合适位置时硬切"""
+    pieces = []
+    while len(sentence) > max_chars:
+        window = sentence[:max_chars]
+        cut = max(window.rfind(c) for c in _SOFT_BREAKS) + 1
+        if cut < max_chars // 2:
+            cut = max_chars
+        pieces.append(sentence[:cut])
+        sentence = sentence[cut:]
+    pieces.append(sentence)
+    return pieces
+
+
+def split_text(text: str, segment_chars: int) -> List[str]:
+    """
+    将长文本切分为不超过 segment_chars 字的片段
+
+    放得下的相邻段落连同换行贪心合并为一段，不足一次请求的文本不切分；超长段落单独按句子贪心合并，
+    片段不跨越它的首尾换行，修改它不影响其他超长段落的切分。
+
+    Returns:
+        list: 去除首尾空白后的非空片段
+    """
+    segment_chars = max(1, min(segment_chars, MAX_TEXT_CHARS))
+    segments, merged = [], ''
+    for paragraph in text.split('\n'):
+        if len(paragraph.strip()) <= segment_chars:
+            joined = f"{merged}\n{paragraph}" if merged else paragraph
+            if len(joined.strip()) > segment_chars:
+                segments.append(merged)
+                joined = paragraph
+            merged = joined
+            continue
+        segments.append(merged)
+        merged = current = ''
+        for sentence in split_sentences(paragraph):
+            for piece in _split_long_sentence(sentence, segment_chars):
+                if current and len(current) + len(piece) > segment_chars:
+                    segments.append(current)
+                    current = ''
+                current += piece
+        segments.append(current)
+    segments.append(merged)
+    return [s.strip() for s in segments if s.strip()]
+
+
+def _frame_length(header: bytes) -> int:
+    """MPEG Layer III 帧长度（字节），不是有效帧头时返回0"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return 0
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    if version_bits == 1 or layer_bits != 1:
+        return 0
+    version = {3: 1, 2: 2, 0: 25}[version_bits]
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if bitrate_index in (0, 15) or rate_index == 3:
+        return 0
+    bitrate = _BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    return (144 if version == 1 else 72) * bitrate // sample_rate + padding
+
+
+def strip_tags(data: bytes) -> bytes:
+    """去掉开头的ID3v2标签与Xing/Info/VBRI帧、结尾的ID3v1标签，只保留音频帧"""
+    start = 0
+    while data[start:start + 3] == b'ID3' and len(data) >= start + 10:
+        size = 0
+        for byte in data[start + 6:start + 10]:
+            size = (size << 7) | (byte & 0x7F)
+        footer = 10 if data[start + 5] & 0x10 else 0
+        start += 10 + size + footer
+
+    end = len(data)
+    if end - start >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+
+    length = _frame_length(data[start:start + 4])
+    if length and any(tag in data[start + 4:start + 48] for tag in (b'Xing', b'Info', b'VBRI')):
+        start += length
+    return data[start:end]
+
+
+def concat_mp3(parts: List[bytes]) -> bytes:
+    """按顺序拼接多段MP3"""
+    if len(parts) == 1:
+        return parts[0]
+    return b''.join(strip_tags(part) for part in parts)
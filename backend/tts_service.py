@@ -6,17 +6,111 @@ import requests
 import json
 import logging
 import base64
+import binascii
+import itertools
+import queue
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict
 from config import get_tts_config, TTS_VOICE_MAPPING
+from audio_cache import get_audio_cache, cache_key
+from limits import get_budget
+from metrics import UpstreamCall, cache_lookup
+from tts_segments import MAX_TEXT_CHARS, split_text, concat_mp3
 
 logger = logging.getLogger(__name__)
 
+_HEX_RE = re.compile(r'^[0-9a-fA-F]+$')
+
+
+class TTSStreamError(Exception):
+    """流式合成过程中上游返回的错误"""
+
+
+def decode_audio(payload: str) -> Optional[bytes]:
+    """解码MiniMax返回的音频（t2a_v2为hex编码，也兼容base64），无法解码时返回None"""
+    if not payload:
+        return None
+    if len(payload) % 2 == 0 and _HEX_RE.match(payload):
+        return bytes.fromhex(payload)
+    try:
+        return base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
 class TTSService:
     """MiniMax文字转语音服务"""
     
-    def __init__(self):
+    def __init__(self, cache=None):
         self.config = get_tts_config()
+        # cache=False disables the audio cache for this instance
+        self.cache = get_audio_cache() if cache is None else (cache or None)
+
+    def audio_key(self, text: str, voice_id: str, fmt: str = 'mp3') -> str:
+        """当前声音设置下该文本音频的缓存键"""
+        voice_setting = self.config['voice_setting']
+        return cache_key(text, voice_id, voice_setting['speed'], voice_setting['vol'], voice_setting['pitch'],
+                         fmt, self.config['model'])
     
+    def _build_request(self, text: str, voice_id: str, stream: bool) -> tuple:
+        """构造MiniMax请求，返回 (url, headers, request_data)"""
+        # 准备请求数据
+        request_data = {
+            "model": self.config['model'],
+            "text": text,
+            "stream": stream,
+            "voice_setting": {
+                "voice_id": voice_id,
+                "speed": self.config['voice_setting']['speed'],
+                "vol": self.config['voice_setting']['vol'],
+                "pitch": self.config['voice_setting']['pitch']
+            },
+            "audio_setting": {
+                "sample_rate": 32000,
+                "bitrate": 128000,
+                "format": "mp3"
+            }
+        }
+        
+        headers = {
+            'Authorization': f'Bearer {self.config["api_key"]}',
+            'Content-Type': 'application/json'
+        }
+        
+        # 添加Group ID到URL参数
+        url = f"{self.config['api_url']}?GroupId={self.config['group_id']}"
+        return url, headers, request_data
+
+    def _check_request(self, text: str) -> tuple:
+        """
+        校验凭证与文本，超长文本截断到2000字
+
+        Returns:
+            tuple: (截断后的文本, 错误信息或None)
+        """
+        if not self.config['api_key'] or not self.config['group_id']:
+            logger.error("MiniMax API key or Group ID not available")
+            return text, "MiniMax API credentials not found"
+        
+        if not text or len(text.strip()) == 0:
+            logger.warning("Empty text provided for TTS")
+            return text, "Text is required"
+        
+        # 限制文本长度（MiniMax限制），更长的文本请用 long_text_to_speech
+        if len(text) > MAX_TEXT_CHARS:
+            logger.warning(f"Text too long ({len(text)} chars), truncating to {MAX_TEXT_CHARS}")
+            text = text[:MAX_TEXT_CHARS]
+        return text, None
+
+    def cached_key(self, text: str, language: str = 'zh') -> Optional[str]:
+        """该文本的音频已在缓存中时返回缓存键，否则返回None"""
+        if not self.cache or not text or not text.strip():
+            return None
+        key = self.audio_key(text, TTS_VOICE_MAPPING.get(language, 'male-qn-qingse'))
+        return key if self.cache.get(key) else None
+
     def text_to_speech(self, text: str, language: str = 'zh') -> Dict:
         """
         将文字转换为语音
@@ -26,65 +120,52 @@ class TTSService:
             language: 语言代码 (en, zh, ja, pt, es)
             
         Returns:
-            dict: 包含success状态和音频数据的字典
+            dict: 包含success状态和音频数据的字典；cache_key 可用于 /api/tts/audio/<key>，
+                  cached 表示结果来自磁盘缓存
         """
         logger.info(f"Starting TTS conversion: language={language}, text_length={len(text)}")
         
-        if not self.config['api_key'] or not self.config['group_id']:
-            logger.error("MiniMax API key or Group ID not available")
-            return {"success": False, "error": "MiniMax API credentials not found"}
-        
-        if not text or len(text.strip()) == 0:
-            logger.warning("Empty text provided for TTS")
-            return {"success": False, "error": "Text is required"}
-        
-        # 限制文本长度（MiniMax限制）
-        if len(text) > 2000:
-            logger.warning(f"Text too long ({len(text)} chars), truncating to 2000")
-            text = text[:2000]
+        text, error = self._check_request(text)
+        if error:
+            return {"success": False, "error": error}
         
         try:
             # 根据语言选择合适的声音
             voice_id = TTS_VOICE_MAPPING.get(language, 'male-qn-qingse')
-            
-            # 准备请求数据
-            request_data = {
-                "model": self.config['model'],
-                "text": text,
-                "stream": False,
-                "voice_setting": {
+
+            key = self.audio_key(text, voice_id)
+            cached = self.cache.read(key) if self.cache else None
+            if self.cache:
+                cache_lookup('audio', cached is not None)
+            if cached is not None:
+                logger.info(f"TTS cache hit: {key[:12]}, {len(cached)} bytes")
+                return {
+                    "success": True,
+                    "audio_data": base64.b64encode(cached).decode('ascii'),
+                    "format": "mp3",
                     "voice_id": voice_id,
-                    "speed": self.config['voice_setting']['speed'],
-                    "vol": self.config['voice_setting']['vol'],
-                    "pitch": self.config['voice_setting']['pitch']
-                },
-                "audio_setting": {
-                    "sample_rate": 32000,
-                    "bitrate": 128000,
-                    "format": "mp3"
+                    "text_length": len(text),
+                    "cache_key": key,
+                    "cached": True
                 }
-            }
-            
-            headers = {
-                'Authorization': f'Bearer {self.config["api_key"]}',
-                'Content-Type': 'application/json'
-            }
             
-            # 添加Group ID到URL参数
-            url = f"{self.config['api_url']}?GroupId={self.config['group_id']}"
+            url, headers, request_data = self._build_request(text, voice_id, stream=False)
             
             logger.info(f"Making TTS API call to {url}")
             logger.debug(f"Request data: {json.dumps(request_data, ensure_ascii=False, indent=2)}")
             
-            response = requests.post(
-                url,
-                headers=headers,
-                data=json.dumps(request_data, ensure_ascii=False).encode('utf-8'),
-                timeout=30
-            )
-            
-            response.raise_for_status()
-            response_data = response.json()
+            with UpstreamCall('tts', 't2a') as call:
+                response = requests.post(
+                    url,
+                    headers=headers,
+                    data=json.dumps(request_data, ensure_ascii=False).encode('utf-8'),
+                    timeout=30
+                )
+                
+                response.raise_for_status()
+                response_data = response.json()
+                if (response_data.get('base_resp') or {}).get('status_code') != 0:
+                    call.fail()
             
             logger.info(f"TTS API response received, status: {response.status_code}")
             
@@ -95,15 +176,29 @@ class TTSService:
                 'base_resp' in response_data and 
                 response_data['base_resp'].get('status_code') == 0):
                 
-                audio_base64 = response_data['data']['audio']
-                logger.info(f"TTS conversion successful, audio data length: {len(audio_base64)}")
-                
+                audio_payload = response_data['data']['audio']
+                logger.info(f"TTS conversion successful, audio data length: {len(audio_payload)}")
+
+                # Normalize to base64 for the client and keep the raw bytes on disk
+                audio_bytes = decode_audio(audio_payload)
+                stored = False
+                if audio_bytes is not None:
+                    audio_payload = base64.b64encode(audio_bytes).decode('ascii')
+                    if self.cache:
+                        try:
+                            self.cache.put(key, audio_bytes)
+                            stored = True
+                        except OSError as e:
+                            logger.warning(f"Could not cache TTS audio: {e}")
+
                 return {
                     "success": True,
-                    "audio_data": audio_base64,
+                    "audio_data": audio_payload,
                     "format": "mp3",
                     "voice_id": voice_id,
-                    "text_length": len(text)
+                    "text_length": len(text),
+                    "cache_key": key if stored else None,
+                    "cached": False
                 }
             else:
                 # 记录详细的错误信息
@@ -120,6 +215,267 @@ class TTSService:
             logger.error(f"Unexpected error during TTS conversion: {e}")
             return {"success": False, "error": f"Unexpected error: {str(e)}"}
     
+    def long_text_to_speech(self, text: str, language: str = 'zh', budget=None) -> Dict:
+        """
+        长文本转语音：按句切分后并发合成各段，再按顺序拼接为一段MP3
+
+        每段单独缓存，修改文本后只重新合成变化的段；每段调用占用一个TTS预算槽位，
+        并发数不超过预算上限。只有一段时等同于 text_to_speech。
+
+        Returns:
+            dict: 与 text_to_speech 相同，另含 segments（段数）与 segments_cached（命中缓存的段数）
+        """
+        budget = budget or get_budget('tts')
+        segments = split_text(text, self.config.get('segment_chars', MAX_TEXT_CHARS))
+        if len(segments) <= 1:
+            with budget.slot():
+                result = self.text_to_speech(text, language)
+            if result['success']:
+                result.update(segments=1, segments_cached=int(result['cached']))
+            return result
+
+        logger.info(f"Starting long TTS: language={language}, text_length={len(text)}, "
+                    f"{len(segments)} segments")
+        _, error = self._check_request(text)
+        if error:
+            return {"success": False, "error": error}
+        voice_id = TTS_VOICE_MAPPING.get(language, 'male-qn-qingse')
+        key = self.audio_key(text, voice_id)
+        cached = self.cache.read(key) if self.cache else None
+        if self.cache:
+            cache_lookup('audio', cached is not None)
+        if cached is not None:
+            logger.info(f"TTS cache hit: {key[:12]}, {len(cached)} bytes")
+            return {"success": True, "audio_data": base64.b64encode(cached).decode('ascii'), "format": "mp3",
+                    "voice_id": voice_id, "text_length": len(text), "cache_key": key, "cached": True,
+                    "segments": len(segments), "segments_cached": len(segments)}
+
+        def synthesize(segment: str) -> Dict:
+            # Cached segments need no upstream call, so they skip the budget
+            segment_cached = self.cache.get(self.audio_key(segment, voice_id)) if self.cache else None
+            if segment_cached is not None:
+                return self.text_to_speech(segment, language)
+            with budget.slot():
+                return self.text_to_speech(segment, language)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(len(segments), budget.max_concurrency)) as executor:
+            futures = [executor.submit(synthesize, segment) for segment in segments]
+            results = []
+            for index, future in enumerate(futures, 1):
+                result = future.result()
+                if not result['success']:
+                    for pending in futures:
+                        pending.cancel()
+                    logger.error(f"Long TTS failed at segment {index}/{len(segments)}: {result['error']}")
+                    return {"success": False, "error": f"Segment {index}/{len(segments)}: {result['error']}"}
+                results.append(result)
+
+        try:
+            audio = concat_mp3([base64.b64decode(r['audio_data'], validate=True) for r in results])
+        except (binascii.Error, ValueError):
+            return {"success": False, "error": "TTS API returned audio that could not be decoded"}
+        segments_cached = sum(1 for r in results if r['cached'])
+        logger.info(f"Long TTS done: {len(segments)} segments ({segments_cached} cached), "
+                    f"{len(audio)} bytes in {time.perf_counter() - started:.2f}s")
+
+        stored = False
+        if self.cache:
+            try:
+                self.cache.put(key, audio)
+                stored = True
+            except OSError as e:
+                logger.warning(f"Could not cache TTS audio: {e}")
+        return {"success": True, "audio_data": base64.b64encode(audio).decode('ascii'), "format": "mp3",
+                "voice_id": voice_id, "text_length": len(text), "cache_key": key if stored else None,
+                "cached": False, "segments": len(segments), "segments_cached": segments_cached}
+
+    def synthesize_many(self, items: list, budget=None):
+        """
+        批量合成：相同的 (text, language) 只合成一次，按完成顺序逐条产出事件
+
+        各条按提交顺序排队，靠前的行先完成，适合边播放边预取。每条产出
+        {"type": "audio", "index", "success", "cache_key", "cached", "segments"}
+        （无缓存时附带 audio_data），失败时为 success=False 与 error；
+        最后产出 {"type": "summary", "count", "unique", "cached", "failed", "seconds"}。
+        提前关闭生成器会取消尚未开始的合成。
+
+        Args:
+            items: [{"text": ..., "language": ...}, ...]
+        """
+        budget = budget or get_budget('tts')
+        started = time.perf_counter()
+        groups = {}
+        for index, item in enumerate(items):
+            groups.setdefault(((item.get('text') or '').strip(), item.get('language') or 'zh'), []).append(index)
+
+        def synthesize(text, language, indexes):
+            try:
+                result = self.long_text_to_speech(text, language, budget=budget)
+            except Exception as e:
+                logger.error(f"Batch TTS item failed: {e}", exc_info=True)
+                result = {"success": False, "error": f"Unexpected error: {str(e)}"}
+            events.put((indexes, result))
+
+        events = queue.Queue()
+        # Segments and single clips take budget slots themselves; the pool only bounds queued work
+        executor = ThreadPoolExecutor(max_workers=budget.max_concurrency)
+        summary = {"type": "summary", "count": len(items), "unique": len(groups), "cached": 0, "failed": 0}
+        try:
+            for (text, language), indexes in groups.items():
+                executor.submit(synthesize, text, language, indexes)
+
+            for _ in range(len(groups)):
+                indexes, result = events.get()
+                if result['success']:
+                    event = {"type": "audio", "success": True, "cache_key": result.get('cache_key'),
+                             "cached": result['cached'], "segments": result.get('segments', 1)}
+                    if not result.get('cache_key'):
+                        event["audio_data"] = result['audio_data']
+                    summary["cached"] += len(indexes) if result['cached'] else 0
+                else:
+                    event = {"type": "audio", "success": False, "error": result['error']}
+                    summary["failed"] += len(indexes)
+                for index in indexes:
+                    yield {**event, "index": index}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(f"Batch TTS done: {summary}")
+        yield summary
+
+    def stream_text_to_speech(self, text: str, language: str = 'zh') -> Dict:
+        """
+        流式文字转语音：上游每生成一段音频就转发一段
+
+        首段音频到达（或出错）后才返回，因此连接和鉴权错误仍以 success=False 报告。
+        超过 MAX_TEXT_CHARS 的文本不截断，直接以 success=False 拒绝，应改用 long_text_to_speech。
+        迭代 chunks 得到MP3字节块；stats 在迭代过程中更新：ttfa（请求到首段音频的秒数）、
+        chunks、bytes、seconds（总耗时）。完整音频在流结束后写入缓存。
+
+        Returns:
+            dict: success、chunks、stats、voice_id、cache_key、cached，或 success=False 与 error
+        """
+        logger.info(f"Starting streaming TTS: language={language}, text_length={len(text)}")
+        if len(text) > MAX_TEXT_CHARS:
+            # Truncating would silently drop the tail; /api/tts synthesizes long text in segments
+            return {"success": False, "error": f"Text too long for streaming ({len(text)} > {MAX_TEXT_CHARS} "
+                                               f"characters); use /api/tts"}
+        text, error = self._check_request(text)
+        if error:
+            return {"success": False, "error": error}
+
+        voice_id = TTS_VOICE_MAPPING.get(language, 'male-qn-qingse')
+        key = self.audio_key(text, voice_id)
+        started = time.perf_counter()
+        stats = {"ttfa": None, "chunks": 0, "bytes": 0, "seconds": None}
+
+        cached = self.cache.read(key) if self.cache else None
+        if self.cache:
+            cache_lookup('audio', cached is not None)
+        if cached is not None:
+            stats.update(ttfa=round(time.perf_counter() - started, 4), chunks=1, bytes=len(cached), seconds=0.0)
+            return {"success": True, "chunks": iter([cached]), "stats": stats, "voice_id": voice_id,
+                    "cache_key": key, "cached": True}
+
+        url, headers, request_data = self._build_request(text, voice_id, stream=True)
+        call = UpstreamCall('tts', 't2a_stream')
+        try:
+            response = requests.post(
+                url,
+                headers=headers,
+                data=json.dumps(request_data, ensure_ascii=False).encode('utf-8'),
+                timeout=(10, 30),
+                stream=True
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            call.finish(e)
+            logger.error(f"Streaming TTS request failed: {e}")
+            return {"success": False, "error": f"API request failed: {str(e)}"}
+
+        chunks = self._relay_stream(response, key, started, stats, call)
+        try:
+            first = next(chunks)
+        except StopIteration:
+            return {"success": False, "error": "TTS API returned no audio"}
+        except (TTSStreamError, requests.exceptions.RequestException) as e:
+            logger.error(f"Streaming TTS failed before the first chunk: {e}")
+            return {"success": False, "error": str(e)}
+        logger.info(f"Streaming TTS first audio after {stats['ttfa']:.3f}s")
+        return {"success": True, "chunks": itertools.chain([first], chunks), "stats": stats,
+                "voice_id": voice_id, "cache_key": key, "cached": False}
+
+    def _relay_stream(self, response, key: str, started: float, stats: dict, call: UpstreamCall = None):
+        """
+        解析MiniMax的SSE流并逐段产出音频字节
+
+        每个事件形如 data: {"data": {"audio": "<hex>", "status": 1}, "base_resp": {...}}；
+        status=2 的最后一个事件重复携带完整音频，跳过。只有收到该事件才缓存音频：
+        没有它就结束的流可能被截断。
+        """
+        parts = []
+        complete = False
+        error = None
+        try:
+            for line in response.iter_lines(chunk_size=None):
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith(b'data:'):
+                    line = line[5:].strip()
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    logger.debug(f"Skipping non-JSON stream line: {line[:80]!r}")
+                    continue
+
+                base_resp = event.get('base_resp') or {}
+                if base_resp.get('status_code', 0) != 0:
+                    if call:
+                        call.fail()
+                    raise TTSStreamError(f"TTS API error: {base_resp.get('status_msg', 'unknown')} "
+                                         f"(code: {base_resp.get('status_code')})")
+                data = event.get('data') or {}
+                if data.get('status') == 2:
+                    complete = True
+                    break
+                audio = decode_audio(data.get('audio') or '')
+                if not audio:
+                    continue
+                if stats['ttfa'] is None:
+                    stats['ttfa'] = round(time.perf_counter() - started, 4)
+                    if call:
+                        call.first_token()
+                stats['chunks'] += 1
+                stats['bytes'] += len(audio)
+                parts.append(audio)
+                yield audio
+            else:
+                # The clip may be cut short, so it is relayed but not cached
+                logger.warning(f"TTS stream ended without its final event after {stats['chunks']} chunks; "
+                               f"audio not cached")
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            response.close()
+            stats['seconds'] = round(time.perf_counter() - started, 4)
+            if call:
+                if error is None and not parts:
+                    call.fail()
+                # A client that disconnects closes the generator; that is not an upstream failure
+                call.finish(error if isinstance(error, Exception) else None)
+
+        logger.info(f"Streaming TTS finished: ttfa={stats['ttfa']}s, {stats['chunks']} chunks, "
+                    f"{stats['bytes']} bytes in {stats['seconds']}s")
+        if complete and parts and self.cache:
+            try:
+                self.cache.put(key, b''.join(parts))
+            except OSError as e:
+                logger.warning(f"Could not cache streamed TTS audio: {e}")
+
     def get_supported_voices(self, language: str = None) -> Dict:
         """
         获取支持的声音列表
@@ -0,0 +1,168 @@
+"""
+LLM Token Usage Accounting
+
+Every upstream chat call reports a usage record: prompt, completion and total
+tokens, as reported by the provider's `usage` block or estimated from the text
+when the block is absent, plus the call's latency. A UsageLedger adds up the
+records of one batch run and derives throughput (tokens/s over the run's wall
+time), latency per completion token and, when prices are configured, the cost.
+
+Failed calls are recorded too, with the prompt they sent and whatever
+completion arrived before the failure: the provider may bill them, and a run's
+cost should include them. A translation whose stream failed and was retried
+without streaming reports one record covering both calls (see combine_records).
+"""
+
+import math
+import re
+import threading
+import time
+from typing import Optional
+
+# Han, kana and hangul are roughly one token per character in common BPE vocabularies
+_WIDE_CHARS = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+# Other scripts average about four characters per token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计文本的token数（接口未返回usage时使用）"""
+    if not text:
+        return 0
+    wide = len(_WIDE_CHARS.findall(text))
+    return wide + math.ceil((len(text) - wide) / CHARS_PER_TOKEN)
+
+
+def usage_record(reported: Optional[dict], prompt_text: str, completion_text: str, latency: float) -> dict:
+    """
+    一次调用的用量记录：优先使用接口返回的usage，缺失的字段按文本估计
+
+    Returns:
+        dict: prompt_tokens、completion_tokens、total_tokens、estimated（是否含估计值）、latency_ms
+    """
+    reported = reported if isinstance(reported, dict) else {}
+    estimated = False
+    counts = {}
+    for kind, text in (('prompt_tokens', prompt_text), ('completion_tokens', completion_text)):
+        value = reported.get(kind)
+        if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+            counts[kind] = value
+        else:
+            counts[kind] = estimate_tokens(text)
+            estimated = True
+    return {
+        **counts,
+        "total_tokens": counts['prompt_tokens'] + counts['completion_tokens'],
+        "estimated": estimated,
+        "latency_ms": round(latency * 1000, 1),
+    }
+
+
+class UsageLedger:
+    """
+    一次批量运行的token用量账本（线程安全）
+
+    price_prompt / price_completion 为每百万token的价格，均为0时不计算费用。
+    """
+
+    def __init__(self, model: str = None, price_prompt: float = 0.0, price_completion: float = 0.0):
+        self.model = model
+        self.price_prompt = price_prompt
+        self.price_completion = price_completion
+        self.started = time.time()
+        self._calls = 0
+        self._estimated = 0
+        self._prompt = 0
+        self._completion = 0
+        self._latency_ms = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'UsageLedger':
+        """按 get_translation_config() / get_evaluation_config() 的模型与价格创建"""
+        return cls(config.get('model'), config.get('price_prompt', 0.0), config.get('price_completion', 0.0))
+
+    def add(self, usage: Optional[dict]):
+        """记入一次调用（或 combine_records 合并的多次调用）的用量记录（None 忽略，例如本地预筛选的行）"""
+        if not usage:
+            return
+        calls = usage.get('calls', 1)
+        with self._lock:
+            self._calls += calls
+            self._estimated += usage.get('estimated_calls', calls if usage.get('estimated') else 0)
+            self._prompt += usage.get('prompt_tokens', 0)
+            self._completion += usage.get('completion_tokens', 0)
+            self._latency_ms += usage.get('latency_ms', 0.0)
+
+    def as_dict(self) -> dict:
+        """汇总：token数、吞吐、每token延迟与费用"""
+        with self._lock:
+            calls, estimated = self._calls, self._estimated
+            prompt, completion, latency_ms = self._prompt, self._completion, self._latency_ms
+        wall = time.time() - self.started
+        total = prompt + completion
+        summary = {
+            "model": self.model,
+            "calls": calls,
+            "estimated_calls": estimated,
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "total_tokens": total,
+            "wall_seconds": round(wall, 2),
+            "upstream_seconds": round(latency_ms / 1000, 2),
+            "tokens_per_second": round(total / wall, 2) if wall > 0 else None,
+            "completion_tokens_per_second": round(completion / wall, 2) if wall > 0 else None,
+            # Mean upstream time per generated token, including the time to first token
+            "ms_per_completion_token": round(latency_ms / completion, 2) if completion else None,
+        }
+        if self.price_prompt or self.price_completion:
+            summary["cost"] = round((prompt * self.price_prompt + completion * self.price_completion) / 1e6, 6)
+        return summary
+
+
+def combine_records(*records: Optional[dict]) -> Optional[dict]:
+    """
+    合并同一结果先后发出的多次调用的用量记录（例如流式失败后的非流式重试）
+
+    Returns:
+        dict: 与 usage_record 相同，另含 calls 与 estimated_calls；没有记录时为None
+    """
+    records = [record for record in records if record]
+    if not records:
+        return None
+    combined = {kind: sum(record.get(kind, 0) for record in records)
+                for kind in ('prompt_tokens', 'completion_tokens', 'total_tokens')}
+    calls = [record.get('calls', 1) for record in records]
+    estimated_calls = sum(record.get('estimated_calls', calls[i] if record.get('estimated') else 0)
+                          for i, record in enumerate(records))
+    return {
+        **combined,
+        "estimated": estimated_calls > 0,
+        "latency_ms": round(sum(record.get('latency_ms', 0.0) for record in records), 1),
+        "calls": sum(calls),
+        "estimated_calls": estimated_calls,
+    }
+
+
+def merge_usage(usages: list) -> Optional[dict]:
+    """合并多个账本汇总（例如同一运行的各语言对），吞吐与每token延迟按合计重新计算"""
+    usages = [usage for usage in usages if isinstance(usage, dict)]
+    if not usages:
+        return None
+    merged = {key: sum(usage.get(key) or 0 for usage in usages)
+              for key in ('calls', 'estimated_calls', 'prompt_tokens', 'completion_tokens', 'total_tokens')}
+    wall = sum(usage.get('wall_seconds') or 0 for usage in usages)
+    upstream = sum(usage.get('upstream_seconds') or 0 for usage in usages)
+    models = {usage.get('model') for usage in usages}
+    merged.update({
+        "model": models.pop() if len(models) == 1 else None,
+        "wall_seconds": round(wall, 2),
+        "upstream_seconds": round(upstream, 2),
+        "tokens_per_second": round(merged['total_tokens'] / wall, 2) if wall > 0 else None,
+        "completion_tokens_per_second": round(merged['completion_tokens'] / wall, 2) if wall > 0 else None,
+        "ms_per_completion_token": (round(upstream * 1000 / merged['completion_tokens'], 2)
+                                    if merged['completion_tokens'] else None),
+    })
+    if any('cost' in usage for usage in usages):
+        merged["cost"] = round(sum(usage.get('cost') or 0 for usage in usages), 6)
+    return merged
@@ -5,7 +5,6 @@ Utility functions and logging setup
 import logging
 from pathlib import Path
 from config import LOGGING_CONFIG
-from langdetect import detect
 
 def setup_logging():
     """配置日志系统"""
@@ -27,9 +26,9 @@ def setup_logging():
 
 def format_run_id(run_id: str) -> str:
     """格式化运行ID为可读格式"""
-    # Convert YYYYMMDD_HHMM to readable format
+    # Convert YYYYMMDD_HHMM (command line) or YYYYMMDD_HHMMSS_xxxxxxxx (background jobs) to readable format
     import re
-    if re.match(r'^\d{8}_\d{4}$', run_id):
+    if re.match(r'^\d{8}_\d{4}(\d{2}_[0-9a-f]+)?$', run_id):
         date = run_id[:8]
         time = run_id[9:]
         year = date[:4]
@@ -37,8 +36,9 @@ def format_run_id(run_id: str) -> str:
         day = date[6:8]
         hour = time[:2]
         minute = time[2:4]
+        second = f":{time[4:6]}" if len(time) > 4 else ""
         
-        return f"{year}-{month}-{day} {hour}:{minute}"
+        return f"{year}-{month}-{day} {hour}:{minute}{second}"
     return run_id
 
 def escape_html(text: str) -> str:
@@ -70,34 +70,33 @@ def validate_language_pair(source_lang: str, target_lang: str) -> tuple[bool, st
     
     return True, ""
 
-LANG_MAP = {
-    'zh-cn': 'zh',
-    'zh-tw': 'zh',
-    'zh': 'zh',
-    'en': 'en',
-    'ja': 'ja',
-    'es': 'es',
-    'pt': 'pt',
-    'ko': 'ko'
-}
-
-def detect_language(text: str) -> str:
-    """自动检测文本语言，返回简化语言代码(zh,en,ja,es,pt)"""
-    try:
-        lang_code = detect(text)
-        return LANG_MAP.get(lang_code, lang_code)
-    except Exception:
-        return 'en'
+def detect_language(text: str):
+    """自动检测文本语言，返回简化语言代码(zh,en,ja,es,pt,ko)，无法判断时返回None"""
+    from language_detection import get_language_detector
+    result = get_language_detector().detect(text)
+    logging.debug(f"Language detection: {result}")
+    return result['language']
 
 # ========= Data Handling Utilities =========
 
 import json
 from datetime import datetime
-from config import PROJECT_ROOT
+from config import PROJECT_ROOT, DATA_ROOT, DEFAULT_VERSION
+from refstore import get_reference_store
+
+def find_reference(source_lang: str, target_lang: str, source_text: str, line_number: int = None):
+    """
+    Find the human reference translation for a test-suite sentence.
+
+    All language suites are line-aligned translations of each other, so the
+    reference for line N of the source suite is line N of the target suite.
+    Returns None when the source text is not a suite sentence.
+    """
+    return get_reference_store().lookup(source_lang, target_lang, source_text, line_number)
 
 def load_test_cases(lang: str) -> list:
     """Load test cases for a specific language"""
-    test_file = PROJECT_ROOT / f"data/testcases/{lang}/test_suite.txt"
+    test_file = DATA_ROOT / f"testcases/{lang}/test_suite.txt"
     if not test_file.exists():
         logging.warning(f"Test file not found: {test_file}")
         return []
@@ -111,7 +110,7 @@ def load_test_cases(lang: str) -> list:
 def save_translation_result(source_lang: str, target_lang: str, line_number: int,
                           source_text: str, translation: str, run_id: str):
     """Save translation result to file"""
-    translations_dir = PROJECT_ROOT / f"data/translations/{run_id}/{source_lang}-{target_lang}"
+    translations_dir = DATA_ROOT / f"translations/{run_id}/{source_lang}-{target_lang}"
     translations_dir.mkdir(parents=True, exist_ok=True)
 
     result_file = translations_dir / f"line_{line_number}_translation.json"
@@ -133,9 +132,11 @@ def save_translation_result(source_lang: str, target_lang: str, line_number: int
 
 def save_evaluation_result(source_lang: str, target_lang: str, line_number: int,
                          source_text: str, translation: str, score: int,
-                         justification: str, eval_run_id: str):
+                         justification: str, eval_run_id: str,
+                         bleu_score: float = None, chrf_score: float = None,
+                         prescreen: dict = None):
     """Save evaluation result to file"""
-    evaluations_dir = PROJECT_ROOT / f"data/evaluations/{eval_run_id}/{source_lang}-{target_lang}"
+    evaluations_dir = DATA_ROOT / f"evaluations/{eval_run_id}/{source_lang}-{target_lang}"
     evaluations_dir.mkdir(parents=True, exist_ok=True)
 
     result_file = evaluations_dir / f"line_{line_number}_evaluation.json"
@@ -148,6 +149,9 @@ def save_evaluation_result(source_lang: str, target_lang: str, line_number: int,
         "translation": translation,
         "evaluation_score": score,
         "justification": justification,
+        "bleu_score": bleu_score,
+        "chrf_score": chrf_score,
+        "prescreen": prescreen,
         "eval_run_id": eval_run_id,
         "timestamp": datetime.now().isoformat(),
     }
@@ -157,9 +161,102 @@ def save_evaluation_result(source_lang: str, target_lang: str, line_number: int,
 
     logging.debug(f"Evaluation saved to {result_file}")
 
+def save_translation_run_stats(source_lang: str, target_lang: str, run_id: str, summary: dict):
+    """Save a translation run's summary and token usage next to the run's language-pair directory"""
+    run_dir = DATA_ROOT / f"translations/{run_id}"
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    stats_file = run_dir / f"{source_lang}-{target_lang}.run.json"
+    stats_data = {
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        **summary,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    with open(stats_file, 'w', encoding='utf-8') as f:
+        json.dump(stats_data, f, ensure_ascii=False, indent=2)
+
+    logging.debug(f"Translation run stats saved to {stats_file}")
+
+def save_evaluation_run_stats(source_lang: str, target_lang: str, eval_run_id: str, stats: dict):
+    """Save per-run judge request statistics next to the run's language-pair directory"""
+    run_dir = DATA_ROOT / f"evaluations/{eval_run_id}"
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    stats_file = run_dir / f"{source_lang}-{target_lang}.run.json"
+    stats_data = {
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "eval_run_id": eval_run_id,
+        **stats,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    with open(stats_file, 'w', encoding='utf-8') as f:
+        json.dump(stats_data, f, ensure_ascii=False, indent=2)
+
+    logging.debug(f"Evaluation run stats saved to {stats_file}")
+
+def save_result(source_lang: str, target_lang: str, line_number: int,
+                source_text: str, translation: str, score, justification: str,
+                bleu_score=None, version: str = DEFAULT_VERSION,
+                chrf_score=None, reference: str = None, prescreen: dict = None):
+    """Save a combined translation + evaluation result consumed by generate_report"""
+    results_dir = DATA_ROOT / f"results/{version}/{source_lang}-{target_lang}"
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    result_file = results_dir / f"test_suite_line_{line_number}_result.json"
+
+    result_data = {
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "line_number": line_number,
+        "source_text": source_text,
+        "translation": translation,
+        "evaluation_score": score,
+        "justification": justification,
+        "reference": reference,
+        "bleu_score": bleu_score,
+        "chrf_score": chrf_score,
+        "prescreen": prescreen,
+        "version": version,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump(result_data, f, ensure_ascii=False, indent=2)
+
+    logging.debug(f"Result saved to {result_file}")
+
+def save_results_usage(version: str, usage: dict):
+    """Save the token usage ledgers of an evaluation-tool run next to its results"""
+    results_dir = DATA_ROOT / f"results/{version}"
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    usage_file = results_dir / "usage.json"
+    with open(usage_file, 'w', encoding='utf-8') as f:
+        json.dump({**usage, "timestamp": datetime.now().isoformat()}, f, ensure_ascii=False, indent=2)
+
+    logging.debug(f"Run usage saved to {usage_file}")
+
+def load_run_usage(run_dir: Path) -> dict:
+    """Load the token usage ledgers saved next to a run's language-pair directories, keyed by pair"""
+    usage = {}
+    for stats_file in sorted(run_dir.glob("*.run.json")):
+        try:
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.warning(f"Failed to load run stats {stats_file}: {e}")
+            continue
+        if isinstance(data.get('usage'), dict):
+            usage[stats_file.name[:-len(".run.json")]] = data['usage']
+    return usage
+
 def load_translation_results(source_lang: str, target_lang: str, run_id: str) -> list:
     """Load translation results from a specific run"""
-    translations_dir = PROJECT_ROOT / f"data/translations/{run_id}/{source_lang}-{target_lang}"
+    translations_dir = DATA_ROOT / f"translations/{run_id}/{source_lang}-{target_lang}"
 
     if not translations_dir.exists():
         logging.warning(f"Translation directory not found: {translations_dir}")
@@ -183,7 +280,7 @@ def load_translation_results(source_lang: str, target_lang: str, run_id: str) ->
 
 def load_evaluation_results(source_lang: str, target_lang: str, eval_run_id: str) -> list:
     """Load evaluation results from a specific run"""
-    evaluations_dir = PROJECT_ROOT / f"data/evaluations/{eval_run_id}/{source_lang}-{target_lang}"
+    evaluations_dir = DATA_ROOT / f"evaluations/{eval_run_id}/{source_lang}-{target_lang}"
 
     if not evaluations_dir.exists():
         logging.warning(f"Evaluation directory not found: {evaluations_dir}")
@@ -209,7 +306,7 @@ def generate_report(version: str):
     """Generate a summary report from result files"""
     logging.info("Generating evaluation report")
 
-    results_dir = PROJECT_ROOT / "data/results" / version
+    results_dir = DATA_ROOT / "results" / version
     if not results_dir.exists():
         logging.warning("No results directory found")
         return
@@ -232,19 +329,63 @@ def generate_report(version: str):
 
     logging.info(f"Collected {len(all_results)} results for report")
 
+    usage = {}
+    usage_file = results_dir / "usage.json"
+    if usage_file.exists():
+        try:
+            with open(usage_file, 'r', encoding='utf-8') as f:
+                usage = json.load(f)
+        except Exception as e:
+            logging.error(f"Error reading usage file {usage_file}: {e}")
+
+    # Corpus-level reference metrics per language pair
+    pair_metrics = {}
+    for result in all_results:
+        if result.get('reference') and result.get('translation'):
+            pair = (result['source_lang'], result['target_lang'])
+            hyps, refs = pair_metrics.setdefault(pair, ([], []))
+            hyps.append(result['translation'])
+            refs.append(result['reference'])
+
     # Generate markdown report
     with open(report_file, 'w', encoding='utf-8') as f:
         f.write("# Translation Evaluation Report\n\n")
         f.write(f"**Report Generated on:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write("| Src | Tgt | Line | Score | Justification | Source Text (truncated) | Result File | Status |\n")
-        f.write("|-----|-----|------|-------|---------------|-------------------------|-------------|--------|\n")
+
+        ledgers = [(service, usage[service]) for service in ('translation', 'evaluation')
+                   if isinstance(usage.get(service), dict)]
+        if ledgers:
+            f.write("## Token Usage\n\n")
+            f.write("| Upstream | Model | Calls | Prompt Tokens | Completion Tokens | Cost |\n")
+            f.write("|----------|-------|-------|---------------|-------------------|------|\n")
+            for service, ledger in ledgers:
+                f.write(f"| {service} | {ledger.get('model') or '-'} | {ledger.get('calls', 0)} | "
+                        f"{ledger.get('prompt_tokens', 0)} | {ledger.get('completion_tokens', 0)} | "
+                        f"{ledger.get('cost', '-')} |\n")
+            f.write("\n")
+
+        if pair_metrics:
+            f.write("## Corpus Metrics\n\n")
+            f.write("| Src | Tgt | Lines | Corpus BLEU | Corpus chrF |\n")
+            f.write("|-----|-----|-------|-------------|-------------|\n")
+            from scoring import corpus_scores
+            for (src, tgt), (hyps, refs) in sorted(pair_metrics.items()):
+                corpus = corpus_scores(hyps, refs)
+                f.write(f"| {src} | {tgt} | {corpus['count']} | {corpus['corpus_bleu']:.4f} | {corpus['corpus_chrf']:.4f} |\n")
+            f.write("\n## Results\n\n")
+
+        f.write("| Src | Tgt | Line | Score | BLEU | chrF | Justification | Source Text (truncated) | Result File | Status |\n")
+        f.write("|-----|-----|------|-------|------|------|---------------|-------------------------|-------------|--------|\n")
 
         for result in sorted(all_results, key=lambda x: (x['source_lang'], x['target_lang'], x['line_number'])):
             source_text_truncated = result['source_text'][:50] + "..." if len(result['source_text']) > 50 else result['source_text']
             justification_truncated = result['justification'][:50] + "..." if len(result['justification']) > 50 else result['justification']
 
+            bleu = f"{result['bleu_score']:.4f}" if isinstance(result.get('bleu_score'), (int, float)) else '-'
+            chrf = f"{result['chrf_score']:.4f}" if isinstance(result.get('chrf_score'), (int, float)) else '-'
+
             f.write(f"| {result['source_lang']} | {result['target_lang']} | {result['line_number']} | "
-                   f"{result['evaluation_score']} | {justification_truncated} | {source_text_truncated} | "
+                   f"{result['evaluation_score']} | {bleu} | {chrf} | {justification_truncated} | {source_text_truncated} | "
                    f"`data/results/{version}/{result['source_lang']}-{result['target_lang']}/test_suite_line_{result['line_number']}_result.json` | Success |\n")
 
     logging.info(f"Report generated: {report_file}") 
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""
+Benchmarks for the batch engine against a simulated upstream (see benchmarks/bench_batch.py)
+"""
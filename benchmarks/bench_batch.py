@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Batch engine benchmark against a simulated OpenAI-compatible upstream
+批处理引擎在模拟上游下的吞吐与延迟基准
+
+Runs run_batch_translation, run_batch_evaluation (single and batched judge
+requests) and run_live_translation_and_evaluation at several concurrency levels
+(batch.MAX_CONCURRENCY) against benchmarks/fake_upstream.py. Everything runs in
+this process on a throwaway DATA_ROOT with a synthetic, line-aligned test suite,
+so the repository's data/ is untouched.
+
+The batch targets can be repeated per line order (BATCH_ORDER: fifo, longest,
+shortest); live lines always start in input order. With --suite mixed, most
+lines are short and every 16th line is 16 times as long, and the upstream's
+translation length follows the input, so the makespan difference between the
+orders shows.
+
+Per-line latencies come from the line traces (backend/tracing.py). Throughput is
+lines per second of wall time. Results are written as JSON (with the commit and
+upstream profile) so runs can be compared between commits:
+
+    python -m benchmarks.bench_batch --output before.json
+    git checkout my-branch
+    python -m benchmarks.bench_batch --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from benchmarks.fake_upstream import FakeUpstream, UpstreamProfile, LATENCY_DISTRIBUTIONS  # noqa: E402
+
+TARGETS = ('translation', 'evaluation', 'evaluation_batched', 'live')
+# Root trace name of one unit of work per target
+TRACE_NAMES = {'translation': 'translate_line', 'evaluation': 'evaluate_line',
+               'evaluation_batched': 'evaluate_batch', 'live': 'playground_line'}
+# Same values as scheduling.ORDERS (not imported: config reads DATA_ROOT at import time)
+ORDERS = ('fifo', 'longest', 'shortest')
+SUITES = ('uniform', 'mixed')
+
+
+def line_repeats(i: int, suite: str) -> int:
+    """第 i 行由几句模板组成：uniform 每行一句；mixed 多为1-3句，每16行有一行16句"""
+    if suite == 'uniform':
+        return 1
+    return 16 if i % 16 == 0 else random.Random(i).randint(1, 3)
+
+
+def write_test_suite(data_root: Path, lines: int, source_lang: str, target_lang: str,
+                     suite: str = 'uniform') -> list:
+    """写入逐行对齐的合成测试集，返回源语言句子"""
+    templates = {
+        'en': "Benchmark sentence {i}: the committee will review the proposal before the meeting on Friday.",
+        'zh': "基准测试句子{i}：委员会将在周五的会议之前审查这项提案。",
+        'ja': "ベンチマーク文{i}：委員会は金曜日の会議の前に提案を検討します。",
+        'es': "Frase de prueba {i}: el comité revisará la propuesta antes de la reunión del viernes.",
+        'pt': "Frase de teste {i}: o comitê revisará a proposta antes da reunião de sexta-feira.",
+        'ko': "벤치마크 문장 {i}: 위원회는 금요일 회의 전에 제안서를 검토할 것입니다.",
+    }
+    def line(lang, i):
+        return ' '.join([templates[lang].format(i=i)] * line_repeats(i, suite))
+
+    for lang in (source_lang, target_lang):
+        suite_file = data_root / 'testcases' / lang / 'test_suite.txt'
+        suite_file.parent.mkdir(parents=True, exist_ok=True)
+        suite_file.write_text(''.join(line(lang, i) + '\n' for i in range(1, lines + 1)), encoding='utf-8')
+    return [line(source_lang, i) for i in range(1, lines + 1)]
+
+
+def line_latencies(trace_file: Path, name: str) -> list:
+    """读取trace文件中指定根名称的耗时（毫秒）"""
+    if not trace_file.exists():
+        return []
+    with open(trace_file, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(record['duration_ms'] for record in records if record['name'] == name)
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(q * len(values)))], 1)
+
+
+def run_target(target: str, args, texts: list, seed_run_id: str, label: str, order: str) -> int:
+    """运行一次目标函数，返回失败的行数（live 的行总是按输入顺序开始，忽略 order）"""
+    from backend import batch
+
+    if target == 'translation':
+        summary = batch.run_batch_translation(args.source_lang, args.target_lang, label, args.lines, order=order)
+        return summary['failed']
+    if target in ('evaluation', 'evaluation_batched'):
+        stats = batch.run_batch_evaluation(args.source_lang, args.target_lang, seed_run_id, label,
+                                           prescreen=False,
+                                           mode='batched' if target == 'evaluation_batched' else 'single',
+                                           batch_size=args.batch_size, order=order)
+        return stats['lines'] - stats['saved']
+    results = batch.run_live_translation_and_evaluation(args.source_lang, args.target_lang, texts)
+    return sum(1 for result in results if result.get('error') or result.get('evaluation_score') == 'N/A')
+
+
+def measure(target: str, concurrency: int, order: str, args, texts: list, seed_run_id: str,
+            upstream: FakeUpstream, trace_dir: Path) -> dict:
+    """在给定并发与调度顺序下测量一个目标"""
+    from backend import batch
+
+    batch.MAX_CONCURRENCY = concurrency
+    trace_file = trace_dir / f"{target}_c{concurrency}_{order or 'input'}.jsonl"
+    os.environ['TRACE_FILE'] = str(trace_file)
+    upstream.reset_stats()
+    label = f"bench_{target}_c{concurrency}_{order or 'input'}"
+
+    started = time.perf_counter()
+    errors = run_target(target, args, texts, seed_run_id, label, order)
+    wall = time.perf_counter() - started
+
+    latencies = line_latencies(trace_file, TRACE_NAMES[target])
+    stats = upstream.reset_stats()
+    return {
+        "target": target,
+        "concurrency": concurrency,
+        "order": order,
+        "lines": args.lines,
+        "seconds": round(wall, 3),
+        "throughput_lps": round(args.lines / wall, 2),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "errors": errors,
+        "upstream_requests": {f"{kind}/{outcome}": count for (kind, outcome), count in sorted(stats.items())},
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_row(result: dict, baseline: dict = None):
+    line = (f"{result['target']:<20} c={result['concurrency']:<4} {result['order'] or '-':<8} "
+            f"{result['seconds']:>7} s  {result['throughput_lps']:>8} lines/s  "
+            f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+            f"errors {result['errors']}")
+    if baseline:
+        change = result['throughput_lps'] / baseline['throughput_lps'] - 1 if baseline['throughput_lps'] else 0
+        line += f"  (throughput {change:+.1%}, p95 was {baseline['p95_ms']} ms)"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=TARGETS)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 10, 32])
+    parser.add_argument('--lines', type=int, default=64, help='Lines per run')
+    parser.add_argument('--orders', nargs='+', default=['longest'], choices=ORDERS,
+                        help='Line orders to run each target with (BATCH_ORDER)')
+    parser.add_argument('--suite', choices=SUITES, default='uniform',
+                        help='uniform: equal lines; mixed: mostly short lines, every 16th line 16x as long')
+    parser.add_argument('--source-lang', default='en')
+    parser.add_argument('--target-lang', default='zh')
+    parser.add_argument('--batch-size', type=int, default=8, help='Lines per judge request (evaluation_batched)')
+    parser.add_argument('--stream', choices=['true', 'false'], default='true', help='TRANSLATION_STREAM')
+    upstream_group = parser.add_argument_group('simulated upstream')
+    upstream_group.add_argument('--ttft', type=float, default=0.2, help='Median time to first token (s)')
+    upstream_group.add_argument('--distribution', choices=LATENCY_DISTRIBUTIONS, default='lognormal')
+    upstream_group.add_argument('--spread', type=float, default=0.5,
+                                help='uniform: +/- fraction of ttft; lognormal: sigma')
+    upstream_group.add_argument('--tokens', type=int, default=40, help='Completion tokens per response')
+    upstream_group.add_argument('--token-rate', type=float, default=100.0, help='Tokens per second')
+    upstream_group.add_argument('--output-ratio', type=float,
+                                help='Translation tokens per input token instead of --tokens '
+                                     '(default: 1 with --suite mixed, otherwise off)')
+    upstream_group.add_argument('--error-rate', type=float, default=0.0, help='Fraction answered with HTTP 500')
+    upstream_group.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction answered with HTTP 429')
+    upstream_group.add_argument('--drop-rate', type=float, default=0.0, help='Fraction cut off mid-response')
+    upstream_group.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Earlier results JSON to compare against')
+    parser.add_argument('--log-level', default='CRITICAL')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()))
+    if args.output_ratio is None:
+        args.output_ratio = 1.0 if args.suite == 'mixed' else 0.0
+    profile = UpstreamProfile(ttft=args.ttft, distribution=args.distribution, spread=args.spread,
+                              tokens=args.tokens, token_rate=args.token_rate, error_rate=args.error_rate,
+                              rate_limit_rate=args.rate_limit_rate, drop_rate=args.drop_rate,
+                              output_ratio=args.output_ratio, seed=args.seed)
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            # Results written before line orders were measured ran in file order
+            baseline = {(r['target'], r['concurrency'], r.get('order', 'fifo')): r
+                        for r in json.load(f)['results']}
+
+    with tempfile.TemporaryDirectory(prefix='translate_eval_bench_') as tmp, FakeUpstream(profile) as upstream:
+        data_root = Path(tmp) / 'data'
+        texts = write_test_suite(data_root, args.lines, args.source_lang, args.target_lang, args.suite)
+        # Read by config at import time, so set before the backend is imported
+        os.environ.update({
+            'DATA_ROOT': str(data_root),
+            'TRANSLATION_API_KEY': 'benchmark', 'TRANSLATION_API_URL': upstream.url,
+            'TRANSLATION_MODEL': 'fake', 'TRANSLATION_STREAM': args.stream,
+            'EVALUATION_API_KEY': 'benchmark', 'EVALUATION_API_URL': upstream.url, 'EVALUATION_MODEL': 'fake',
+            'TRACING_ENABLED': 'true', 'TRACE_SAMPLE_RATE': '1', 'TRACE_FILE': str(Path(tmp) / 'seed.jsonl'),
+            'METRICS_ENABLED': 'false', 'SHARED_STORE_PATH': '',
+            # batch.MAX_CONCURRENCY is what is measured, not the per-upstream budgets
+            'TRANSLATION_MAX_CONCURRENCY': '1000', 'EVALUATION_MAX_CONCURRENCY': '1000',
+        })
+        from backend import batch
+
+        # Translations for the evaluation targets (and the output history the line costs are
+        # predicted from), also warming up imports and references
+        fault_free = UpstreamProfile(ttft=0, distribution='fixed', tokens=args.tokens, token_rate=0,
+                                     output_ratio=args.output_ratio)
+        upstream.profile, measured_profile = fault_free, upstream.profile
+        batch.MAX_CONCURRENCY = 10
+        batch.run_batch_translation(args.source_lang, args.target_lang, 'bench_seed', args.lines, order='fifo')
+        upstream.profile = measured_profile
+
+        results = []
+        for target in args.targets:
+            for concurrency in args.concurrency:
+                for order in (args.orders if target != 'live' else [None]):
+                    result = measure(target, concurrency, order, args, texts, 'bench_seed', upstream, Path(tmp))
+                    results.append(result)
+                    print_row(result, baseline.get((target, concurrency, order)))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "lines": args.lines,
+            "suite": args.suite,
+            "source_lang": args.source_lang,
+            "target_lang": args.target_lang,
+            "stream": args.stream == 'true',
+            "batch_size": args.batch_size,
+            "upstream": profile.as_dict(),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Translation memory lookup benchmark
+翻译记忆的建索引耗时、查询延迟与命中率基准
+
+Fills a TranslationMemory (backend/tm.py) with synthetic sentences: a quarter
+are UI-style templates that differ only in a number or a word, the rest are
+random word sequences. Then it queries near-duplicates (one word changed),
+exact repeats and unrelated sentences, and reports the per-entry indexing cost,
+lookup latency percentiles and how each kind of query was answered: served
+(exact repeat), hinted (similarity from the TM_HINT_THRESHOLD default) or miss.
+
+    python -m benchmarks.bench_tm --entries 20000 --queries 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from tm import TranslationMemory  # noqa: E402
+
+WORDS = ("file folder project change save open close delete account user setting window page item list "
+         "message error network server request update version report screen button option value").split()
+TEMPLATES = ("Delete {n} files from the {w} folder?", "Your {w} was saved {n} minutes ago.",
+             "Click {w} to continue with step {n}.", "{n} new messages in your {w} inbox.")
+# Default of get_memory_config()
+HINT_THRESHOLD = 0.5
+
+
+def sentence(rng: random.Random, i: int) -> str:
+    if i % 4 == 0:
+        return rng.choice(TEMPLATES).format(n=rng.randint(1, 500), w=rng.choice(WORDS))
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 14))).capitalize() + "."
+
+
+def edit(rng: random.Random, text: str) -> str:
+    """替换一个词"""
+    words = text.split()
+    words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=2000, help="Queries of each kind")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sources = [sentence(rng, i) for i in range(args.entries)]
+    memory = TranslationMemory()
+    started = time.perf_counter()
+    for i, source in enumerate(sources):
+        memory.add(source, f"translation {i}")
+    build = time.perf_counter() - started
+    print(f"{len(memory)} entries indexed in {build:.2f}s ({build / args.entries * 1000:.3f} ms per entry)\n")
+
+    kinds = {
+        'near-duplicate': [edit(rng, rng.choice(sources)) for _ in range(args.queries)],
+        'exact': [rng.choice(sources) for _ in range(args.queries)],
+        'unrelated': [f"Quarterly revenue grew by {rng.randint(2, 90)} percent in region {i}."
+                      for i in range(args.queries)],
+    }
+    print(f"{'queries':<16}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'served':>9}{'hinted':>9}{'miss':>9}")
+    for kind, queries in kinds.items():
+        latencies, outcomes = [], {'served': 0, 'hinted': 0, 'miss': 0}
+        for query in queries:
+            started = time.perf_counter()
+            served = memory.exact(query)
+            matches = [] if served else memory.search(query, HINT_THRESHOLD)
+            latencies.append(time.perf_counter() - started)
+            if served:
+                outcomes['served'] += 1
+            else:
+                outcomes['hinted' if matches else 'miss'] += 1
+        rates = [f"{outcomes[o] / len(queries):>9.1%}" for o in ('served', 'hinted', 'miss')]
+        print(f"{kind:<16}{percentile(latencies, 0.5):>9}{percentile(latencies, 0.95):>9}"
+              f"{max(latencies) * 1000:>9.3f}{''.join(rates)}")
+
+
+if __name__ == '__main__':
+    main()
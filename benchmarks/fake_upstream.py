@@ -0,0 +1,266 @@
+"""
+Simulated OpenAI-compatible chat-completions and MiniMax TTS upstream
+模拟的 OpenAI 兼容上游（翻译与评估共用）与 MiniMax 语音合成上游
+
+The server answers the request shapes the services send:
+
+- translation (a system prompt is present): generated text, as SSE when stream=true
+- single evaluation: "SCORE: n / JUSTIFICATION: ..." text
+- batched evaluation (the prompt lists items by id): {"results": [...]} JSON
+- MiniMax t2a_v2 (any path ending in /t2a_v2): hex audio, as SSE events when stream=true
+
+For TTS, each token stands for one audio chunk of `audio_chunk_bytes` bytes.
+With `output_ratio` > 0, a translation's length follows its input instead:
+output_ratio tokens per input token (about four characters).
+
+Every response waits for a time-to-first-token drawn from the profile's latency
+distribution, then emits `tokens` tokens at `token_rate` tokens/s (streamed
+responses send them as they are generated, non-streamed ones send everything at
+the end). A fraction of requests can fail with HTTP 500, HTTP 429, or a stream
+that is cut off before [DONE].
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+_BATCH_ID = re.compile(r'"id":\s*(\d+)')
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients close idle keep-alive connections; anything else is worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class UpstreamProfile:
+    """上游行为参数：首token延迟分布、生成速度与错误注入比例"""
+
+    def __init__(self, ttft: float = 0.2, distribution: str = 'lognormal', spread: float = 0.5,
+                 tokens: int = 40, token_rate: float = 100.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, drop_rate: float = 0.0, audio_chunk_bytes: int = 1600,
+                 output_ratio: float = 0.0, seed: int = None):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.ttft = ttft
+        # fixed: always ttft; uniform: ttft * [1 - spread, 1 + spread]; lognormal: median ttft, sigma spread
+        self.distribution = distribution
+        self.spread = spread
+        self.tokens = tokens
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.drop_rate = drop_rate
+        self.audio_chunk_bytes = audio_chunk_bytes
+        self.output_ratio = output_ratio
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> tuple:
+        """抽取一次请求的 (首token延迟, 故障类型或None)"""
+        with self._lock:
+            if self.distribution == 'uniform':
+                ttft = self.ttft * self._random.uniform(1 - self.spread, 1 + self.spread)
+            elif self.distribution == 'lognormal':
+                ttft = self._random.lognormvariate(0, self.spread) * self.ttft
+            else:
+                ttft = self.ttft
+            roll = self._random.random()
+        fault = None
+        for name, rate in (('error', self.error_rate), ('rate_limited', self.rate_limit_rate),
+                           ('dropped', self.drop_rate)):
+            if roll < rate:
+                fault = name
+                break
+            roll -= rate
+        return max(ttft, 0.0), fault
+
+    def as_dict(self) -> dict:
+        return {key: value for key, value in vars(self).items() if not key.startswith('_')}
+
+
+class FakeUpstream:
+    """在后台线程运行的模拟上游；stats 按 (请求类型, 结果) 计数"""
+
+    def __init__(self, profile: UpstreamProfile = None, host: str = '127.0.0.1', port: int = 0):
+        self.profile = profile or UpstreamProfile()
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self.server = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    @property
+    def tts_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1/t2a_v2"
+
+    def start(self) -> 'FakeUpstream':
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'FakeUpstream':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def reset_stats(self) -> Counter:
+        with self._stats_lock:
+            stats, self.stats = self.stats, Counter()
+        return stats
+
+    def _count(self, kind: str, outcome: str):
+        with self._stats_lock:
+            self.stats[(kind, outcome)] += 1
+
+    def _handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if self.path.split('?')[0].rstrip('/').endswith('/t2a_v2'):
+                    self._tts(body)
+                    return
+                kind, pieces = _answer(body, upstream.profile.tokens, upstream.profile.output_ratio)
+                ttft, fault = upstream.profile.draw()
+                upstream._count(kind, fault or 'ok')
+                time.sleep(ttft)
+                if fault in ('error', 'rate_limited'):
+                    status = 500 if fault == 'error' else 429
+                    self._send_json(status, {"error": {"message": f"injected {fault}", "type": fault}})
+                    return
+                interval = 1 / upstream.profile.token_rate if upstream.profile.token_rate > 0 else 0
+                usage = {"prompt_tokens": sum(len(m.get('content', '')) for m in body.get('messages', [])) // 4,
+                         "completion_tokens": len(pieces)}
+                if body.get('stream'):
+                    self._stream(pieces, interval, usage, dropped=fault == 'dropped')
+                else:
+                    time.sleep(interval * len(pieces))
+                    if fault == 'dropped':
+                        self.close_connection = True
+                        return
+                    self._send_json(200, {"choices": [{"message": {"role": "assistant", "content": ''.join(pieces)}}],
+                                          "usage": usage})
+
+            def _tts(self, body: dict):
+                profile = upstream.profile
+                ttft, fault = profile.draw()
+                upstream._count('tts', fault or 'ok')
+                time.sleep(ttft)
+                if fault in ('error', 'rate_limited'):
+                    status = 500 if fault == 'error' else 429
+                    self._send_json(status, {"base_resp": {"status_code": 1002, "status_msg": f"injected {fault}"}})
+                    return
+                interval = 1 / profile.token_rate if profile.token_rate > 0 else 0
+                audio = [_mp3_chunk(i, profile.audio_chunk_bytes) for i in range(max(profile.tokens, 1))]
+                if not body.get('stream'):
+                    time.sleep(interval * len(audio))
+                    if fault == 'dropped':
+                        self.close_connection = True
+                        return
+                    self._send_json(200, {"data": {"audio": b''.join(audio).hex(), "status": 2},
+                                          "base_resp": {"status_code": 0, "status_msg": "success"}})
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for i, part in enumerate(audio):
+                    if i:
+                        time.sleep(interval)
+                    if fault == 'dropped' and i >= len(audio) // 2:
+                        self.close_connection = True
+                        return
+                    event = {"data": {"audio": part.hex(), "status": 1}, "base_resp": {"status_code": 0}}
+                    self._chunk(f"data: {json.dumps(event)}\n\n")
+                final = {"data": {"audio": b''.join(audio).hex(), "status": 2}, "base_resp": {"status_code": 0}}
+                self._chunk(f"data: {json.dumps(final)}\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _send_json(self, status: int, payload: dict):
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _chunk(self, text: str):
+                payload = text.encode('utf-8')
+                self.wfile.write(f"{len(payload):x}\r\n".encode('ascii') + payload + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, pieces: list, interval: float, usage: dict, dropped: bool):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for i, piece in enumerate(pieces):
+                    if i:
+                        time.sleep(interval)
+                    if dropped and i >= len(pieces) // 2:
+                        # Cut the connection mid-stream without the terminating chunk
+                        self.close_connection = True
+                        return
+                    event = {"choices": [{"delta": {"content": piece}}]}
+                    self._chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+                self._chunk(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n")
+                self._chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def _answer(body: dict, tokens: int, output_ratio: float = 0.0) -> tuple:
+    """按请求类型生成回答，返回 (类型, 逐token文本列表)"""
+    messages = body.get('messages') or [{}]
+    prompt = messages[-1].get('content', '')
+    if any(m.get('role') == 'system' for m in messages):
+        if output_ratio > 0:
+            tokens = round(output_ratio * len(prompt) / 4)
+        pieces = [f"词{i}" for i in range(max(tokens, 1))]
+        return 'translation', pieces
+    ids = list(dict.fromkeys(int(i) for i in _BATCH_ID.findall(prompt)))
+    if body.get('response_format') or ids:
+        results = [{"id": i, "score": 7 + i % 3, "justification": "Accurate and fluent."} for i in ids]
+        text = json.dumps({"results": results})
+        return 'evaluation_batch', _split(text, max(tokens, len(ids) * 12))
+    return 'evaluation', _split("SCORE: 8\nJUSTIFICATION: Accurate and natural translation.", tokens)
+
+
+def _split(text: str, tokens: int) -> list:
+    """把文本分成约 tokens 段，模拟逐token生成"""
+    size = max(1, -(-len(text) // max(tokens, 1)))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def _mp3_chunk(index: int, size: int) -> bytes:
+    """MPEG-1 Layer III 帧（128kbps、32kHz，每帧576字节）组成的音频片段"""
+    frame = b'\xff\xfb\x98\x44' + bytes([index % 256]) * 572
+    return (frame * (size // len(frame) + 1))[:max(size // len(frame), 1) * len(frame)]
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Open-loop HTTP load test for /api/translate, /api/playground-run and /api/tts
+按到达率对运行中的应用施压，找出延迟曲线的拐点
+
+Starts the app (dev server or gunicorn, via scripts/benchmark_serving.py) with
+the translation, evaluation and MiniMax upstreams pointed at one local stand-in
+(benchmarks/fake_upstream.py), then offers requests at increasing arrival rates.
+
+Arrivals are open-loop: requests are sent on a Poisson schedule whether or not
+earlier ones have finished, and each latency is measured from the scheduled send
+time, so a server that falls behind shows up as growing latency instead of
+quietly lowering the offered load. Each step reports, per endpoint, the achieved
+throughput (successful responses per second), latency percentiles and the error
+rate.
+
+A step is healthy when, over all endpoints, the error rate is at most
+--max-error-rate and p95 stays within --knee-factor times the p95 of the first
+step. With open-loop arrivals an overloaded server queues, so latency is what
+collapses first. The knee is the highest healthy rate below the first unhealthy
+step; saturation throughput is the highest achieved throughput seen. Without
+--rates the offered rate starts at --start-rate and grows by --factor until two
+steps past the knee.
+
+    python -m benchmarks.load_test --mix translate=6 playground=1 tts=3
+    python -m benchmarks.load_test --rates 5 10 20 40 --duration 30 --mode gunicorn
+    python -m benchmarks.load_test --url http://127.0.0.1:8888 --rates 2 4 8   # app already running
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.fake_upstream import FakeUpstream, UpstreamProfile, LATENCY_DISTRIBUTIONS  # noqa: E402
+from scripts.benchmark_serving import free_port, start_app, stop_app  # noqa: E402
+
+ENDPOINTS = {
+    'translate': '/api/translate',
+    'playground': '/api/playground-run',
+    'tts': '/api/tts',
+}
+
+
+def build_payload(endpoint: str, n: int, playground_lines: int) -> dict:
+    """每个请求的文本不同，避免命中TTS缓存"""
+    if endpoint == 'translate':
+        # Near-duplicate texts: keep the translation memory out of the measured path
+        return {"source_lang": "en", "target_lang": "zh", "text": f"Load test sentence number {n}.", "memory": False}
+    if endpoint == 'playground':
+        return {"source_lang": "en", "target_lang": "zh",
+                "texts": [f"Playground line {i} of request {n}." for i in range(1, playground_lines + 1)]}
+    return {"text": f"Load test speech number {n}.", "language": "en", "audio_url": True}
+
+
+def send(base_url: str, endpoint: str, payload: dict, timeout: float) -> tuple:
+    """发送请求并读完响应，返回 (是否成功, 错误类别)"""
+    request = urllib.request.Request(base_url + ENDPOINTS[endpoint], data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return False, f"http_{e.code}"
+    except (OSError, ValueError) as e:
+        return False, 'timeout' if 'timed out' in str(e) else 'connection'
+    return (True, None) if body.get('success') else (False, 'failed')
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+
+def summarize(samples: list, duration: float) -> dict:
+    """samples: [(latency秒, 成功, 错误类别)]"""
+    ok = [latency for latency, success, _ in samples if success]
+    errors = {}
+    for _, success, kind in samples:
+        if not success:
+            errors[kind] = errors.get(kind, 0) + 1
+    return {
+        "sent": len(samples),
+        "throughput_rps": round(len(ok) / duration, 2),
+        "error_rate": round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        "errors": errors,
+        "p50_ms": percentile([s[0] for s in samples], 0.50),
+        "p95_ms": percentile([s[0] for s in samples], 0.95),
+        "p99_ms": percentile([s[0] for s in samples], 0.99),
+    }
+
+
+def run_step(base_url: str, rate: float, duration: float, mix: dict, args, counter) -> dict:
+    """以给定到达率施压 duration 秒，等所有请求结束后汇总"""
+    rng = random.Random(args.seed + int(rate * 1000))
+    endpoints, weights = zip(*mix.items())
+    samples = {endpoint: [] for endpoint in endpoints}
+    lock = threading.Lock()
+
+    def one(endpoint: str, scheduled: float, n: int):
+        success, kind = send(base_url, endpoint, build_payload(endpoint, n, args.playground_lines), args.timeout)
+        latency = time.perf_counter() - scheduled
+        with lock:
+            samples[endpoint].append((latency, success, kind))
+
+    executor = ThreadPoolExecutor(max_workers=args.max_clients)
+    started = time.perf_counter()
+    scheduled = started
+    try:
+        while True:
+            scheduled += rng.expovariate(rate)
+            if scheduled - started >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(one, rng.choices(endpoints, weights)[0], scheduled, next(counter))
+    finally:
+        executor.shutdown(wait=True)
+    elapsed = max(time.perf_counter() - started, duration)
+
+    per_endpoint = {endpoint: summarize(samples[endpoint], elapsed) for endpoint in endpoints if samples[endpoint]}
+    overall = summarize([s for values in samples.values() for s in values], elapsed)
+    return {"offered_rps": rate, "seconds": round(elapsed, 2), "overall": overall, "endpoints": per_endpoint}
+
+
+def healthy(step: dict, baseline_p95: float, args) -> bool:
+    overall = step["overall"]
+    return (overall["sent"] > 0
+            and overall["error_rate"] <= args.max_error_rate
+            and overall["p95_ms"] <= args.knee_factor * baseline_p95)
+
+
+def find_knee(steps: list, args) -> dict:
+    """第一个不健康的步骤之前的最高到达率即为拐点"""
+    if not steps or not steps[0]["overall"]["p95_ms"]:
+        return {"knee_rps": None, "saturation_rps": None}
+    baseline = steps[0]["overall"]["p95_ms"]
+    knee = None
+    for step in sorted(steps, key=lambda s: s["offered_rps"]):
+        step["healthy"] = healthy(step, baseline, args)
+        if not step["healthy"]:
+            break
+        knee = step
+    saturation = max(steps, key=lambda s: s["overall"]["throughput_rps"])
+    return {
+        "knee_rps": knee["offered_rps"] if knee else None,
+        "knee_p95_ms": knee["overall"]["p95_ms"] if knee else None,
+        "saturation_rps": saturation["overall"]["throughput_rps"],
+        "baseline_p95_ms": baseline,
+    }
+
+
+def print_step(step: dict):
+    overall = step["overall"]
+    print(f"offered {step['offered_rps']:>7.2f} req/s  achieved {overall['throughput_rps']:>7.2f}  "
+          f"p50 {overall['p50_ms']} ms  p95 {overall['p95_ms']} ms  p99 {overall['p99_ms']} ms  "
+          f"errors {overall['error_rate']:.1%}")
+    for endpoint, result in step["endpoints"].items():
+        print(f"    {endpoint:<11} {result['throughput_rps']:>7.2f} req/s  p50 {result['p50_ms']:>8} ms  "
+              f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  errors {result['error_rate']:.1%}"
+              + (f" {result['errors']}" if result['errors'] else ''))
+
+
+def parse_mix(values: list) -> dict:
+    mix = {}
+    for value in values:
+        name, _, weight = value.partition('=')
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', nargs='+', default=['translate=6', 'playground=1', 'tts=3'],
+                        help='Endpoint weights, e.g. translate=6 playground=1 tts=3')
+    parser.add_argument('--rates', type=float, nargs='+', help='Offered rates (req/s) to test; default: ramp')
+    parser.add_argument('--start-rate', type=float, default=2.0)
+    parser.add_argument('--factor', type=float, default=1.5, help='Rate multiplier between ramp steps')
+    parser.add_argument('--max-rate', type=float, default=500.0)
+    parser.add_argument('--duration', type=float, default=15.0, help='Seconds per step')
+    parser.add_argument('--knee-factor', type=float, default=3.0,
+                        help='A step is past the knee when p95 exceeds this multiple of the first step')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--playground-lines', type=int, default=3, help='Texts per playground request')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Client timeout per request (s)')
+    parser.add_argument('--max-clients', type=int, default=512, help='Client threads (requests in flight)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    server_group = parser.add_argument_group('server')
+    server_group.add_argument('--url', help='Load an already running app instead of starting one')
+    server_group.add_argument('--mode', choices=['dev', 'gunicorn'], default='gunicorn')
+    server_group.add_argument('--workers', type=int, default=(os.cpu_count() or 1) * 2 + 1)
+    server_group.add_argument('--threads', type=int, default=16)
+    upstream_group = parser.add_argument_group('simulated upstreams')
+    upstream_group.add_argument('--ttft', type=float, default=0.3, help='Median time to first token/audio (s)')
+    upstream_group.add_argument('--distribution', choices=LATENCY_DISTRIBUTIONS, default='lognormal')
+    upstream_group.add_argument('--spread', type=float, default=0.5)
+    upstream_group.add_argument('--tokens', type=int, default=30, help='Tokens (or audio chunks) per response')
+    upstream_group.add_argument('--token-rate', type=float, default=100.0)
+    upstream_group.add_argument('--error-rate', type=float, default=0.0)
+    upstream_group.add_argument('--rate-limit-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    upstream = process = None
+    tmp = tempfile.TemporaryDirectory(prefix='translate_eval_load_')
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            upstream = FakeUpstream(UpstreamProfile(
+                ttft=args.ttft, distribution=args.distribution, spread=args.spread, tokens=args.tokens,
+                token_rate=args.token_rate, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                seed=args.seed)).start()
+            port = free_port()
+            # The stand-ins have no quota, so the per-upstream budgets do not cap the load
+            process = start_app(args.mode, port, upstream.url, args.workers, args.threads, extra_env={
+                'EVALUATION_API_KEY': 'loadtest', 'EVALUATION_API_URL': upstream.url, 'EVALUATION_MODEL': 'fake',
+                'MINIMAX_API_KEY': 'loadtest', 'MINIMAX_GROUP_ID': 'loadtest', 'MINIMAX_API_URL': upstream.tts_url,
+                'EVALUATION_MAX_CONCURRENCY': '1000', 'TTS_MAX_CONCURRENCY': '1000',
+                'AUDIO_CACHE_DIR': str(Path(tmp.name) / 'audio'), 'TRACING_ENABLED': 'false',
+                'SHARED_STORE_PATH': str(Path(tmp.name) / 'store.sqlite'),
+            })
+            base_url = f"http://127.0.0.1:{port}"
+
+        counter = itertools.count(1)
+        rates = args.rates or []
+        steps, rate, unhealthy = [], args.start_rate, 0
+        while True:
+            if args.rates:
+                if not rates:
+                    break
+                rate = rates.pop(0)
+            step = run_step(base_url, rate, args.duration, mix, args, counter)
+            steps.append(step)
+            print_step(step)
+            if not args.rates:
+                # Ramp until two steps past the knee (or the ceiling)
+                if not healthy(step, steps[0]["overall"]["p95_ms"] or float('inf'), args):
+                    unhealthy += 1
+                if unhealthy >= 2 or rate * args.factor > args.max_rate:
+                    break
+                rate = round(rate * args.factor, 2)
+    finally:
+        if process:
+            stop_app(process)
+        if upstream:
+            upstream.stop()
+        tmp.cleanup()
+
+    summary = find_knee(steps, args)
+    print(f"\nKnee: {summary['knee_rps']} req/s offered (p95 {summary.get('knee_p95_ms')} ms, "
+          f"baseline p95 {summary.get('baseline_p95_ms')} ms); saturation throughput {summary['saturation_rps']} req/s")
+    if args.output:
+        report = {"mix": mix, "server": args.url or f"{args.mode} {args.workers}x{args.threads}",
+                  "upstream": None if args.url else upstream.profile.as_dict(), "summary": summary, "steps": steps}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ Setup comprehensive test cases for translation evaluation
 """
 
 import os
+import sys
 from pathlib import Path
 
 def setup_testcases():
@@ -123,6 +124,13 @@ def setup_testcases():
         
         print(f"✓ Created {len(test_sentences)} test cases in {test_file}")
     
+    # Refresh the reference store so lookups see the new suites without re-reading files
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+    from refstore import ReferenceStore
+    store = ReferenceStore(testcases_dir=Path("testcases").resolve())
+    imported = store.import_testcases()
+    print(f"✓ Reference store updated: {', '.join(imported) if imported else 'already up to date'}")
+
     print(f"\n🎉 Test case setup complete!")
     print(f"Generated {len(test_sentences)} sentences for each of {len(languages)} languages")
     print("You can now run: python evaluation/eval.py --version v1")
@@ -10,20 +10,23 @@ import json
 import time
 import argparse
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
-import nltk
-from nltk.translate.bleu_score import sentence_bleu, SmoothingFunction
 
 # Project root & default version
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / 'backend'))
 
-from backend.services import TranslationService, EvaluationService
-from backend.utils import (load_test_cases, save_translation_result,
-                           save_evaluation_result, load_translation_results,
-                           load_evaluation_results, generate_report)
+from backend.utils import load_test_cases, save_result, save_results_usage, generate_report, find_reference
+from limits import UpstreamBudget
+from usage import UsageLedger
+from scoring import sentence_scores
+from prescreen import prescreen_translation, prescreen_justification, JUDGE
+from config import get_prescreen_config
 
 # Version identifier for result directory (overridden in main)
 RESULT_VERSION = os.environ.get('RESULT_VERSION', 'v1')
@@ -57,15 +60,183 @@ def setup_logging():
     
     return logging.getLogger(__name__)
 
-# Initialize logging
-logger = setup_logging()
+# Handlers are installed by main(); importing this module (or --help) stays cheap
+logger = logging.getLogger(__name__)
+
+class ProgressDisplay:
+    """实时进度与ETA显示（线程安全）"""
+
+    def __init__(self, total: int, stream=sys.stderr, interval: float = 0.5):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.stream = stream
+        self.interval = interval
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_logged = 0
+
+    def start(self):
+        if self.stream.isatty():
+            self._thread = threading.Thread(target=self._refresh, daemon=True)
+            self._thread.start()
+
+    def update(self, success: bool):
+        with self._lock:
+            self.done += 1
+            if not success:
+                self.failed += 1
+            done = self.done
+        # Non-interactive output: log roughly every 10% instead of redrawing
+        if self._thread is None and (done == self.total or done - self._last_logged >= max(1, self.total // 10)):
+            self._last_logged = done
+            logger.info(self.render())
+
+    def render(self) -> str:
+        with self._lock:
+            done, failed = self.done, self.failed
+        elapsed = time.monotonic() - self.started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - done
+        eta = remaining / rate if rate > 0 else float('inf')
+        eta_str = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta != float('inf') else '--:--:--'
+        percent = done / self.total * 100 if self.total else 100.0
+        return (f"[{done}/{self.total} {percent:5.1f}%] failed={failed} "
+                f"rate={rate:.2f}/s elapsed={time.strftime('%H:%M:%S', time.gmtime(elapsed))} ETA={eta_str}")
+
+    def _refresh(self):
+        while not self._stop.wait(self.interval):
+            self.stream.write('\r' + self.render())
+            self.stream.flush()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.stream.write('\r' + self.render() + '\n')
+            self.stream.flush()
+
+
+class PairScheduler:
+    """
+    并发调度所有语言对和行：翻译与评估分别受各自上游的并发与速率预算约束，
+    一行翻译完成后立即进入评估，不同语言对与行之间互不阻塞。
+    每次上游调用（包括失败的调用）的token用量分别记入翻译与评估的用量账本。
+    """
+
+    def __init__(self, translation_service, evaluation_service,
+                 translation_budget: UpstreamBudget, evaluation_budget: UpstreamBudget,
+                 version: str, prescreen: bool = True):
+        self.translation_service = translation_service
+        self.evaluation_service = evaluation_service
+        self.translation_budget = translation_budget
+        self.evaluation_budget = evaluation_budget
+        self.version = version
+        self.prescreen = prescreen
+        self.prescreen_decisions = {}
+        self._decisions_lock = threading.Lock()
+        self.translation_usage = UsageLedger.from_config(getattr(translation_service, 'config', {}))
+        self.evaluation_usage = UsageLedger.from_config(getattr(evaluation_service, 'config', {}))
+
+    def run(self, jobs: list) -> dict:
+        """执行 (src, tgt, line_num, source_text) 任务列表，返回统计信息（含两个上游的用量汇总 usage）"""
+        progress = ProgressDisplay(len(jobs))
+        stats = {'processed': 0, 'successful': 0}
+        # Enough workers to keep both upstreams saturated at the same time
+        max_workers = self.translation_budget.max_concurrency + self.evaluation_budget.max_concurrency
+
+        progress.start()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self._process_line, *job): job for job in jobs}
+                for future in as_completed(futures):
+                    src_lang, tgt_lang, line_num, _ = futures[future]
+                    try:
+                        success = future.result()
+                    except Exception as e:
+                        logger.error(f"Line {line_num} of {src_lang}->{tgt_lang} failed: {e}", exc_info=True)
+                        success = False
+                    stats['processed'] += 1
+                    if success:
+                        stats['successful'] += 1
+                    progress.update(success)
+        finally:
+            progress.close()
+
+        stats['usage'] = {'translation': self.translation_usage.as_dict(),
+                          'evaluation': self.evaluation_usage.as_dict()}
+        return stats
+
+    def _process_line(self, src_lang: str, tgt_lang: str, line_num: int, source_text: str) -> bool:
+        """翻译并评估单行，返回评估是否成功"""
+        logger.info(f"🔄 Processing {src_lang} → {tgt_lang} line {line_num}: {source_text[:50]}...")
+
+        with self.translation_budget.slot():
+            translation_result = self.translation_service.translate_text(src_lang, tgt_lang, source_text)
+        self.translation_usage.add(translation_result.get("usage"))
+        if not translation_result.get("success"):
+            logger.error(f"Translation failed for {src_lang} → {tgt_lang} line {line_num}: "
+                         f"{translation_result.get('error')}")
+            return False
+
+        translation = translation_result["translation"]
+        logger.info(f"📄 Translation ({src_lang} → {tgt_lang} line {line_num}): {translation[:50]}...")
+
+        # Reference metrics: the target-language suite holds the human reference for this line
+        reference = find_reference(src_lang, tgt_lang, source_text, line_num)
+        metrics = sentence_scores(translation, reference)
+
+        screen = None
+        if self.prescreen:
+            screen = prescreen_translation(src_lang, tgt_lang, source_text, translation, reference)
+            with self._decisions_lock:
+                self.prescreen_decisions[screen["decision"]] = self.prescreen_decisions.get(screen["decision"], 0) + 1
+
+        if screen and screen["decision"] != JUDGE:
+            eval_result = {"success": True, "score": screen["score"], "justification": prescreen_justification(screen)}
+        else:
+            with self.evaluation_budget.slot():
+                eval_result = self.evaluation_service.evaluate_translation(src_lang, tgt_lang, source_text, translation)
+            self.evaluation_usage.add(eval_result.get("usage"))
+        if eval_result.get("success"):
+            score = eval_result["score"]
+            justification = eval_result["justification"]
+            logger.info(f"⭐ Score ({src_lang} → {tgt_lang} line {line_num}): {score}/10")
+        else:
+            logger.warning(f"Evaluation failed: {eval_result.get('error')}")
+            score = "N/A"
+            justification = f"Evaluation failed: {eval_result.get('error')}"
+
+        save_result(src_lang, tgt_lang, line_num, source_text,
+                    translation, score, justification, metrics["bleu_score"], version=self.version,
+                    chrf_score=metrics["chrf_score"], reference=reference, prescreen=screen)
+
+        return bool(eval_result.get("success"))
+
+
+def build_jobs(language_pairs: list, line: int = None) -> list:
+    """展开语言对和行，生成调度任务列表"""
+    jobs = []
+    for src_lang, tgt_lang in language_pairs:
+        test_cases = load_test_cases(src_lang)
+        if not test_cases:
+            logger.warning(f"No test cases found for {src_lang}")
+            continue
+
+        if line:
+            if line > len(test_cases):
+                logger.error(f"Line {line} not found (max: {len(test_cases)})")
+                continue
+            selected = [(line, test_cases[line - 1])]
+        else:
+            selected = list(enumerate(test_cases, start=1))
+
+        for line_num, source_text in selected:
+            jobs.append((src_lang, tgt_lang, line_num, source_text))
+    return jobs
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    logger.info("Downloading NLTK punkt tokenizer")
-    nltk.download('punkt')
 
 def main():
     """Main function"""
@@ -74,12 +245,27 @@ def main():
     parser.add_argument('--source', type=str, help='Source language code')
     parser.add_argument('--target', type=str, help='Target language code')
     parser.add_argument('--line', type=int, help='Specific line number to process')
-    parser.add_argument('--delay', type=float, default=2.0, help='Delay between API calls (seconds)')
+    parser.add_argument('--delay', type=float, default=None,
+                        help='Minimum interval between calls to the same upstream (seconds); '
+                             'shorthand for --translation-rate/--evaluation-rate of 1/DELAY')
+    parser.add_argument('--translation-concurrency', type=int, default=None,
+                        help='Max concurrent translation calls (default: TRANSLATION_MAX_CONCURRENCY or 10)')
+    parser.add_argument('--evaluation-concurrency', type=int, default=None,
+                        help='Max concurrent evaluation calls (default: EVALUATION_MAX_CONCURRENCY or 10)')
+    parser.add_argument('--translation-rate', type=float, default=None,
+                        help='Translation requests per second, 0 = unlimited (default: TRANSLATION_RATE_LIMIT)')
+    parser.add_argument('--evaluation-rate', type=float, default=None,
+                        help='Evaluation requests per second, 0 = unlimited (default: EVALUATION_RATE_LIMIT)')
+    parser.add_argument('--no-prescreen', action='store_true',
+                        help='Send every line to the LLM judge (default: PRESCREEN_ENABLED)')
     parser.add_argument('--version', type=str, default=RESULT_VERSION, help='Version tag for result directory (default v1)')
     
     args = parser.parse_args()
     RESULT_VERSION = args.version
 
+    setup_logging()
+    from backend.services import TranslationService, EvaluationService
+
     translation_service = TranslationService()
     evaluation_service = EvaluationService()
     
@@ -114,69 +300,30 @@ def main():
                 if src != tgt:
                     language_pairs.append((src, tgt))
     
-    logger.info(f"Processing {len(language_pairs)} language pairs with {args.delay}s delay")
-    
-    total_processed = 0
-    total_successful = 0
-    
-    for src_lang, tgt_lang in language_pairs:
-        logger.info(f"📝 Processing {src_lang} → {tgt_lang}")
-        
-        # Load test cases
-        test_cases = load_test_cases(src_lang)
-        if not test_cases:
-            logger.warning(f"No test cases found for {src_lang}")
-            continue
-        
-        if args.line:
-            if args.line > len(test_cases):
-                logger.error(f"Line {args.line} not found (max: {len(test_cases)})")
-                continue
-            test_cases = [test_cases[args.line - 1]]
-            line_numbers = [args.line]
-        else:
-            line_numbers = list(range(1, len(test_cases) + 1))
-        
-        for i, (line_num, source_text) in enumerate(zip(line_numbers, test_cases)):
-            logger.info(f"🔄 Processing line {line_num}: {source_text[:50]}...")
-            
-            # Translate
-            translation_result = translation_service.translate_text(src_lang, tgt_lang, source_text)
-            if not translation_result.get("success"):
-                logger.error(f"Translation failed: {translation_result.get('error')}")
-                total_processed += 1
-                continue
-            
-            translation = translation_result["translation"]
-            logger.info(f"📄 Translation: {translation[:50]}...")
-            
-            # Evaluate
-            eval_result = evaluation_service.evaluate_translation(src_lang, tgt_lang, source_text, translation)
-            if eval_result.get("success"):
-                score = eval_result["score"]
-                justification = eval_result["justification"]
-                logger.info(f"⭐ Score: {score}/10")
-            else:
-                logger.warning(f"Evaluation failed: {eval_result.get('error')}")
-                score = "N/A"
-                justification = f"Evaluation failed: {eval_result.get('error')}"
-            
-            # Calculate BLEU score (if reference available)
-            bleu_score = None
-            # Note: BLEU calculation would need reference translations
-            
-            # Save result
-            save_result(src_lang, tgt_lang, line_num, source_text, 
-                       translation, score, justification, bleu_score, version=RESULT_VERSION)
-            
-            total_processed += 1
-            if eval_result.get("success"):
-                total_successful += 1
-            
-            # Rate limiting
-            if i < len(test_cases) - 1:  # Don't delay after the last item
-                logger.debug(f"Waiting {args.delay} seconds...")
-                time.sleep(args.delay)
+    delay_rate = 1.0 / args.delay if args.delay else None
+    translation_budget = UpstreamBudget.from_config(
+        'translation',
+        max_concurrency=args.translation_concurrency,
+        rate=args.translation_rate if args.translation_rate is not None else delay_rate
+    )
+    evaluation_budget = UpstreamBudget.from_config(
+        'evaluation',
+        max_concurrency=args.evaluation_concurrency,
+        rate=args.evaluation_rate if args.evaluation_rate is not None else delay_rate
+    )
+
+    jobs = build_jobs(language_pairs, args.line)
+    logger.info(f"Processing {len(language_pairs)} language pairs ({len(jobs)} lines) with "
+                f"translation concurrency={translation_budget.max_concurrency} rate={translation_budget.limiter.rate or 'unlimited'}, "
+                f"evaluation concurrency={evaluation_budget.max_concurrency} rate={evaluation_budget.limiter.rate or 'unlimited'}")
+
+    scheduler = PairScheduler(translation_service, evaluation_service,
+                              translation_budget, evaluation_budget, RESULT_VERSION,
+                              prescreen=get_prescreen_config()['enabled'] and not args.no_prescreen)
+    stats = scheduler.run(jobs)
+    total_processed = stats['processed']
+    total_successful = stats['successful']
+    save_results_usage(RESULT_VERSION, stats['usage'])
     
     # Generate report
     generate_report(version=RESULT_VERSION)
@@ -184,9 +331,16 @@ def main():
     logger.info("🎉 Evaluation Complete!")
     logger.info(f"Total processed: {total_processed}")
     logger.info(f"Successful evaluations: {total_successful}")
+    if scheduler.prescreen:
+        judged = scheduler.prescreen_decisions.get(JUDGE, 0)
+        logger.info(f"Pre-screen decisions: {scheduler.prescreen_decisions} "
+                    f"({sum(scheduler.prescreen_decisions.values()) - judged} lines scored without the judge)")
     if total_processed > 0:
         success_rate = total_successful/total_processed*100
         logger.info(f"Success rate: {success_rate:.1f}%")
+    for service, usage in stats['usage'].items():
+        logger.info(f"{service.capitalize()} usage: {usage['calls']} calls, {usage['total_tokens']} tokens"
+                    + (f", cost {usage['cost']}" if 'cost' in usage else ""))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
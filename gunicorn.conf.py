@@ -0,0 +1,63 @@
+"""
+Gunicorn configuration for production serving
+生产环境多进程配置：python run_app.py（FLASK_ENV=production）或
+gunicorn -c gunicorn.conf.py run_app:app
+
+Graceful reload (new code/config, no dropped requests): kill -HUP <master pid>
+Add/remove workers at runtime: kill -TTIN / -TTOU <master pid>
+"""
+
+import os
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / 'backend'))
+
+from config import FLASK_CONFIG, get_serving_config  # noqa: E402
+
+serving = get_serving_config()
+
+bind = f"{FLASK_CONFIG['host']}:{FLASK_CONFIG['port']}"
+chdir = str(project_root)
+
+# Prefork workers, each running a thread pool: translation traffic is I/O-bound and long-lived
+worker_class = 'gthread'
+workers = serving['workers']
+threads = serving['threads']
+
+# Load the app once in the master so workers fork with modules already imported
+preload_app = serving['preload']
+
+timeout = serving['timeout']
+graceful_timeout = serving['graceful_timeout']
+keepalive = serving['keepalive']
+
+# Worker recycling bounds memory growth; jitter keeps workers from restarting together.
+# Disabled by default (WEB_MAX_REQUESTS=0): recycling a worker fails the background jobs it is running
+max_requests = serving['max_requests']
+max_requests_jitter = serving['max_requests_jitter']
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+proc_name = 'translate_eval'
+
+
+def when_ready(server):
+    server.log.info(f"Serving on {bind}: {workers} workers x {threads} threads, preload={preload_app}")
+
+
+def worker_exit(server, worker):
+    # Background jobs run in this worker's threads and end with it (e.g. recycled after max_requests)
+    from jobs import abandon_jobs
+    abandon_jobs(f"Worker {worker.pid} exited while the job was unfinished")
+    # Keep the worker's counters in the /metrics totals after it is gone
+    import metrics
+    from shared_store import get_shared_store
+    store = get_shared_store()
+    if store is not None:
+        try:
+            metrics.retire_worker(store)
+        except Exception as e:
+            server.log.warning(f"Retiring metrics of worker {worker.pid} failed: {e}")
@@ -24,7 +24,38 @@ logs_dir.mkdir(exist_ok=True)
 # Import and run the Flask app
 from backend.app import app
 
+
+def run_production():
+    """Serve the app with gunicorn (prefork workers x threads), configured by gunicorn.conf.py"""
+    import runpy
+    from gunicorn.app.base import BaseApplication
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            settings = runpy.run_path(str(project_root / 'gunicorn.conf.py'))
+            for key, value in settings.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    ProductionServer().run()
+
+
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the translation evaluation web app')
+    parser.add_argument('--production', action='store_true',
+                        help='Serve with gunicorn workers (default when FLASK_ENV=production)')
+    parser.add_argument('--dev', action='store_true', help='Force the Flask development server')
+    args = parser.parse_args()
+
+    if args.production or (os.environ.get('FLASK_ENV') == 'production' and not args.dev):
+        run_production()
+        sys.exit(0)
+
     # 环境配置
     host = os.environ.get('FLASK_HOST', '127.0.0.1')
     port = int(os.environ.get('FLASK_PORT', 8888))
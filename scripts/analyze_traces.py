@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Per-stage latency breakdown of exported line traces
+按阶段汇总每行的耗时，并列出最慢的trace
+
+Reads the JSONL written by backend/tracing.py (TRACE_FILE, default logs/traces.jsonl).
+Upstream spans are split into "wait" (until the first token, or until the response
+headers for non-streaming calls; includes connection setup) and "generate" (the rest).
+Time inside a line not covered by any leaf span is reported as "(other)".
+
+Usage:
+    python scripts/analyze_traces.py --run-id my_run
+    python scripts/analyze_traces.py --name playground_line --top 5
+"""
+
+import argparse
+import json
+import statistics
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'backend'))
+from config import get_tracing_config  # noqa: E402
+
+
+def load_traces(path: str, run_id: str = None, name: str = None) -> list:
+    """Read traces, keeping those of one run (translation or evaluation run id) and/or root name."""
+    traces = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            attrs = record.get('attrs', {})
+            if run_id and run_id not in (attrs.get('run_id'), attrs.get('eval_run_id')):
+                continue
+            if name and record.get('name') != name:
+                continue
+            traces.append(record)
+    return traces
+
+
+def stages(record: dict) -> list:
+    """(stage, milliseconds) for each leaf span of a trace, upstream spans split into wait/generate."""
+    parents = {span['parent'] for span in record['spans']}
+    result = []
+    for span in record['spans']:
+        if span['id'] in parents:
+            continue
+        duration = span['duration_ms']
+        wait = span['events'].get('first_token', span['attrs'].get('headers_ms'))
+        if wait is not None and 'outcome' in span['attrs']:
+            wait = min(wait, duration)
+            result.append((f"{span['name']}.wait", wait))
+            result.append((f"{span['name']}.generate", duration - wait))
+        else:
+            result.append((span['name'], duration))
+    covered = sum(ms for _, ms in result)
+    result.append(('(other)', max(record['duration_ms'] - covered, 0.0)))
+    return result
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def breakdown(traces: list) -> list:
+    """Rows of (stage, count, mean, p50, p95, max, share of all traced time), by total time."""
+    samples = defaultdict(list)
+    for record in traces:
+        for stage, ms in stages(record):
+            samples[stage].append(ms)
+    total = sum(record['duration_ms'] for record in traces) or 1.0
+    rows = [(stage, len(values), statistics.fmean(values), percentile(values, 0.5), percentile(values, 0.95),
+             max(values), sum(values) / total) for stage, values in samples.items()]
+    return sorted(rows, key=lambda row: row[1] * row[2], reverse=True)
+
+
+def describe(record: dict) -> str:
+    attrs = record.get('attrs', {})
+    label = ' '.join(f"{key}={attrs[key]}" for key in ('run_id', 'eval_run_id', 'line_num', 'line_number')
+                     if attrs.get(key) is not None)
+    parts = sorted(stages(record), key=lambda item: item[1], reverse=True)
+    detail = ', '.join(f"{stage} {ms:.0f}" for stage, ms in parts if ms >= 1)
+    return f"{record['duration_ms']:9.0f} ms  {record['name']} {label}\n             {detail}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', default=get_tracing_config()['file'] or 'logs/traces.jsonl',
+                        help='Trace file (default: TRACE_FILE)')
+    parser.add_argument('--run-id', help='Only traces of this translation or evaluation run')
+    parser.add_argument('--name', help='Only traces with this root name (translate_line, evaluate_line, '
+                                       'evaluate_batch, playground_line)')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest traces to list')
+    args = parser.parse_args()
+
+    if not Path(args.file).exists():
+        sys.exit(f"No trace file at {args.file}")
+    traces = load_traces(args.file, args.run_id, args.name)
+    if not traces:
+        sys.exit("No matching traces")
+
+    durations = [record['duration_ms'] for record in traces]
+    print(f"{len(traces)} traces, line latency p50 {percentile(durations, 0.5):.0f} ms, "
+          f"p95 {percentile(durations, 0.95):.0f} ms, max {max(durations):.0f} ms\n")
+    print(f"{'stage':<36}{'count':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}{'share':>8}")
+    for stage, count, mean, p50, p95, high, share in breakdown(traces):
+        print(f"{stage:<36}{count:>7}{mean:>10.1f}{p50:>10.1f}{p95:>10.1f}{high:>10.1f}{share:>8.1%}")
+
+    print(f"\nSlowest {min(args.top, len(traces))} traces (ms):")
+    for record in sorted(traces, key=lambda r: r['duration_ms'], reverse=True)[:args.top]:
+        print(describe(record))
+
+
+if __name__ == '__main__':
+    main()
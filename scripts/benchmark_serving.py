@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Serving benchmark: Flask dev server vs gunicorn production mode
+对比开发服务器与生产多进程模式的吞吐与延迟
+
+A local stand-in for the translation API streams each answer over --latency
+seconds, so the benchmark measures how the web tier copes with slow, I/O-bound
+upstream calls rather than the model itself.
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_upstream(latency: float, chunks: int = 10) -> ThreadingHTTPServer:
+    """OpenAI-compatible chat endpoint that streams a fixed answer over `latency` seconds"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if body.get('stream'):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                # Chunked like real LLM APIs, so clients see each event as it is sent
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                events = [f"data: {json.dumps({'choices': [{'delta': {'content': f'词{i}'}}]}, ensure_ascii=False)}\n\n"
+                          for i in range(chunks)] + ["data: [DONE]\n\n"]
+                for i, event in enumerate(events):
+                    if i < chunks:
+                        time.sleep(latency / chunks)
+                    payload = event.encode('utf-8')
+                    self.wfile.write(f"{len(payload):x}\r\n".encode('ascii') + payload + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(latency)
+                payload = json.dumps({"choices": [{"message": {"content": "译文"}}]}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_app(mode: str, port: int, upstream_url: str, workers: int, threads: int,
+              extra_env: dict = None) -> subprocess.Popen:
+    env = dict(os.environ,
+               FLASK_HOST='127.0.0.1', FLASK_PORT=str(port),
+               TRANSLATION_API_KEY='benchmark', TRANSLATION_API_URL=upstream_url, TRANSLATION_MODEL='fake',
+               TRANSLATION_MAX_CONCURRENCY='1000', WEB_WORKERS=str(workers), WEB_THREADS=str(threads),
+               WEB_ACCESS_LOG='', PYTHONUNBUFFERED='1', **(extra_env or {}))
+    flag = '--production' if mode == 'gunicorn' else '--dev'
+    if mode == 'dev':
+        env['FLASK_ENV'] = 'development'
+    # Own session so the dev server's reloader child and gunicorn workers stop with it
+    process = subprocess.Popen([sys.executable, 'run_app.py', flag], cwd=project_root, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/examples", timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    stop_app(process)
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+def stop_app(process: subprocess.Popen):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(timeout=60)
+
+
+def run_load(port: int, concurrency: int, requests_total: int) -> dict:
+    """固定并发的闭环压测，返回吞吐与延迟分位数"""
+    url = f"http://127.0.0.1:{port}/api/translate"
+    # The same sentence every time: keep the translation memory from answering it without an upstream call
+    payload = json.dumps({"source_lang": "en", "target_lang": "zh", "text": "Benchmark sentence.",
+                          "memory": False}).encode('utf-8')
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one_request(_):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            request = urllib.request.Request(url, data=payload, headers={'Content-Type': 'application/json'})
+            ok = json.loads(urllib.request.urlopen(request, timeout=120).read()).get('success')
+        except OSError:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors += 0 if ok else 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one_request, range(requests_total)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+    return {
+        "requests": requests_total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests_total / wall, 2),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the Flask dev server with gunicorn production serving')
+    parser.add_argument('--modes', nargs='+', default=['dev', 'gunicorn'], choices=['dev', 'gunicorn'])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32, 64])
+    parser.add_argument('--requests', type=int, default=256, help='Requests per concurrency level')
+    parser.add_argument('--latency', type=float, default=1.0, help='Upstream streaming time per request (s)')
+    parser.add_argument('--workers', type=int, default=(os.cpu_count() or 1) * 2 + 1)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    upstream = start_fake_upstream(args.latency)
+    upstream_url = f"http://127.0.0.1:{upstream.server_address[1]}/v1/chat/completions"
+    results = []
+    for mode in args.modes:
+        port = free_port()
+        process = start_app(mode, port, upstream_url, args.workers, args.threads)
+        try:
+            for concurrency in args.concurrency:
+                result = run_load(port, concurrency, args.requests)
+                result["mode"] = mode if mode == 'dev' else f"gunicorn {args.workers}x{args.threads}"
+                results.append(result)
+                if not args.json:
+                    print(f"{result['mode']:<18} c={concurrency:<4} {result['throughput_rps']:>7} req/s  "
+                          f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  "
+                          f"p99 {result['p99_ms']:>8} ms  errors {result['errors']}")
+        finally:
+            stop_app(process)
+    upstream.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
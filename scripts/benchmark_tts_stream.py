@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-audio: /api/tts (whole clip) vs /api/tts/stream (chunked)
+对比整段合成与流式合成的首段音频到达时间
+
+A local stand-in for MiniMax streams --chunks hex-encoded audio events over
+--latency seconds (and answers non-streaming requests after the same delay).
+The audio cache is disabled so every request reaches the stand-in.
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from benchmark_serving import free_port, start_app, stop_app  # noqa: E402
+
+
+def start_fake_minimax(latency: float, chunks: int, chunk_bytes: int) -> ThreadingHTTPServer:
+    """MiniMax t2a_v2 stand-in: SSE events with hex audio when stream=true, one JSON body otherwise"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            audio = [bytes([i % 256]) * chunk_bytes for i in range(chunks)]
+            if body.get('stream'):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                events = [{"data": {"audio": part.hex(), "status": 1}, "base_resp": {"status_code": 0}}
+                          for part in audio]
+                events.append({"data": {"audio": b''.join(audio).hex(), "status": 2},
+                               "base_resp": {"status_code": 0}})
+                for i, event in enumerate(events):
+                    if i < chunks:
+                        time.sleep(latency / chunks)
+                    payload = f"data: {json.dumps(event)}\n\n".encode('utf-8')
+                    self.wfile.write(f"{len(payload):x}\r\n".encode('ascii') + payload + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(latency)
+                payload = json.dumps({"data": {"audio": b''.join(audio).hex()},
+                                      "base_resp": {"status_code": 0}}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(url: str, payload: dict) -> dict:
+    """发送一次请求，返回首字节时间与总时间（秒）"""
+    request = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    started = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=120) as response:
+        first = response.read(1)
+        ttfb = time.perf_counter() - started
+        size = len(first) + len(response.read())
+    return {"ttfb": ttfb, "total": time.perf_counter() - started, "bytes": size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare time to first audio of /api/tts and /api/tts/stream')
+    parser.add_argument('--latency', type=float, default=3.0, help='Upstream synthesis time per clip (s)')
+    parser.add_argument('--chunks', type=int, default=10, help='Audio events per streamed clip')
+    parser.add_argument('--chunk-bytes', type=int, default=8000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    upstream = start_fake_minimax(args.latency, args.chunks, args.chunk_bytes)
+    port = free_port()
+    process = start_app('dev', port, 'http://127.0.0.1:1/unused', workers=1, threads=8, extra_env={
+        'MINIMAX_API_KEY': 'benchmark', 'MINIMAX_GROUP_ID': 'benchmark', 'AUDIO_CACHE_DIR': '',
+        'MINIMAX_API_URL': f"http://127.0.0.1:{upstream.server_address[1]}/v1/t2a_v2"})
+    try:
+        base = f"http://127.0.0.1:{port}"
+        rows = []
+        for name, path in (('/api/tts', '/api/tts'), ('/api/tts/stream', '/api/tts/stream')):
+            samples = [measure(base + path, {"text": f"Benchmark sentence {i}.", "language": 'en'})
+                       for i in range(args.runs)]
+            rows.append((name, statistics.median(s["ttfb"] for s in samples),
+                         statistics.median(s["total"] for s in samples), samples[0]["bytes"]))
+    finally:
+        stop_app(process)
+        upstream.shutdown()
+
+    print(f"{'endpoint':<18}{'first byte (ms)':>17}{'total (ms)':>12}{'bytes':>10}")
+    for name, ttfb, total, size in rows:
+        print(f"{name:<18}{ttfb * 1000:>17.0f}{total * 1000:>12.0f}{size:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Startup profiler for the web app and the evaluation CLI
+测量冷启动耗时并按模块/包汇总导入时间（基于 python -X importtime）
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+# Cold-start commands: importing run_app builds the Flask app without serving it
+TARGETS = {
+    'app': ['-c', 'import run_app'],
+    'eval': [str(project_root / 'evaluation' / 'eval.py'), '--help'],
+}
+
+
+def run_target(target: str, importtime: bool = False) -> tuple:
+    """
+    在新的解释器进程中执行启动命令
+
+    Returns:
+        tuple: (耗时秒数, stderr文本)
+    """
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + TARGETS[target]
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    started = time.perf_counter()
+    completed = subprocess.run(command, cwd=project_root, env=env, capture_output=True, text=True, timeout=120)
+    elapsed = time.perf_counter() - started
+    if completed.returncode != 0:
+        raise RuntimeError(f"{target} startup failed ({completed.returncode}): {completed.stderr[-2000:]}")
+    return elapsed, completed.stderr
+
+
+def measure_cold_start(target: str, runs: int = 3) -> float:
+    """多次测量冷启动耗时，返回最小值（秒）"""
+    return min(run_target(target)[0] for _ in range(runs))
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    解析 -X importtime 输出
+
+    Returns:
+        list: [(模块名, 自身耗时us, 累计耗时us), ...]
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def package_breakdown(modules: list) -> list:
+    """按顶层包汇总自身耗时，返回按耗时降序的 [(包名, us, 模块数)]"""
+    totals = defaultdict(lambda: [0, 0])
+    for name, self_us, _ in modules:
+        package = name.split('.')[0]
+        totals[package][0] += self_us
+        totals[package][1] += 1
+    return sorted(((package, us, count) for package, (us, count) in totals.items()),
+                  key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile cold start of the web app and eval CLI')
+    parser.add_argument('targets', nargs='*', metavar='TARGET',
+                        help=f"What to profile: {', '.join(sorted(TARGETS))} (default: all)")
+    parser.add_argument('--runs', type=int, default=3, help='Wall-clock runs per target (minimum is reported)')
+    parser.add_argument('--top', type=int, default=15, help='Rows shown per table')
+    args = parser.parse_args()
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(sorted(unknown))}")
+
+    for target in args.targets or sorted(TARGETS):
+        wall = measure_cold_start(target, args.runs)
+        _, stderr = run_target(target, importtime=True)
+        modules = parse_importtime(stderr)
+        total_us = sum(self_us for _, self_us, _ in modules)
+
+        print(f"=== {target}: cold start {wall * 1000:.0f} ms (min of {args.runs}), "
+              f"imports {total_us / 1000:.0f} ms across {len(modules)} modules ===")
+        print(f"{'package':<28}{'self ms':>10}{'modules':>10}")
+        for package, us, count in package_breakdown(modules)[:args.top]:
+            print(f"{package:<28}{us / 1000:>10.1f}{count:>10}")
+        print(f"\n{'module (cumulative)':<48}{'cum ms':>10}{'self ms':>10}")
+        for name, self_us, cumulative_us in sorted(modules, key=lambda m: m[2], reverse=True)[:args.top]:
+            print(f"{name:<48}{cumulative_us / 1000:>10.1f}{self_us / 1000:>10.1f}")
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -21,7 +21,8 @@ def run_all_tests():
     
     # Discover and run tests
     loader = unittest.TestLoader()
-    suite = loader.discover(str(project_root / 'tests'), pattern='test_*.py')
+    # Import the tests as a package so tests/__init__.py isolates the trace file and shared store
+    suite = loader.discover(str(project_root / 'tests'), pattern='test_*.py', top_level_dir=str(project_root))
     
     runner = unittest.TextTestRunner(verbosity=2)
     result = runner.run(suite)
@@ -1,3 +1,14 @@
 """
 Tests package for Translation Evaluation Tool
-""" 
\ No newline at end of file
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+# Keep trace exports and the shared store of the whole test run out of the repository (logs/, data/)
+_TEST_DIR = tempfile.mkdtemp(prefix='translate_eval_tests_')
+atexit.register(shutil.rmtree, _TEST_DIR, ignore_errors=True)
+os.environ['TRACE_FILE'] = os.path.join(_TEST_DIR, 'traces.jsonl')
+os.environ['SHARED_STORE_PATH'] = os.path.join(_TEST_DIR, 'shared_store.sqlite')
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Audio Cache Tests
+测试TTS音频磁盘缓存与LRU淘汰
+"""
+
+import base64
+import os
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.audio_cache import AudioCache, cache_key
+from backend.tts_service import TTSService, decode_audio
+
+
+class TestAudioCache(unittest.TestCase):
+    """磁盘缓存测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = AudioCache(self.tmp.name, max_bytes=250)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_every_setting(self):
+        """文本、声音、语速、音量、音调、格式任一变化都产生不同的键"""
+        base = cache_key('你好', 'male-qn-qingse', 1.0, 1.0, 0)
+        self.assertEqual(base, cache_key('你好', 'male-qn-qingse', 1, 1, 0.0))
+        variants = [
+            cache_key('你好！', 'male-qn-qingse', 1.0, 1.0, 0),
+            cache_key('你好', 'female-yujie', 1.0, 1.0, 0),
+            cache_key('你好', 'male-qn-qingse', 1.2, 1.0, 0),
+            cache_key('你好', 'male-qn-qingse', 1.0, 0.8, 0),
+            cache_key('你好', 'male-qn-qingse', 1.0, 1.0, 2),
+            cache_key('你好', 'male-qn-qingse', 1.0, 1.0, 0, 'wav'),
+        ]
+        self.assertEqual(len({base, *variants}), 7)
+
+    def test_put_and_read(self):
+        """写入后可读取，无效键不访问文件系统"""
+        key = cache_key('hello', 'v', 1, 1, 0)
+        self.assertIsNone(self.cache.read(key))
+        self.cache.put(key, b'audio-bytes')
+        self.assertEqual(self.cache.read(key), b'audio-bytes')
+        self.assertIsNone(self.cache.get('../etc/passwd'))
+
+    def test_lru_eviction(self):
+        """超出容量时淘汰最久未使用的文件"""
+        keys = [cache_key(str(i), 'v', 1, 1, 0) for i in range(3)]
+        now = time.time()
+        for i, key in enumerate(keys[:2]):
+            self.cache.put(key, b'x' * 100)
+            os.utime(self.cache.path(key), (now - 100 + i, now - 100 + i))
+        # Reading the oldest entry makes it the most recently used
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.cache.put(keys[2], b'x' * 100)
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+        self.assertEqual(self.cache.stats()["bytes"], 200)
+
+
+class TestTTSServiceCache(unittest.TestCase):
+    """TTS服务的缓存行为测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = TTSService(cache=AudioCache(self.tmp.name, max_bytes=10 ** 6))
+        self.service.config = dict(self.service.config, api_key='key', group_id='group')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_decode_audio(self):
+        """兼容hex与base64编码"""
+        self.assertEqual(decode_audio('49443303'), b'ID3\x03')
+        self.assertEqual(decode_audio(base64.b64encode(b'ID3\x03xyz').decode()), b'ID3\x03xyz')
+        self.assertIsNone(decode_audio('base64_audio_data'))
+        self.assertIsNone(decode_audio(''))
+
+    @patch('backend.tts_service.requests.post')
+    def test_second_request_served_from_cache(self, mock_post):
+        """相同文本第二次合成不再调用MiniMax"""
+        mock_response = Mock()
+        mock_response.raise_for_status.return_value = None
+        mock_response.json.return_value = {
+            'data': {'audio': b'ID3 fake mp3'.hex()},
+            'base_resp': {'status_code': 0, 'status_msg': 'success'}
+        }
+        mock_post.return_value = mock_response
+
+        first = self.service.text_to_speech('你好', 'zh')
+        second = self.service.text_to_speech('你好', 'zh')
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(first['cache_key'], second['cache_key'])
+        self.assertEqual(base64.b64decode(second['audio_data']), b'ID3 fake mp3')
+        self.assertEqual(self.service.cache.read(first['cache_key']), b'ID3 fake mp3')
+
+        self.service.text_to_speech('你好', 'ja')
+        self.assertEqual(mock_post.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
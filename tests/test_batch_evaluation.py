@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Batched Evaluation Tests
+测试多条目评估请求与JSON结果校验
+"""
+
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.services import parse_batch_evaluation
+from backend.prompts import get_batch_evaluation_prompt
+from backend import batch
+
+
+class TestParseBatchEvaluation(unittest.TestCase):
+    """JSON结果解析与校验测试"""
+
+    def test_valid_results(self):
+        """合法结果全部解析"""
+        content = '{"results": [{"id": 1, "score": 8, "justification": "Good."}, {"id": 2, "score": 3, "justification": "Wrong meaning."}]}'
+        results, missing = parse_batch_evaluation(content, [1, 2])
+        self.assertEqual(results[1], {"score": 8, "justification": "Good."})
+        self.assertEqual(missing, [])
+
+    def test_fenced_and_list_output(self):
+        """兼容代码块包裹和顶层列表"""
+        content = '```json\n[{"id": "1", "score": 7.0, "justification": "OK."}]\n```'
+        results, missing = parse_batch_evaluation(content, [1, 2])
+        self.assertEqual(results, {1: {"score": 7, "justification": "OK."}})
+        self.assertEqual(missing, [2])
+
+    def test_invalid_entries_are_missing(self):
+        """越界分数、空理由、未知或重复id都视为缺失"""
+        content = ('{"results": [{"id": 1, "score": 11, "justification": "x"},'
+                   '{"id": 2, "score": 5, "justification": ""},'
+                   '{"id": 3, "score": 6, "justification": "fine"},'
+                   '{"id": 3, "score": 2, "justification": "dup"},'
+                   '{"id": 9, "score": 6, "justification": "unknown"}]}')
+        results, missing = parse_batch_evaluation(content, [1, 2, 3])
+        self.assertEqual(results, {3: {"score": 6, "justification": "fine"}})
+        self.assertEqual(missing, [1, 2])
+
+    def test_not_json(self):
+        """非JSON输出时全部缺失"""
+        self.assertEqual(parse_batch_evaluation("SCORE: 8", [1]), ({}, [1]))
+
+    def test_prompt_lists_items(self):
+        """批量prompt包含每个条目"""
+        prompt = get_batch_evaluation_prompt('en', 'zh', [
+            {"id": 1, "source_text": "Hello.", "translation": "你好。"},
+            {"id": 2, "source_text": "Bye.", "translation": "再见。"}
+        ])
+        self.assertIn('"id": 2', prompt)
+        self.assertIn('再见。', prompt)
+
+
+class FakeEvaluationService:
+    """只对第一个条目给出批量结果的假评估服务"""
+
+    def __init__(self):
+        self.batch_calls = []
+        self.single_calls = []
+
+    def evaluate_batch(self, source_lang, target_lang, items):
+        self.batch_calls.append(items)
+        first = items[0]["id"]
+        return {"success": True, "results": {first: {"score": 8, "justification": "Batched."}},
+                "missing": [item["id"] for item in items[1:]]}
+
+    def evaluate_translation(self, source_lang, target_lang, source_text, translation):
+        self.single_calls.append(source_text)
+        return {"success": True, "score": 6, "justification": "Single."}
+
+
+class TestBatchedRun(unittest.TestCase):
+    """批量评估模式测试"""
+
+    def test_missing_items_are_requeued(self):
+        """批量响应中缺失的条目逐条重评，并保存请求统计"""
+        items = [{"line_number": i, "source_text": f"Sentence number {i} for the judge.",
+                  "translation": f"第{i}句需要评估的译文。"} for i in range(1, 6)]
+        service = FakeEvaluationService()
+        saved, stats = {}, {}
+
+        def save_result(src, tgt, line, source, translation, score, justification, run_id, **kwargs):
+            saved[line] = score
+
+        with patch.object(batch, 'EvaluationService', return_value=service), \
+                patch.object(batch, 'load_translation_results', return_value=items), \
+                patch.object(batch, 'save_evaluation_result', side_effect=save_result), \
+                patch.object(batch, 'save_evaluation_run_stats',
+                             side_effect=lambda src, tgt, run_id, data: stats.update(data)):
+            batch.run_batch_evaluation('en', 'zh', 'tr', 'ev', prescreen=False, mode='batched', batch_size=3)
+
+        self.assertEqual(sorted(len(call) for call in service.batch_calls), [2, 3])
+        self.assertEqual(len(service.single_calls), 3)
+        self.assertEqual(sorted(saved), [1, 2, 3, 4, 5])
+        self.assertEqual(sorted(saved.values()), [6, 6, 6, 8, 8])
+        self.assertEqual(stats["batched_requests"], 2)
+        self.assertEqual(stats["requeued_items"], 3)
+        self.assertEqual(stats["judge_requests"], 5)
+
+    def test_each_line_is_screened_once(self):
+        """每行的参考译文、句级指标与预筛只计算一次，并随结果保存"""
+        items = [{"line_number": i, "source_text": f"Sentence number {i} for the judge.",
+                  "translation": f"第{i}句需要评估的译文。"} for i in range(1, 6)]
+        screen = {"decision": "judge", "reason": "uncertain"}
+        for mode in ('single', 'batched'):
+            saved = {}
+            with self.subTest(mode=mode), \
+                    patch.object(batch, 'EvaluationService', return_value=FakeEvaluationService()), \
+                    patch.object(batch, 'load_translation_results', return_value=items), \
+                    patch.object(batch, 'save_evaluation_result',
+                                 side_effect=lambda *args, **kwargs: saved.update({args[2]: kwargs})), \
+                    patch.object(batch, 'save_evaluation_run_stats'), \
+                    patch.object(batch, 'find_reference', return_value=None) as find_reference, \
+                    patch.object(batch, 'prescreen_translation', return_value=screen) as prescreen:
+                batch.run_batch_evaluation('en', 'zh', 'tr', 'ev', prescreen=True, mode=mode, batch_size=3)
+                self.assertEqual(find_reference.call_count, 5)
+                self.assertEqual(prescreen.call_count, 5)
+                self.assertEqual(sorted(saved), [1, 2, 3, 4, 5])
+                self.assertTrue(all(kwargs["prescreen"] is screen for kwargs in saved.values()))
+
+    def test_unknown_mode(self):
+        """不支持的模式报错"""
+        with self.assertRaises(ValueError):
+            batch.run_batch_evaluation('en', 'zh', 'tr', 'ev', mode='parallel')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark Upstream Tests
+测试基准测试用的模拟上游能被翻译、评估与TTS服务正确解析，错误注入，以及压测的拐点判定
+"""
+
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from benchmarks.fake_upstream import FakeUpstream, UpstreamProfile
+from benchmarks.load_test import find_knee, parse_mix
+from backend.services import TranslationService, EvaluationService
+from backend.tts_service import TTSService
+
+
+class TestFakeUpstream(unittest.TestCase):
+    """模拟上游测试"""
+
+    def setUp(self):
+        self.upstream = FakeUpstream(UpstreamProfile(ttft=0, distribution='fixed', tokens=5, token_rate=0)).start()
+        config = {'api_key': 'key', 'api_url': self.upstream.url, 'model': 'fake'}
+        self.translation = TranslationService()
+        self.translation.config = dict(self.translation.config, **config)
+        self.evaluation = EvaluationService()
+        self.evaluation.config = dict(self.evaluation.config, **config)
+
+    def tearDown(self):
+        self.upstream.stop()
+
+    def test_services_parse_responses(self):
+        """流式与非流式翻译、单条与批量评估都能得到有效结果"""
+        for stream in (True, False):
+            result = self.translation.translate_text('en', 'zh', 'Hello.', stream=stream)
+            self.assertEqual((result["success"], result["translation"]), (True, "词0词1词2词3词4"))
+            # The stand-in reports usage in the last stream event and in the JSON body
+            self.assertEqual(result["usage"]["completion_tokens"], 5)
+            self.assertFalse(result["usage"]["estimated"])
+
+        single = self.evaluation.evaluate_translation('en', 'zh', 'Hello.', '你好。')
+        self.assertEqual(single["score"], 8)
+        items = [{"id": i, "source_text": f"Line {i}.", "translation": f"第{i}行。"} for i in (1, 2, 3)]
+        batched = self.evaluation.evaluate_batch('en', 'zh', items)
+        self.assertEqual(sorted(batched["results"]), [1, 2, 3])
+        self.assertEqual(batched["missing"], [])
+        self.assertEqual(self.upstream.stats[('evaluation_batch', 'ok')], 1)
+
+    def test_tts_route(self):
+        """MiniMax接口返回可拼接的MP3帧，流式与非流式一致"""
+        tts = TTSService()
+        tts.cache = None
+        tts.config = dict(tts.config, api_key='key', group_id='group', api_url=self.upstream.tts_url)
+        whole = tts.text_to_speech('Hello.', 'en')
+        self.assertTrue(whole["success"])
+        streamed = tts.stream_text_to_speech('Hello.', 'en')
+        self.assertTrue(streamed["success"])
+        audio = b''.join(streamed["chunks"])
+        self.assertEqual(len(audio), 5 * 1152)
+        self.assertTrue(audio.startswith(b'\xff\xfb'))
+        self.assertEqual(self.upstream.stats[('tts', 'ok')], 2)
+
+    def test_fault_injection(self):
+        """注入的500、429与中断都表现为失败"""
+        for fault in ('error_rate', 'rate_limit_rate', 'drop_rate'):
+            self.upstream.profile = UpstreamProfile(ttft=0, distribution='fixed', token_rate=0, **{fault: 1.0})
+            with patch('backend.services.logger'):
+                result = self.translation.translate_text('en', 'zh', 'Hello.', stream=True)
+            self.assertFalse(result["success"], fault)
+        self.assertEqual(set(outcome for _, outcome in self.upstream.reset_stats()),
+                         {'error', 'rate_limited', 'dropped'})
+
+    def test_latency_distributions(self):
+        """首token延迟按分布抽样，同一种子可复现"""
+        first = UpstreamProfile(ttft=0.2, distribution='lognormal', spread=0.5, seed=3)
+        second = UpstreamProfile(ttft=0.2, distribution='lognormal', spread=0.5, seed=3)
+        samples = [first.draw()[0] for _ in range(200)]
+        self.assertEqual(samples[:5], [second.draw()[0] for _ in range(5)])
+        self.assertLess(min(samples), 0.2)
+        self.assertGreater(max(samples), 0.2)
+        uniform = UpstreamProfile(ttft=1.0, distribution='uniform', spread=0.25, seed=1)
+        self.assertTrue(all(0.75 <= uniform.draw()[0] <= 1.25 for _ in range(100)))
+        with self.assertRaises(ValueError):
+            UpstreamProfile(distribution='normal')
+
+
+class TestLoadTestKnee(unittest.TestCase):
+    """压测拐点判定测试"""
+
+    @staticmethod
+    def step(rate, p95, error_rate=0.0, throughput=None):
+        return {"offered_rps": rate, "overall": {"sent": 100, "p95_ms": p95, "error_rate": error_rate,
+                                                 "throughput_rps": throughput or rate}}
+
+    def test_knee_is_last_healthy_rate(self):
+        """p95超过基线倍数或错误率超限的第一步之前即为拐点"""
+        args = Mock(knee_factor=3.0, max_error_rate=0.01)
+        steps = [self.step(4, 900), self.step(8, 950), self.step(16, 1100, throughput=15),
+                 self.step(32, 5000, throughput=20), self.step(64, 9000, throughput=18)]
+        summary = find_knee(steps, args)
+        self.assertEqual(summary["knee_rps"], 16)
+        self.assertEqual(summary["saturation_rps"], 20)
+        errors = [self.step(4, 900), self.step(8, 950, error_rate=0.05)]
+        self.assertEqual(find_knee(errors, args)["knee_rps"], 4)
+
+    def test_parse_mix(self):
+        """端点权重解析，权重为0的端点去掉"""
+        self.assertEqual(parse_mix(['translate=6', 'tts', 'playground=0']), {'translate': 6.0, 'tts': 1.0})
+        with self.assertRaises(Exception):
+            parse_mix(['upload=1'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Cold Start Tests
+测试Web应用与评估CLI的冷启动耗时和延迟加载
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from scripts.profile_startup import measure_cold_start
+
+# Wall-clock budgets in seconds (generous for slow CI machines; override per environment)
+APP_BUDGET = float(os.environ.get('COLD_START_BUDGET_APP', '2.0'))
+EVAL_BUDGET = float(os.environ.get('COLD_START_BUDGET_EVAL', '1.5'))
+
+# Modules that must only load on first use
+DEFERRED_MODULES = ['requests', 'langdetect', 'services', 'tts_service', 'batch', 'jobs', 'examples', 'backend.services']
+
+
+class TestColdStart(unittest.TestCase):
+    """冷启动测试"""
+
+    def test_app_within_budget(self):
+        """导入run_app（构建Flask应用）在预算内完成"""
+        elapsed = measure_cold_start('app')
+        self.assertLess(elapsed, APP_BUDGET, f"run_app cold start took {elapsed:.2f}s (budget {APP_BUDGET}s)")
+
+    def test_eval_help_within_budget(self):
+        """eval.py --help 在预算内完成"""
+        elapsed = measure_cold_start('eval')
+        self.assertLess(elapsed, EVAL_BUDGET, f"eval.py --help took {elapsed:.2f}s (budget {EVAL_BUDGET}s)")
+
+    def test_heavy_modules_are_deferred(self):
+        """启动时不加载服务、langdetect等重依赖"""
+        for setup in ('import run_app',
+                      "sys.argv = ['eval.py']; sys.path.insert(0, 'evaluation'); import eval"):
+            code = f"import sys; {setup}; print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+            completed = subprocess.run([sys.executable, '-c', code], cwd=project_root,
+                                       capture_output=True, text=True, timeout=60)
+            self.assertEqual(completed.returncode, 0, completed.stderr)
+            self.assertEqual(completed.stdout.strip(), '', f"loaded eagerly by `{setup}`")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
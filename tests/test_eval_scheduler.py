@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Evaluation Tool Scheduler Tests
+测试评估脚本的并发调度：翻译完成后立即评估、各上游的并发上限与进度统计
+"""
+
+import io
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.limits import UpstreamBudget
+from evaluation.eval import PairScheduler, ProgressDisplay, build_jobs
+
+
+class Recorder:
+    """记录调用顺序与各上游同时进行的调用数"""
+
+    def __init__(self):
+        self.events = []
+        self.active = {'translate': 0, 'evaluate': 0}
+        self.peak = {'translate': 0, 'evaluate': 0}
+        self.lock = threading.Lock()
+
+    def enter(self, kind: str, key):
+        with self.lock:
+            self.events.append((kind, key))
+            self.active[kind] += 1
+            self.peak[kind] = max(self.peak[kind], self.active[kind])
+
+    def leave(self, kind: str):
+        with self.lock:
+            self.active[kind] -= 1
+
+
+class FakeTranslationService:
+    def __init__(self, recorder, delay=0.03):
+        self.recorder = recorder
+        self.delay = delay
+
+    def translate_text(self, source_lang, target_lang, text):
+        self.recorder.enter('translate', (target_lang, text))
+        time.sleep(self.delay)
+        self.recorder.leave('translate')
+        if 'fail' in text:
+            return {"success": False, "error": "boom"}
+        return {"success": True, "translation": f"{target_lang}:{text}"}
+
+
+class FakeEvaluationService:
+    def __init__(self, recorder, delay=0.01):
+        self.recorder = recorder
+        self.delay = delay
+
+    def evaluate_translation(self, source_lang, target_lang, source_text, translation):
+        self.recorder.enter('evaluate', (target_lang, source_text))
+        time.sleep(self.delay)
+        self.recorder.leave('evaluate')
+        return {"success": True, "score": 7, "justification": "Fine."}
+
+
+class TestPairScheduler(unittest.TestCase):
+    """调度顺序与并发上限测试"""
+
+    def setUp(self):
+        self.recorder = Recorder()
+        save_patcher = patch('evaluation.eval.save_result')
+        reference_patcher = patch('evaluation.eval.find_reference', return_value=None)
+        self.saved = save_patcher.start()
+        reference_patcher.start()
+        self.addCleanup(save_patcher.stop)
+        self.addCleanup(reference_patcher.stop)
+
+    def scheduler(self, translation_concurrency: int, evaluation_concurrency: int) -> PairScheduler:
+        return PairScheduler(FakeTranslationService(self.recorder), FakeEvaluationService(self.recorder),
+                             UpstreamBudget('translation', max_concurrency=translation_concurrency),
+                             UpstreamBudget('evaluation', max_concurrency=evaluation_concurrency),
+                             'test', prescreen=False)
+
+    def test_line_evaluated_as_soon_as_translated(self):
+        """每行先翻译再评估，评估不等所有翻译完成"""
+        jobs = [('en', 'zh', i, f"line {i}") for i in range(1, 6)]
+        stats = self.scheduler(1, 1).run(jobs)
+        self.assertEqual((stats['processed'], stats['successful']), (5, 5))
+        events = self.recorder.events
+        for _, _, _, text in jobs:
+            self.assertLess(events.index(('translate', ('zh', text))), events.index(('evaluate', ('zh', text))))
+        last_translation = max(i for i, (kind, _) in enumerate(events) if kind == 'translate')
+        first_evaluation = min(i for i, (kind, _) in enumerate(events) if kind == 'evaluate')
+        self.assertLess(first_evaluation, last_translation)
+
+    def test_budgets_cap_each_upstream(self):
+        """翻译与评估分别受各自的并发上限约束，语言对之间互不等待"""
+        jobs = [('en', tgt, i, f"line {i}") for tgt in ('zh', 'ja') for i in range(1, 7)]
+        stats = self.scheduler(3, 1).run(jobs)
+        self.assertEqual(stats['processed'], 12)
+        self.assertEqual(self.recorder.peak, {'translate': 3, 'evaluate': 1})
+        events = self.recorder.events
+        # The second pair starts translating before the first pair has been evaluated
+        first_ja = min(i for i, (kind, key) in enumerate(events) if kind == 'translate' and key[0] == 'ja')
+        last_zh = max(i for i, (kind, key) in enumerate(events) if kind == 'evaluate' and key[0] == 'zh')
+        self.assertLess(first_ja, last_zh)
+        self.assertEqual(self.saved.call_count, 12)
+
+    def test_failed_translation_is_not_evaluated(self):
+        """翻译失败的行不评估、不保存，计入处理数但不计入成功数"""
+        jobs = [('en', 'zh', 1, "line 1"), ('en', 'zh', 2, "this will fail"), ('en', 'zh', 3, "line 3")]
+        with self.assertLogs('evaluation.eval', 'ERROR'):
+            stats = self.scheduler(2, 2).run(jobs)
+        self.assertEqual((stats['processed'], stats['successful']), (3, 2))
+        self.assertNotIn(('evaluate', ('zh', "this will fail")), self.recorder.events)
+        self.assertEqual(self.saved.call_count, 2)
+
+    def test_build_jobs(self):
+        """按语言对展开测试集的行，指定行号时只取该行"""
+        with patch('evaluation.eval.load_test_cases', side_effect=lambda lang: ['a', 'b', 'c'] if lang == 'en' else []):
+            self.assertEqual(build_jobs([('en', 'zh'), ('en', 'ja')], line=2),
+                             [('en', 'zh', 2, 'b'), ('en', 'ja', 2, 'b')])
+            self.assertEqual(len(build_jobs([('en', 'zh')])), 3)
+            with self.assertLogs('evaluation.eval', 'WARNING'):
+                self.assertEqual(build_jobs([('zh', 'en')]), [])
+
+
+class TestProgressDisplay(unittest.TestCase):
+    """进度显示测试"""
+
+    def test_counts_and_render(self):
+        """统计完成与失败数，全部完成时ETA为0"""
+        progress = ProgressDisplay(4, stream=io.StringIO())
+        progress.start()
+        with self.assertLogs('evaluation.eval', 'INFO') as logs:
+            for success in (True, False, True, True):
+                progress.update(success)
+        progress.close()
+        self.assertEqual((progress.done, progress.failed), (4, 1))
+        self.assertTrue(progress.render().startswith("[4/4 100.0%] failed=1 "))
+        self.assertTrue(progress.render().endswith("ETA=00:00:00"))
+        # Not a terminal: one log line per 10% of the lines instead of redrawing
+        self.assertEqual(len(logs.output), 4)
+
+    def test_logs_every_tenth_when_not_a_terminal(self):
+        """非终端输出时大约每完成10%记录一次"""
+        progress = ProgressDisplay(100, stream=io.StringIO())
+        progress.start()
+        with self.assertLogs('evaluation.eval', 'INFO') as logs:
+            for _ in range(100):
+                progress.update(True)
+        progress.close()
+        self.assertEqual(len(logs.output), 10)
+        self.assertIn("[100/100 100.0%]", logs.output[-1])
+
+    def test_empty_run(self):
+        """没有任务时显示100%"""
+        self.assertTrue(ProgressDisplay(0, stream=io.StringIO()).render().startswith("[0/0 100.0%]"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Glossary Tests
+测试术语表：Aho-Corasick 多模式匹配、词边界与大小写规则、文件热加载与prompt注入
+"""
+
+import os
+import random
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+# services.py imports glossary and segment_cache by their bare names, so those are the modules to patch
+import glossary
+import segment_cache
+from glossary import Glossary, find_terms, get_glossary, load_glossary_file, missing_terms
+from backend.services import TranslationService
+from backend.shared_store import SharedStore
+
+
+def terms_of(entries: dict, text: str) -> list:
+    return [term["term"] for term in Glossary(entries).find(text)]
+
+
+class TestGlossaryMatching(unittest.TestCase):
+    """多模式匹配测试"""
+
+    def test_matches_brute_force(self):
+        """与逐个术语查找的结果一致（包括重叠与互为前后缀的术语）"""
+        rng = random.Random(3)
+        alphabet = 'abc'
+        for _ in range(200):
+            terms = {''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(6)}
+            text = ''.join(rng.choice(alphabet) for _ in range(30))
+            found = {(start, end) for start, end, _ in Glossary({t: 'x' for t in terms})._all(text)}
+            expected = {(i, i + len(t)) for t in terms for i in range(len(text)) if text.startswith(t, i)}
+            self.assertEqual(found, expected)
+
+    def test_word_boundaries(self):
+        """术语不匹配单词的一部分，CJK文本没有词边界"""
+        entries = {"app": "应用", "机器学习": "machine learning", "API": "接口"}
+        self.assertEqual(terms_of(entries, "An apple a day."), [])
+        self.assertEqual(terms_of(entries, "Open the app, then the App-store."), ["app"])
+        self.assertEqual(terms_of(entries, "我们用机器学习模型"), ["机器学习"])
+
+    def test_case_rules(self):
+        """普通术语不区分大小写，全大写缩写区分"""
+        entries = {"machine learning": "机器学习", "IT": "信息技术"}
+        self.assertEqual(terms_of(entries, "Machine Learning in IT"), ["machine learning", "IT"])
+        self.assertEqual(terms_of(entries, "Is it machine learning?"), ["machine learning"])
+
+    def test_leftmost_longest(self):
+        """重叠时取最左、最长的术语，按首次出现去重"""
+        entries = {"learning": "学习", "machine learning": "机器学习", "model": "模型"}
+        self.assertEqual(terms_of(entries, "A machine learning model, a model for learning."),
+                         ["machine learning", "model", "learning"])
+        self.assertEqual(Glossary(entries).find("model learning model", limit=1),
+                         [{"term": "model", "translation": "模型"}])
+
+    def test_thousands_of_terms(self):
+        """数千条术语时一次扫描仍然很快"""
+        rng = random.Random(5)
+        words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 9)))
+                 for _ in range(5000)]
+        entries = {f"{w} {words[i - 1]}" if i % 3 == 0 else w: f"t{i}" for i, w in enumerate(words)}
+        compiled = Glossary(entries)
+        text = ' '.join(rng.choice(words) for _ in range(300))
+        started = time.perf_counter()
+        found = compiled.find(text)
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertTrue(found)
+
+
+class TestGlossaryFiles(unittest.TestCase):
+    """术语表文件加载与热更新测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / 'en-zh.tsv'
+        self.path.write_text("# term\ttranslation\nmachine learning\t机器学习\nbroken line\n\ttoken\n", encoding='utf-8')
+        for patcher in (patch.dict('os.environ', {'GLOSSARY_DIR': self.tmp.name, 'GLOSSARY_RELOAD_SECONDS': '0'}),
+                        patch.object(glossary, '_glossaries', {})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_load_and_reload(self):
+        """格式不对的行跳过；文件修改后重新编译，删除后不再注入"""
+        with self.assertLogs('glossary', 'WARNING'):
+            self.assertEqual(load_glossary_file(self.path), {"machine learning": "机器学习"})
+        self.assertEqual(len(get_glossary('en', 'zh')), 1)
+        self.assertIs(get_glossary('en', 'zh'), get_glossary('en', 'zh'))
+        self.assertIsNone(get_glossary('en', 'ja'))
+
+        self.path.write_text("machine learning\t机器学习\ntoken\t词元\n", encoding='utf-8')
+        mtime = self.path.stat().st_mtime + 10
+        os.utime(self.path, (mtime, mtime))
+        self.assertEqual([t["term"] for t in find_terms('en', 'zh', "A token for machine learning")],
+                         ["token", "machine learning"])
+
+        with patch.dict('os.environ', {'GLOSSARY_ENABLED': 'false'}):
+            self.assertEqual(find_terms('en', 'zh', "token"), [])
+        self.path.unlink()
+        self.assertEqual(find_terms('en', 'zh', "token"), [])
+
+    def test_terms_in_prompt(self):
+        """只把原文中出现的术语放入系统prompt，结果中列出这些术语"""
+        service = TranslationService()
+        service.config = dict(service.config, api_key='test', model='m', stream=False)
+        self.path.write_text("machine learning\t机器学习\ntoken\t词元\n", encoding='utf-8')
+        with patch.object(service, '_translate_non_stream',
+                          return_value={"success": True, "translation": "机器学习很有用。"}) as upstream:
+            result = service.translate_text('en', 'zh', "Machine learning is useful.")
+        system_prompt = upstream.call_args.args[0]['messages'][0]['content']
+        self.assertIn("## 术语表\n原文中的以下术语必须使用规定的译法：\n- machine learning → 机器学习", system_prompt)
+        self.assertNotIn("词元", system_prompt)
+        self.assertTrue(system_prompt.endswith("请翻译以下英文文本："))
+        self.assertEqual(result["terms"], ["machine learning"])
+
+    def edit_glossary(self, content: str):
+        self.path.write_text(content, encoding='utf-8')
+        mtime = self.path.stat().st_mtime + 10
+        os.utime(self.path, (mtime, mtime))
+
+    def test_glossary_edit_reaches_sentence_cache(self):
+        """术语表修改后，增量翻译只重新翻译术语译法变化的句子"""
+        store = SharedStore(str(Path(self.tmp.name) / 'store.sqlite'))
+        for patcher in (patch.object(segment_cache, 'get_shared_store', return_value=store),
+                        patch.object(segment_cache, '_cache', None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        service = TranslationService()
+        service.config = dict(service.config, api_key='test', model='m', segment_cache_ttl=60)
+        sent = []
+
+        def translate_text(source_lang, target_lang, text, **options):
+            sent.append(text)
+            return {"success": True, "translation": text}
+
+        text = "We use machine learning. Hello there."
+        with patch.object(service, 'translate_text', side_effect=translate_text):
+            service.translate_incremental('en', 'zh', text)
+            self.assertEqual(sorted(sent), ["Hello there.", "We use machine learning."])
+            sent.clear()
+            self.assertEqual(service.translate_incremental('en', 'zh', text)["reused_segments"], 2)
+            self.edit_glossary("machine learning\t机学\n")
+            result = service.translate_incremental('en', 'zh', text)
+        self.assertEqual(sent, ["We use machine learning."])
+        self.assertEqual(result["reused_segments"], 1)
+
+    def test_memory_translation_must_use_glossary(self):
+        """翻译记忆中的译文没有使用当前规定的译法时不直接返回，而是作为参考译文重新翻译"""
+        service = TranslationService()
+        service.config = dict(service.config, api_key='test', model='m', stream=False)
+        stored = {"source_text": "Machine learning is useful.", "translation": "机器学习很有用。", "similarity": 1.0}
+        text = "Machine learning is useful."
+        with patch('backend.services.consult', return_value={"served": stored, "hints": []}), \
+                patch('backend.services.remember'), \
+                patch.object(service, '_translate_non_stream',
+                             return_value={"success": True, "translation": "机学很有用。"}) as upstream:
+            served = service.translate_text('en', 'zh', text, use_memory=True)
+            upstream.assert_not_called()
+            self.assertEqual((served["memory"]["served"], served["terms"]), (True, ["machine learning"]))
+
+            self.edit_glossary("machine learning\t机学\n")
+            result = service.translate_text('en', 'zh', text, use_memory=True)
+        system_prompt = upstream.call_args.args[0]['messages'][0]['content']
+        self.assertIn("- machine learning → 机学", system_prompt)
+        self.assertIn("译文：机器学习很有用。", system_prompt)
+        self.assertEqual((result["translation"], result["memory"]), ("机学很有用。", {"served": False, "hints": 1}))
+        self.assertEqual(missing_terms([{"term": "API", "translation": "Interface"}], "an interface"), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Incremental Translation Tests
+测试增量翻译：按段落与句子切分、句子译文缓存复用与译文重组
+"""
+
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+# services.py imports segment_cache by its bare name, so that is the module to patch
+import segment_cache
+from segment_cache import SegmentCache, join_segments, segment_key, segment_text
+from backend.services import TranslationService
+from backend.shared_store import SharedStore
+
+
+class TestSegments(unittest.TestCase):
+    """切分与重组测试"""
+
+    def test_segment_and_join(self):
+        """换行、缩进与制表符原样保留，同一行内句间的空格取决于目标语言"""
+        sentences, separators = segment_text("First one.  Second one!\n\n  第三句。第四句？\n\tLast.")
+        self.assertEqual(sentences, ["First one.", "Second one!", "第三句。", "第四句？", "Last."])
+        self.assertEqual(separators, ["", "  ", "\n\n  ", "", "\n\t", ""])
+        self.assertEqual(join_segments(["一。", "二！", "三。", "四？", "五。"], separators, 'zh'),
+                         "一。二！\n\n  三。四？\n\t五。")
+        self.assertEqual(join_segments(["One.", "Two!", "Three.", "Four?", "Five."], separators, 'en'),
+                         "One.  Two!\n\n  Three. Four?\n\tFive.")
+        self.assertEqual(segment_text(" \n"), ([], [" \n"]))
+
+    def test_sentence_boundaries(self):
+        """缩写、首字母、小数与引号内的句号不切分句子"""
+        cases = {
+            "Dr. Smith paid $3.50 for e.g. coffee. Then he left.":
+                ["Dr. Smith paid $3.50 for e.g. coffee.", "Then he left."],
+            "J. R. Smith came... and went. Really?! Yes.":
+                ["J. R. Smith came... and went.", "Really?!", "Yes."],
+            "\"Stop.\" she said. See Fig. 3 (approx. 5 km). El Sr. García llegó.":
+                ["\"Stop.\" she said.", "See Fig. 3 (approx. 5 km).", "El Sr. García llegó."],
+            "「こんにちは。」と言った。次の文。": ["「こんにちは。」と言った。", "次の文。"],
+        }
+        for text, expected in cases.items():
+            self.assertEqual(segment_text(text)[0], expected, text)
+
+    def test_key_depends_on_settings(self):
+        """缓存键随模型、语言对与采样参数变化"""
+        settings = {'temperature': 0.0, 'top_p': 1.0, 'max_length': 100}
+        key = segment_key('m', 'en', 'zh', settings, 'Hello.')
+        self.assertEqual(key, segment_key('m', 'en', 'zh', dict(reversed(list(settings.items()))), 'Hello.'))
+        self.assertNotEqual(key, segment_key('m', 'en', 'ja', settings, 'Hello.'))
+        self.assertNotEqual(key, segment_key('m', 'en', 'zh', dict(settings, temperature=0.7), 'Hello.'))
+
+    def test_local_cache_is_bounded(self):
+        """共享存储不可用时使用有上限的进程内LRU"""
+        cache = SegmentCache(ttl=60, max_entries=2)
+        with patch.object(segment_cache, 'get_shared_store', return_value=None):
+            cache.set('a', '1')
+            cache.set('b', '2')
+            cache.get('a')
+            cache.set('c', '3')
+            self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), ('1', None, '3'))
+
+    def test_shared_cache_is_purged_and_bounded(self):
+        """共享存储中的句子缓存定期清除过期键，并只保留最近写入的句子"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SharedStore(str(Path(tmp) / 'store.sqlite'))
+            store.set('cache:old', 1, ttl=0.01)
+            time.sleep(0.02)
+            cache = SegmentCache(ttl=60, max_entries=2)
+            with patch.object(segment_cache, 'get_shared_store', return_value=store), \
+                    patch.object(segment_cache, '_PURGE_EVERY', 1):
+                for key in ('tseg:a', 'tseg:b', 'tseg:c'):
+                    cache.set(key, key[-1])
+                    time.sleep(0.01)
+                self.assertEqual((cache.get('tseg:a'), cache.get('tseg:b'), cache.get('tseg:c')), (None, 'b', 'c'))
+            self.assertEqual(store.purge_expired(), 0)
+            self.assertEqual(len(store.items('cache:')), 0)
+
+
+class TestTranslateIncremental(unittest.TestCase):
+    """增量翻译服务测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        store = SharedStore(str(Path(self.tmp.name) / 'store.sqlite'))
+        for patcher in (patch.object(segment_cache, 'get_shared_store', return_value=store),
+                        patch.object(segment_cache, '_cache', None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.service = TranslationService()
+        self.service.config = dict(self.service.config, api_key='test', model='m', segment_cache_ttl=60)
+        self.sent = []
+
+    def translate_text(self, source_lang, target_lang, text, **options):
+        self.sent.append(text)
+        if 'broken' in text:
+            return {"success": False, "error": "timeout"}
+        return {"success": True, "translation": f" <{text}> ",
+                "usage": {"prompt_tokens": 5, "completion_tokens": 2, "estimated": False, "latency_ms": 10.0}}
+
+    def translate(self, text, **options):
+        with patch.object(self.service, 'translate_text', side_effect=self.translate_text):
+            return self.service.translate_incremental('en', 'zh', text, **options)
+
+    def test_only_changed_sentences_are_sent(self):
+        """改动一句后只翻译这一句，其余复用并按原结构重组"""
+        first = self.translate("One. Two. Two.\nThree.")
+        self.assertEqual(first["translation"], "<One.><Two.><Two.>\n<Three.>")
+        self.assertEqual((first["segments"], first["reused_segments"]), (3, 0))
+        self.assertEqual(sorted(self.sent), ["One.", "Three.", "Two."])
+        self.assertEqual(first["usage"]["calls"], 3)
+
+        self.sent.clear()
+        second = self.translate("One. Two changed.\nThree.")
+        self.assertEqual(self.sent, ["Two changed."])
+        self.assertEqual(second["translation"], "<One.><Two changed.>\n<Three.>")
+        self.assertEqual((second["segments"], second["reused_segments"], second["usage"]["calls"]), (3, 2, 1))
+
+        # Different sampling settings do not reuse the cached sentences
+        self.sent.clear()
+        self.translate("One.", temperature=0.9)
+        self.assertEqual(self.sent, ["One."])
+
+    def test_failed_sentences_are_not_cached(self):
+        """部分句子失败时整体失败，成功的句子已缓存，重试只发送失败的句子"""
+        result = self.translate("Fine. A broken one.")
+        self.assertFalse(result["success"])
+        self.assertEqual(result["error"], "1 segments failed: timeout")
+        self.sent.clear()
+        self.translate("Fine. A broken one.")
+        self.assertEqual(self.sent, ["A broken one."])
+
+    def test_reuse_disabled(self):
+        """TRANSLATION_SEGMENT_CACHE_TTL 为0时不复用"""
+        self.service.config['segment_cache_ttl'] = 0
+        self.translate("One.")
+        result = self.translate("One.")
+        self.assertEqual((result["reused_segments"], self.sent), (0, ["One.", "One."]))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Background Job Tests
+测试后台批处理任务的进度、取消与跨worker可见性
+"""
+
+import tempfile
+import threading
+import time
+import unittest
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.jobs import JobManager, JobProgress, JobError, JobQueueFull, new_run_id, validate_job_params
+from backend.shared_store import SharedStore
+# jobs.py imports batch by its bare name, so that is the module to patch
+import batch
+
+
+class FakeTranslationService:
+    """可阻塞的假翻译服务，记录每次调用"""
+
+    def __init__(self, gate: threading.Event = None, fail_on: str = None):
+        self.gate = gate
+        self.fail_on = fail_on
+        self.calls = []
+        self.started = threading.Event()
+
+    def translate_text(self, source_lang, target_lang, text):
+        self.calls.append(text)
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        if text == self.fail_on:
+            return {"success": False, "error": "upstream error"}
+        return {"success": True, "translation": f"译文：{text}",
+                "usage": {"prompt_tokens": 10, "completion_tokens": 4, "total_tokens": 14, "estimated": False,
+                          "latency_ms": 20.0}}
+
+
+def wait_for(manager, job_id, statuses=('completed', 'failed', 'cancelled'), timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not reach {statuses}: {manager.get(job_id)}")
+
+
+class TestJobProgress(unittest.TestCase):
+    """进度统计测试"""
+
+    def test_snapshot(self):
+        """完成/失败计数、百分比与ETA"""
+        progress = JobProgress()
+        progress.add_total(10)
+        progress.started -= 2  # pretend two seconds have passed
+        progress.record(True, 3)
+        progress.record(False)
+        snapshot = progress.snapshot()
+        self.assertEqual((snapshot['done'], snapshot['failed'], snapshot['total']), (3, 1, 10))
+        self.assertEqual(snapshot['percent'], 40.0)
+        self.assertAlmostEqual(snapshot['throughput'], 2.0, delta=0.1)
+        self.assertAlmostEqual(snapshot['eta_seconds'], 3.0, delta=0.2)
+
+    def test_validation(self):
+        """无效参数被拒绝"""
+        with self.assertRaises(JobError):
+            validate_job_params('export', {'source_lang': 'en', 'target_lang': 'zh'})
+        with self.assertRaises(JobError):
+            validate_job_params('translation', {'source_lang': 'en', 'target_lang': 'en'})
+        with self.assertRaises(JobError):
+            validate_job_params('evaluation', {'source_lang': 'en', 'target_lang': 'zh'})
+        with self.assertRaises(JobError):
+            validate_job_params('translation', {'source_lang': 'en', 'target_lang': 'zh', 'run_id': '../x'})
+        params = validate_job_params('translation', {'source_lang': 'en', 'target_lang': 'zh', 'lines': '3'})
+        self.assertEqual(params['lines'], 3)
+
+
+class TestJobManager(unittest.TestCase):
+    """任务执行、取消与队列测试"""
+
+    def setUp(self):
+        self.cases = [f"Sentence {i}." for i in range(1, 7)]
+        self.saved = []
+        self.patches = [
+            patch.object(batch, 'load_test_cases', return_value=self.cases),
+            patch.object(batch, 'save_translation_result',
+                         side_effect=lambda src, tgt, line, text, translation, run_id: self.saved.append(line)),
+            patch.object(batch, 'save_translation_run_stats'),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_translation_job_progress(self):
+        """翻译任务完成后统计成功与失败行数"""
+        service = FakeTranslationService(fail_on="Sentence 2.")
+        manager = JobManager(max_workers=1)
+        with patch.object(batch, 'TranslationService', return_value=service):
+            job = manager.submit('translation', {'source_lang': 'en', 'target_lang': 'zh', 'lines': 4,
+                                                 'run_id': 'test_run'})
+            job = wait_for(manager, job['id'])
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual((job['progress']['done'], job['progress']['failed']), (3, 1))
+        summary = dict(job['result']['translation'])
+        usage = summary.pop('usage')
+        self.assertEqual((usage['calls'], usage['total_tokens'], usage['ms_per_completion_token']), (3, 42, 5.0))
+        self.assertEqual(summary, {"run_id": 'test_run', "lines": 4, "saved": 3, "failed": 1, "cancelled": 0,
+                                   "order": 'longest'})
+        self.assertEqual(sorted(self.saved), [1, 3, 4])
+
+    def test_cancel_running_job_stops_new_calls(self):
+        """取消运行中的任务后不再发起新的上游请求"""
+        gate = threading.Event()
+        service = FakeTranslationService(gate=gate)
+        manager = JobManager(max_workers=1)
+        with patch.object(batch, 'TranslationService', return_value=service), \
+                patch.object(batch, 'MAX_CONCURRENCY', 1):
+            job = manager.submit('translation', {'source_lang': 'en', 'target_lang': 'zh', 'lines': 6})
+            self.assertTrue(service.started.wait(5))
+            cancelled = manager.cancel(job['id'])
+            self.assertTrue(cancelled['cancel_requested'])
+            gate.set()
+            job = wait_for(manager, job['id'])
+        self.assertEqual(job['status'], 'cancelled')
+        self.assertEqual(len(service.calls), 1)
+        self.assertEqual(job['result']['translation']['cancelled'], 5)
+        self.assertEqual(job['progress']['done'], 1)
+
+    def test_cancel_while_waiting_for_upstream_slot(self):
+        """排队等待上游槽位期间被取消的行拿到槽位后不再发起请求"""
+        cancel_event = threading.Event()
+
+        class CancellingBudget:
+            @contextmanager
+            def slot(self, priority):
+                cancel_event.set()  # the job is cancelled while this line waits behind other traffic
+                yield
+
+        service = FakeTranslationService()
+        with patch.object(batch, 'get_budget', return_value=CancellingBudget()):
+            outcome = batch._translate_and_save(service, 'en', 'zh', 'Sentence 1.', 1, 'test_run', cancel_event)
+        self.assertEqual(outcome, batch.CANCELLED)
+        self.assertEqual(service.calls, [])
+
+    def test_cancel_queued_job_and_queue_limit(self):
+        """排队中的任务取消后不会运行；排队已满时拒绝提交"""
+        gate = threading.Event()
+        service = FakeTranslationService(gate=gate)
+        manager = JobManager(max_workers=1, max_queued=1)
+        params = {'source_lang': 'en', 'target_lang': 'zh', 'lines': 1}
+        with patch.object(batch, 'TranslationService', return_value=service):
+            running = manager.submit('translation', params)
+            self.assertTrue(service.started.wait(5))
+            queued = manager.submit('translation', params)
+            with self.assertRaises(JobQueueFull):
+                manager.submit('translation', params)
+            self.assertEqual(manager.cancel(queued['id'])['status'], 'cancelled')
+            gate.set()
+            self.assertEqual(wait_for(manager, running['id'])['status'], 'completed')
+        self.assertEqual(len(service.calls), 1)
+        self.assertEqual([job['id'] for job in manager.list()], [queued['id'], running['id']])
+
+    def test_run_ids_do_not_collide(self):
+        """同时提交的任务得到不同的运行ID；指定的运行ID正被写入时拒绝提交"""
+        self.assertEqual(len({new_run_id() for _ in range(100)}), 100)
+        gate = threading.Event()
+        service = FakeTranslationService(gate=gate)
+        manager = JobManager(max_workers=2)
+        params = {'source_lang': 'en', 'target_lang': 'zh', 'lines': 1}
+        with patch.object(batch, 'TranslationService', return_value=service):
+            first = manager.submit('translation', params)
+            second = manager.submit('translation', params)
+            self.assertNotEqual(first['params']['run_id'], second['params']['run_id'])
+            with self.assertRaises(JobError):
+                manager.submit('translation', dict(params, run_id=first['params']['run_id']))
+            other_pair = manager.submit('translation', dict(params, target_lang='ja', run_id=first['params']['run_id']))
+            gate.set()
+            wait_for(manager, first['id'])
+            again = manager.submit('translation', dict(params, run_id=first['params']['run_id']))
+            for job in (second, other_pair, again):
+                self.assertEqual(wait_for(manager, job['id'])['status'], 'completed')
+
+    def test_concurrent_submits_with_same_run_id(self):
+        """同时提交相同运行ID的任务时只有一个被接受"""
+        gate = threading.Event()
+        service = FakeTranslationService(gate=gate)
+        manager = JobManager(max_workers=4)
+        params = {'source_lang': 'en', 'target_lang': 'zh', 'lines': 1, 'run_id': 'shared_run'}
+        barrier = threading.Barrier(4)
+        accepted, rejected = [], []
+
+        def submit():
+            barrier.wait(5)
+            try:
+                accepted.append(manager.submit('translation', params))
+            except JobError:
+                rejected.append(True)
+
+        with patch.object(batch, 'TranslationService', return_value=service):
+            threads = [threading.Thread(target=submit) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+            gate.set()
+            self.assertEqual((len(accepted), len(rejected)), (1, 3))
+            wait_for(manager, accepted[0]['id'])
+
+    def test_same_run_id_across_workers(self):
+        """不同worker同时提交相同运行ID的任务时只有一个被接受；任务结束或遗留的占用会被释放"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SharedStore(Path(tmp) / 'store.sqlite')
+            managers = [JobManager(max_workers=1, store=store) for _ in range(4)]
+            gate = threading.Event()
+            service = FakeTranslationService(gate=gate)
+            params = {'source_lang': 'en', 'target_lang': 'zh', 'lines': 1, 'run_id': 'shared_run'}
+            barrier = threading.Barrier(len(managers))
+            accepted, rejected = [], []
+
+            def submit(manager):
+                barrier.wait(5)
+                try:
+                    accepted.append((manager, manager.submit('translation', params)))
+                except JobError:
+                    rejected.append(manager)
+
+            with patch.object(batch, 'TranslationService', return_value=service):
+                threads = [threading.Thread(target=submit, args=(manager,)) for manager in managers]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join(5)
+                self.assertEqual((len(accepted), len(rejected)), (1, 3))
+                owner, job = accepted[0]
+                self.assertEqual(list(store.items('run:')), ['run:translations:shared_run:en-zh'])
+                gate.set()
+                wait_for(owner, job['id'])
+                self.assertEqual(store.items('run:'), {})
+
+                # A claim left behind by a worker that died before publishing its job
+                store.claim(['run:translations:stale_run:en-zh'], {'job': 'deadbeef0000', 'since': time.time() - 3600})
+                job = rejected[0].submit('translation', dict(params, run_id='stale_run'))
+                self.assertEqual(wait_for(rejected[0], job['id'])['status'], 'completed')
+
+    def test_visible_and_cancellable_from_another_worker(self):
+        """其他worker通过共享存储查看并取消任务"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = SharedStore(Path(tmp) / 'store.sqlite')
+            owner, other = JobManager(max_workers=1, store=store), JobManager(max_workers=1, store=store)
+            gate = threading.Event()
+            service = FakeTranslationService(gate=gate)
+            with patch.object(batch, 'TranslationService', return_value=service), \
+                    patch.object(batch, 'MAX_CONCURRENCY', 1):
+                job = owner.submit('translation', {'source_lang': 'en', 'target_lang': 'zh', 'lines': 6})
+                self.assertTrue(service.started.wait(5))
+                self.assertEqual(other.get(job['id'])['status'], 'running')
+                self.assertEqual([j['id'] for j in other.list()], [job['id']])
+                self.assertTrue(other.cancel(job['id'])['cancel_requested'])
+                time.sleep(0.6)  # the owner re-reads the shared flag at most every 0.5 s
+                gate.set()
+                job = wait_for(owner, job['id'])
+            self.assertEqual(job['status'], 'cancelled')
+            self.assertEqual(len(service.calls), 1)
+            self.assertEqual(other.get(job['id'])['status'], 'cancelled')
+
+    def test_jobs_of_dead_worker_fail(self):
+        """拥有任务的worker没有心跳后，其他worker把任务标记为失败；存活的worker定期发布心跳"""
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch.dict('os.environ', {'JOB_HEARTBEAT_SECONDS': '0.1', 'JOB_STALE_SECONDS': '0.5'}):
+            store = SharedStore(Path(tmp) / 'store.sqlite')
+            owner, other = JobManager(max_workers=1, store=store), JobManager(max_workers=1, store=store)
+            gate = threading.Event()
+            service = FakeTranslationService(gate=gate)
+            with patch.object(batch, 'TranslationService', return_value=service):
+                alive = owner.submit('translation', {'source_lang': 'en', 'target_lang': 'zh', 'lines': 1})
+                self.assertTrue(service.started.wait(5))
+                dead = dict(alive, id='deadbeef0000', owner=-1, heartbeat=time.time() - 5, status='running')
+                store.set('job:deadbeef0000', dead)
+                time.sleep(0.8)
+                self.assertEqual(other.get(alive['id'])['status'], 'running')
+                failed = other.get('deadbeef0000')
+                self.assertEqual(failed['status'], 'failed')
+                self.assertIn('Worker -1', failed['error'])
+                self.assertEqual(store.get('job:deadbeef0000')['status'], 'failed')
+
+                owner.abandon("Worker exited")
+                self.assertEqual(other.get(alive['id'])['status'], 'failed')
+                gate.set()
+                owner._jobs[alive['id']].future.result(5)
+            self.assertEqual(owner.get(alive['id'])['status'], 'failed')
+            self.assertEqual(owner.get(alive['id'])['error'], "Worker exited")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
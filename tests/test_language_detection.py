@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Language Detection Tests
+测试分层语言检测
+"""
+
+import unittest
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.language_detection import LanguageDetector, script_counts
+from backend.utils import detect_language, load_test_cases
+
+
+class TestScriptDetection(unittest.TestCase):
+    """文字系统检测测试"""
+
+    def test_script_counts(self):
+        """按文字系统统计字母"""
+        counts = script_counts("Hello 你好 カタ 한국")
+        self.assertEqual(counts, {'han': 2, 'kana': 2, 'hangul': 2, 'latin': 5})
+
+    def test_cjk_languages(self):
+        """韩文、日文假名与汉字分别判定为ko/ja/zh"""
+        detector = LanguageDetector()
+        self.assertEqual(detector.detect("안녕하세요")["language"], 'ko')
+        self.assertEqual(detector.detect("今日は良い天気ですね")["language"], 'ja')
+        result = detector.detect("今天天气很好")
+        self.assertEqual((result["language"], result["method"]), ('zh', 'script'))
+
+
+class TestLatinDetection(unittest.TestCase):
+    """拉丁文字语言检测测试"""
+
+    def test_trigram_model(self):
+        """三元组模型区分英语、西语、葡语"""
+        detector = LanguageDetector()
+        cases = {
+            "The weather is nice today": 'en',
+            "¿Dónde está la estación de tren?": 'es',
+            "Onde fica a estação de comboios?": 'pt',
+        }
+        for text, lang in cases.items():
+            result = detector.detect(text)
+            self.assertEqual((result["language"], result["method"]), (lang, 'trigram'), text)
+
+    def test_suites(self):
+        """整套测试用例按多数票检测"""
+        detector = LanguageDetector()
+        for lang in ('en', 'zh', 'ja', 'es', 'pt'):
+            result = detector.detect_majority(load_test_cases(lang))
+            self.assertEqual(result["language"], lang)
+            self.assertEqual(result["share"], 1.0)
+
+    def test_deterministic_and_cached(self):
+        """相同文本结果一致且命中缓存"""
+        detector = LanguageDetector()
+        first = detector.detect_batch(["Hola", "Hola", "Hola"])
+        self.assertEqual(first[0], first[2])
+        self.assertEqual(detector.cache_info().hits, 2)
+        # Callers get copies, so changing a result does not change later lookups
+        first[0]['language'] = 'xx'
+        self.assertEqual(detector.detect("Hola"), first[2])
+
+    def test_undetectable(self):
+        """无法判断时返回None而不是默认英语"""
+        self.assertIsNone(detect_language("12345 !!!"))
+
+    def test_unsupported_languages_undetectable(self):
+        """不支持的拉丁文字语言与过短的文本返回None，而不是最接近的支持语言"""
+        detector = LanguageDetector()
+        for text in ("Bonjour, comment ça va ?", "Je voudrais un café, s'il vous plaît.",
+                     "Das ist ein schönes Haus.", "OK"):
+            self.assertIsNone(detector.detect(text)["language"], text)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Upstream Budget Tests
+测试令牌桶限速、并发上限、上游预算的优先级排队、交互预留槽位、等待老化与排队指标，以及跨worker共享的槽位队列
+"""
+
+import multiprocessing
+import tempfile
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.limits import RateLimiter, UpstreamBudget, INTERACTIVE, PLAYGROUND, BATCH
+from backend.shared_store import SharedStore, SharedSlots
+# limits.py imports metrics by its bare name, so that is where its samples are recorded
+from metrics import UPSTREAM_QUEUE_WAIT
+
+
+class TestRateLimiter(unittest.TestCase):
+    """令牌桶限速测试"""
+
+    def test_burst_then_paced(self):
+        """突发容量内不等待，之后按速率放行"""
+        limiter = RateLimiter(rate=20, burst=2)
+        started = time.monotonic()
+        waits = [limiter.acquire() for _ in range(6)]
+        elapsed = time.monotonic() - started
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertTrue(all(wait > 0 for wait in waits[2:]))
+        # Four tokens beyond the burst at 20 per second
+        self.assertGreaterEqual(elapsed, 0.19)
+        self.assertLess(elapsed, 0.5)
+
+    def test_refill_is_capped(self):
+        """空闲期间补充的令牌不超过突发容量"""
+        limiter = RateLimiter(rate=100, burst=1)
+        limiter.acquire()
+        time.sleep(0.05)
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertGreater(limiter.acquire(), 0.0)
+
+    def test_unlimited(self):
+        """rate 为0时从不等待"""
+        limiter = RateLimiter(rate=0)
+        self.assertEqual([limiter.acquire() for _ in range(100)], [0.0] * 100)
+
+    def test_paced_across_threads(self):
+        """多线程共用一个限速器时总速率不超过配置值"""
+        limiter = RateLimiter(rate=50, burst=1)
+        started = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(11)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+
+
+class TestConcurrencyCap(unittest.TestCase):
+    """并发上限测试"""
+
+    def test_cap_holds_under_load(self):
+        """同时占用的槽位数不超过上限，所有调用最终完成"""
+        budget = UpstreamBudget('test', max_concurrency=3)
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0, 'done': 0}
+
+        def call():
+            with budget.slot(BATCH):
+                with lock:
+                    state['active'] += 1
+                    state['peak'] = max(state['peak'], state['active'])
+                time.sleep(0.02)
+                with lock:
+                    state['active'] -= 1
+                    state['done'] += 1
+
+        threads = [threading.Thread(target=call) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual((state['peak'], state['done']), (3, 12))
+        self.assertEqual(budget.active, 0)
+
+    def test_slot_released_on_error(self):
+        """调用抛出异常时槽位也会释放"""
+        budget = UpstreamBudget('test', max_concurrency=1)
+        with self.assertRaises(RuntimeError):
+            with budget.slot():
+                raise RuntimeError('upstream failed')
+        self.assertEqual(budget.active, 0)
+        with budget.slot():
+            self.assertEqual(budget.active, 1)
+
+    def test_budget_rate_limit(self):
+        """槽位有空闲时，预算的每次调用仍消耗一个限速令牌"""
+        budget = UpstreamBudget('test', max_concurrency=2, rate=20, burst=1)
+        started = time.monotonic()
+        for _ in range(3):
+            with budget.slot():
+                pass
+        # Two tokens beyond the burst at 20 per second
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+        self.assertEqual(budget.active, 0)
+
+
+class TestPriorityBudget(unittest.TestCase):
+    """优先级预算测试"""
+
+    def setUp(self):
+        self.order = []
+        self.threads = []
+
+    def tearDown(self):
+        for thread in self.threads:
+            thread.join(5)
+
+    def call(self, budget, priority, name=None, hold: threading.Event = None):
+        """在后台线程中占用一个槽位，等到它开始排队（或已拿到槽位）再返回"""
+        queued = len(budget._waiters)
+        started = threading.Event()
+
+        def run():
+            with budget.slot(priority):
+                self.order.append(name or priority)
+                started.set()
+                if hold is not None:
+                    hold.wait(5)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        deadline = time.time() + 5
+        while len(budget._waiters) <= queued and not started.is_set() and time.time() < deadline:
+            time.sleep(0.001)
+        return started
+
+    def test_higher_priority_goes_first(self):
+        """槽位释放后按 交互 > playground > 批量 的顺序分配，同类先到先得"""
+        budget = UpstreamBudget('test', max_concurrency=1, aging=0)
+        hold = threading.Event()
+        self.assertTrue(self.call(budget, BATCH, 'running', hold).wait(5))
+        for priority, name in ((BATCH, 'batch1'), (PLAYGROUND, 'playground'), (BATCH, 'batch2'),
+                               (INTERACTIVE, 'interactive')):
+            self.call(budget, priority, name)
+        hold.set()
+        for thread in self.threads:
+            thread.join(5)
+        self.assertEqual(self.order, ['running', 'interactive', 'playground', 'batch1', 'batch2'])
+
+    def test_reserved_slots(self):
+        """预留槽位只给交互调用，批量调用最多占用其余槽位"""
+        budget = UpstreamBudget('test', max_concurrency=3, reserved=1, aging=0)
+        hold = threading.Event()
+        for i in range(3):
+            self.call(budget, BATCH, f"batch{i}", hold)
+        self.assertEqual(budget.active, 2)
+        self.assertTrue(self.call(budget, INTERACTIVE, hold=hold).wait(5))
+        self.assertEqual(budget.active, 3)
+        hold.set()
+        for thread in self.threads:
+            thread.join(5)
+        self.assertEqual(self.order[-1], 'batch2')
+        self.assertEqual(budget.active, 0)
+        # Reserving every slot would stop batch work, so one is always left
+        self.assertEqual(UpstreamBudget('test', max_concurrency=2, reserved=5).reserved, 1)
+
+    def test_aging_prevents_starvation(self):
+        """等待超过 aging 的批量调用排在新到的交互调用之前"""
+        budget = UpstreamBudget('test', max_concurrency=1, aging=0.2)
+        hold = threading.Event()
+        self.assertTrue(self.call(budget, INTERACTIVE, 'running', hold).wait(5))
+        self.call(budget, BATCH, 'old batch')
+        time.sleep(0.3)
+        self.call(budget, PLAYGROUND, 'new playground')
+        self.call(budget, INTERACTIVE, 'new interactive')
+        hold.set()
+        for thread in self.threads:
+            thread.join(5)
+        self.assertEqual(self.order, ['running', 'old batch', 'new interactive', 'new playground'])
+
+    def test_queue_wait_metric(self):
+        """排队时间按服务与优先级记录，未知优先级报错"""
+        budget = UpstreamBudget('test_wait', max_concurrency=1)
+        with budget.slot(PLAYGROUND):
+            pass
+        samples = UPSTREAM_QUEUE_WAIT.collect()
+        counts = samples[('test_wait', PLAYGROUND)]
+        # One observation (bucket counts, then the sum of the waits)
+        self.assertEqual(sum(counts[:-1]), 1)
+        self.assertLess(counts[-1], 1)
+        with self.assertRaises(ValueError):
+            with budget.slot('urgent'):
+                pass
+
+
+class TestSharedBudget(unittest.TestCase):
+    """共享槽位测试：两个预算对象共用一个存储，模拟两个worker进程"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = SharedStore(Path(self.tmp.name) / 'shared.sqlite')
+        self.order = []
+        self.threads = []
+
+    def tearDown(self):
+        for thread in self.threads:
+            thread.join(5)
+
+    def worker(self, max_concurrency: int, reserved: int = 0) -> UpstreamBudget:
+        slots = SharedSlots(SharedStore(self.store.path), 'upstream:test', lease=600)
+        return UpstreamBudget('test', max_concurrency, reserved=reserved, aging=0, slots=slots)
+
+    def queued(self) -> int:
+        return self.store._connection().execute('SELECT COUNT(*) FROM slots').fetchone()[0]
+
+    def call(self, budget, priority, name, hold: threading.Event = None):
+        """在后台线程中占用一个槽位，等到它进入共享队列再返回"""
+        queued = self.queued()
+        started = threading.Event()
+
+        def run():
+            with budget.slot(priority):
+                self.order.append(name)
+                started.set()
+                if hold is not None:
+                    hold.wait(5)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        deadline = time.time() + 5
+        while self.queued() <= queued and time.time() < deadline:
+            time.sleep(0.001)
+        return started
+
+    def test_priority_across_workers(self):
+        """一个worker的批量调用占满槽位时，另一个worker的交互调用先于排队更早的批量调用"""
+        first, second = self.worker(1), self.worker(1)
+        hold = threading.Event()
+        self.assertTrue(self.call(first, BATCH, 'running', hold).wait(5))
+        self.call(second, BATCH, 'batch')
+        self.call(first, PLAYGROUND, 'playground')
+        self.call(second, INTERACTIVE, 'interactive')
+        time.sleep(0.1)
+        self.assertEqual(self.order, ['running'])
+        hold.set()
+        for thread in self.threads:
+            thread.join(5)
+        self.assertEqual(self.order, ['running', 'interactive', 'playground', 'batch'])
+        self.assertEqual(self.queued(), 0)
+
+    def test_reserved_slots_across_workers(self):
+        """预留槽位与并发上限按所有worker合计"""
+        first, second = self.worker(2, reserved=1), self.worker(2, reserved=1)
+        hold = threading.Event()
+        self.assertTrue(self.call(first, BATCH, 'batch1', hold).wait(5))
+        blocked = self.call(second, BATCH, 'batch2', hold)
+        self.assertTrue(self.call(second, INTERACTIVE, 'interactive', hold).wait(5))
+        self.assertFalse(blocked.wait(0.2))
+        hold.set()
+        self.assertTrue(blocked.wait(5))
+
+    def test_long_calls_keep_their_lease(self):
+        """占用时间超过租期的调用会续租，不会被其他worker当作泄漏清除"""
+        first = self.worker(1)
+        second = UpstreamBudget('test', 1, aging=0,
+                                slots=SharedSlots(SharedStore(self.store.path), 'upstream:test', lease=0.2))
+        first.slots.lease = 0.2
+        hold = threading.Event()
+        self.assertTrue(self.call(first, BATCH, 'long', hold).wait(5))
+        waiting = self.call(second, BATCH, 'next')
+        self.assertFalse(waiting.wait(1.5))
+        hold.set()
+        self.assertTrue(waiting.wait(5))
+        self.assertEqual(self.order, ['long', 'next'])
+
+    def test_slots_of_exited_worker_are_released(self):
+        """被强杀的worker占用的槽位在下次分配时清除"""
+        process = multiprocessing.Process(target=time.sleep, args=(0,))
+        process.start()
+        process.join(5)
+        conn = self.store._connection()
+        conn.execute('INSERT INTO slots (budget, rank, since, pid, active, updated) VALUES (?, 2, ?, ?, 1, ?)',
+                     ('upstream:test', time.time(), process.pid, time.time()))
+        budget = self.worker(1)
+        with self.assertLogs(level='WARNING'):
+            with budget.slot(BATCH):
+                self.assertEqual(self.queued(), 1)
+        self.assertEqual(self.queued(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
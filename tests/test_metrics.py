@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Metrics Tests
+测试指标的分片计数、直方图、Prometheus文本格式与跨进程合并
+"""
+
+import tempfile
+import threading
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import Mock
+
+import requests
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend import metrics
+from backend.metrics import Counter, Gauge, Histogram, Registry, merge_snapshots, render
+from backend.shared_store import SharedStore
+
+
+class TestMetrics(unittest.TestCase):
+    """指标测试"""
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_sums_threads(self):
+        """多线程并发计数不丢失，退出线程的分片被合并"""
+        counter = Counter('jobs_total', 'Jobs', ['kind'], registry=self.registry)
+        counter._compact_at = 4
+
+        def work():
+            for _ in range(1000):
+                counter.inc(kind='a')
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc(2.5, kind='b')
+        self.assertEqual(counter.collect(), {('a',): 8000, ('b',): 2.5})
+        # Shards of the finished threads were folded into the retired totals
+        self.assertEqual(len(counter._shards), 1)
+
+        with self.assertRaises(ValueError):
+            counter.inc(kind='a', extra='x')
+
+    def test_histogram_render(self):
+        """直方图输出累计桶、_sum 与 _count"""
+        histogram = Histogram('latency_seconds', 'Latency', ['route'], buckets=(0.1, 1), registry=self.registry)
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, route='/a')
+        gauge = Gauge('in_flight', 'In flight', registry=self.registry)
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        text = render(self.registry.snapshot())
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{route="/a",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_sum{route="/a"} 3.65', text)
+        self.assertIn('latency_seconds_count{route="/a"} 4', text)
+        self.assertIn('in_flight 1', text)
+
+    def test_merge_worker_snapshots(self):
+        """多个worker的快照相加，标签值转义"""
+        counter = Counter('requests_total', 'Requests', ['route'], registry=self.registry)
+        counter.inc(route='/a"b')
+        first = self.registry.snapshot()
+        counter.inc(3, route='/a"b')
+        counter.inc(route='/c')
+        merged = merge_snapshots([first, self.registry.snapshot()])
+        text = render(merged)
+        self.assertIn('requests_total{route="/a\\"b"} 5', text)
+        self.assertIn('requests_total{route="/c"} 1', text)
+
+    def test_gauge_function_and_hit_ratio(self):
+        """采集时计算的gauge与缓存命中率"""
+        gauge = Gauge('queue', 'Queue', ['status'], registry=self.registry)
+        gauge.set_function(lambda: {('queued',): 3})
+        cache = Counter('cache_requests_total', 'Cache', ['cache', 'result'], registry=self.registry)
+        cache.inc(3, cache='audio', result='hit')
+        cache.inc(cache='audio', result='miss')
+        text = render(metrics.add_hit_ratios(self.registry.snapshot()))
+        self.assertIn('queue{status="queued"} 3', text)
+        self.assertIn('cache_hit_ratio{cache="audio"} 0.75', text)
+
+
+class TestUpstreamCall(unittest.TestCase):
+    """上游调用记录测试"""
+
+    def outcome_count(self, outcome):
+        return metrics.UPSTREAM_REQUESTS.collect().get(('test', 'chat', outcome), 0)
+
+    def test_outcomes(self):
+        """成功、429、超时与内容错误分别计数，进行中数量归零"""
+        before = {o: self.outcome_count(o) for o in ('ok', 'rate_limited', 'timeout', 'api_error')}
+        with metrics.UpstreamCall('test', 'chat') as call:
+            call.usage({'prompt_tokens': 12, 'completion_tokens': 5}, 'm')
+        response = Mock(status_code=429)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            with metrics.UpstreamCall('test', 'chat'):
+                raise requests.exceptions.HTTPError('429', response=response)
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            with metrics.UpstreamCall('test', 'chat'):
+                raise requests.exceptions.ReadTimeout('slow')
+        call = metrics.UpstreamCall('test', 'chat')
+        call.first_token()
+        call.fail()
+        call.finish()
+        call.finish()
+
+        for outcome in before:
+            self.assertEqual(self.outcome_count(outcome), before[outcome] + 1, outcome)
+        self.assertEqual(metrics.UPSTREAM_IN_FLIGHT.collect()[('test',)], 0)
+        self.assertGreaterEqual(metrics.LLM_TOKENS.collect()[('test', 'm', 'prompt')], 12)
+        # Bucket counts (without the trailing sum) include the first-token observation
+        self.assertGreaterEqual(sum(metrics.UPSTREAM_TTFT.collect()[('test', 'chat')][:-1]), 1)
+
+
+class TestWorkerSnapshots(unittest.TestCase):
+    """跨worker快照：退出worker的计数不会从总数中消失"""
+
+    DEAD_PID = 2 ** 22 + 1  # above the largest pid Linux hands out
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SharedStore(Path(self.tmp.name) / 'store.sqlite')
+        registry = Registry()
+        Counter('requests_total', 'Requests', ['route'], registry=registry).inc(5, route='/a')
+        Gauge('in_flight', 'In flight', registry=registry).inc(2)
+        self.worker_snapshot = registry.snapshot()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_dead_worker_counters_retired(self):
+        """已退出worker的计数器并入retired，gauge被丢弃，只合并一次"""
+        self.store.set(f'metrics:{self.DEAD_PID}:abcd1234', self.worker_snapshot)
+        metrics.retire_dead_workers(self.store)
+        metrics.retire_dead_workers(self.store)
+
+        snapshots = self.store.items('metrics:')
+        self.assertEqual(list(snapshots), [metrics.RETIRED_KEY])
+        text = render(merge_snapshots(list(snapshots.values())))
+        self.assertIn('requests_total{route="/a"} 5', text)
+        self.assertNotIn('in_flight', text)
+
+        self.store.set(f'metrics:{self.DEAD_PID}:ef567890', self.worker_snapshot)
+        metrics.retire_dead_workers(self.store)
+        self.assertIn('requests_total{route="/a"} 10', render(self.store.get(metrics.RETIRED_KEY)))
+
+    def test_exiting_worker_retires_itself(self):
+        """worker退出时发布最终快照并立即并入retired"""
+        metrics.publish(self.store)
+        self.assertIn(metrics._store_key(), self.store.items('metrics:'))
+        metrics.retire_worker(self.store)
+        self.assertEqual(list(self.store.items('metrics:')), [metrics.RETIRED_KEY])
+        retired = self.store.get(metrics.RETIRED_KEY)
+        self.assertIn('upstream_requests_total', retired)
+        self.assertNotIn('upstream_requests_in_flight', retired)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Multi-target Translation Tests
+测试一个原文翻译为多个目标语言：并发模式、结构化单次请求与JSON结果解析
+"""
+
+import json
+import threading
+import time
+import unittest
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.services import TranslationService, parse_multi_translation
+from backend.prompts import get_multi_translation_prompt
+
+
+def usage(prompt_tokens, completion_tokens):
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens, "estimated": False, "latency_ms": 100.0}
+
+
+class TestParseMultiTranslation(unittest.TestCase):
+    """JSON结果解析测试"""
+
+    def test_wrapped_and_flat_output(self):
+        """兼容 translations 包裹、顶层字典与代码块"""
+        content = '{"translations": {"zh": " 你好 ", "ja": "こんにちは"}}'
+        self.assertEqual(parse_multi_translation(content, ['zh', 'ja']), ({"zh": "你好", "ja": "こんにちは"}, []))
+        content = '```json\n{"zh": "你好"}\n```'
+        self.assertEqual(parse_multi_translation(content, ['zh', 'ko']), ({"zh": "你好"}, ['ko']))
+
+    def test_invalid_output(self):
+        """空译文、非字符串与非JSON输出都视为缺失"""
+        self.assertEqual(parse_multi_translation('{"zh": "", "ja": 3}', ['zh', 'ja']), ({}, ['zh', 'ja']))
+        self.assertEqual(parse_multi_translation('你好', ['zh']), ({}, ['zh']))
+
+    def test_prompt_lists_targets(self):
+        """prompt 列出每个目标语言代码"""
+        prompt = get_multi_translation_prompt('en', ['zh', 'ko'])
+        self.assertIn('- zh: 中文', prompt)
+        self.assertIn('{"translations": {"zh": "...", "ko": "..."}}', prompt)
+
+
+class TestTranslateMulti(unittest.TestCase):
+    """多目标翻译服务测试"""
+
+    def setUp(self):
+        self.service = TranslationService()
+        self.service.config = dict(self.service.config, api_key='test', model='m', multi_mode='concurrent')
+        self.slots = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        with self.lock:
+            self.slots += 1
+        yield
+
+    def test_concurrent(self):
+        """每个目标语言一次请求并发执行，逐个返回结果与耗时，失败的目标单独标出"""
+        def translate_text(source_lang, target_lang, text, **options):
+            time.sleep(0.2)
+            if target_lang == 'ko':
+                return {"success": False, "error": "timeout"}
+            return {"success": True, "translation": f"{target_lang}:{text}", "usage": usage(10, 2)}
+
+        with patch.object(self.service, 'translate_text', side_effect=translate_text) as translate:
+            result = self.service.translate_multi('en', ['zh', 'ja', 'ko'], 'Hello', slot=self.slot, temperature=0.3)
+
+        self.assertEqual(translate.call_count, 3)
+        self.assertEqual(translate.call_args.kwargs, {'temperature': 0.3})
+        self.assertEqual(self.slots, 3)
+        self.assertEqual(list(result["results"]), ['zh', 'ja', 'ko'])
+        self.assertEqual(result["results"]["ja"]["translation"], 'ja:Hello')
+        self.assertGreaterEqual(result["results"]["zh"]["latency_ms"], 200)
+        # The three requests overlap
+        self.assertLess(result["latency_ms"], 500)
+        self.assertFalse(result["success"])
+        self.assertEqual(result["error"], "Translation failed for: ko")
+        self.assertEqual((result["usage"]["calls"], result["usage"]["prompt_tokens"]), (2, 20))
+
+    def test_structured(self):
+        """一次请求翻译所有目标语言，缺失的目标语言单独翻译"""
+        content = json.dumps({"translations": {"zh": "你好", "ja": ""}}, ensure_ascii=False)
+        with patch.object(self.service, '_translate_non_stream',
+                          return_value={"success": True, "translation": content, "usage": usage(50, 8)}) as shared, \
+                patch.object(self.service, 'translate_text',
+                             return_value={"success": True, "translation": "こんにちは", "usage": usage(10, 3)}) as single:
+            result = self.service.translate_multi('en', ['zh', 'ja'], 'Hello', mode='structured', slot=self.slot)
+
+        request_data = shared.call_args.args[0]
+        self.assertEqual(shared.call_args.kwargs, {'endpoint': 'chat_multi'})
+        self.assertEqual(request_data['messages'][1], {'role': 'user', 'content': 'Hello'})
+        self.assertEqual(request_data['response_format'], {'type': 'json_object'})
+        self.assertEqual(single.call_args.args, ('en', 'ja', 'Hello'))
+        self.assertTrue(result["success"])
+        self.assertEqual(result["mode"], 'structured')
+        self.assertEqual({lang: r["translation"] for lang, r in result["results"].items()},
+                         {"zh": "你好", "ja": "こんにちは"})
+        self.assertEqual(self.slots, 2)
+        self.assertEqual((result["usage"]["calls"], result["usage"]["completion_tokens"]), (2, 11))
+
+    def test_structured_failure_falls_back(self):
+        """结构化请求失败时所有目标语言单独翻译；单个目标语言不走结构化请求"""
+        with patch.object(self.service, '_translate_non_stream', return_value={"success": False, "error": "400"}), \
+                patch.object(self.service, 'translate_text',
+                             return_value={"success": True, "translation": "x"}) as single:
+            result = self.service.translate_multi('en', ['zh', 'ja'], 'Hello', mode='structured')
+            self.assertTrue(result["success"])
+            self.assertEqual(single.call_count, 2)
+            with patch.object(self.service, '_translate_structured') as structured:
+                self.service.translate_multi('en', ['zh'], 'Hello', mode='structured')
+            structured.assert_not_called()
+
+    def test_invalid_mode(self):
+        """未知模式报错"""
+        result = self.service.translate_multi('en', ['zh'], 'Hello', mode='parallel')
+        self.assertEqual(result, {"success": False, "error": "Unsupported multi-target mode: parallel"})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Streaming Playground Tests
+测试试验场逐行流式返回翻译与评估结果
+"""
+
+import threading
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend import batch
+
+
+class FakeTranslationService:
+    """“slow”开头的文本等待放行后才返回"""
+
+    release = threading.Event()
+    calls = []
+
+    def translate_text(self, source_lang, target_lang, text):
+        FakeTranslationService.calls.append(text)
+        if text.startswith('slow'):
+            FakeTranslationService.release.wait(5)
+        if text == 'broken':
+            return {"success": False, "error": "upstream error"}
+        return {"success": True, "translation": f"译：{text}"}
+
+
+class FakeEvaluationService:
+    def evaluate_translation(self, source_lang, target_lang, source_text, translation):
+        return {"success": True, "score": 8, "justification": "Fine."}
+
+
+class TestPlaygroundStream(unittest.TestCase):
+    """流式试验场测试"""
+
+    def setUp(self):
+        FakeTranslationService.release = threading.Event()
+        FakeTranslationService.calls = []
+        self.patches = [
+            patch.object(batch, 'TranslationService', FakeTranslationService),
+            patch.object(batch, 'EvaluationService', FakeEvaluationService),
+            patch.object(batch, 'get_prescreen_config', return_value={'enabled': False}),
+            patch.object(batch, 'find_reference', return_value=None),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        FakeTranslationService.release.set()
+        for p in self.patches:
+            p.stop()
+
+    def test_events_arrive_before_slowest_line(self):
+        """快的行先返回，每行先有译文再有评估，最后是汇总"""
+        stream = batch.stream_live_translation_and_evaluation('en', 'zh', ['slow one', 'fast two', 'broken', ''])
+        events = []
+        for event in stream:
+            events.append(event)
+            # Everything except the slow line is done before it is released
+            if len([e for e in events if e["type"] == "result"]) == 2:
+                FakeTranslationService.release.set()
+
+        types = [(e["type"], e.get("line_number")) for e in events]
+        self.assertLess(types.index(("translation", 2)), types.index(("result", 2)))
+        self.assertLess(types.index(("result", 2)), types.index(("translation", 1)))
+        self.assertEqual(types[-1], ("summary", None))
+        results = {e["line_number"]: e for e in events if e["type"] == "result"}
+        self.assertEqual(sorted(results), [1, 2, 3])
+        self.assertTrue(results[3]["error"])
+        self.assertEqual(events[-1]["count"], 3)
+        self.assertEqual(events[-1]["avg_score"], round(16 / 3, 2))
+
+    def test_non_streaming_results_are_sorted(self):
+        """非流式接口仍返回按行号排序的结果"""
+        FakeTranslationService.release.set()
+        results = batch.run_live_translation_and_evaluation('en', 'zh', ['slow one', 'fast two'])
+        self.assertEqual([r["line_number"] for r in results], [1, 2])
+        self.assertNotIn("type", results[0])
+        self.assertEqual(results[0]["translation"], "译：slow one")
+
+    def test_closing_stream_skips_pending_lines(self):
+        """客户端断开后未开始的行不再调用上游"""
+        with patch.object(batch, 'MAX_CONCURRENCY', 1):
+            stream = batch.stream_live_translation_and_evaluation('en', 'zh', ['fast one', 'slow two', 'fast three'])
+            self.assertEqual(next(stream)["type"], "translation")
+            stream.close()
+            FakeTranslationService.release.set()
+        self.assertNotIn('fast three', FakeTranslationService.calls)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Pre-screen Tests
+测试本地预筛选
+"""
+
+import unittest
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.prescreen import prescreen_translation, ACCEPT, REJECT, JUDGE
+from backend.utils import find_reference, load_test_cases
+
+
+class TestPrescreen(unittest.TestCase):
+    """预筛选决策测试"""
+
+    def setUp(self):
+        self.en = load_test_cases('en')
+        self.zh = load_test_cases('zh')
+        self.source = self.en[2]
+        self.reference = find_reference('en', 'zh', self.source, 3)
+
+    def test_empty_and_copy_rejected(self):
+        """空译文与原文照抄直接判低分"""
+        self.assertEqual(prescreen_translation('en', 'zh', self.source, '  ...  ')['reason'], 'empty_output')
+        result = prescreen_translation('en', 'zh', self.source, self.source)
+        self.assertEqual((result['decision'], result['reason']), (REJECT, 'untranslated_copy'))
+        self.assertEqual(result['score'], 1)
+
+    def test_short_copies_sent_to_judge(self):
+        """名称、编号等短文本原样保留可能是正确的，交给LLM评估而不是直接拒绝"""
+        for source_lang, target_lang, text in (('en', 'es', 'Hotel'), ('en', 'pt', 'OK'),
+                                               ('en', 'zh', 'iPhone 15'), ('zh', 'en', 'SKU-4411')):
+            result = prescreen_translation(source_lang, target_lang, text, text)
+            self.assertEqual(result['decision'], JUDGE, text)
+        self.assertIn('untranslated_copy', prescreen_translation('en', 'es', 'Hotel', 'Hotel')['flags'])
+
+    def test_wrong_script_rejected(self):
+        """目标语言文字系统不符时拒绝"""
+        result = prescreen_translation('en', 'zh', self.source, self.en[5])
+        self.assertEqual((result['decision'], result['reason']), (REJECT, 'wrong_script'))
+
+    def test_truncated_output_rejected(self):
+        """译文长度严重不合理时拒绝"""
+        result = prescreen_translation('en', 'zh', self.source, self.reference[:2])
+        self.assertEqual((result['decision'], result['reason']), (REJECT, 'length_ratio'))
+
+    def test_reference_match_accepted(self):
+        """与参考译文一致时直接通过"""
+        result = prescreen_translation('en', 'zh', self.source, self.reference, self.reference)
+        self.assertEqual((result['decision'], result['score']), (ACCEPT, 10))
+
+    def test_uncertain_sent_to_judge(self):
+        """不确定的译文交给LLM评估"""
+        result = prescreen_translation('en', 'zh', self.source, self.zh[7], self.reference)
+        self.assertEqual(result['decision'], JUDGE)
+        self.assertIn('reference_chrf', result['checks'])
+
+    def test_related_languages_not_copies(self):
+        """西语与葡语的正常译文不被误判为照抄"""
+        es = load_test_cases('es')
+        pt = load_test_cases('pt')
+        for es_line, pt_line in zip(es, pt):
+            self.assertNotEqual(prescreen_translation('es', 'pt', es_line, pt_line)['decision'], REJECT)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
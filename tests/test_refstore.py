@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Reference Store Tests
+测试参考译文库
+"""
+
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.refstore import ReferenceStore
+
+
+class TestReferenceStore(unittest.TestCase):
+    """参考译文库单元测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.testcases = root / 'testcases'
+        for lang, lines in {'en': ['Hello.', 'Good night.'], 'zh': ['你好。', '晚安。']}.items():
+            (self.testcases / lang).mkdir(parents=True)
+            (self.testcases / lang / 'greetings.txt').write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        self.store_root = root / 'references'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lazy_build_and_lookup(self):
+        """首次查找时才构建/加载，之后按键直接查找"""
+        store = ReferenceStore(self.store_root, self.testcases)
+        self.assertFalse(self.store_root.exists())
+
+        self.assertEqual(store.get('greetings', 2, 'zh'), '晚安。')
+        self.assertTrue((self.store_root / 'greetings.json').exists())
+        self.assertIsNone(store.get('greetings', 3, 'zh'))
+        self.assertIsNone(store.get('missing', 1, 'zh'))
+
+    def test_lookup_by_text_and_line(self):
+        """按源文本查找参考，行号不匹配时回退到文本匹配"""
+        store = ReferenceStore(self.store_root, self.testcases)
+        self.assertEqual(store.lookup('en', 'zh', 'Good night.'), '晚安。')
+        self.assertEqual(store.lookup('en', 'zh', 'Good night.', line_number=1), '晚安。')
+        self.assertEqual(store.lookup('zh', 'en', '你好。', line_number=1), 'Hello.')
+        self.assertIsNone(store.lookup('en', 'zh', 'Unknown text'))
+
+    def test_persisted_and_incremental_import(self):
+        """持久化后新实例无需读取测试文件；只有变化的套件会重新导入"""
+        store = ReferenceStore(self.store_root, self.testcases)
+        self.assertEqual(store.import_testcases(), ['greetings'])
+        self.assertEqual(store.import_testcases(), [])
+
+        reloaded = ReferenceStore(self.store_root, self.testcases / 'nowhere')
+        self.assertEqual(reloaded.get('greetings', 1, 'en'), 'Hello.')
+
+        (self.testcases / 'zh' / 'greetings.txt').write_text('您好。\n晚安。\n', encoding='utf-8')
+        self.assertEqual(store.import_testcases(), ['greetings'])
+        self.assertEqual(store.get('greetings', 1, 'zh'), '您好。')
+        self.assertEqual(store.lookup('en', 'zh', 'Hello.'), '您好。')
+
+    def test_edited_testcases_reimported_on_lookup(self):
+        """已有 manifest 时，编辑过的测试文件在下次查找时自动重新导入"""
+        ReferenceStore(self.store_root, self.testcases).import_testcases()
+        (self.testcases / 'zh' / 'greetings.txt').write_text('早上好。\n你好。\n晚安。\n', encoding='utf-8')
+
+        store = ReferenceStore(self.store_root, self.testcases, refresh_seconds=0)
+        self.assertEqual(store.get('greetings', 1, 'zh'), '早上好。')
+        (self.testcases / 'en' / 'greetings.txt').write_text('Good morning.\nHello.\nGood night.\n',
+                                                              encoding='utf-8')
+        self.assertEqual(store.lookup('en', 'zh', 'Good night.'), '晚安。')
+        self.assertEqual(store.get('greetings', 3, 'en'), 'Good night.')
+
+    def test_import_suite(self):
+        """直接导入新套件"""
+        store = ReferenceStore(self.store_root, self.testcases)
+        store.import_suite('extra', {'en': ['Yes.'], 'ja': ['はい。']})
+        self.assertIn('extra', store.suites())
+        self.assertEqual(ReferenceStore(self.store_root).get('extra', 1, 'ja'), 'はい。')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Batch Scheduling Tests
+测试批处理按估计代价排序：历史译文长度预测、三种调度顺序与提交顺序
+"""
+
+import json
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+# batch.py imports scheduling by its bare name, so that is the module to patch
+import scheduling
+from scheduling import evaluation_costs, load_output_history, resolve_order, schedule, translation_costs
+from backend import batch
+from backend.jobs import JobError, validate_job_params
+
+
+def write_run(data_root: Path, run_id: str, pair: str, lines: dict):
+    pair_dir = data_root / 'translations' / run_id / pair
+    pair_dir.mkdir(parents=True)
+    for i, (source_text, translation) in enumerate(lines.items(), 1):
+        (pair_dir / f"line_{i}_translation.json").write_text(
+            json.dumps({"source_text": source_text, "translation": translation}), encoding='utf-8')
+
+
+class TestCosts(unittest.TestCase):
+    """代价估计测试"""
+
+    def setUp(self):
+        scheduling._history_cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_root = Path(self.tmp.name)
+        patcher = patch.object(scheduling, 'DATA_ROOT', self.data_root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(scheduling._history_cache.clear)
+
+    def test_history_predicts_output(self):
+        """已翻译过的原文用上次的译文长度，其余按语言对的输出比例估计"""
+        write_run(self.data_root, 'r1', 'en-zh', {"Hello there.": "你好。", "Good morning to you all.": "大家早上好。"})
+        write_run(self.data_root, 'r2', 'en-ja', {"Hello there.": "こんにちは" * 20})
+        outputs, ratio = load_output_history('en', 'zh')
+        self.assertEqual(outputs, {"Hello there.": 3, "Good morning to you all.": 6})
+        self.assertAlmostEqual(ratio, 9 / 9)
+        costs = translation_costs('en', 'zh', ["Hello there.", "abcdefgh"])
+        self.assertEqual(costs, [3 + 3, 2 + 2.0])
+
+    def test_no_history(self):
+        """没有历史时译文长度按原文长度估计"""
+        self.assertEqual(load_output_history('en', 'ko'), ({}, 1.0))
+        self.assertEqual(translation_costs('en', 'ko', ["abcd" * 10]), [20.0])
+
+    def test_evaluation_costs(self):
+        """评估代价为原文与译文token数之和"""
+        self.assertEqual(evaluation_costs([{"source_text": "abcdefgh", "translation": "你好"}, {}]), [4, 0])
+
+
+class TestSchedule(unittest.TestCase):
+    """调度顺序测试"""
+
+    def test_orders(self):
+        """longest 代价高的先开始，shortest 相反，相同代价保持原顺序"""
+        costs = [1, 5, 3, 5]
+        self.assertEqual(schedule(costs, 'fifo'), [0, 1, 2, 3])
+        self.assertEqual(schedule(costs, 'longest'), [1, 3, 2, 0])
+        self.assertEqual(schedule(costs, 'shortest'), [0, 2, 1, 3])
+
+    def test_resolve_order(self):
+        """未指定时使用 BATCH_ORDER，未知顺序报错"""
+        with patch.dict('os.environ', {'BATCH_ORDER': 'fifo'}):
+            self.assertEqual(resolve_order(), 'fifo')
+        self.assertEqual(resolve_order('shortest'), 'shortest')
+        with self.assertRaises(ValueError):
+            resolve_order('random')
+        with self.assertRaises(JobError):
+            validate_job_params('translation', {'source_lang': 'en', 'target_lang': 'zh', 'order': 'random'})
+        params = validate_job_params('evaluation', {'source_lang': 'en', 'target_lang': 'zh',
+                                                    'translation_run_id': 'r1', 'order': 'longest'})
+        self.assertEqual(params['order'], 'longest')
+
+
+class RecordingTranslationService:
+    """记录调用顺序的假翻译服务"""
+
+    def __init__(self):
+        self.calls = []
+
+    def translate_text(self, source_lang, target_lang, text):
+        self.calls.append(text)
+        return {"success": True, "translation": text.upper()}
+
+
+class TestBatchOrder(unittest.TestCase):
+    """批量翻译的提交顺序测试"""
+
+    def run_translation(self, order):
+        cases = ["short", "a much longer sentence than the others", "mid length one"]
+        service = RecordingTranslationService()
+        with patch.object(batch, 'MAX_CONCURRENCY', 1), \
+                patch.object(batch, 'TranslationService', return_value=service), \
+                patch.object(batch, 'load_test_cases', return_value=cases), \
+                patch.object(batch, 'save_translation_result') as save, \
+                patch.object(batch, 'save_translation_run_stats'), \
+                patch.object(batch, 'translation_costs', side_effect=lambda s, t, texts: [len(x) for x in texts]):
+            summary = batch.run_batch_translation('en', 'zh', 'order_run', 3, order=order)
+        # Line numbers still follow the file, whatever the start order
+        saved = {call.args[2]: call.args[3] for call in save.call_args_list}
+        self.assertEqual(saved, {1: cases[0], 2: cases[1], 3: cases[2]})
+        self.assertEqual(summary["order"], order)
+        return [cases.index(text) for text in service.calls]
+
+    def test_start_order(self):
+        """longest 先翻译最长的行，fifo 按文件顺序"""
+        self.assertEqual(self.run_translation('longest'), [1, 2, 0])
+        self.assertEqual(self.run_translation('shortest'), [0, 2, 1])
+        self.assertEqual(self.run_translation('fifo'), [0, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Reference Metric Tests
+测试BLEU/chrF计算
+"""
+
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend import scoring
+from backend.scoring import tokenize, sentence_scores, corpus_scores
+from backend.utils import find_reference, load_test_cases
+
+
+class TestTokenize(unittest.TestCase):
+    """分词测试"""
+
+    def test_latin_words_and_punctuation(self):
+        """拉丁文按词切分，连字符词与小数保持完整"""
+        self.assertEqual(
+            tokenize("COVID-19 costs 3.5 dollars, it's fine."),
+            ['COVID-19', 'costs', '3.5', 'dollars', ',', "it's", 'fine', '.']
+        )
+
+    def test_cjk_characters(self):
+        """中日文按字切分，夹杂的英文单词保持完整"""
+        self.assertEqual(tokenize("使用IoT设备。"), ['使', '用', 'IoT', '设', '备', '。'])
+        self.assertEqual(tokenize("デジタル変革"), ['デ', 'ジ', 'タ', 'ル', '変', '革'])
+
+
+class TestScores(unittest.TestCase):
+    """句子级与语料级分数测试"""
+
+    def test_identical_and_disjoint(self):
+        """完全相同得1分，完全不同得0分"""
+        reference = "The cat sat on the mat."
+        self.assertEqual(sentence_scores(reference, reference), {"bleu_score": 1.0, "chrf_score": 1.0})
+        self.assertEqual(sentence_scores("xyz", reference)["bleu_score"], 0.0)
+
+    def test_known_values(self):
+        """与sacrebleu默认配置的结果一致"""
+        scores = sentence_scores("the cat sat on a mat", "the cat sat on the mat")
+        self.assertAlmostEqual(scores["bleu_score"], 0.5373, places=4)
+        self.assertAlmostEqual(scores["chrf_score"], 0.6598, places=4)
+
+    def test_missing_reference(self):
+        """无参考译文时返回None"""
+        self.assertEqual(sentence_scores("anything", None), {"bleu_score": None, "chrf_score": None})
+
+    def test_corpus_scores(self):
+        """语料级分数汇总统计量而非平均句子分数"""
+        hyps = ["the cat sat on a mat", "该算法效果很好。"]
+        refs = ["the cat sat on the mat", "该算法效果很好。"]
+        result = corpus_scores(hyps, refs)
+        self.assertEqual(result["count"], 2)
+        self.assertEqual(result["sentences"][1], {"bleu_score": 1.0, "chrf_score": 1.0})
+        self.assertGreater(result["corpus_bleu"], result["sentences"][0]["bleu_score"])
+
+        with self.assertRaises(ValueError):
+            corpus_scores(hyps, refs[:1])
+
+    def test_corpus_of_short_lines(self):
+        """所有句子都短于4个词时语料级BLEU为0（与sacrebleu一致），句子级仍按有效阶数计算"""
+        result = corpus_scores(["Good night", "Thank you"], ["Good night", "Thank you"])
+        self.assertEqual(result["corpus_bleu"], 0.0)
+        self.assertEqual(result["corpus_chrf"], 1.0)
+        self.assertEqual(result["sentences"][0]["bleu_score"], 1.0)
+
+    def test_large_corpora_use_all_cpus(self):
+        """超过阈值的语料默认多进程计算，结果与单进程一致"""
+        hyps = [f"the cat {i} sat on a mat" for i in range(40)]
+        refs = [f"the cat {i % 7} sat on the mat" for i in range(40)]
+        single = corpus_scores(hyps, refs, processes=1, chunk_size=10)
+        with patch.object(scoring, 'PARALLEL_MIN_LINES', 20), patch.object(scoring.os, 'cpu_count', return_value=2):
+            self.assertEqual(corpus_scores(hyps, refs, chunk_size=10), single)
+
+
+class TestFindReference(unittest.TestCase):
+    """参考译文查找测试"""
+
+    def test_suite_lines_are_aligned(self):
+        """源语言第N行对应目标语言第N行"""
+        en = load_test_cases('en')
+        zh = load_test_cases('zh')
+        self.assertEqual(find_reference('en', 'zh', en[2], 3), zh[2])
+        self.assertEqual(find_reference('en', 'zh', en[2]), zh[2])
+        self.assertIsNone(find_reference('en', 'zh', "Not a suite sentence."))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
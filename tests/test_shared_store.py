@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Shared Store Tests
+测试跨进程共享存储与限速
+"""
+
+import multiprocessing
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.shared_store import SharedStore, SharedRateLimiter
+
+
+def _increment(path, times):
+    store = SharedStore(path)
+    for _ in range(times):
+        store.incr('counter')
+
+
+class TestSharedStore(unittest.TestCase):
+    """共享存储测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'shared.sqlite'
+        self.store = SharedStore(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_get_set_ttl(self):
+        """读写JSON值，过期后视为不存在"""
+        self.store.set('history', [{"run_id": "20250101_1200"}])
+        self.assertEqual(self.store.get('history'), [{"run_id": "20250101_1200"}])
+        self.store.set('short', 1, ttl=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.store.get('short'))
+        self.assertEqual(self.store.purge_expired(), 1)
+
+    def test_incr_across_processes(self):
+        """多个进程并发计数不丢失"""
+        processes = [multiprocessing.Process(target=_increment, args=(self.path, 25)) for _ in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+        self.assertEqual(self.store.get('counter'), 75)
+
+    def test_claim(self):
+        """一组键要么全部占用，要么一个也不占用；只释放仍由自己占用的键"""
+        self.assertEqual(self.store.claim(['run:a', 'run:b'], 'job1'), {})
+        self.assertEqual(self.store.claim(['run:b', 'run:c'], 'job2'), {'run:b': 'job1'})
+        self.assertIsNone(self.store.get('run:c'))
+        self.store.unclaim(['run:a', 'run:b'], 'job2')
+        self.assertEqual(self.store.get('run:a'), 'job1')
+        self.store.unclaim(['run:a', 'run:b'], 'job1')
+        self.assertEqual(self.store.claim(['run:b', 'run:c'], 'job2'), {})
+
+    def test_token_bucket(self):
+        """令牌桶突发容量用尽后按速率补充"""
+        self.assertEqual(self.store.take_token('upstream:test', rate=10, capacity=2), 0.0)
+        self.assertEqual(self.store.take_token('upstream:test', rate=10, capacity=2), 0.0)
+        self.assertGreater(self.store.take_token('upstream:test', rate=10, capacity=2), 0.0)
+
+        limiter = SharedRateLimiter(SharedStore(self.path), 'upstream:test', rate=10, burst=2)
+        self.assertGreater(limiter.acquire(), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
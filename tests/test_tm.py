@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Translation Memory Tests
+测试翻译记忆：MinHash LSH 近似检索、从运行结果加载、直接返回与参考译文提示
+"""
+
+import json
+import tempfile
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+# services.py imports tm by its bare name, so that is the module to patch
+import tm
+from tm import TranslationMemory, consult, get_memory, jaccard, memory_stats, normalize, refresh, shingles
+from backend.prompts import get_translation_prompt
+from backend.services import TranslationService
+
+
+def write_result(data_root: Path, run_id: str, pair: str, line: int, source_text: str, translation: str):
+    pair_dir = data_root / 'translations' / run_id / pair
+    pair_dir.mkdir(parents=True, exist_ok=True)
+    (pair_dir / f"line_{line}_translation.json").write_text(
+        json.dumps({"source_text": source_text, "translation": translation}, ensure_ascii=False), encoding='utf-8')
+
+
+class TestTranslationMemory(unittest.TestCase):
+    """索引与检索测试"""
+
+    def test_search(self):
+        """完全相同（归一化后）返回1.0，近似句按相似度排序，不相关的句子不返回"""
+        memory = TranslationMemory()
+        memory.add("Delete 3 files from the project?", "要从项目中删除3个文件吗？")
+        memory.add("Delete 3 folders from the project?", "要从项目中删除3个文件夹吗？")
+        memory.add("The weather is nice today.", "今天天气很好。")
+        self.assertEqual(memory.search("Delete  3 files from the project?")[0]["similarity"], 1.0)
+
+        matches = memory.search("Delete 4 files from the project?", threshold=0.5)
+        self.assertEqual(matches[0]["translation"], "要从项目中删除3个文件吗？")
+        expected = jaccard(shingles("Delete 4 files from the project?"), shingles("Delete 3 files from the project?"))
+        self.assertEqual(matches[0]["similarity"], round(expected, 3))
+        self.assertGreater(matches[0]["similarity"], matches[1]["similarity"])
+        self.assertEqual(memory.search("An entirely unrelated sentence.", threshold=0.3), [])
+
+    def test_max_entries(self):
+        """超过上限时丢弃最早加入的条目，索引中也不再能找到"""
+        memory = TranslationMemory(max_entries=2)
+        memory.add("Delete 3 files from the project?", "要从项目中删除3个文件吗？")
+        memory.add("Delete 3 folders from the project?", "要从项目中删除3个文件夹吗？")
+        memory.add("Delete 3 files from the project?", "删除3个文件？")
+        memory.add("The weather is nice today.", "今天天气很好。")
+        self.assertEqual(len(memory), 2)
+        self.assertIsNone(memory.exact("Delete 3 files from the project?"))
+        matches = memory.search("Delete 3 files from the project!", threshold=0.3)
+        self.assertEqual([m["translation"] for m in matches], ["要从项目中删除3个文件夹吗？"])
+        for i in range(100):
+            memory.add(f"Sentence number {i}.", str(i))
+        self.assertEqual(len(memory), 2)
+        self.assertEqual(sum(len(bucket) for buckets in memory._bands for bucket in buckets.values()), 2 * tm.BANDS)
+
+    def test_latest_translation_wins(self):
+        """相同原文只保留最新译文；空原文或空译文忽略"""
+        memory = TranslationMemory()
+        memory.add("Save", "保存")
+        memory.add(" Save ", "存储")
+        memory.add("", "x")
+        memory.add("Open", " ")
+        self.assertEqual(len(memory), 1)
+        self.assertEqual(memory.search("Save")[0]["translation"], "存储")
+        self.assertEqual(normalize("ｆｕｌｌ　width  text"), "full width text")
+
+    def test_lookup_is_fast(self):
+        """大量相似模板句中的查询也只比较有限的候选条目"""
+        memory = TranslationMemory()
+        for i in range(3000):
+            memory.add(f"Template string number {i} for screen {i % 97}.", f"模板字符串 {i}")
+        started = time.perf_counter()
+        for i in range(100):
+            matches = memory.search(f"Template string number {i * 37} for screen {i}!", threshold=0.5)
+        self.assertLess((time.perf_counter() - started) / 100, 0.005)
+        self.assertTrue(matches)
+
+
+class TestConsult(unittest.TestCase):
+    """从运行结果加载与查询策略测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.data_root = Path(self.tmp.name)
+        self.addCleanup(self.tmp.cleanup)
+        # The background refresher is started per worker; these tests load the results explicitly
+        for patcher in (patch.object(tm, 'DATA_ROOT', self.data_root), patch.object(tm, '_pairs', {}),
+                        patch.object(tm, '_start_refresher'),
+                        patch.dict('os.environ', {'TM_HINT_THRESHOLD': '0.5'})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        write_result(self.data_root, 'r1', 'en-zh', 1, "Click Save to keep your changes.", "点击“保存”以保留更改。")
+        write_result(self.data_root, 'r1', 'en-ja', 1, "Click Save to keep your changes.", "変更を保持するには保存をクリック。")
+        refresh('en', 'zh')
+
+    def test_serve_hint_miss(self):
+        """只有完全相同的原文直接返回，相似的（即使意思相反）只作为提示，并统计命中率"""
+        served = consult('en', 'zh', "Click  Save to keep your changes.")
+        self.assertEqual(served["served"]["translation"], "点击“保存”以保留更改。")
+        hinted = consult('en', 'zh', "Click Save to not keep your changes.")
+        self.assertIsNone(hinted["served"])
+        self.assertEqual(len(hinted["hints"]), 1)
+        self.assertGreater(hinted["hints"][0]["similarity"], 0.8)
+        self.assertEqual(consult('en', 'zh', "Something else entirely."), {"served": None, "hints": []})
+        stats = memory_stats()['en-zh']
+        self.assertEqual((stats["entries"], stats["lookups"], stats["served"], stats["hinted"]), (1, 3, 1, 1))
+        self.assertAlmostEqual(stats["served_rate"], 1 / 3, places=3)
+
+    def test_new_results_are_loaded(self):
+        """刷新时只读入新增的结果文件；查询本身不扫描数据目录"""
+        self.assertEqual(len(get_memory('en', 'zh')), 1)
+        write_result(self.data_root, 'r2', 'en-zh', 1, "Open the file menu.", "打开文件菜单。")
+        self.assertEqual(len(get_memory('en', 'zh')), 1)
+        refresh('en', 'zh')
+        self.assertEqual(len(get_memory('en', 'zh')), 2)
+        # en-ja has a stored result, but it is read by the refresher, not by the lookup
+        self.assertIsNone(consult('en', 'ja', "Click Save to keep your changes.")["served"])
+        tm._start_refresher.assert_called()
+
+
+class TestServiceMemory(unittest.TestCase):
+    """翻译服务使用翻译记忆的测试"""
+
+    def setUp(self):
+        self.service = TranslationService()
+        self.service.config = dict(self.service.config, api_key='test', model='m', stream=False)
+
+    def test_served_without_upstream(self):
+        """直接返回时不调用上游"""
+        match = {"served": {"source_text": "Hi.", "translation": "嗨。", "similarity": 1.0}, "hints": []}
+        with patch('backend.services.consult', return_value=match), \
+                patch.object(self.service, '_translate_non_stream') as upstream:
+            result = self.service.translate_text('en', 'zh', 'Hi.', use_memory=True)
+        upstream.assert_not_called()
+        self.assertEqual(result["translation"], "嗨。")
+        self.assertTrue(result["memory"]["served"])
+
+    def test_hints_in_prompt(self):
+        """参考译文放入系统prompt，新译文记入记忆；默认不查询记忆"""
+        hint = {"source_text": "Save all files.", "translation": "保存所有文件。", "similarity": 0.6}
+        with patch('backend.services.consult', return_value={"served": None, "hints": [hint]}) as lookup, \
+                patch('backend.services.remember') as remember, \
+                patch.object(self.service, '_translate_non_stream',
+                             return_value={"success": True, "translation": "保存文件。"}) as upstream:
+            result = self.service.translate_text('en', 'zh', 'Save files.', use_memory=True)
+            system_prompt = upstream.call_args.args[0]['messages'][0]['content']
+            self.assertIn("原文：Save all files.\n译文：保存所有文件。", system_prompt)
+            self.assertTrue(system_prompt.endswith("请翻译以下英文文本："))
+            self.assertEqual(result["memory"], {"served": False, "hints": 1})
+            remember.assert_called_once_with('en', 'zh', 'Save files.', "保存文件。")
+
+            self.service.translate_text('en', 'zh', 'Save files.')
+            lookup.assert_called_once()
+        self.assertEqual(get_translation_prompt('en', 'zh', examples=[]), get_translation_prompt('en', 'zh'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Tracing Tests
+测试trace的span层级、JSONL导出、批处理中的阶段记录与耗时分析
+"""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from tracing import trace, span, start_span, traced, current_trace_id
+from metrics import UpstreamCall
+from scripts.analyze_traces import load_traces, stages, breakdown
+
+
+class TracingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp.name, 'traces', 'traces.jsonl')
+        self.env = patch.dict(os.environ, {'TRACE_FILE': self.file, 'TRACING_ENABLED': 'true',
+                                           'TRACE_SAMPLE_RATE': '1'})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def exported(self):
+        if not os.path.exists(self.file):
+            return []
+        with open(self.file, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+
+class TestTracing(TracingTestCase):
+    """span层级与导出测试"""
+
+    def test_nested_spans_exported_as_one_line(self):
+        """子span挂在当前span下，叶子span可在其他线程结束，整条trace写成一行"""
+        with trace('line', run_id='r1') as root:
+            trace_id = current_trace_id()
+            with span('prompt'):
+                pass
+            with span('judge') as judge:
+                call = start_span('evaluation.chat')
+                worker = threading.Thread(target=lambda: (call.event('first_token'), call.finish()))
+                worker.start()
+                worker.join()
+                judge.set(score=4)
+            with trace('requeued'):
+                pass
+        self.assertIsNone(current_trace_id())
+
+        records = self.exported()
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual((record['trace_id'], record['name'], record['attrs']), (trace_id, 'line', {'run_id': 'r1'}))
+        spans = {s['name']: s for s in record['spans']}
+        self.assertEqual(set(spans), {'prompt', 'judge', 'evaluation.chat', 'requeued'})
+        self.assertEqual(spans['evaluation.chat']['parent'], spans['judge']['id'])
+        self.assertEqual(spans['prompt']['parent'], root.span_id)
+        self.assertIn('first_token', spans['evaluation.chat']['events'])
+        self.assertEqual(spans['judge']['attrs'], {'score': 4})
+
+    def test_noop_outside_trace_and_when_disabled(self):
+        """不在trace中或关闭追踪时不记录也不写文件"""
+        with span('alone') as alone:
+            alone.set(x=1)
+        start_span('alone').finish()
+        with patch.dict(os.environ, {'TRACING_ENABLED': 'false'}):
+            with trace('line'):
+                with trace('nested'):
+                    self.assertIsNone(current_trace_id())
+        self.assertEqual(self.exported(), [])
+
+    def test_traced_records_arguments_and_errors(self):
+        """装饰器记录指定参数与返回值，异常记在根span上"""
+        @traced('job', 'run_id')
+        def work(run_id, fail=False):
+            if fail:
+                raise ValueError('boom')
+            return True
+
+        work('r2')
+        with self.assertRaises(ValueError):
+            work(run_id='r3', fail=True)
+        first, second = self.exported()
+        self.assertEqual(first['attrs'], {'run_id': 'r2', 'result': True})
+        self.assertEqual(second['attrs']['run_id'], 'r3')
+        self.assertIn('ValueError: boom', second['attrs']['error'])
+
+
+class TestBatchTracing(TracingTestCase):
+    """批处理中的阶段记录测试"""
+
+    def test_translate_line_stages(self):
+        """逐行翻译记录上游调用（含首token）与写文件阶段"""
+        from backend import batch
+
+        service = Mock()
+
+        def translate_text(source_lang, target_lang, text):
+            with UpstreamCall('translation', 'chat_stream') as call:
+                call.received(Mock(elapsed=None))
+                call.first_token()
+            return {"success": True, "translation": "你好"}
+
+        service.translate_text.side_effect = translate_text
+        with patch.object(batch, 'save_translation_result') as save:
+            self.assertTrue(batch._translate_and_save(service, 'en', 'zh', 'hello', 7, 'run_a'))
+        save.assert_called_once()
+
+        record, = self.exported()
+        self.assertEqual(record['name'], 'translate_line')
+        self.assertEqual(record['attrs'], {'run_id': 'run_a', 'line_num': 7, 'result': True})
+        names = [s['name'] for s in record['spans']]
+        self.assertEqual(names, ['translation.queue', 'translation.chat_stream', 'save'])
+        self.assertEqual(record['spans'][0]['attrs']['priority'], 'batch')
+        self.assertEqual(record['spans'][1]['attrs']['outcome'], 'ok')
+
+        rows = {name for name, _ in stages(record)}
+        self.assertEqual(rows, {'translation.queue', 'translation.chat_stream.wait',
+                                'translation.chat_stream.generate', 'save', '(other)'})
+        self.assertEqual(len(load_traces(self.file, run_id='run_a')), 1)
+        self.assertEqual(load_traces(self.file, run_id='other'), [])
+
+    def test_breakdown_shares(self):
+        """各阶段占比之和为1，按总耗时排序"""
+        record = {'name': 'line', 'duration_ms': 100.0, 'attrs': {}, 'spans': [
+            {'id': 'a', 'parent': 'root', 'name': 'evaluation.chat', 'duration_ms': 80.0,
+             'attrs': {'outcome': 'ok', 'headers_ms': 70.0}, 'events': {}},
+            {'id': 'b', 'parent': 'root', 'name': 'save', 'duration_ms': 5.0, 'attrs': {}, 'events': {}},
+        ]}
+        rows = breakdown([record])
+        self.assertEqual([row[0] for row in rows],
+                         ['evaluation.chat.wait', '(other)', 'evaluation.chat.generate', 'save'])
+        self.assertAlmostEqual(sum(row[-1] for row in rows), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
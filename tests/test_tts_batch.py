@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Batch TTS Tests
+测试批量合成的去重、缓存与按完成顺序返回
+"""
+
+import json
+import tempfile
+import threading
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.audio_cache import AudioCache
+from backend.limits import UpstreamBudget
+from backend.tts_service import TTSService
+
+
+class TestSynthesizeMany(unittest.TestCase):
+    """批量合成测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = TTSService(cache=AudioCache(self.tmp.name, max_bytes=10 ** 7))
+        self.service.config = dict(self.service.config, api_key='key', group_id='group')
+        self.budget = UpstreamBudget('tts', max_concurrency=2)
+        self.texts = []
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.release.set()
+        self.tmp.cleanup()
+
+    def fake_post(self, url, headers=None, data=None, timeout=None):
+        text = json.loads(data.decode('utf-8'))['text']
+        with self.lock:
+            self.texts.append(text)
+        if text.startswith('slow'):
+            self.release.wait(5)
+        response = Mock()
+        response.raise_for_status.return_value = None
+        if text == 'broken':
+            response.json.return_value = {'base_resp': {'status_code': 1004, 'status_msg': 'auth failed'}}
+        else:
+            response.json.return_value = {'data': {'audio': f"ID3 {text}".encode('utf-8').hex()},
+                                          'base_resp': {'status_code': 0, 'status_msg': 'success'}}
+        return response
+
+    def test_duplicates_synthesized_once(self):
+        """相同文本与语言只调用一次MiniMax，每个位置都收到事件"""
+        items = [{"text": "hello", "language": "en"}, {"text": "world", "language": "en"},
+                 {"text": "hello ", "language": "en"}, {"text": "hello", "language": "ja"}]
+        with patch('backend.tts_service.requests.post', side_effect=self.fake_post):
+            events = list(self.service.synthesize_many(items, budget=self.budget))
+
+        self.assertEqual(sorted(self.texts), ['hello', 'hello', 'world'])
+        audio = {e["index"]: e for e in events if e["type"] == "audio"}
+        self.assertEqual(sorted(audio), [0, 1, 2, 3])
+        self.assertEqual(audio[0]["cache_key"], audio[2]["cache_key"])
+        self.assertNotEqual(audio[0]["cache_key"], audio[3]["cache_key"])
+        self.assertNotIn("audio_data", audio[0])
+        self.assertEqual(events[-1], {**events[-1], "type": "summary", "count": 4, "unique": 3, "failed": 0})
+
+    def test_events_in_completion_order_and_cached(self):
+        """快的条目先返回，失败单独报告；再次请求全部命中缓存"""
+        items = [{"text": "slow one", "language": "en"}, {"text": "fast two", "language": "en"},
+                 {"text": "broken", "language": "en"}]
+        with patch('backend.tts_service.requests.post', side_effect=self.fake_post):
+            events = []
+            for event in self.service.synthesize_many(items, budget=self.budget):
+                events.append(event)
+                if event.get("index") == 1:
+                    self.release.set()
+            first = [e["index"] for e in events if e["type"] == "audio"]
+            self.assertLess(first.index(1), first.index(0))
+            failed = next(e for e in events if e.get("index") == 2)
+            self.assertFalse(failed["success"])
+            self.assertIn('auth failed', failed["error"])
+
+            self.texts.clear()
+            again = list(self.service.synthesize_many(items[:2], budget=self.budget))
+        self.assertEqual(self.texts, [])
+        self.assertTrue(all(e["cached"] for e in again if e["type"] == "audio"))
+        self.assertEqual(again[-1]["cached"], 2)
+
+    def test_without_cache_audio_is_inline(self):
+        """禁用缓存时事件内附带base64音频"""
+        self.service.cache = None
+        with patch('backend.tts_service.requests.post', side_effect=self.fake_post):
+            events = list(self.service.synthesize_many([{"text": "hi", "language": "en"}], budget=self.budget))
+        self.assertIsNone(events[0]["cache_key"])
+        self.assertTrue(events[0]["audio_data"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Long-text TTS Tests
+测试长文本按句切分、分段并发合成与MP3拼接
+"""
+
+import json
+import requests
+import tempfile
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.audio_cache import AudioCache
+from backend.limits import UpstreamBudget
+from backend.tts_segments import split_text, split_sentences, strip_tags, concat_mp3
+from backend.tts_service import TTSService
+
+
+def mp3_frame(fill: int) -> bytes:
+    """一个 MPEG-1 Layer III、128kbps、32kHz 的帧（576字节）"""
+    return b'\xff\xfb\x98\x44' + bytes([fill]) * 572
+
+
+def id3v2(size: int = 20) -> bytes:
+    return b'ID3\x04\x00\x00' + bytes([0, 0, 0, size]) + b'\x00' * size
+
+
+def xing_frame() -> bytes:
+    frame = bytearray(mp3_frame(0))
+    frame[36:40] = b'Info'
+    return bytes(frame)
+
+
+class TestSplitText(unittest.TestCase):
+    """文本切分测试"""
+
+    def test_sentences_keep_punctuation(self):
+        """句末标点、引号与空白归入前一句"""
+        self.assertEqual(split_sentences('你好。今天天气不错！“走吧？”好'),
+                         ['你好。', '今天天气不错！', '“走吧？”', '好'])
+        self.assertEqual(split_sentences('Hello there. Version 2.5 is out! Ok'),
+                         ['Hello there. ', 'Version 2.5 is out! ', 'Ok'])
+
+    def test_segments_respect_limit_and_paragraphs(self):
+        """片段不超过上限，超长段落的片段不跨越换行，拼起来与原文一致"""
+        paragraph = '这是一个测试句子。' * 10
+        text = f"{paragraph}\n短段落。"
+        segments = split_text(text, 40)
+        self.assertTrue(all(len(s) <= 40 for s in segments))
+        self.assertEqual(segments[-1], '短段落。')
+        self.assertEqual(''.join(segments), text.replace('\n', ''))
+
+    def test_short_paragraphs_merged(self):
+        """放得下的相邻段落合并为一段，超长段落单独切分"""
+        self.assertEqual(split_text('第一行。\n第二行。', 300), ['第一行。\n第二行。'])
+        long_paragraph = '这是一个测试句子。' * 4
+        self.assertEqual(split_text(f"短一。\n短二。\n\n短三。\n{long_paragraph}\n短四。", 20),
+                         ['短一。\n短二。\n\n短三。', '这是一个测试句子。这是一个测试句子。',
+                          '这是一个测试句子。这是一个测试句子。', '短四。'])
+        self.assertEqual(split_text('第一行的内容在这里。\n第二行的内容在这里。', 20),
+                         ['第一行的内容在这里。', '第二行的内容在这里。'])
+
+    def test_long_sentence_split_at_commas(self):
+        """超长句子在逗号处切开，没有逗号时硬切"""
+        segments = split_text('一二三四五，六七八九十，' * 3, 14)
+        self.assertTrue(all(s.endswith('，') for s in segments))
+        self.assertEqual(split_text('x' * 25, 10), ['x' * 10, 'x' * 10, 'x' * 5])
+
+    def test_edit_only_changes_its_paragraph(self):
+        """修改一个超长段落不影响其他超长段落的切分"""
+        paragraphs = ['第一段的句子。' * 8, '第二段的句子。' * 8, '第三段的句子。' * 8]
+        first, third = split_text(paragraphs[0], 30), split_text(paragraphs[2], 30)
+        paragraphs[1] = '改过的第二段。' + paragraphs[1]
+        after = split_text('\n'.join(paragraphs), 30)
+        self.assertEqual(after[:len(first)], first)
+        self.assertEqual(after[-len(third):], third)
+
+
+class TestConcatMp3(unittest.TestCase):
+    """MP3拼接测试"""
+
+    def test_strip_tags(self):
+        """去掉ID3v2、Xing/Info帧与ID3v1标签"""
+        frames = mp3_frame(1) + mp3_frame(2)
+        data = id3v2() + xing_frame() + frames + b'TAG' + b'\x00' * 125
+        self.assertEqual(strip_tags(data), frames)
+        self.assertEqual(strip_tags(frames), frames)
+
+    def test_concat_in_order(self):
+        """多段按顺序拼接为连续的音频帧"""
+        parts = [id3v2() + xing_frame() + mp3_frame(i) for i in (1, 2, 3)]
+        self.assertEqual(concat_mp3(parts), mp3_frame(1) + mp3_frame(2) + mp3_frame(3))
+        self.assertEqual(concat_mp3(parts[:1]), parts[0])
+
+
+class TestLongTextToSpeech(unittest.TestCase):
+    """长文本合成测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = TTSService(cache=AudioCache(self.tmp.name, max_bytes=10 ** 7))
+        self.service.config = dict(self.service.config, api_key='key', group_id='group', segment_chars=20)
+        self.budget = UpstreamBudget('tts', max_concurrency=2)
+        self.active = 0
+        self.peak = 0
+        self.texts = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fake_post(self, url, headers=None, data=None, timeout=None):
+        text = json.loads(data.decode('utf-8'))['text']
+        with self.lock:
+            self.texts.append(text)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {
+            'data': {'audio': (id3v2() + mp3_frame(len(self.texts))).hex()},
+            'base_resp': {'status_code': 0, 'status_msg': 'success'}
+        }
+        return response
+
+    def test_segments_synthesized_concurrently_in_order(self):
+        """各段在预算内并发合成，按原文顺序拼接，整段结果写入缓存"""
+        text = '第一句话在这里。第二句话在这里。第三句话在这里。第四句话在这里。'
+        with patch('backend.tts_service.requests.post', side_effect=self.fake_post):
+            result = self.service.long_text_to_speech(text, 'zh', budget=self.budget)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['segments'], 2)
+        self.assertEqual(self.peak, 2)
+        self.assertEqual(sorted(self.texts), ['第一句话在这里。第二句话在这里。', '第三句话在这里。第四句话在这里。'])
+
+        audio = self.service.cache.read(result['cache_key'])
+        self.assertEqual(len(audio), 2 * 576)
+        self.assertFalse(audio.startswith(b'ID3'))
+
+    def test_edit_only_resynthesizes_changed_segments(self):
+        """修改文本后只有变化的段调用MiniMax"""
+        lines = ['第一行的内容在这里。', '第二行的内容在这里。', '第三行的内容在这里。']
+        with patch('backend.tts_service.requests.post', side_effect=self.fake_post):
+            self.service.long_text_to_speech('\n'.join(lines), 'zh', budget=self.budget)
+            self.texts.clear()
+            lines[1] = '第二行改过了在这里。'
+            result = self.service.long_text_to_speech('\n'.join(lines), 'zh', budget=self.budget)
+        self.assertEqual(self.texts, ['第二行改过了在这里。'])
+        self.assertEqual(result['segments_cached'], 2)
+
+    def test_segment_failure(self):
+        """任一段失败时整体失败并指出是哪一段"""
+        def failing_post(url, headers=None, data=None, timeout=None):
+            if '第二' in json.loads(data.decode('utf-8'))['text']:
+                raise requests.exceptions.ConnectionError('boom')
+            return self.fake_post(url, headers, data, timeout)
+
+        with patch('backend.tts_service.requests.post', side_effect=failing_post):
+            result = self.service.long_text_to_speech('第一行的内容在这里。\n第二行的内容在这里。\n第三行的内容在这里。',
+                                                      'zh', budget=self.budget)
+        self.assertFalse(result['success'])
+        self.assertIn('Segment 2/3', result['error'])
+
+    def test_short_lines_in_one_request(self):
+        """放得下的多行文本只调用一次MiniMax，换行保留在请求文本中"""
+        with patch('backend.tts_service.requests.post', side_effect=self.fake_post):
+            result = self.service.long_text_to_speech('第一行。\n第二行。', 'zh', budget=self.budget)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['segments'], 1)
+        self.assertEqual(self.texts, ['第一行。\n第二行。'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
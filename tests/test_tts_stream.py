@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Streaming TTS Tests
+用本地模拟的MiniMax流式接口测试音频分段转发与首段音频时间
+"""
+
+import json
+import tempfile
+import threading
+import time
+import unittest
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.audio_cache import AudioCache
+from backend.tts_service import TTSService
+from backend.tts_segments import MAX_TEXT_CHARS
+from backend.config import TTS_VOICE_MAPPING
+
+CHUNKS = [b'ID3\x04chunk-one', b'\xff\xfbchunk-two', b'\xff\xfbchunk-three']
+
+
+def start_fake_minimax(delay: float = 0.1, error: bool = False, truncated: bool = False):
+    """以SSE逐段返回hex音频的本地MiniMax替身，最后一个事件(status=2)携带完整音频（truncated 时不发送）"""
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            requests_seen.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            if error:
+                events = [{"base_resp": {"status_code": 1004, "status_msg": "auth failed"}}]
+            else:
+                events = [{"data": {"audio": chunk.hex(), "status": 1}, "base_resp": {"status_code": 0}}
+                          for chunk in CHUNKS]
+                if not truncated:
+                    events.append({"data": {"audio": b''.join(CHUNKS).hex(), "status": 2},
+                                   "base_resp": {"status_code": 0}})
+            for event in events:
+                time.sleep(delay)
+                payload = f"data: {json.dumps(event)}\n\n".encode('utf-8')
+                self.wfile.write(f"{len(payload):x}\r\n".encode('ascii') + payload + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, requests_seen
+
+
+class TestStreamingTTS(unittest.TestCase):
+    """流式TTS测试"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = TTSService(cache=AudioCache(self.tmp.name, max_bytes=10 ** 6))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def use_server(self, server):
+        self.service.config = dict(self.service.config, api_key='key', group_id='group',
+                                   api_url=f"http://127.0.0.1:{server.server_address[1]}/v1/t2a_v2")
+        self.addCleanup(server.shutdown)
+
+    def test_chunks_are_relayed_as_they_arrive(self):
+        """首段音频在整段合成完成前到达，最终事件中的完整音频不重复发送"""
+        server, seen = start_fake_minimax(delay=0.15)
+        self.use_server(server)
+
+        result = self.service.stream_text_to_speech('你好，世界', 'zh')
+        self.assertTrue(result['success'])
+        self.assertFalse(result['cached'])
+        self.assertTrue(seen[0]['stream'])
+
+        received = list(result['chunks'])
+        stats = result['stats']
+        self.assertEqual(received, CHUNKS)
+        self.assertEqual(stats['chunks'], 3)
+        self.assertEqual(stats['bytes'], sum(len(chunk) for chunk in CHUNKS))
+        # First audio after one event; the whole stream takes four
+        self.assertLess(stats['ttfa'], 0.45)
+        self.assertGreater(stats['seconds'], 0.55)
+
+        # The finished clip is cached, so the next request needs no upstream call
+        self.assertEqual(self.service.cached_key('你好，世界', 'zh'), result['cache_key'])
+        again = self.service.stream_text_to_speech('你好，世界', 'zh')
+        self.assertTrue(again['cached'])
+        self.assertEqual(b''.join(again['chunks']), b''.join(CHUNKS))
+        self.assertEqual(len(seen), 1)
+
+    def test_truncated_stream_is_not_cached(self):
+        """没有最终事件就结束的流照常转发，但不缓存（可能被截断）"""
+        server, seen = start_fake_minimax(delay=0.0, truncated=True)
+        self.use_server(server)
+        result = self.service.stream_text_to_speech('你好，世界', 'zh')
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(list(result['chunks']), CHUNKS)
+        self.assertIsNone(self.service.cached_key('你好，世界', 'zh'))
+        self.assertFalse(self.service.stream_text_to_speech('你好，世界', 'zh')['cached'])
+        self.assertEqual(len(seen), 2)
+
+    def test_upstream_error_before_audio(self):
+        """首段音频前的上游错误以 success=False 返回"""
+        server, _ = start_fake_minimax(delay=0.0, error=True)
+        self.use_server(server)
+        result = self.service.stream_text_to_speech('hello', 'en')
+        self.assertFalse(result['success'])
+        self.assertIn('auth failed', result['error'])
+        self.assertIsNone(self.service.cached_key('hello', 'en'))
+
+    def test_missing_credentials(self):
+        """缺少凭证时不发起请求"""
+        self.service.config = dict(self.service.config, api_key='', group_id='')
+        result = self.service.stream_text_to_speech('hello', 'en')
+        self.assertFalse(result['success'])
+        self.assertIn('credentials not found', result['error'])
+
+    def test_long_text_is_rejected_not_truncated(self):
+        """超长文本不截断而是拒绝；缓存键按完整文本计算"""
+        server, seen = start_fake_minimax(delay=0.0)
+        self.use_server(server)
+        head = '你好。' * (MAX_TEXT_CHARS // 3)
+        first, second = head + '第一段结尾。' * 50, head + '第二段结尾。' * 50
+        result = self.service.stream_text_to_speech(first, 'zh')
+        self.assertFalse(result['success'])
+        self.assertIn('/api/tts', result['error'])
+        self.assertEqual(seen, [])
+
+        # Audio synthesized for one long text (by /api/tts) is not served for another with the same start
+        self.service.cache.put(self.service.audio_key(first, TTS_VOICE_MAPPING['zh']), b'ID3first')
+        self.assertIsNotNone(self.service.cached_key(first, 'zh'))
+        self.assertIsNone(self.service.cached_key(second, 'zh'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
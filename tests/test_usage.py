@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Token Usage Tests
+测试token估计、用量记录、运行账本汇总与按语言对读取账本，以及失败调用与评估脚本的用量
+"""
+
+import json
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import requests
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(project_root / 'backend'))
+
+from backend.usage import UsageLedger, combine_records, estimate_tokens, merge_usage, usage_record
+from backend.utils import load_run_usage, save_results_usage
+from backend.metrics import UpstreamCall
+from backend.services import TranslationService
+from backend.limits import UpstreamBudget
+from evaluation.eval import PairScheduler
+
+
+class TestUsageRecord(unittest.TestCase):
+    """单次调用用量测试"""
+
+    def test_estimate_tokens(self):
+        """汉字、假名、谚文按每字一个token，其余约四个字符一个token"""
+        self.assertEqual(estimate_tokens(''), 0)
+        self.assertEqual(estimate_tokens('你好世界'), 4)
+        self.assertEqual(estimate_tokens('こんにちは'), 5)
+        self.assertEqual(estimate_tokens('Hello world!'), 3)
+        self.assertEqual(estimate_tokens('翻译 this'), 2 + 2)
+
+    def test_reported_usage_wins(self):
+        """接口返回的usage优先，缺失的字段按文本估计并标记"""
+        reported = usage_record({'prompt_tokens': 120, 'completion_tokens': 30}, 'prompt', '译文', 0.25)
+        self.assertEqual(reported, {"prompt_tokens": 120, "completion_tokens": 30, "total_tokens": 150,
+                                    "estimated": False, "latency_ms": 250.0})
+        partial = usage_record({'prompt_tokens': 120, 'completion_tokens': None}, 'prompt', '译文', 0.25)
+        self.assertEqual((partial["completion_tokens"], partial["estimated"]), (2, True))
+        self.assertEqual(usage_record(None, 'abcdefgh', '', 0)["prompt_tokens"], 2)
+
+    def test_upstream_call_tokens(self):
+        """UpstreamCall 记录最后一次 usage，并使用调用耗时"""
+        with UpstreamCall('test', 'chat') as call:
+            call.usage({'prompt_tokens': 9, 'completion_tokens': 3}, 'm')
+        record = call.tokens([{'role': 'user', 'content': 'Hello there'}], 'Hi')
+        self.assertEqual((record["prompt_tokens"], record["completion_tokens"], record["estimated"]), (9, 3, False))
+        self.assertAlmostEqual(record["latency_ms"], call.duration * 1000, places=0)
+
+        with UpstreamCall('test', 'chat_stream') as call:
+            pass
+        record = call.tokens([{'role': 'system', 'content': '你好'}, {'role': 'user', 'content': 'abcd'}], '世界')
+        # "你好\nabcd": two han characters plus five other characters
+        self.assertEqual((record["prompt_tokens"], record["completion_tokens"], record["estimated"]), (4, 2, True))
+
+
+class TestUsageLedger(unittest.TestCase):
+    """运行账本测试"""
+
+    def test_ledger_totals_and_cost(self):
+        """账本累计token、估计次数、每token延迟与费用，None 记录被忽略"""
+        ledger = UsageLedger('model-a', price_prompt=2.0, price_completion=8.0)
+        ledger.add({"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120, "estimated": False,
+                    "latency_ms": 400.0})
+        ledger.add({"prompt_tokens": 50, "completion_tokens": 20, "total_tokens": 70, "estimated": True,
+                    "latency_ms": 200.0})
+        ledger.add(None)
+        summary = ledger.as_dict()
+        self.assertEqual((summary["calls"], summary["estimated_calls"]), (2, 1))
+        self.assertEqual((summary["prompt_tokens"], summary["completion_tokens"], summary["total_tokens"]),
+                         (150, 40, 190))
+        self.assertEqual(summary["upstream_seconds"], 0.6)
+        self.assertEqual(summary["ms_per_completion_token"], 15.0)
+        self.assertAlmostEqual(summary["cost"], (150 * 2.0 + 40 * 8.0) / 1e6)
+        self.assertNotIn("cost", UsageLedger().as_dict())
+        self.assertIsNone(UsageLedger().as_dict()["ms_per_completion_token"])
+
+    def test_merge_usage(self):
+        """合并各语言对的账本，吞吐按合计时间重新计算"""
+        first = {"model": "m", "calls": 2, "estimated_calls": 0, "prompt_tokens": 100, "completion_tokens": 50,
+                 "total_tokens": 150, "wall_seconds": 1.0, "upstream_seconds": 1.0, "cost": 0.5}
+        second = dict(first, calls=1, prompt_tokens=50, completion_tokens=50, total_tokens=100, wall_seconds=4.0,
+                      cost=0.25)
+        merged = merge_usage([first, None, second])
+        self.assertEqual((merged["calls"], merged["total_tokens"], merged["model"]), (3, 250, "m"))
+        self.assertEqual(merged["tokens_per_second"], 50.0)
+        self.assertEqual(merged["ms_per_completion_token"], 20.0)
+        self.assertEqual(merged["cost"], 0.75)
+        self.assertIsNone(merge_usage([]))
+        self.assertIsNone(merge_usage([first, dict(second, model="other")])["model"])
+
+    def test_load_run_usage(self):
+        """按语言对读取运行目录中的账本，损坏或无账本的文件跳过"""
+        with tempfile.TemporaryDirectory() as tmp:
+            run_dir = Path(tmp)
+            (run_dir / 'en-zh.run.json').write_text(json.dumps({"usage": {"calls": 3}}), encoding='utf-8')
+            (run_dir / 'en-ja.run.json').write_text(json.dumps({"mode": "single"}), encoding='utf-8')
+            (run_dir / 'zh-en.run.json').write_text('{broken', encoding='utf-8')
+            with patch('backend.utils.logging'):
+                self.assertEqual(load_run_usage(run_dir), {'en-zh': {"calls": 3}})
+
+
+class TestFailedCallUsage(unittest.TestCase):
+    """失败调用的用量测试"""
+
+    def test_combine_records(self):
+        """合并多次调用的记录，保留调用次数与估计次数"""
+        first = {"prompt_tokens": 10, "completion_tokens": 0, "total_tokens": 10, "estimated": True,
+                 "latency_ms": 100.0}
+        second = {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15, "estimated": False,
+                  "latency_ms": 50.0}
+        combined = combine_records(first, None, second)
+        self.assertEqual((combined["calls"], combined["estimated_calls"], combined["total_tokens"]), (2, 1, 25))
+        self.assertEqual(combined["latency_ms"], 150.0)
+        self.assertIsNone(combine_records(None))
+        ledger = UsageLedger()
+        ledger.add(combined)
+        ledger.add(second)
+        self.assertEqual((ledger.as_dict()["calls"], ledger.as_dict()["estimated_calls"]), (3, 1))
+
+    def test_failed_stream_and_fallback_are_recorded(self):
+        """流式失败后非流式重试也失败时，结果的用量包含两次调用"""
+        service = TranslationService()
+        service.config = dict(service.config, api_key='test', model='m', stream=True)
+        rejected = Mock()
+        rejected.raise_for_status.side_effect = requests.exceptions.HTTPError('500 Server Error')
+        with patch('backend.services.requests.post',
+                   side_effect=[requests.exceptions.ConnectionError('reset'), rejected]):
+            result = service.translate_text('en', 'zh', "Hello there.")
+        self.assertFalse(result["success"])
+        self.assertEqual((result["usage"]["calls"], result["usage"]["estimated_calls"]), (2, 2))
+        self.assertGreater(result["usage"]["prompt_tokens"], 0)
+
+
+class FakeTranslationService:
+    config = {'model': 'mt', 'price_prompt': 1.0, 'price_completion': 0.0}
+
+    def translate_text(self, source_lang, target_lang, text):
+        usage = {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12, "estimated": False,
+                 "latency_ms": 5.0}
+        if 'fail' in text:
+            return {"success": False, "error": "boom", "usage": dict(usage, completion_tokens=0, total_tokens=10)}
+        return {"success": True, "translation": text.upper(), "usage": usage}
+
+
+class FakeEvaluationService:
+    config = {'model': 'judge'}
+
+    def evaluate_translation(self, source_lang, target_lang, source_text, translation):
+        return {"success": True, "score": 8, "justification": "Good.",
+                "usage": {"prompt_tokens": 30, "completion_tokens": 5, "total_tokens": 35, "estimated": True,
+                          "latency_ms": 5.0}}
+
+
+class TestEvaluationToolUsage(unittest.TestCase):
+    """评估脚本用量账本测试"""
+
+    def test_scheduler_ledgers(self):
+        """翻译（包括失败的调用）与评估的用量分别汇总，并保存在结果目录中"""
+        scheduler = PairScheduler(FakeTranslationService(), FakeEvaluationService(),
+                                  UpstreamBudget('translation', max_concurrency=2),
+                                  UpstreamBudget('evaluation', max_concurrency=2), 'test', prescreen=False)
+        jobs = [('en', 'zh', 1, 'first line'), ('en', 'zh', 2, 'this will fail'), ('en', 'zh', 3, 'third line')]
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch('evaluation.eval.save_result'), patch('evaluation.eval.find_reference', return_value=None), \
+                patch('backend.utils.DATA_ROOT', Path(tmp)):
+            stats = scheduler.run(jobs)
+            save_results_usage('test', stats['usage'])
+            saved = json.loads((Path(tmp) / 'results/test/usage.json').read_text(encoding='utf-8'))
+        translation, evaluation = stats['usage']['translation'], stats['usage']['evaluation']
+        self.assertEqual((stats['processed'], stats['successful']), (3, 2))
+        self.assertEqual((translation['model'], translation['calls'], translation['prompt_tokens']), ('mt', 3, 30))
+        self.assertAlmostEqual(translation['cost'], 30 / 1e6)
+        self.assertEqual((evaluation['calls'], evaluation['estimated_calls'], evaluation['total_tokens']), (2, 2, 70))
+        self.assertEqual(saved['translation']['calls'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)